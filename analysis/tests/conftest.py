@@ -0,0 +1,92 @@
+"""
+Shared fixtures for the visitor_revenue tests.
+
+Everything runs against LocalSnowflake, the DuckDB stand-in for the
+analytics.webflow tables: no credentials, network or Node toolchain needed.
+
+    cd analysis && python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import pytest
+
+ANALYSIS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ANALYSIS_DIR not in sys.path:
+    sys.path.insert(0, ANALYSIS_DIR)
+
+from visitor_revenue.local_backend import SYNTHETIC_END_DATE, LocalSnowflake  # noqa: E402
+
+# The last day of the synthetic data, which doesn't move with the clock
+ANALYSIS_DATE = SYNTHETIC_END_DATE
+
+
+@pytest.fixture(scope='session')
+def local_snowflake():
+    """One seeded in-memory DuckDB for the whole session (seeding takes a few seconds)"""
+    backend = LocalSnowflake(rows=5000)
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def make_analyzer(local_snowflake, tmp_path):
+    """Build analyzers on the session's LocalSnowflake that write under tmp_path"""
+    from visitor_revenue_analysis import WebflowVisitorRevenueAnalyzer
+
+    def make(**options):
+        options.setdefault('local_backend', local_snowflake)
+        analyzer = WebflowVisitorRevenueAnalyzer(**options)
+        analyzer.output_dir = str(tmp_path / 'output')
+        return analyzer
+
+    return make
+
+
+@pytest.fixture
+def run_main(tmp_path, monkeypatch):
+    """The analyzer's command line, writing its results under tmp_path/'output'"""
+    import visitor_revenue_analysis
+
+    class Analyzer(visitor_revenue_analysis.WebflowVisitorRevenueAnalyzer):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.output_dir = str(tmp_path / 'output')
+
+    monkeypatch.setattr(visitor_revenue_analysis, 'WebflowVisitorRevenueAnalyzer', Analyzer)
+    return visitor_revenue_analysis.main
+
+
+class FailingBackend:
+    """A LocalSnowflake whose queries reading `table` fail with `message`"""
+
+    def __init__(self, backend, table: str, message: str = "SQL compilation error: table is unavailable"):
+        self._backend = backend
+        self.table = table
+        self.message = message
+
+    def stream(self, query: str):
+        from visitor_revenue.errors import SnowflakeQueryError
+
+        if self.table in query:
+            raise SnowflakeQueryError(self.message)
+        return self._backend.stream(query)
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+
+class RecordingBackend:
+    """A LocalSnowflake that remembers the SQL text it was sent"""
+
+    def __init__(self, backend):
+        self._backend = backend
+        self.queries = []
+
+    def stream(self, query: str):
+        self.queries.append(query)
+        return self._backend.stream(query)
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
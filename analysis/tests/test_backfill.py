@@ -0,0 +1,102 @@
+"""
+Tests for backfills: as-of dates, the manifest that lets an interrupted
+backfill resume, and batched vs per-date queries.
+"""
+
+import json
+import os
+import tempfile
+from datetime import date
+
+import pytest
+
+from conftest import ANALYSIS_DATE, FailingBackend
+from visitor_revenue.backfill import BackfillManifest, backfill_dates
+from visitor_revenue.columnar_io import load_results
+from visitor_revenue.result_reuse import date_window
+
+DATES = backfill_dates(date.fromisoformat(date_window(ANALYSIS_DATE, 14)[0]), date.fromisoformat(ANALYSIS_DATE))
+
+
+@pytest.fixture
+def scratch(tmp_path, monkeypatch):
+    """Route tempfile to a directory the test can inspect"""
+    directory = tmp_path / 'tmp'
+    directory.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(directory))
+    return directory
+
+
+def manifest(analyzer):
+    path = os.path.join(analyzer.output_dir, 'backfill', 'backfill_manifest.json')
+    return json.load(open(path)) if os.path.exists(path) else {}
+
+
+def test_backfill_dates_step_from_start_to_end():
+    assert DATES == [date_window(ANALYSIS_DATE, 14)[0], date_window(ANALYSIS_DATE, 7)[0], ANALYSIS_DATE]
+    assert backfill_dates(date(2026, 1, 1), date(2026, 1, 3), 5) == ['2026-01-01']
+    with pytest.raises(ValueError, match="at least 1"):
+        backfill_dates(date(2026, 1, 1), date(2026, 1, 3), 0)
+
+
+def test_every_date_gets_a_report_and_a_manifest_entry(make_analyzer, scratch):
+    analyzer = make_analyzer()
+    analyzer.run_backfill(DATES, workers=2)
+    assert analyzer.failures == []
+    assert sorted(manifest(analyzer)) == DATES
+    for as_of in DATES:
+        assert os.path.exists(os.path.join(analyzer.output_dir, 'backfill', f"visitor_revenue_report_{as_of}.md"))
+    # The backfill's daily aggregate store is removed with its temporary directory
+    assert os.listdir(scratch) == []
+
+
+def test_a_rerun_resumes_with_the_dates_not_yet_completed(make_analyzer, capsys):
+    first = make_analyzer()
+    first.run_backfill(DATES[:2])
+    completed_at = {as_of: entry['completed_at'] for as_of, entry in manifest(first).items()}
+    capsys.readouterr()
+
+    resumed = make_analyzer()
+    resumed.run_backfill(DATES)
+    assert "3 as-of dates; 2 already completed, 1 to run" in capsys.readouterr().out
+    entries = manifest(resumed)
+    assert sorted(entries) == DATES
+    assert {as_of: entries[as_of]['completed_at'] for as_of in DATES[:2]} == completed_at
+
+
+def test_failed_dates_are_retried_by_the_next_run(make_analyzer, local_snowflake, scratch):
+    failing = make_analyzer(local_backend=FailingBackend(local_snowflake, 'FCT_USER_CREATED'))
+    failing.run_backfill(DATES)
+    assert failing.failures and manifest(failing) == {}
+    assert os.listdir(scratch) == []
+
+    retried = make_analyzer()
+    retried.run_backfill(DATES)
+    assert retried.failures == []
+    assert sorted(manifest(retried)) == DATES
+
+
+def test_batched_and_per_date_backfills_agree(make_analyzer, tmp_path):
+    batched = make_analyzer()
+    batched.run_backfill(DATES, batch=True)
+    separate = make_analyzer()
+    separate.output_dir = str(tmp_path / 'separate')
+    separate.run_backfill(DATES, batch=False)
+
+    for as_of in DATES:
+        expected = load_results(os.path.join(separate.output_dir, 'backfill'), as_of)
+        actual = load_results(os.path.join(batched.output_dir, 'backfill'), as_of)
+        assert sorted(actual) == sorted(expected)
+        for key in ('geography_visitors', 'channel_visitors', 'visitor_trends', 'signup_conversion'):
+            # ORDER BY leaves rows with equal counts in no particular order
+            assert sorted(map(repr, actual[key].to_pylist())) == sorted(map(repr, expected[key].to_pylist())), \
+                (as_of, key)
+
+
+def test_the_manifest_survives_a_reload(tmp_path):
+    path = str(tmp_path / 'nested' / 'backfill_manifest.json')
+    BackfillManifest(path).complete('2026-10-01', 'report.md')
+    reloaded = BackfillManifest(path)
+    assert '2026-10-01' in reloaded and '2026-10-08' not in reloaded
+    (tmp_path / 'corrupt.json').write_text('{')
+    assert '2026-10-01' not in BackfillManifest(str(tmp_path / 'corrupt.json'))
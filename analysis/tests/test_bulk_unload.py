@@ -0,0 +1,79 @@
+"""
+Tests for bulk unloads through LocalSnowflake's stage: the Parquet files and
+manifest, reuse, and cleanup when a statement fails.
+"""
+
+import os
+
+import pytest
+
+from conftest import ANALYSIS_DATE
+from visitor_revenue.bulk_unload import MANIFEST, open_dataset, read_manifest, reusable, unload
+from visitor_revenue.errors import SnowflakeQueryError
+from visitor_revenue.result_reuse import date_window
+
+START, END = date_window(ANALYSIS_DATE, 30)
+QUERY = f"""
+        SELECT ID_VISITOR, DATE_DAY
+        FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS
+        WHERE DATE_DAY BETWEEN DATE '{START}' AND DATE '{END}'
+        """
+
+
+def failing(local_snowflake, verb):
+    """execute() that fails every statement starting with verb"""
+    def execute(sql):
+        if sql.startswith(verb):
+            raise SnowflakeQueryError(f"{verb} failed: Service Unavailable")
+        return local_snowflake.stream(sql)
+    return execute
+
+
+def leftovers(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if name != 'unload')
+
+
+def test_unload_writes_parquet_and_a_manifest(local_snowflake, tmp_path):
+    directory = str(tmp_path / 'unload')
+    result = unload(QUERY, ANALYSIS_DATE, directory, local_snowflake.stream)
+    [expected] = local_snowflake.query(f"SELECT COUNT(*) AS n FROM ({QUERY})")
+    assert result.rows == expected['n'] > 0
+    assert result.files >= 1 and not result.reused
+    assert open_dataset(directory).count_rows() == result.rows
+    assert read_manifest(directory)['rows'] == result.rows
+    assert leftovers(tmp_path) == []
+
+
+def test_a_complete_unload_is_reused(local_snowflake, tmp_path):
+    directory = str(tmp_path / 'unload')
+    first = unload(QUERY, ANALYSIS_DATE, directory, local_snowflake.stream)
+    reused = reusable(directory, QUERY, ANALYSIS_DATE)
+    assert reused is not None and reused.reused
+    assert (reused.files, reused.rows) == (first.files, first.rows)
+    assert reusable(directory, QUERY, '2026-10-16') is None
+    assert reusable(str(tmp_path / 'missing'), QUERY, ANALYSIS_DATE) is None
+
+
+@pytest.mark.parametrize('verb', ['COPY', 'GET'])
+def test_a_failed_unload_keeps_the_previous_directory(local_snowflake, tmp_path, verb):
+    directory = str(tmp_path / 'unload')
+    first = unload(QUERY, ANALYSIS_DATE, directory, local_snowflake.stream)
+    with pytest.raises(SnowflakeQueryError, match=f"{verb} failed"):
+        unload(QUERY, ANALYSIS_DATE, directory, failing(local_snowflake, verb))
+    assert leftovers(tmp_path) == []
+    assert reusable(directory, QUERY, ANALYSIS_DATE).rows == first.rows
+    assert open_dataset(directory).count_rows() == first.rows
+
+
+def test_a_failed_first_unload_leaves_nothing_behind(local_snowflake, tmp_path):
+    directory = str(tmp_path / 'unload')
+    with pytest.raises(SnowflakeQueryError):
+        unload(QUERY, ANALYSIS_DATE, directory, failing(local_snowflake, 'GET'))
+    assert os.listdir(tmp_path) == []
+
+
+def test_a_directory_without_a_manifest_is_not_reused(local_snowflake, tmp_path):
+    directory = str(tmp_path / 'unload')
+    unload(QUERY, ANALYSIS_DATE, directory, local_snowflake.stream)
+    os.remove(os.path.join(directory, MANIFEST))
+    assert reusable(directory, QUERY, ANALYSIS_DATE) is None
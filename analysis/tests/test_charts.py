@@ -0,0 +1,88 @@
+"""
+Tests for the report charts: rendering in a process pool, reuse of
+unchanged charts by input hash, and embedding in the Markdown/HTML report.
+"""
+
+import os
+
+import pytest
+
+from conftest import ANALYSIS_DATE
+from visitor_revenue.charts import CHARTS, ChartSpec, chart_inputs, chart_key, render_charts
+
+pytest.importorskip('matplotlib')
+
+GEOGRAPHY = CHARTS[0]
+ROWS = [{'region': 'US', 'unique_visitors': 500}, {'region': 'UK', 'unique_visitors': 300}]
+
+
+def test_charts_are_keyed_by_the_columns_they_plot():
+    inputs = chart_inputs(GEOGRAPHY, ROWS)
+    assert inputs == [['US', 500], ['UK', 300]]
+    # Columns the chart doesn't plot don't change it
+    assert chart_key(GEOGRAPHY, chart_inputs(GEOGRAPHY, [dict(row, other=1) for row in ROWS])) == \
+        chart_key(GEOGRAPHY, inputs)
+    assert chart_key(GEOGRAPHY, [['US', 501], ['UK', 300]]) != chart_key(GEOGRAPHY, inputs)
+    assert chart_inputs(GEOGRAPHY, [{'region': 'US'}]) is None
+    assert chart_inputs(GEOGRAPHY, []) is None
+
+
+def test_unchanged_charts_are_reused(tmp_path):
+    first = render_charts({'geography_visitors': ROWS}, str(tmp_path), workers=1)
+    assert [(chart.spec.name, chart.cached) for chart in first] == [('geography', False)]
+    assert os.path.getsize(first[0].path) > 0
+    again = render_charts({'geography_visitors': ROWS}, str(tmp_path), workers=1)
+    assert [(chart.path, chart.cached) for chart in again] == [(first[0].path, True)]
+    assert render_charts({}, str(tmp_path)) == []
+
+
+def test_a_chart_that_fails_to_render_is_left_out(tmp_path, capsys):
+    rows = {'geography_visitors': ROWS, 'visitor_trends': [{'date': '2026-10-15'}]}
+    broken = ChartSpec('visitor_trends', 'visitor_trends', "Trends", 'unknown', ('date',), ())
+    charts = render_charts(rows, str(tmp_path), workers=1, specs=[GEOGRAPHY, broken])
+    assert [chart.spec.name for chart in charts] == ['geography']
+    assert "Error rendering visitor_trends chart" in capsys.readouterr().out
+
+
+def test_every_chart_kind_renders(tmp_path):
+    results = {
+        'geography_visitors': ROWS,
+        'channel_visitors': [{'channel_category': 'Paid', 'channel': 'Search', 'unique_visitors': 400}],
+        'geo_channel_matrix': [{'region': 'US', 'channel_category': 'Paid', 'pre_signup_rate': 12.5},
+                               {'region': 'UK', 'channel_category': 'Organic', 'pre_signup_rate': None}],
+        'revenue_segments': [{'segment': 'SMB', 'plan_tier': 'Pro', 'total_mrr': 1200.0}],
+        'visitor_trends': [{'date': '2026-10-14', 'unique_visitors': 90, 'visitors_7d_avg': 85.0},
+                           {'date': '2026-10-15', 'unique_visitors': 110, 'visitors_7d_avg': 95.5}],
+    }
+    charts = render_charts(results, str(tmp_path), workers=1)
+    assert [chart.spec.name for chart in charts] == [spec.name for spec in CHARTS]
+    assert all(os.path.getsize(chart.path) > 0 for chart in charts)
+
+
+def test_the_report_embeds_charts_rendered_in_a_process_pool(make_analyzer, capsys):
+    analyzer = make_analyzer(charts=True, chart_workers=2)
+    analyzer.run_analyses()
+    analyzer.save_results()
+    # The synthetic data is too small for some results (e.g. the geography x channel matrix)
+    specs = [spec for spec in CHARTS if spec.result in analyzer.results]
+    assert len(specs) >= 4
+    assert f"Charts: {len(specs)} rendered, 0 unchanged" in capsys.readouterr().out
+    assert len(os.listdir(os.path.join(analyzer.output_dir, 'charts'))) == len(specs)
+
+    with open(os.path.join(analyzer.output_dir, f"visitor_revenue_report_{ANALYSIS_DATE}.md")) as f:
+        report = f.read()
+    assert "## Charts" in report
+    for spec in specs:
+        assert f"![{spec.title}](charts/{spec.name}_" in report
+    with open(os.path.join(analyzer.output_dir, f"visitor_revenue_report_{ANALYSIS_DATE}.html")) as f:
+        assert f.read().count('src="data:image/png;base64,') == len(specs)
+
+    analyzer.save_results()
+    assert f"Charts: 0 rendered, {len(specs)} unchanged" in capsys.readouterr().out
+
+
+def test_charts_from_the_command_line(run_main, tmp_path, capsys):
+    run_main(['--local', '--local-rows', '1000', '--backend', 'records', '--charts', '--chart-workers', '1'])
+    assert "Charts: " in capsys.readouterr().out
+    reports = [name for name in os.listdir(tmp_path / 'output') if name.endswith('.html')]
+    assert len(reports) == 1 and os.listdir(tmp_path / 'output' / 'charts')
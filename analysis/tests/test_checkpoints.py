@@ -0,0 +1,106 @@
+"""
+Tests for per-step checkpoints and --resume: finished steps are restored
+from their files, failed ones rerun, and checkpoints from another date or
+other settings are never reused.
+"""
+
+import json
+import os
+
+from conftest import ANALYSIS_DATE, FailingBackend, RecordingBackend
+from visitor_revenue.checkpoints import RunCheckpoints
+from visitor_revenue.result_reuse import date_window
+
+REVENUE_TABLE = 'TOOL_PLAN_OBJECT_DAILY_CURRENT'
+
+
+def run_dir(analyzer):
+    return os.path.join(analyzer.output_dir, 'runs', analyzer.analysis_date)
+
+
+def manifest(analyzer):
+    with open(os.path.join(run_dir(analyzer), 'checkpoints.json')) as f:
+        return json.load(f)
+
+
+def interrupted_run(make_analyzer, local_snowflake, **options):
+    """A run whose revenue step failed"""
+    analyzer = make_analyzer(local_backend=FailingBackend(local_snowflake, REVENUE_TABLE), **options)
+    analyzer.run_analyses()
+    return analyzer
+
+
+def test_every_step_is_checkpointed_with_its_status(make_analyzer, local_snowflake):
+    analyzer = interrupted_run(make_analyzer, local_snowflake)
+    steps = manifest(analyzer)
+    assert {method for _, method in analyzer.ANALYSIS_STEPS} == set(steps)
+    assert steps['analyze_revenue_by_segment']['status'] == 'failed'
+    assert steps['analyze_revenue_by_segment']['keys'] == []
+    visitor_trends = steps['analyze_visitor_trends']
+    assert visitor_trends['status'] == 'ok' and visitor_trends['keys'] == ['visitor_trends']
+    assert visitor_trends['window'] == ANALYSIS_DATE and len(visitor_trends['queries']) == 1
+    assert os.path.exists(os.path.join(run_dir(analyzer), 'visitor_trends.arrow'))
+
+
+def test_resume_reruns_only_the_failed_step(make_analyzer, local_snowflake, capsys):
+    first = interrupted_run(make_analyzer, local_snowflake)
+    capsys.readouterr()
+
+    backend = RecordingBackend(local_snowflake)
+    resumed = make_analyzer(local_backend=backend, resume=True)
+    resumed.run_analyses()
+    assert len(backend.queries) == 1 and REVENUE_TABLE in backend.queries[0]
+    assert "Restored analyze_visitor_trends from checkpoint (visitor_trends)" in capsys.readouterr().out
+    assert set(resumed.results) == set(first.results) | {'revenue_segments'}
+    assert resumed.results['visitor_trends'].equals(first.results['visitor_trends'])
+    assert manifest(resumed)['analyze_revenue_by_segment']['status'] == 'ok'
+
+
+def test_a_run_without_resume_starts_over(make_analyzer, local_snowflake):
+    interrupted_run(make_analyzer, local_snowflake)
+    backend = RecordingBackend(local_snowflake)
+    make_analyzer(local_backend=backend).run_analyses()
+    assert len(backend.queries) == len(make_analyzer().ANALYSIS_STEPS)
+
+
+def test_checkpoints_from_other_settings_or_dates_are_not_reused(make_analyzer, local_snowflake):
+    interrupted_run(make_analyzer, local_snowflake)
+    other_backend = RecordingBackend(local_snowflake)
+    make_analyzer(local_backend=other_backend, resume=True, result_backend='records').run_analyses()
+    assert len(other_backend.queries) == len(make_analyzer().ANALYSIS_STEPS)
+
+    other_date = RecordingBackend(local_snowflake)
+    make_analyzer(local_backend=other_date, resume=True, analysis_date=date_window(ANALYSIS_DATE, 1)[0]).run_analyses()
+    assert len(other_date.queries) == len(make_analyzer().ANALYSIS_STEPS)
+
+
+def test_a_missing_result_file_reruns_its_step(make_analyzer, local_snowflake):
+    first = interrupted_run(make_analyzer, local_snowflake)
+    os.remove(os.path.join(run_dir(first), 'visitor_trends.arrow'))
+    backend = RecordingBackend(local_snowflake)
+    make_analyzer(local_backend=backend, resume=True).run_analyses()
+    assert len(backend.queries) == 2
+    assert any('DAILY_MARKETING_VISITOR_DETAILS' in query for query in backend.queries)
+
+
+def test_completed_checks_status_window_and_settings(tmp_path):
+    checkpoints = RunCheckpoints(str(tmp_path / 'run'))
+    settings = {'cube': False}
+    checkpoints.record('ok_step', 'ok', ['a'], [], ANALYSIS_DATE, settings)
+    checkpoints.record('downgraded_step', 'downgraded', ['b'], [], ANALYSIS_DATE, settings)
+    reloaded = RunCheckpoints(str(tmp_path / 'run'))
+    assert reloaded.completed('ok_step', ANALYSIS_DATE, settings)['keys'] == ['a']
+    assert reloaded.completed('ok_step', ANALYSIS_DATE, {'cube': True}) is None
+    assert reloaded.completed('ok_step', '2026-10-14', settings) is None
+    assert reloaded.completed('downgraded_step', ANALYSIS_DATE, settings) is None
+    assert reloaded.completed('missing_step', ANALYSIS_DATE, settings) is None
+
+
+def test_resume_from_the_command_line(run_main, capsys):
+    args = ['--local', '--local-rows', '2000', '--no-single-flight']
+    assert run_main(args) == 0
+    capsys.readouterr()
+    assert run_main(args + ['--resume']) == 0
+    output = capsys.readouterr().out
+    assert "Restored analyze_visitor_trends from checkpoint" in output
+    assert "Executing:" not in output
@@ -0,0 +1,67 @@
+"""
+Tests for the result file formats: what save_results writes through each
+result backend and what load_results reads back.
+"""
+
+import csv
+import json
+
+import pandas as pd
+import pytest
+
+from conftest import ANALYSIS_DATE
+from visitor_revenue.columnar_io import available_dates, load_results, result_path, write_frame, write_records
+from visitor_revenue.records import Records
+
+ROWS = [
+    {'date': '2026-10-15', 'unique_visitors': 120, 'pre_signup_rate': 12.5},
+    {'date': '2026-10-14', 'unique_visitors': 80, 'pre_signup_rate': None},
+]
+
+
+@pytest.mark.parametrize('backend', ['records', 'pandas', 'polars'])
+def test_saved_results_load_back_unchanged(make_analyzer, backend):
+    analyzer = make_analyzer(result_backend=backend, output_formats=('arrow', 'parquet', 'csv', 'json'))
+    analyzer.analyze_visitor_trends()
+    analyzer.save_results()
+    expected = analyzer.result_backend.to_rows(analyzer.results['visitor_trends'])
+
+    for fmt in ('arrow', 'parquet'):
+        tables = load_results(analyzer.output_dir, ANALYSIS_DATE, fmt)
+        assert list(tables) == ['visitor_trends']
+        assert tables['visitor_trends'].to_pylist() == expected
+    with open(result_path(analyzer.output_dir, 'visitor_trends', ANALYSIS_DATE, 'json')) as f:
+        assert len(json.load(f)) == len(expected)
+    with open(result_path(analyzer.output_dir, 'visitor_trends', ANALYSIS_DATE, 'csv')) as f:
+        assert len(list(csv.DictReader(f))) == len(expected)
+
+
+def test_dtypes_survive_the_columnar_formats(tmp_path):
+    df = pd.DataFrame(ROWS)
+    for fmt in ('arrow', 'parquet'):
+        write_frame(df, result_path(str(tmp_path), 'trends', ANALYSIS_DATE, fmt), fmt)
+        table = load_results(str(tmp_path), ANALYSIS_DATE, fmt)['trends']
+        assert str(table.schema.field('unique_visitors').type) == 'int64'
+        assert table.column('pre_signup_rate').null_count == 1
+
+
+def test_records_and_row_dicts_write_the_same_table(tmp_path):
+    write_records(ROWS, result_path(str(tmp_path), 'rows', ANALYSIS_DATE, 'arrow'), 'arrow')
+    write_records(Records.from_rows(ROWS), result_path(str(tmp_path), 'records', ANALYSIS_DATE, 'arrow'), 'arrow')
+    tables = load_results(str(tmp_path), ANALYSIS_DATE)
+    assert tables['rows'].to_pylist() == tables['records'].to_pylist() == ROWS
+
+
+def test_the_latest_run_before_a_date_is_loaded(tmp_path):
+    for day in ('2026-10-13', '2026-10-14', ANALYSIS_DATE):
+        write_records([{'day': day}], result_path(str(tmp_path), 'trends', day, 'arrow'), 'arrow')
+    assert available_dates(str(tmp_path)) == ['2026-10-13', '2026-10-14', ANALYSIS_DATE]
+    assert load_results(str(tmp_path))['trends'].to_pylist() == [{'day': ANALYSIS_DATE}]
+    assert load_results(str(tmp_path), before=ANALYSIS_DATE)['trends'].to_pylist() == [{'day': '2026-10-14'}]
+    assert load_results(str(tmp_path), before='2026-10-13') == {}
+    assert load_results(str(tmp_path), keys=['other']) == {}
+
+
+def test_only_columnar_formats_can_be_loaded(tmp_path):
+    with pytest.raises(ValueError, match="columnar formats only"):
+        load_results(str(tmp_path), fmt='csv')
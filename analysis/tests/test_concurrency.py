@@ -0,0 +1,67 @@
+"""
+Tests for concurrent analysis steps: results and console output in step
+order, and one failing step not taking the others down.
+"""
+
+import time
+
+import pytest
+
+from conftest import FailingBackend
+from visitor_revenue.concurrency import run_grouped
+
+
+def step(name, delay, output):
+    def run():
+        time.sleep(delay)
+        print(f"{name} done")
+        output.append(name)
+        return name
+    return run
+
+
+def test_results_and_output_keep_step_order(capsys):
+    finished = []
+    steps = [step('slow', 0.2, finished), step('medium', 0.1, finished), step('fast', 0, finished)]
+    assert run_grouped(steps, max_workers=3) == ['slow', 'medium', 'fast']
+    assert finished == ['fast', 'medium', 'slow']  # they did overlap
+    assert capsys.readouterr().out == "slow done\nmedium done\nfast done\n"
+
+
+def test_a_failing_step_does_not_stop_the_others(capsys):
+    finished = []
+
+    def broken():
+        print("broken starting")
+        raise RuntimeError("step failed")
+
+    with pytest.raises(RuntimeError, match="step failed"):
+        run_grouped([broken, step('after', 0.1, finished)], max_workers=2)
+    assert finished == ['after']
+    assert capsys.readouterr().out == "broken starting\nafter done\n"
+
+
+def test_one_worker_runs_sequentially(capsys):
+    finished = []
+    assert run_grouped([step('a', 0.05, finished), step('b', 0, finished)], max_workers=1) == ['a', 'b']
+    assert finished == ['a', 'b']
+
+
+def test_concurrent_analyzer_matches_a_sequential_run(make_analyzer):
+    sequential = make_analyzer()
+    sequential.run_analyses()
+    concurrent = make_analyzer(max_concurrency=4)
+    concurrent.run_analyses()
+    assert list(concurrent.results) == [key for key, _ in concurrent.ANALYSIS_STEPS if key in sequential.results]
+    for key, frame in sequential.results.items():
+        assert concurrent.results[key].equals(frame), key
+
+
+def test_a_failed_query_only_loses_its_own_section(make_analyzer, local_snowflake):
+    analyzer = make_analyzer(local_backend=FailingBackend(local_snowflake, 'TOOL_PLAN_OBJECT_DAILY_CURRENT'),
+                             max_concurrency=4)
+    analyzer.run_analyses()
+    assert [failure['query'] for failure in analyzer.failures] == ["Current Revenue by Customer Segment"]
+    assert analyzer.failures[0]['kind'] == 'permanent'
+    assert 'revenue_segments' not in analyzer.results
+    assert all(len(analyzer.results[key]) for key in ('geography_visitors', 'channel_visitors', 'visitor_trends'))
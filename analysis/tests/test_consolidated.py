@@ -0,0 +1,107 @@
+"""
+Tests for the single GROUPING SETS visitor query and the local split that
+stands in for the four per-analysis queries.
+"""
+
+from conftest import ANALYSIS_DATE
+from visitor_revenue.consolidated import (consolidated_visitor_query, percent_rate, round_half_up,
+                                          split_visitor_groupings)
+from visitor_revenue.result_reuse import date_window
+
+# Dimensions each GROUPING_ID keeps, in the order of the query's GROUPING_ID(...) arguments
+GROUPED_DIMS = {
+    'geography': {'region'},                            # 7  = 0111
+    'channel': {'channel_category', 'channel'},         # 9  = 1001
+    'geo_channel': {'region', 'channel_category'},      # 3  = 0011
+    'daily': {'date'},                                  # 14 = 1110
+}
+
+
+def visitor_row(grouping_set, visitors, **dims):
+    row = {'grouping_set': grouping_set, 'region': None, 'channel_category': None, 'channel': None, 'date': None,
+           'unique_visitors': visitors, 'new_visitors': visitors // 2, 'pre_signup_visitors': visitors // 10}
+    row.update(dims)
+    return row
+
+
+def test_grouping_ids_map_to_the_dimensions_they_group_by(local_snowflake):
+    rows = local_snowflake.stream(consolidated_visitor_query(ANALYSIS_DATE)).to_dicts()
+    assert {r['grouping_set'] for r in rows} == set(GROUPED_DIMS)
+    for row in rows:
+        present = {dim for dim in ('region', 'channel_category', 'channel', 'date') if row[dim] is not None}
+        assert present == GROUPED_DIMS[row['grouping_set']], row
+
+
+def test_having_keeps_every_day_but_drops_small_groups(local_snowflake):
+    rows = local_snowflake.stream(consolidated_visitor_query(ANALYSIS_DATE)).to_dicts()
+    assert len([r for r in rows if r['grouping_set'] == 'daily']) == 31
+    assert all(r['unique_visitors'] >= 100 for r in rows if r['grouping_set'] != 'daily')
+
+
+def test_geography_counts_match_a_direct_query(local_snowflake):
+    rows = local_snowflake.stream(consolidated_visitor_query(ANALYSIS_DATE)).to_dicts()
+    start, end = date_window(ANALYSIS_DATE, 30)
+    direct = local_snowflake.stream(f"""
+        SELECT COALESCE(CUSTOM_REGION, 'Unknown') AS region, COUNT(DISTINCT ID_VISITOR) AS unique_visitors
+        FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS
+        WHERE DATE_DAY BETWEEN DATE '{start}' AND DATE '{end}'
+        GROUP BY 1
+        HAVING COUNT(DISTINCT ID_VISITOR) >= 100
+    """).to_dicts()
+    assert {r['region']: r['unique_visitors'] for r in rows if r['grouping_set'] == 'geography'} == \
+        {r['region']: r['unique_visitors'] for r in direct}
+
+
+def test_geography_and_channel_keep_groups_over_100_ordered_and_limited():
+    rows = [visitor_row('geography', 100, region='Edge')]
+    rows += [visitor_row('geography', 101 + i, region=f"R{i}") for i in range(30)]
+    rows += [visitor_row('channel', 200 + i, channel_category='Paid', channel=f"C{i}") for i in range(40)]
+    result = split_visitor_groupings(rows)
+
+    geography = result['geography_visitors']
+    assert len(geography) == 25
+    assert 'Edge' not in {r['region'] for r in geography}
+    assert [r['unique_visitors'] for r in geography] == sorted((r['unique_visitors'] for r in geography), reverse=True)
+    assert geography[0]['region'] == 'R29'
+    assert len(result['channel_visitors']) == 30
+
+
+def test_geo_channel_keeps_pairs_from_regions_with_1000_visitors():
+    rows = [
+        visitor_row('geo_channel', 600, region='Big', channel_category='Paid'),
+        visitor_row('geo_channel', 400, region='Big', channel_category='Organic'),
+        visitor_row('geo_channel', 99, region='Big', channel_category='Social'),
+        visitor_row('geo_channel', 900, region='Small', channel_category='Paid'),
+        visitor_row('geo_channel', 99, region='Small', channel_category='Organic'),
+        visitor_row('geo_channel', 99, region='Small', channel_category='Social'),
+    ]
+    matrix = split_visitor_groupings(rows)['geo_channel_matrix']
+    # 'Small' only reaches 1000 counting pairs under 100, which are dropped first
+    assert [(r['region'], r['channel_category']) for r in matrix] == [('Big', 'Paid'), ('Big', 'Organic')]
+
+
+def test_geo_channel_is_limited_to_50():
+    rows = [visitor_row('geo_channel', 100 + i, region='Big', channel_category=f"C{i}") for i in range(60)]
+    assert len(split_visitor_groupings(rows)['geo_channel_matrix']) == 50
+
+
+def test_upper_case_keys_and_null_counts_are_accepted():
+    row = {key.upper(): value for key, value in visitor_row('geography', 150, region='US').items()}
+    row['PRE_SIGNUP_VISITORS'] = None
+    [geography] = split_visitor_groupings([row])['geography_visitors']
+    assert geography['pre_signup_visitors'] == 0
+    assert geography['pre_signup_rate'] == 0.0
+
+
+def test_daily_trends_are_newest_first_with_trailing_averages():
+    rows = [visitor_row('daily', 100 * (day + 1), date=f"2026-10-{day + 1:02d}") for day in range(8)]
+    trends = split_visitor_groupings(rows)['visitor_trends']
+    assert trends[0]['date'] == '2026-10-08'
+    assert trends[0]['visitors_7d_avg'] == sum(100 * (day + 1) for day in range(1, 8)) / 7
+    assert trends[-1]['visitors_7d_avg'] == 100
+
+
+def test_rates_round_half_away_from_zero():
+    assert round_half_up(0.125) == 0.13
+    assert percent_rate(1, 8) == 12.5
+    assert percent_rate(1, 0) is None
@@ -0,0 +1,106 @@
+"""
+Tests for the budget scheduler: cheapest-first admission, window halving
+and refusal.
+"""
+
+import dataclasses
+
+import pytest
+
+from conftest import ANALYSIS_DATE
+from visitor_revenue.consolidated import consolidated_visitor_query
+from visitor_revenue.cost_planner import (CostBudget, QueryEstimate, StepPlan, explain_sql, parse_explain,
+                                          schedule)
+
+MB = 1024 * 1024
+
+
+def step(method, megabytes, days=30, seconds=None):
+    return StepPlan(method=method, description=method, query=f"SELECT '{method}'",
+                    estimate=QueryEstimate(100, 100, megabytes * MB), seconds=seconds, days=days, window_days=days)
+
+
+def downgrade(plan, days):
+    """Re-plan with the scan scaled by the shortened window, as re-EXPLAINing would"""
+    estimate = plan.estimate._replace(bytes_assigned=plan.estimate.bytes_assigned * days // plan.days)
+    return dataclasses.replace(plan, estimate=estimate, window_days=days)
+
+
+def test_everything_runs_without_a_budget():
+    plans = schedule([step('b', 20), step('a', 10)], CostBudget(), downgrade)
+    assert [(plan.method, plan.decision) for plan in plans] == [('a', 'run'), ('b', 'run')]
+
+
+def test_cheapest_steps_are_admitted_first():
+    plans = schedule([step('big', 70), step('small', 10), step('medium', 30)], CostBudget(max_bytes=100 * MB),
+                     downgrade)
+    assert [plan.method for plan in plans] == ['small', 'medium', 'big']
+    assert [plan.decision for plan in plans] == ['run', 'run', 'downgrade']
+
+
+def test_window_is_halved_until_the_step_fits():
+    [plan] = schedule([step('a', 60)], CostBudget(max_bytes=20 * MB), downgrade)
+    # 60 MB over 30 days: 15 days is 30 MB, 7 days is 14 MB
+    assert plan.decision == 'downgrade'
+    assert plan.window_days == 7
+    assert plan.bytes == 14 * MB
+    assert plan.reason == "window shortened from 30 to 7 days to fit the budget"
+    assert plan.label() == "7 of 30 days"
+
+
+def test_one_halving_when_that_is_enough():
+    [plan] = schedule([step('a', 60)], CostBudget(max_bytes=30 * MB), downgrade)
+    assert (plan.decision, plan.window_days) == ('downgrade', 15)
+
+
+def test_steps_that_do_not_fit_at_the_shortest_window_are_refused():
+    calls = []
+
+    def recording_downgrade(plan, days):
+        calls.append(days)
+        return downgrade(plan, days)
+
+    plans = schedule([step('a', 40), step('b', 60)], CostBudget(max_bytes=45 * MB), recording_downgrade)
+    assert [(plan.method, plan.decision) for plan in plans] == [('a', 'run'), ('b', 'refuse')]
+    assert calls == [15, 7]
+    assert "doesn't fit the run's budget" in plans[1].reason
+    assert plans[1].label() == "refused"
+
+
+def test_steps_without_a_window_are_refused_without_downgrading():
+    [plan] = schedule([step('a', 60, days=None)], CostBudget(max_bytes=10 * MB),
+                      lambda plan, days: pytest.fail("downgraded a step with no window"))
+    assert plan.decision == 'refuse'
+
+
+def test_credit_budget_uses_expected_seconds():
+    budget = CostBudget(max_credits=0.01, credits_per_hour=3.6)
+    plans = schedule([step('fast', 1, seconds=5), step('slow', 1, seconds=20)], budget, downgrade)
+    assert [(plan.method, plan.decision) for plan in plans] == [('fast', 'run'), ('slow', 'refuse')]
+
+
+def test_cached_and_unknown_steps_cost_nothing():
+    cached = dataclasses.replace(step('cached', 500), cached=True)
+    unknown = dataclasses.replace(step('unknown', 0), estimate=None)
+    plans = schedule([cached, unknown], CostBudget(max_bytes=1), downgrade)
+    assert [plan.decision for plan in plans] == ['run', 'run']
+
+
+def test_parse_explain_prefers_global_stats():
+    rows = [
+        {'operation': 'GlobalStats', 'partitionsTotal': 10, 'partitionsAssigned': 4, 'bytesAssigned': 4096},
+        {'operation': 'TableScan', 'partitionsTotal': 10, 'partitionsAssigned': 4, 'bytesAssigned': 4096},
+    ]
+    assert parse_explain(rows) == QueryEstimate(10, 4, 4096)
+    assert parse_explain(rows[1:] * 2) == QueryEstimate(20, 8, 8192)
+    with pytest.raises(ValueError):
+        parse_explain([{'operation': 'Result'}])
+
+
+def test_local_explain_reports_the_scan(local_snowflake):
+    def estimate(days):
+        return parse_explain(local_snowflake.query(explain_sql(consolidated_visitor_query(ANALYSIS_DATE, days))))
+
+    # The session's 5,000 rows fit one synthetic partition, so both windows scan all of it
+    assert estimate(30).partitions_assigned == estimate(30).partitions_total == 1
+    assert 0 < estimate(7).bytes_assigned <= estimate(30).bytes_assigned
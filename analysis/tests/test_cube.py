@@ -0,0 +1,108 @@
+"""
+Tests for VisitorCube slices: exact groupings, summed upper bounds and
+merged sketches, against COUNT(DISTINCT) from the local backend.
+"""
+
+import pytest
+
+from conftest import ANALYSIS_DATE
+from visitor_revenue import hll
+from visitor_revenue.consolidated import consolidated_visitor_query
+from visitor_revenue.cube import VisitorCube, visitor_cube_query
+from visitor_revenue.result_reuse import date_window
+
+START, END = date_window(ANALYSIS_DATE, 30)
+# The last seven days of the window
+WEEK_START = date_window(ANALYSIS_DATE, 6)[0]
+
+
+@pytest.fixture(scope='module')
+def exact_cube(local_snowflake):
+    return VisitorCube(local_snowflake.query(visitor_cube_query(ANALYSIS_DATE, exact=True)))
+
+
+@pytest.fixture(scope='module')
+def sketch_cube(local_snowflake):
+    return VisitorCube(local_snowflake.query(visitor_cube_query(ANALYSIS_DATE)))
+
+
+def count_distinct(local_snowflake, by, where=""):
+    rows = local_snowflake.query(f"""
+        SELECT COALESCE({by}, 'Unknown') AS key, COUNT(DISTINCT ID_VISITOR) AS unique_visitors
+        FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS
+        WHERE DATE_DAY BETWEEN DATE '{START}' AND DATE '{END}' {where}
+        GROUP BY 1
+    """)
+    return {row['key']: row['unique_visitors'] for row in rows}
+
+
+def test_reported_groupings_are_exact(local_snowflake, exact_cube):
+    result = exact_cube.slice(by=['region'])
+    assert not result.approximate and result.note == ""
+    assert {r['region']: r['unique_visitors'] for r in result.rows} == count_distinct(local_snowflake, 'CUSTOM_REGION')
+    counts = [r['unique_visitors'] for r in result.rows]
+    assert counts == sorted(counts, reverse=True)
+
+
+def test_exact_cube_reproduces_the_consolidated_groupings(local_snowflake, exact_cube):
+    consolidated = local_snowflake.query(consolidated_visitor_query(ANALYSIS_DATE))
+    expected = {(r['region'], r['unique_visitors']) for r in consolidated if r['grouping_set'] == 'geography'}
+    cube_rows = {(r['region'], r['unique_visitors']) for r in exact_cube.grouping_rows()
+                 if r['grouping_set'] == 'geography'}
+    assert expected <= cube_rows
+
+
+def test_a_filter_pinned_to_one_value_stays_exact(local_snowflake, exact_cube):
+    region = exact_cube.slice(by=['region']).rows[0]['region']
+    result = exact_cube.slice(by=['channel_category'], where={'region': region})
+    assert not result.approximate
+    expected = count_distinct(local_snowflake, 'DIM_CHANNEL_CATEGORY',
+                              f"AND COALESCE(CUSTOM_REGION, 'Unknown') = '{region}'")
+    assert {r['channel_category']: r['unique_visitors'] for r in result.rows} == expected
+
+
+def test_other_questions_are_summed_upper_bounds(local_snowflake, exact_cube):
+    result = exact_cube.slice(by=['channel_category'], start=WEEK_START, end=END)
+    # No reported grouping has a date, so the region x channel x day cells are summed
+    assert result.approximate
+    assert "summed across region, channel, date" in result.note
+    week = local_snowflake.query(f"""
+        SELECT COALESCE(DIM_CHANNEL_CATEGORY, 'Unknown') AS key, COUNT(DISTINCT ID_VISITOR) AS unique_visitors
+        FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS
+        WHERE DATE_DAY BETWEEN DATE '{WEEK_START}' AND DATE '{END}'
+        GROUP BY 1
+    """)
+    exact = {row['key']: row['unique_visitors'] for row in week}
+    for row in result.rows:
+        assert row['unique_visitors'] >= exact[row['channel_category']]
+
+
+def test_sketch_slices_are_within_the_error_bound(local_snowflake, sketch_cube):
+    assert sketch_cube.sketched and sketch_cube.cells > 0
+    result = sketch_cube.slice(by=['channel_category'])
+    assert result.approximate and result.error == hll.error_bound()
+    exact = count_distinct(local_snowflake, 'DIM_CHANNEL_CATEGORY')
+    for row in result.rows:
+        expected = exact[row['channel_category']]
+        assert abs(row['unique_visitors'] - expected) <= max(1, hll.error_bound() * expected)
+
+
+def test_sketch_totals_merge_across_days(local_snowflake, sketch_cube):
+    [total] = sketch_cube.slice().rows
+    [exact] = local_snowflake.query(f"""
+        SELECT COUNT(DISTINCT ID_VISITOR) AS unique_visitors
+        FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS
+        WHERE DATE_DAY BETWEEN DATE '{START}' AND DATE '{END}'
+    """)
+    assert abs(total['unique_visitors'] - exact['unique_visitors']) <= hll.error_bound() * exact['unique_visitors']
+
+
+def test_unknown_dimensions_are_rejected(exact_cube):
+    with pytest.raises(ValueError, match="Unknown cube dimension"):
+        exact_cube.slice(by=['country'])
+
+
+def test_empty_cube():
+    cube = VisitorCube([])
+    assert cube.cells == 0 and cube.date_range is None
+    assert cube.slice(by=['region']).rows == []
@@ -0,0 +1,93 @@
+"""
+Tests for the per-day aggregate store: which days get re-fetched, how stale
+days are grouped into queries, and the rollups computed from stored days.
+"""
+
+from datetime import date, timedelta
+
+from conftest import ANALYSIS_DATE
+from visitor_revenue.daily_store import DailyAggregateStore, weekly_conversion
+
+END = date.fromisoformat(ANALYSIS_DATE)
+START = END - timedelta(days=9)
+
+
+def recording(rows=()):
+    """fetch(sql) that records every query it is given"""
+    queries = []
+
+    def fetch(sql):
+        queries.append(sql)
+        return list(rows)
+    fetch.queries = queries
+    return fetch
+
+
+def test_an_empty_store_fetches_every_day(tmp_path):
+    store = DailyAggregateStore(str(tmp_path / 'daily.sqlite'), refetch_days=3)
+    assert store.dates_to_fetch('visitor_daily', START, END) == [START + timedelta(days=i) for i in range(10)]
+
+
+def test_only_the_refetch_window_is_fetched_again(tmp_path):
+    store = DailyAggregateStore(str(tmp_path / 'daily.sqlite'), refetch_days=3)
+    fetch = recording()
+    assert store.refresh('visitor_daily', START, END, fetch) == [(START, END)]
+    assert store.dates_to_fetch('visitor_daily', START, END) == [END - timedelta(days=2), END - timedelta(days=1), END]
+    assert store.refresh('visitor_daily', START, END, fetch) == [(END - timedelta(days=2), END)]
+    assert f"BETWEEN DATE '{(END - timedelta(days=2)).isoformat()}' AND DATE '{ANALYSIS_DATE}'" in fetch.queries[-1]
+
+
+def test_nothing_is_fetched_without_a_refetch_window(tmp_path):
+    store = DailyAggregateStore(str(tmp_path / 'daily.sqlite'), refetch_days=0)
+    fetch = recording()
+    store.refresh('visitor_daily', START, END, fetch)
+    assert store.refresh('visitor_daily', START, END, fetch) == []
+    assert len(fetch.queries) == 1
+
+
+def test_stale_days_are_fetched_in_contiguous_runs(tmp_path):
+    store = DailyAggregateStore(str(tmp_path / 'daily.sqlite'), refetch_days=2)
+    store.upsert('visitor_daily', [], START + timedelta(days=1), END)
+    fetch = recording()
+    # The missing first day and the trailing window are two queries, not one spanning all ten days
+    assert store.refresh('visitor_daily', START, END, fetch) == [(START, START), (END - timedelta(days=1), END)]
+    assert len(fetch.queries) == 2
+    assert f"BETWEEN DATE '{START.isoformat()}' AND DATE '{START.isoformat()}'" in fetch.queries[0]
+
+
+def test_days_without_rows_are_stored_as_zeros(tmp_path):
+    store = DailyAggregateStore(str(tmp_path / 'daily.sqlite'))
+    rows = [{'DATE': f"{START.isoformat()} 00:00:00", 'UNIQUE_VISITORS': 5, 'NEW_VISITORS': 2, 'PRE_SIGNUP_VISITORS': None}]
+    store.upsert('visitor_daily', rows, START, START + timedelta(days=1))
+    assert store.load('visitor_daily', START, END) == [
+        {'date': START.isoformat(), 'unique_visitors': 5.0, 'new_visitors': 2.0, 'pre_signup_visitors': 0.0},
+        {'date': (START + timedelta(days=1)).isoformat(), 'unique_visitors': 0.0, 'new_visitors': 0.0,
+         'pre_signup_visitors': 0.0},
+    ]
+
+
+def test_weekly_conversion_rolls_up_monday_start_weeks(tmp_path):
+    store = DailyAggregateStore(str(tmp_path / 'daily.sqlite'))
+    sunday, monday = date(2026, 10, 4), date(2026, 10, 5)
+    store.upsert('conversion_daily', [
+        {'date': sunday.isoformat(), 'signups': 10, 'new_subscriptions': 1, 'new_mrr': 20},
+        {'date': monday.isoformat(), 'signups': 20, 'new_subscriptions': 2, 'new_mrr': 30},
+        {'date': (monday + timedelta(days=6)).isoformat(), 'signups': 20, 'new_subscriptions': 3, 'new_mrr': 60},
+    ], sunday, monday + timedelta(days=7))
+
+    newest, oldest = weekly_conversion(store, sunday, monday + timedelta(days=7))
+    assert (newest['week'], oldest['week']) == ('2026-10-05', '2026-09-28')
+    assert (newest['total_signups'], newest['total_new_subscriptions'], newest['total_new_mrr']) == (40, 5, 90)
+    assert newest['conversion_rate'] == 12.5
+    assert newest['avg_mrr_per_conversion'] == 18.0
+    assert oldest['total_signups'] == 10
+
+
+def test_incremental_analyzer_matches_the_sql_path(make_analyzer, tmp_path):
+    direct = make_analyzer()
+    direct.analyze_visitor_trends()
+    incremental = make_analyzer(daily_store=DailyAggregateStore(str(tmp_path / 'daily.sqlite')))
+    incremental.analyze_visitor_trends()
+    columns = ['date', 'unique_visitors', 'new_visitors', 'pre_signup_visitors']
+    assert incremental.results['visitor_trends'][columns].astype(str).values.tolist() == \
+        direct.results['visitor_trends'][columns].astype(str).values.tolist()
@@ -0,0 +1,74 @@
+"""
+Tests for HLL_EXPORT parsing and distinct-count estimates, checked against
+exact COUNT(DISTINCT) from the local backend.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from visitor_revenue import hll
+
+
+def registers(export):
+    indices, values = hll.parse_export(export)
+    full = np.zeros(1 << hll.PRECISION, dtype=np.uint8)
+    full[indices] = values
+    return full
+
+
+def local_export(local_snowflake, source):
+    [row] = local_snowflake.query(f"SELECT HLL_EXPORT(HLL_ACCUMULATE(x)) AS sketch FROM {source}")
+    return row['sketch']
+
+
+def test_sparse_dense_and_null_exports_parse_alike():
+    dense = [0] * (1 << hll.PRECISION)
+    dense[3], dense[70] = 2, 5
+    sparse = {'version': 4, 'precision': 12, 'sparse': {'indices': [3, 70], 'maxLzCounts': [2, 5]}}
+    for export in (sparse, json.dumps(sparse), {'version': 4, 'precision': 12, 'dense': dense}):
+        indices, values = hll.parse_export(export)
+        assert indices.tolist() == [3, 70] and values.tolist() == [2, 5]
+    assert len(hll.parse_export(None)[0]) == 0
+
+
+def test_other_precisions_are_rejected():
+    with pytest.raises(ValueError, match="precision 14"):
+        hll.parse_export({'precision': 14, 'sparse': {}})
+
+
+def test_empty_sketch_estimates_zero():
+    assert hll.estimate(np.zeros(1 << hll.PRECISION, dtype=np.uint8)) == 0
+
+
+@pytest.mark.parametrize('distinct', [10, 1000, 50000, 300000])
+def test_estimates_are_within_the_error_bound(local_snowflake, distinct):
+    export = local_export(local_snowflake, f"range({distinct}) t(x)")
+    assert abs(hll.estimate(registers(export)) - distinct) <= hll.error_bound() * distinct
+
+
+def test_merged_sketches_estimate_the_union(local_snowflake):
+    # Overlapping ranges: the union has 150,000 values, the parts sum to 200,000
+    first = registers(local_export(local_snowflake, "range(0, 100000) t(x)"))
+    second = registers(local_export(local_snowflake, "range(50000, 150000) t(x)"))
+    merged = np.maximum(first, second)
+    assert abs(hll.estimate(merged) - 150000) <= hll.error_bound() * 150000
+    assert hll.estimates(np.stack([first, second])).shape == (2,)
+
+
+def test_visitor_sketches_match_count_distinct(local_snowflake):
+    rows = local_snowflake.query("""
+        SELECT DIM_CHANNEL_CATEGORY AS category,
+               COUNT(DISTINCT ID_VISITOR) AS exact,
+               HLL_EXPORT(HLL_ACCUMULATE(ID_VISITOR)) AS sketch
+        FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS
+        GROUP BY 1
+    """)
+    for row in rows:
+        assert abs(hll.estimate(registers(row['sketch'])) - row['exact']) <= max(1, hll.error_bound() * row['exact'])
+
+
+def test_error_bound_at_precision_12():
+    assert hll.relative_error() == pytest.approx(0.01625)
+    assert hll.error_bound() == pytest.approx(0.03185)
@@ -0,0 +1,51 @@
+"""
+Tests for the cold-start import benchmark and the lazy imports it guards.
+"""
+
+import json
+import subprocess
+import sys
+
+from conftest import ANALYSIS_DIR
+from visitor_revenue.import_benchmark import HEAVY_MODULES, heavy_modules, main, module_imports, parse_importtime
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     _io
+import time:       200 |        300 |   io
+import time:        50 |        350 | first
+import time:       400 |        400 |     numpy.core
+import time:      1000 |       1400 |   numpy
+import time:       300 |       1700 | second
+"""
+
+
+def test_importtime_output_is_parsed_into_import_trees():
+    entries = parse_importtime(IMPORTTIME)
+    assert [(entry.module, entry.depth) for entry in entries] == [
+        ('_io', 2), ('io', 1), ('first', 0), ('numpy.core', 2), ('numpy', 1), ('second', 0)]
+    tree = module_imports(entries, 'second')
+    assert [entry.module for entry in tree] == ['numpy.core', 'numpy', 'second']
+    assert tree[-1].cumulative_us == 1700
+    assert heavy_modules(tree) == ['numpy'] and heavy_modules(module_imports(entries, 'first')) == []
+
+
+def test_importing_the_analyzer_loads_no_heavy_modules():
+    modules = ', '.join(repr(module) for module in HEAVY_MODULES)
+    check = f"import sys, visitor_revenue_analysis; print(sorted(set(sys.modules) & {{{modules}}}))"
+    result = subprocess.run([sys.executable, '-c', check], cwd=ANALYSIS_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '[]'
+
+
+def test_the_benchmark_passes_within_budget_and_writes_json(tmp_path, capsys):
+    output = tmp_path / 'imports.json'
+    assert main(['--module', 'visitor_revenue_analysis', '--repeat', '1', '--budget-ms', '60000',
+                 '--json', str(output)]) == 0
+    assert "All modules within the cold-start budget" in capsys.readouterr().out
+    assert list(json.loads(output.read_text())) == ['visitor_revenue_analysis']
+
+
+def test_the_benchmark_fails_over_budget(capsys):
+    assert main(['--module', 'visitor_revenue.records', '--repeat', '1', '--budget-ms', '0']) == 1
+    assert "exceeds the 0 ms budget" in capsys.readouterr().out
@@ -0,0 +1,91 @@
+"""
+Tests for schema-driven ingest: categorical dimensions, narrowed counts and
+typed value columns in the pandas and Polars result frames.
+"""
+
+import pandas as pd
+import polars as pl
+import pytest
+
+from visitor_revenue.ingest import (VISITOR_SCHEMA, FrameSchema, columns_from_rows, columns_from_tuples,
+                                    pandas_frame, polars_frame, smallest_int)
+from visitor_revenue.result_backends import get_result_backend
+
+ROWS = [
+    {'region': 'US', 'date': '2026-10-15', 'unique_visitors': 120, 'new_visitors': 300, 'pre_signup_visitors': 4,
+     'sessions': 2 ** 40, 'pre_signup_rate': 12.5, 'note': 'a'},
+    {'region': 'UK', 'date': '2026-10-14', 'unique_visitors': 80, 'new_visitors': None, 'pre_signup_visitors': 0,
+     'sessions': 7, 'pre_signup_rate': None, 'note': 3},
+    {'region': 'US', 'date': '2026-10-13', 'unique_visitors': -5, 'new_visitors': 10, 'pre_signup_visitors': 1,
+     'sessions': 9, 'pre_signup_rate': 7, 'note': None},
+]
+
+
+def test_smallest_int_is_the_narrowest_signed_type():
+    assert smallest_int(-128, 127) == 'int8'
+    assert smallest_int(0, 128) == 'int16'
+    assert smallest_int(-2 ** 15 - 1, 0) == 'int32'
+    assert smallest_int(0, 2 ** 31) == 'int64'
+
+
+def test_pandas_frames_follow_the_schema():
+    df = pandas_frame(columns_from_rows(ROWS), VISITOR_SCHEMA)
+    assert isinstance(df['region'].dtype, pd.CategoricalDtype)
+    assert list(df['region'].cat.categories) == ['UK', 'US']
+    assert df['unique_visitors'].dtype == 'int8'
+    assert df['pre_signup_visitors'].dtype == 'int8'
+    # A missing count can't be an integer
+    assert df['new_visitors'].dtype == 'float64' and df['new_visitors'].isna().sum() == 1
+    assert df['sessions'].dtype == 'int64'
+    assert df['pre_signup_rate'].dtype == 'float64' and df['pre_signup_rate'].tolist()[2] == 7.0
+    assert pd.api.types.is_string_dtype(df['date'].dtype) and df['date'].tolist()[0] == '2026-10-15'
+    # Mixed columns are left as Python objects
+    assert df['note'].dtype == object and df['note'].tolist() == ['a', 3, None]
+
+
+def test_pandas_frames_hold_the_same_values_as_plain_frames():
+    df = pandas_frame(columns_from_rows(ROWS), VISITOR_SCHEMA)
+    plain = pd.DataFrame(ROWS)
+    assert df.astype(object).where(df.notna(), None).to_dict('records') == \
+        plain.astype(object).where(plain.notna(), None).to_dict('records')
+    assert df.groupby('region', observed=True)['unique_visitors'].sum().to_dict() == {'UK': 80, 'US': 115}
+
+
+def test_polars_frames_follow_the_schema():
+    df = polars_frame(columns_from_rows(ROWS), VISITOR_SCHEMA)
+    assert df.schema['region'] == pl.Categorical
+    assert df.schema['unique_visitors'] == pl.Int8
+    assert df.schema['new_visitors'] == pl.Int64 and df['new_visitors'].null_count() == 1
+    assert df.schema['sessions'] == pl.Int64
+    assert df['region'].cast(pl.String).to_list() == ['US', 'UK', 'US']
+
+
+def test_tuples_and_row_dicts_build_the_same_columns():
+    columns = list(ROWS[0])
+    tuples = [tuple(row[name] for name in columns) for row in ROWS]
+    assert columns_from_tuples(tuples, columns) == columns_from_rows(ROWS)
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'polars'])
+def test_backends_only_apply_a_schema_when_given_one(backend):
+    result_backend = get_result_backend(backend)
+    # Without missing values, which plain frames turn into NaN (unequal to itself)
+    rows = [{name: value for name, value in row.items() if name != 'note'} for row in ROWS[::2]]
+    typed = result_backend.frame(rows, FrameSchema(counts=('unique_visitors',)))
+    plain = result_backend.frame(rows)
+    assert result_backend.to_rows(typed) == result_backend.to_rows(plain)
+    assert str(typed['unique_visitors'].dtype).lower() == 'int8'
+    assert str(plain['unique_visitors'].dtype).lower() == 'int64'
+    assert result_backend.empty(result_backend.frame([], VISITOR_SCHEMA))
+
+
+def test_analyzer_results_are_compact_and_match_the_records_backend(make_analyzer):
+    rows = {}
+    for backend in ('records', 'pandas'):
+        analyzer = make_analyzer(result_backend=backend)
+        analyzer.analyze_visitor_metrics_by_geography()
+        df = analyzer.results['geography_visitors']
+        rows[backend] = analyzer.result_backend.to_rows(df)
+    assert isinstance(df['region'].dtype, pd.CategoricalDtype)
+    assert df['unique_visitors'].dtype.itemsize < 8
+    assert rows['pandas'] == rows['records']
@@ -0,0 +1,115 @@
+"""
+Tests for the declarative insight rules, evaluated over every result shape:
+row dicts, Records, pandas and Polars.
+"""
+
+import pandas as pd
+import polars as pl
+import pytest
+
+from visitor_revenue.insights import InsightRule, evaluate_insights
+from visitor_revenue.records import Records
+
+REGIONS = [
+    {'region': 'US', 'channel': 'Paid', 'visitors': 500, 'signups': 50, 'rate': 10.0},
+    {'region': 'UK', 'channel': 'Organic', 'visitors': 300, 'signups': 45, 'rate': 15.0},
+    {'region': 'DE', 'channel': 'Paid', 'visitors': 200, 'signups': 10, 'rate': 5.0},
+    {'region': 'FR', 'channel': 'Organic', 'visitors': 100, 'signups': 15, 'rate': 15.0},
+    {'region': 'JP', 'channel': 'Social', 'visitors': 50, 'signups': None, 'rate': None},
+]
+
+SHAPES = {
+    'rows': lambda rows: rows,
+    'records': Records.from_rows,
+    'pandas': pd.DataFrame,
+    'polars': pl.DataFrame,
+}
+
+
+@pytest.fixture(params=list(SHAPES))
+def regions(request):
+    return SHAPES[request.param](REGIONS)
+
+
+def evaluate(rule, data):
+    return evaluate_insights([rule], {'regions': data})
+
+
+def test_first_formats_the_first_row(regions):
+    assert evaluate(InsightRule('regions', 'first', "{region}: {visitors:,.0f}"), regions) == ["US: 500"]
+
+
+def test_count_compares_against_the_median_skipping_missing_values(regions):
+    rule = InsightRule('regions', 'count', "{count} above median", metric='rate', comparison='>', threshold='median')
+    assert evaluate(rule, regions) == ["2 above median"]
+
+
+def test_count_can_be_skipped_when_nothing_matches(regions):
+    rule = InsightRule('regions', 'count', "{count}", metric='rate', comparison='>', threshold=99, skip_if_zero=True)
+    assert evaluate(rule, regions) == []
+    assert evaluate(InsightRule('regions', 'count', "{count}", metric='rate', comparison='>', threshold=99),
+                    regions) == ["0"]
+
+
+def test_top_sorts_descending_and_keeps_ties_in_row_order(regions):
+    rule = InsightRule('regions', 'top', "{region}", metric='rate', comparison='>=', threshold=5, n=3)
+    assert evaluate(rule, regions) == ["UK", "FR", "US"]
+
+
+def test_top_without_sorting_keeps_row_order(regions):
+    rule = InsightRule('regions', 'top', "{region}", metric='rate', comparison='>', threshold='mean', sort=False)
+    assert evaluate(rule, regions) == ["UK", "FR"]
+
+
+def test_sum_and_mean_skip_missing_values(regions):
+    assert evaluate(InsightRule('regions', 'sum', "{value:.0f}", metric='signups'), regions) == ["120"]
+    assert evaluate(InsightRule('regions', 'mean', "{value:.1f}", metric='rate', head=2), regions) == ["12.5"]
+
+
+def test_change_compares_the_first_n_rows_to_the_next_n(regions):
+    rule = InsightRule('regions', 'change', "{direction} {value:+.1f}", metric='rate', n=2)
+    assert evaluate(rule, regions) == ["improving +2.5"]
+    assert evaluate(InsightRule('regions', 'change', "{value}", metric='rate', n=3), regions) == []
+
+
+def test_best_ratio_groups_before_dividing(regions):
+    rule = InsightRule('regions', 'best_ratio', "{channel} {value:.2f}", metric='signups', denominator='visitors',
+                       group_by='channel')
+    assert evaluate(rule, regions) == ["Organic 0.15"]
+
+
+def test_top_share_is_the_largest_groups_share_of_the_total(regions):
+    rule = InsightRule('regions', 'top_share', "{value:.1f}", metric='visitors', group_by='channel', n=1)
+    assert evaluate(rule, regions) == ["60.9"]
+
+
+def test_min_rows_missing_and_empty_results_produce_nothing(regions):
+    assert evaluate(InsightRule('regions', 'first', "{region}", min_rows=6), regions) == []
+    assert evaluate_insights([InsightRule('regions', 'first', "{region}")], {}) == []
+    assert evaluate_insights([InsightRule('regions', 'first', "{region}")], {'regions': []}) == []
+
+
+def test_rules_are_evaluated_in_order_across_results():
+    rules = [
+        InsightRule('regions', 'first', "a {region}"),
+        InsightRule('other', 'first', "b {x}"),
+        InsightRule('regions', 'sum', "c {value:.0f}", metric='visitors'),
+    ]
+    assert evaluate_insights(rules, {'regions': REGIONS, 'other': [{'x': 1}]}) == ["a US", "b 1", "c 1150"]
+
+
+def test_unknown_kinds_and_comparisons_are_rejected():
+    with pytest.raises(ValueError, match="Unknown insight rule kind"):
+        InsightRule('regions', 'max', "{value}")
+    with pytest.raises(ValueError, match="Unknown comparison"):
+        InsightRule('regions', 'count', "{count}", metric='rate', comparison='!=')
+
+
+def test_analyzer_insights_match_across_result_backends(make_analyzer):
+    insights = []
+    for backend in ('records', 'pandas', 'polars'):
+        analyzer = make_analyzer(result_backend=backend)
+        analyzer.analyze_visitor_metrics_by_geography()
+        analyzer.analyze_visitor_metrics_by_channel()
+        insights.append(evaluate_insights(analyzer.INSIGHT_RULES, analyzer.results))
+    assert insights[0] and insights[0] == insights[1] == insights[2]
@@ -0,0 +1,74 @@
+"""
+Tests for the LocalSnowflake stand-in and the pipeline benchmark built on it.
+"""
+
+import datetime
+import json
+
+from visitor_revenue import pipeline_benchmark
+from visitor_revenue.local_backend import SYNTHETIC_DAYS, SYNTHETIC_END_DATE, LocalSnowflake, translate_sql
+
+
+def test_synthetic_dates_end_on_the_fixed_end_date(local_snowflake):
+    [row] = local_snowflake.query("""
+        SELECT MIN(DATE_DAY) AS first_day, MAX(DATE_DAY) AS last_day
+        FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS
+    """)
+    end = datetime.date.fromisoformat(SYNTHETIC_END_DATE)
+    assert row['last_day'] == SYNTHETIC_END_DATE
+    assert row['first_day'] == (end - datetime.timedelta(days=SYNTHETIC_DAYS - 1)).isoformat()
+    [row] = local_snowflake.query("SELECT MAX(TIMESTAMP) AS latest FROM analytics.webflow.FCT_USER_CREATED")
+    assert row['latest'] < SYNTHETIC_END_DATE
+
+
+def test_snowflake_only_syntax_is_translated():
+    translated = translate_sql("SELECT DATEADD(day, -7, d), HLL_EXPORT(HLL_ACCUMULATE(v)) FROM t")
+    assert "sf_dateadd('day'," in translated
+    assert "sf_hll_export(list(v))" in translated
+
+
+def test_a_persistent_database_is_seeded_once(tmp_path):
+    database = str(tmp_path / 'synthetic.duckdb')
+    first = LocalSnowflake(rows=1000, database=database)
+    checksum = first.query("SELECT SUM(hash(ID_VISITOR, DATE_DAY)) AS h "
+                           "FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS")
+    first.close()
+    assert first.seed_seconds is not None
+
+    reused = LocalSnowflake(rows=1000, database=database)
+    try:
+        assert reused.seed_seconds is None
+        assert reused.query("SELECT SUM(hash(ID_VISITOR, DATE_DAY)) AS h "
+                            "FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS") == checksum
+    finally:
+        reused.close()
+
+
+def test_the_analyzer_runs_as_of_the_synthetic_end_date(local_snowflake):
+    from visitor_revenue_analysis import WebflowVisitorRevenueAnalyzer
+
+    analyzer = WebflowVisitorRevenueAnalyzer(local_backend=local_snowflake)
+    assert analyzer.analysis_date == SYNTHETIC_END_DATE
+
+
+def test_parse_scale():
+    assert [pipeline_benchmark.parse_scale(s) for s in ('10k', '1M', '2_500', '1.5b')] == \
+        [10000, 1000000, 2500, 1500000000]
+
+
+def test_compare_to_baseline_ignores_noise():
+    baseline = {'10k': {'total': 1.0, 'tiny': 0.01}}
+    assert pipeline_benchmark.compare_to_baseline({'10k': {'total': 1.2, 'tiny': 0.04}}, baseline, 0.25) == []
+    [regression] = pipeline_benchmark.compare_to_baseline({'10k': {'total': 1.5}}, baseline, 0.25)
+    assert regression.startswith("10k total: 1.000s -> 1.500s")
+
+
+def test_pipeline_benchmark_runs_every_stage(tmp_path, capsys):
+    path = str(tmp_path / 'bench.json')
+    assert pipeline_benchmark.main(['--scales', '2k', '--repeat', '1', '--json', path]) == 0
+    timings = json.load(open(path))['2k']
+    assert {'seed_tables', 'analyze_visitor_trends', 'save_results', 'total'} <= set(timings)
+    # Against itself nothing regresses
+    assert pipeline_benchmark.main(['--scales', '2k', '--repeat', '1', '--baseline', path,
+                                    '--tolerance', '100']) == 0
+    assert "No stage regressed" in capsys.readouterr().out
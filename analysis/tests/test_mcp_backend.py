@@ -0,0 +1,110 @@
+"""
+Tests for the MCP session pool against a stand-in `query_run_query` server
+that answers from a small LocalSnowflake.
+"""
+
+import os
+import stat
+import sys
+import textwrap
+
+import pytest
+from mcp import StdioServerParameters
+
+from conftest import ANALYSIS_DIR, ANALYSIS_DATE
+from visitor_revenue import mcp_backend
+from visitor_revenue.errors import SnowflakeQueryError
+from visitor_revenue.mcp_backend import MCPQueryPool, parse_tool_result
+
+FAKE_SERVER = textwrap.dedent("""\
+    #!{python}
+    import json, sys
+    sys.path.insert(0, {analysis_dir!r})
+    from mcp.server.fastmcp import FastMCP
+    from visitor_revenue.local_backend import LocalSnowflake
+
+    backend = LocalSnowflake(rows=1000)
+    server = FastMCP('snowflake')
+
+    @server.tool()
+    def query_run_query(query: str) -> str:
+        return json.dumps(backend.query(query), default=str)
+
+    server.run()
+    """)
+
+
+@pytest.fixture
+def fake_server(tmp_path):
+    script = tmp_path / 'uv'
+    script.write_text(FAKE_SERVER.format(python=sys.executable, analysis_dir=ANALYSIS_DIR))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return script
+
+
+@pytest.fixture
+def pool(fake_server):
+    with MCPQueryPool(StdioServerParameters(command=str(fake_server), args=[]), size=2, start_timeout=60) as pool:
+        yield pool
+
+
+def test_queries_and_streams_are_answered(pool):
+    assert pool.query("SELECT 1 AS n UNION ALL SELECT 2 ORDER BY n") == [{'n': 1}, {'n': 2}]
+    assert pool.stream("SELECT 'a' AS letter").to_dicts() == [{'letter': 'a'}]
+    assert sum(session['calls'] for session in pool.stats()['sessions']) == 2
+
+
+def test_tool_errors_leave_the_session_up(pool):
+    with pytest.raises(SnowflakeQueryError, match="no_such_table"):
+        pool.query("SELECT * FROM no_such_table")
+    assert pool.query("SELECT 3 AS n") == [{'n': 3}]
+    assert all(session['restarts'] == 0 for session in pool.stats()['sessions'])
+
+
+def test_calls_wait_for_a_dead_pool_to_restart(pool, monkeypatch):
+    monkeypatch.setattr(mcp_backend, 'RESTART_BACKOFF', 0.05)
+    for session in pool.sessions:
+        pool._loop.call_soon_threadsafe(session.mark_dead, RuntimeError("server exited"))
+    assert pool.query("SELECT 4 AS n") == [{'n': 4}]
+    assert sum(session['restarts'] for session in pool.stats()['sessions']) >= 1
+
+
+def test_a_closed_pool_refuses_calls(fake_server):
+    pool = MCPQueryPool(StdioServerParameters(command=str(fake_server), args=[]), size=1, start_timeout=60)
+    pool.start()
+    pool.close()
+    with pytest.raises(SnowflakeQueryError, match="closed"):
+        pool._submit(pool._wait_ready(1))
+
+
+def test_tool_results_in_every_shape():
+    class Text:
+        type = 'text'
+
+        def __init__(self, text):
+            self.text = text
+
+    class Result:
+        def __init__(self, *texts, structured=None, error=False):
+            self.content = [Text(text) for text in texts]
+            self.structuredContent = structured
+            self.isError = error
+
+    assert parse_tool_result(Result(structured={'result': '[{"n": 1}]'})) == [{'n': 1}]
+    assert parse_tool_result(Result('{"rows": [{"n": 1}]}')) == [{'n': 1}]
+    assert parse_tool_result(Result('{"n": 1}', '{"n": 2}')) == [{'n': 1}, {'n': 2}]
+    assert parse_tool_result(Result()) == []
+    with pytest.raises(SnowflakeQueryError, match="permission denied"):
+        parse_tool_result(Result("permission denied", error=True))
+
+
+def test_the_analyzer_queries_through_mcp_sessions(fake_server, make_analyzer, monkeypatch):
+    # snowflake_server_params launches `uv run mcp-server-snowflake <config>`
+    monkeypatch.setenv('PATH', f"{fake_server.parent}{os.pathsep}{os.environ['PATH']}")
+    analyzer = make_analyzer(local_backend=None, query_mode='mcp', mcp_sessions=1, analysis_date=ANALYSIS_DATE)
+    try:
+        trends = analyzer.analyze_visitor_trends()
+    finally:
+        analyzer.close()
+    assert analyzer.failures == []
+    assert len(trends) == 31
@@ -0,0 +1,90 @@
+"""
+Smoke tests for the MCP load-test harness and its offline stub server in
+packages/core/tests/snowflake.
+"""
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from mcp import StdioServerParameters
+
+from conftest import ANALYSIS_DIR
+from visitor_revenue.errors import SnowflakeQueryError
+from visitor_revenue.mcp_backend import MCPQueryPool
+
+SNOWFLAKE_TESTS = os.path.join(os.path.dirname(ANALYSIS_DIR), 'packages', 'core', 'tests', 'snowflake')
+LOAD_TEST = os.path.join(SNOWFLAKE_TESTS, 'load-test-snowflake-mcp.py')
+STUB_SERVER = os.path.join(SNOWFLAKE_TESTS, 'stub-snowflake-mcp-server.py')
+
+
+@pytest.fixture(scope='module')
+def load_test():
+    spec = importlib.util.spec_from_file_location('load_test_snowflake_mcp', LOAD_TEST)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_load_test(tmp_path, *args):
+    path = tmp_path / 'load.json'
+    completed = subprocess.run(
+        [sys.executable, LOAD_TEST, '--stub', '--stub-latency-ms', '50', '--warmup', '0.2', '--duration', '1',
+         '--json', str(path), *args],
+        capture_output=True, text=True, timeout=120,
+    )
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+    return json.loads(path.read_text()), completed.stdout
+
+
+def test_concurrent_calls_overlap_on_an_async_server(tmp_path):
+    results, output = run_load_test(tmp_path, '--concurrency', '1', '4')
+    one, four = results['levels']
+    assert results['target'] == 'stub' and len(results['session_init_ms']) == 1
+    assert one['error_rate'] == four['error_rate'] == 0.0
+    assert 40 <= one['p50_ms'] < 200
+    assert four['throughput_per_s'] > 2.5 * one['throughput_per_s']
+    assert results['scaling_concurrency'] == 4
+    assert "Throughput was still scaling at concurrency 4" in output
+
+
+def test_a_blocking_server_runs_calls_one_at_a_time(tmp_path):
+    results, output = run_load_test(tmp_path, '--stub-blocking', '--concurrency', '1', '4')
+    one, four = results['levels']
+    assert four['throughput_per_s'] < 1.5 * one['throughput_per_s']
+    assert four['p50_ms'] > 2 * one['p50_ms']
+    assert results['scaling_concurrency'] == 1
+    assert "Throughput stops scaling past concurrency 1" in output
+
+
+def test_injected_failures_are_counted_as_tool_errors(tmp_path):
+    results, _ = run_load_test(tmp_path, '--stub-error-rate', '1', '--concurrency', '2', '--max-p95-ms', '1000')
+    [level] = results['levels']
+    assert level['ok'] == 0 and level['errors'] == {'tool_error': level['calls']}
+    # Tool errors alone don't disqualify a level, but without successes it has no p95
+    assert results['p95_budget_concurrency'] is None
+
+
+def test_percentiles_and_knee(load_test):
+    assert load_test.percentile([], 50) is None
+    assert [load_test.percentile(list(range(1, 101)), pct) for pct in (50, 95, 99)] == [50, 95, 99]
+    levels = [
+        {'concurrency': 1, 'throughput_per_s': 10, 'p95_ms': 100, 'errors': {}},
+        {'concurrency': 2, 'throughput_per_s': 19, 'p95_ms': 110, 'errors': {'tool_error': 3}},
+        {'concurrency': 4, 'throughput_per_s': 20, 'p95_ms': 190, 'errors': {'timeout': 1}},
+    ]
+    assert load_test.find_knee(levels, max_p95_ms=200) == {'scaling_concurrency': 2, 'p95_budget_concurrency': 2}
+
+
+def test_the_stub_serves_the_analyzers_mcp_pool():
+    server = StdioServerParameters(command=sys.executable, args=[STUB_SERVER, '--latency-ms', '0', '--rows', '3'])
+    with MCPQueryPool(server, size=1, start_timeout=60) as pool:
+        rows = pool.query("SELECT 1")
+        assert [row['ID'] for row in rows] == [0, 1, 2]
+    failing = StdioServerParameters(command=sys.executable, args=[STUB_SERVER, '--latency-ms', '0', '--error-rate', '1'])
+    with MCPQueryPool(failing, size=1, start_timeout=60) as pool:
+        with pytest.raises(SnowflakeQueryError, match="Injected failure"):
+            pool.query("SELECT 1")
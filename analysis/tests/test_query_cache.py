@@ -0,0 +1,128 @@
+"""
+Tests for the on-disk query result cache: keys, TTLs, LRU eviction and
+sharing one cache directory between processes.
+"""
+
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from visitor_revenue.query_cache import CacheMissError, QueryCache, normalize_sql, ttl_for_query
+from visitor_revenue.result_protocol import QueryResult
+
+RESULT = QueryResult(['region', 'visitors'], [('US', 10), ('DE', None)])
+
+
+def test_normalize_sql_strips_comments_and_whitespace_outside_literals():
+    query = """
+        SELECT region,  -- the region
+               COUNT(*)
+        FROM t WHERE note = 'a  --  b';
+    """
+    assert normalize_sql(query) == "SELECT region, COUNT(*) FROM t WHERE note = 'a  --  b'"
+
+
+def test_key_ignores_formatting_but_not_literals_or_window():
+    key = QueryCache.key("SELECT 1 FROM t WHERE d = '2026-01-01'", '2026-10-15')
+    assert key == QueryCache.key("SELECT 1\n  FROM t  -- source\n WHERE d = '2026-01-01';", '2026-10-15')
+    assert key != QueryCache.key("SELECT 1 FROM t WHERE d = '2026-01-02'", '2026-10-15')
+    assert key != QueryCache.key("SELECT 1 FROM t WHERE d = '2026-01-01'", '2026-10-16')
+
+
+def test_ttl_is_the_shortest_of_the_tables_read():
+    assert ttl_for_query("SELECT * FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS") == 24 * 3600
+    assert ttl_for_query("SELECT * FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS "
+                         "JOIN analytics.webflow.FCT_USER_CREATED USING (id)") == 6 * 3600
+    assert ttl_for_query("SELECT 1") == 3600
+
+
+def test_fetch_loads_once_then_serves_the_cached_result(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    calls = []
+
+    def load():
+        calls.append(1)
+        return RESULT
+
+    assert cache.fetch("SELECT 1", '2026-10-15', load) == RESULT
+    assert cache.fetch("SELECT  1 -- again", '2026-10-15', load) == RESULT
+    assert len(calls) == 1
+    assert cache.contains("SELECT 1", '2026-10-15')
+
+
+def test_expired_entries_are_reloaded(tmp_path, monkeypatch):
+    cache = QueryCache(str(tmp_path))
+    cache.fetch("SELECT 1", '', lambda: RESULT, ttl=60)
+    now = __import__('time').time()
+    monkeypatch.setattr('visitor_revenue.query_cache.time.time', lambda: now + 61)
+    assert not cache.contains("SELECT 1", '')
+    fresh = QueryResult(['x'], [(1,)])
+    assert cache.fetch("SELECT 1", '', lambda: fresh, ttl=60) == fresh
+
+
+def test_offline_mode_serves_stale_entries_and_raises_on_a_miss(tmp_path, monkeypatch):
+    QueryCache(str(tmp_path)).fetch("SELECT 1", '', lambda: RESULT, ttl=60)
+    now = __import__('time').time()
+    monkeypatch.setattr('visitor_revenue.query_cache.time.time', lambda: now + 3600)
+    offline = QueryCache(str(tmp_path), mode='offline')
+    assert offline.fetch("SELECT 1", '', lambda: pytest.fail("offline mode ran a query")) == RESULT
+    with pytest.raises(CacheMissError):
+        offline.fetch("SELECT 2", '', lambda: RESULT)
+
+
+def test_refresh_mode_always_reloads(tmp_path):
+    QueryCache(str(tmp_path)).fetch("SELECT 1", '', lambda: RESULT)
+    fresh = QueryResult(['x'], [(1,)])
+    assert QueryCache(str(tmp_path), mode='refresh').fetch("SELECT 1", '', lambda: fresh) == fresh
+    assert QueryCache(str(tmp_path)).fetch("SELECT 1", '', lambda: RESULT) == fresh
+
+
+def test_least_recently_used_entries_are_evicted_over_the_byte_budget(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('visitor_revenue.query_cache.time.time', lambda: clock[0])
+    entry_bytes = len(json.dumps({'columns': RESULT.columns, 'rows': RESULT.rows}))
+    cache = QueryCache(str(tmp_path), max_bytes=2 * entry_bytes)
+    for key in ('a', 'b'):
+        clock[0] += 1
+        cache.put(key * 64, RESULT, 3600)
+    clock[0] += 1
+    assert cache.get('a' * 64) == RESULT  # 'a' is now the most recently used
+    clock[0] += 1
+    cache.put('c' * 64, RESULT, 3600)
+    assert cache.get('b' * 64) is None
+    assert cache.get('a' * 64) == RESULT
+    assert not os.path.exists(tmp_path / ('b' * 64 + '.json'))
+
+
+def test_orphaned_entry_files_are_removed(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    orphan = tmp_path / ('f' * 64 + '.json')
+    orphan.write_text('[]')
+    cache.put('a' * 64, RESULT, 3600)
+    assert not orphan.exists()
+
+
+def test_entries_written_as_row_dicts_are_still_read(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    cache.put('a' * 64, RESULT, 3600)
+    (tmp_path / ('a' * 64 + '.json')).write_text(json.dumps(RESULT.to_dicts()))
+    assert cache.get('a' * 64) == RESULT
+
+
+def _put_many(cache_dir, worker):
+    cache = QueryCache(cache_dir)
+    for i in range(25):
+        cache.put(QueryCache.key(f"SELECT {worker}, {i}"), RESULT, 3600)
+
+
+def test_processes_sharing_a_cache_keep_each_others_entries(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_put_many, args=(str(tmp_path), worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    cache = QueryCache(str(tmp_path))
+    assert all(cache.contains(f"SELECT {worker}, {i}", '') for worker in range(4) for i in range(25))
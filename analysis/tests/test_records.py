@@ -0,0 +1,121 @@
+"""
+Tests for the typed-column Records result backend.
+"""
+
+import math
+from array import array
+from decimal import Decimal
+
+from visitor_revenue.records import Records
+
+ROWS = [
+    {'region': 'US', 'visitors': '1200', 'rate': '12.5', 'day': '2026-10-01'},
+    {'region': 'DE', 'visitors': 800, 'rate': None, 'day': '2026-10-02'},
+    {'region': 'FR', 'visitors': Decimal('300'), 'rate': Decimal('7.25'), 'day': '2026-10-03'},
+]
+
+
+def test_columns_are_typed_once_at_ingest():
+    records = Records.from_rows(ROWS)
+    assert records.columns == ['region', 'visitors', 'rate', 'day']
+    assert records.column('visitors') == array('q', [1200, 800, 300])
+    assert records.column('rate').typecode == 'd'
+    assert records.column('region') == ['US', 'DE', 'FR']
+    assert records.column('day') == ['2026-10-01', '2026-10-02', '2026-10-03']
+
+
+def test_missing_values_read_as_none():
+    records = Records.from_rows(ROWS)
+    assert math.isnan(records.column('rate')[1])
+    assert records[1]['rate'] is None
+    assert records.values('rate') == [12.5, None, 7.25]
+    assert records.to_dicts()[1] == {'region': 'DE', 'visitors': 800, 'rate': None, 'day': '2026-10-02'}
+
+
+def test_integer_columns_with_missing_values_become_floats():
+    records = Records.from_rows([{'n': 1}, {'n': None}])
+    assert records.column('n').typecode == 'd'
+    assert records.values('n') == [1.0, None]
+
+
+def test_rows_read_like_dicts():
+    row = Records.from_rows(ROWS)[-1]
+    assert row['region'] == 'FR'
+    assert row.get('missing', 'default') == 'default'
+    assert 'rate' in row and len(row) == 4
+    assert dict(row) == {'region': 'FR', 'visitors': 300, 'rate': 7.25, 'day': '2026-10-03'}
+
+
+def test_head_take_and_slices():
+    records = Records.from_rows(ROWS)
+    assert records.head(10) is records
+    assert [row['region'] for row in records.head(2)] == ['US', 'DE']
+    assert [row['region'] for row in records.take([2, 0])] == ['FR', 'US']
+    assert records.take([2, 0]).column('visitors') == array('q', [300, 1200])
+    assert len(records[1:]) == 2
+
+
+def test_floats_turns_text_and_missing_values_into_nan():
+    records = Records.from_rows([{'x': 'n/a', 'y': 2}, {'x': '3', 'y': 4}])
+    floats = records.floats('x')
+    assert math.isnan(floats[0]) and floats[1] == 3.0
+    assert records.floats('y') == array('d', [2.0, 4.0])
+
+
+def test_from_tuples_matches_from_rows():
+    columns = list(ROWS[0])
+    tuples = [tuple(row[name] for name in columns) for row in ROWS]
+    assert Records.from_tuples(tuples, columns).to_dicts() == Records.from_rows(ROWS).to_dicts()
+    empty = Records.from_tuples([], ['a', 'b'])
+    assert len(empty) == 0 and empty.columns == ['a', 'b']
+
+
+def test_out_of_range_integers_stay_python_ints():
+    records = Records.from_rows([{'id': 2 ** 70}, {'id': 1}])
+    assert records.values('id') == [2 ** 70, 1]
+
+
+def test_local_query_results(local_snowflake):
+    result = local_snowflake.stream("""
+        SELECT COALESCE(CUSTOM_REGION, 'Unknown') AS region, COUNT(*) AS n
+        FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS
+        GROUP BY 1 ORDER BY 2 DESC
+    """).to_result()
+    records = Records.from_tuples(result.rows, result.columns)
+    assert sum(records.column('n')) == 5000
+    assert records.column('n').typecode == 'q'
+
+
+def test_sort_by_puts_missing_values_last():
+    records = Records.from_rows(ROWS)
+    assert [row['region'] for row in records.sort_by('rate')] == ['FR', 'US', 'DE']
+    assert [row['region'] for row in records.sort_by('rate', descending=True)] == ['US', 'FR', 'DE']
+    assert [row['region'] for row in records.sort_by('region')] == ['DE', 'FR', 'US']
+
+
+def test_filter_never_matches_missing_values():
+    records = Records.from_rows(ROWS)
+    assert [row['region'] for row in records.filter('rate', lambda rate: rate > 0)] == ['US', 'FR']
+    assert records.filter('visitors', lambda n: n > 5000).columns == records.columns
+    assert len(records.filter('visitors', lambda n: n > 5000)) == 0
+
+
+def test_top_is_largest_first_with_ties_in_row_order():
+    records = Records.from_rows([{'k': 'a', 'v': 1.0}, {'k': 'b', 'v': 3.0}, {'k': 'c', 'v': None},
+                                 {'k': 'd', 'v': 3.0}, {'k': 'e', 'v': 2.0}])
+    assert [row['k'] for row in records.top(3, 'v')] == ['b', 'd', 'e']
+    assert [row['k'] for row in records.top(10, 'v')] == ['b', 'd', 'e', 'a']
+
+
+def test_group_sum_sorts_keys_and_counts_missing_as_zero():
+    records = Records.from_rows([
+        {'channel': 'Paid', 'visitors': 500, 'signups': 50.0},
+        {'channel': 'Organic', 'visitors': 300, 'signups': None},
+        {'channel': 'Paid', 'visitors': 200, 'signups': 10.0},
+    ])
+    grouped = records.group_sum('channel', ['visitors', 'signups'])
+    assert grouped.to_dicts() == [
+        {'channel': 'Organic', 'visitors': 300, 'signups': 0.0},
+        {'channel': 'Paid', 'visitors': 700, 'signups': 60.0},
+    ]
+    assert grouped.column('visitors').typecode == 'q'
@@ -0,0 +1,151 @@
+"""
+Tests for error classification and QueryRunner's retries, deadlines and
+hedging. Backoff is zeroed so retries don't sleep.
+"""
+
+import random
+import threading
+import time
+
+import pytest
+
+from visitor_revenue.errors import SnowflakeQueryError
+from visitor_revenue.resilience import (LatencyHistory, QueryFailedError, QueryPolicy, QueryRunner,
+                                        QueryTimeoutError, classify_error)
+from visitor_revenue.result_protocol import ProtocolError
+
+
+def runner(**policy):
+    policy.setdefault('backoff', 0.0)
+    return QueryRunner(QueryPolicy(**policy))
+
+
+def wait_for_cancel(token):
+    """An attempt that never finishes on its own: it ends when its token fires"""
+    cancelled = threading.Event()
+    token.on_cancel(cancelled.set)
+    cancelled.wait(10)
+    token.raise_if_cancelled()
+    raise AssertionError("attempt was never cancelled")
+
+
+@pytest.mark.parametrize('error, kind', [
+    (QueryTimeoutError("Query did not finish within 5s"), 'timeout'),
+    (SnowflakeQueryError("ECONNRESET: socket hang up"), 'transient'),
+    (SnowflakeQueryError("Authentication token has expired"), 'transient'),
+    (SnowflakeQueryError("HTTP 503 Service Unavailable"), 'transient'),
+    (ProtocolError("Result truncated after 10 rows"), 'transient'),
+    (SnowflakeQueryError("SQL compilation error: invalid identifier 'X'"), 'permanent'),
+    (SnowflakeQueryError("SQL compilation error: statement timeout parameter"), 'permanent'),
+    (SnowflakeQueryError("Something unexpected"), 'permanent'),
+    (KeyError('column'), 'permanent'),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+def test_transient_errors_are_retried_until_success():
+    calls = []
+
+    def attempt(token):
+        calls.append(token)
+        if len(calls) < 3:
+            raise SnowflakeQueryError("ECONNRESET: socket hang up")
+        return 'rows'
+
+    history = LatencyHistory()
+    assert QueryRunner(QueryPolicy(backoff=0.0), history).run(attempt, key='q') == 'rows'
+    assert len(calls) == 3
+    assert len({id(token) for token in calls}) == 3  # a fresh token per attempt
+    assert history.quantile('q', 0.5) is not None
+
+
+def test_permanent_errors_fail_at_once():
+    calls = []
+
+    def attempt(token):
+        calls.append(1)
+        raise SnowflakeQueryError("SQL compilation error: Object 'X' does not exist or not authorized")
+
+    with pytest.raises(QueryFailedError) as raised:
+        runner(max_attempts=5).run(attempt)
+    assert (raised.value.kind, raised.value.attempts) == ('permanent', 1)
+    assert len(calls) == 1
+
+
+def test_retries_stop_at_max_attempts():
+    def attempt(token):
+        raise SnowflakeQueryError("429 Too Many Requests")
+
+    with pytest.raises(QueryFailedError) as raised:
+        runner(max_attempts=2).run(attempt)
+    assert (raised.value.kind, raised.value.attempts) == ('transient', 2)
+
+
+def test_deadline_cancels_the_attempt():
+    started = time.perf_counter()
+    with pytest.raises(QueryFailedError) as raised:
+        runner(timeout=0.2, max_attempts=2).run(wait_for_cancel, key='slow')
+    assert (raised.value.kind, raised.value.attempts) == ('timeout', 2)
+    assert isinstance(raised.value.__cause__, QueryTimeoutError)
+    assert time.perf_counter() - started < 5
+
+
+def test_deadline_interrupts_a_local_query(local_snowflake):
+    def attempt(token):
+        stream = local_snowflake.stream("SELECT SUM(a.range * b.range) FROM range(100000) a, range(100000) b")
+        token.on_cancel(stream.cancel)
+        return stream.to_dicts()
+
+    started = time.perf_counter()
+    with pytest.raises(QueryFailedError) as raised:
+        runner(timeout=0.5, max_attempts=1).run(attempt)
+    assert raised.value.kind == 'timeout'
+    assert time.perf_counter() - started < 10
+
+
+def test_a_hedged_duplicate_wins_over_a_stalled_attempt():
+    history = LatencyHistory()
+    for _ in range(5):
+        history.record('q', 0.05)
+    calls = []
+
+    def attempt(token):
+        calls.append(token)
+        if len(calls) == 1:
+            wait_for_cancel(token)
+        return 'rows'
+
+    policy = QueryPolicy(timeout=10, hedge_quantile=0.95, hedge_min_samples=5)
+    started = time.perf_counter()
+    assert QueryRunner(policy, history).run(attempt, key='q') == 'rows'
+    assert time.perf_counter() - started < 5
+    assert len(calls) == 2
+    assert calls[0].cancelled  # the stalled original is abandoned
+
+
+def test_no_hedging_without_enough_history():
+    history = LatencyHistory()
+    history.record('q', 0.05)
+    runner = QueryRunner(QueryPolicy(hedge_quantile=0.95, hedge_min_samples=5), history)
+    assert runner.hedge_delay('q') is None
+    history.record('q', 0.05)
+    assert QueryRunner(QueryPolicy(hedge_quantile=0.95, hedge_min_samples=2), history).hedge_delay('q') == 0.05
+
+
+def test_backoff_doubles_with_jitter_up_to_the_cap():
+    runner = QueryRunner(QueryPolicy(backoff=1.0, max_backoff=4.0), rng=random.Random(0))
+    for attempt, ceiling in ((1, 1.0), (2, 2.0), (3, 4.0), (6, 4.0)):
+        for _ in range(20):
+            assert ceiling / 2 <= runner.backoff_delay(attempt) <= ceiling
+
+
+def test_latency_history_persists(tmp_path):
+    path = str(tmp_path / 'latency.json')
+    history = LatencyHistory(path, max_samples=3)
+    for seconds in (1, 2, 3, 4):
+        history.record('q', seconds)
+    history.save()
+    reloaded = LatencyHistory(path)
+    assert reloaded.quantile('q', 0.5) == 3
+    assert reloaded.quantile('q', 1.0) == 4
@@ -0,0 +1,101 @@
+"""
+Tests for the framed NDJSON result protocol (decode_frames, ResultStream).
+"""
+
+import json
+
+import pytest
+
+from visitor_revenue.errors import SnowflakeQueryError
+from visitor_revenue.result_protocol import ProtocolError, QueryResult, ResultStream, decode_frames
+
+HEADER = {'frame': 'header', 'protocol': 1, 'columns': [{'name': 'region', 'type': 'text'},
+                                                         {'name': 'visitors', 'type': 'fixed'}]}
+
+
+def lines(*frames):
+    return [json.dumps(frame) + '\n' for frame in frames]
+
+
+def test_decode_skips_log_output_before_the_header():
+    trailer = {'frame': 'trailer', 'row_count': 1, 'query_id': 'q1'}
+    result = lines(HEADER, ['US', 10], trailer)
+    frames = list(decode_frames(['npm WARN something\n', '{"not": "a frame"}\n', '{broken json\n'] + result))
+    assert frames[:2] == [HEADER, ['US', 10]]
+    assert frames[2]['query_id'] == 'q1'
+    # Counted from the header on, not the log lines before it
+    assert frames[2]['bytes_received'] == sum(len(line) for line in result)
+
+
+def test_decode_raises_on_a_malformed_row():
+    frames = decode_frames(lines(HEADER) + ['["US", \n'])
+    next(frames)
+    with pytest.raises(ProtocolError, match="Malformed row frame"):
+        next(frames)
+
+
+def test_stream_reads_rows_as_tuples_and_keeps_the_trailer():
+    stream = ResultStream(iter([HEADER, ['US', 10], ['DE', 4], {'frame': 'trailer', 'row_count': 2, 'query_id': 'q'}]))
+    assert stream.column_names == ['region', 'visitors']
+    assert list(stream) == [('US', 10), ('DE', 4)]
+    assert stream.trailer['query_id'] == 'q'
+
+
+def test_to_result_and_to_dicts_agree():
+    frames = [HEADER, ['US', 10], ['DE', None], {'frame': 'trailer', 'row_count': 2}]
+    result = ResultStream(iter(frames)).to_result()
+    assert result == QueryResult(['region', 'visitors'], [('US', 10), ('DE', None)])
+    assert result.to_dicts() == ResultStream(iter(frames)).to_dicts()
+    assert QueryResult.from_dicts(result.to_dicts()) == result
+
+
+def test_error_frame_in_place_of_the_header():
+    stream = ResultStream(decode_frames(lines({'frame': 'error', 'message': 'SQL compilation error: bad'})))
+    with pytest.raises(SnowflakeQueryError, match="SQL compilation error"):
+        stream.header
+
+
+def test_error_frame_after_rows():
+    stream = ResultStream(iter([HEADER, ['US', 10], {'frame': 'error', 'message': 'Warehouse suspended'}]))
+    with pytest.raises(SnowflakeQueryError, match="Warehouse suspended") as raised:
+        stream.to_dicts()
+    assert not isinstance(raised.value, ProtocolError)
+
+
+def test_missing_trailer_is_a_truncated_result():
+    stream = ResultStream(iter([HEADER, ['US', 10]]))
+    with pytest.raises(ProtocolError, match="truncated after 1 rows"):
+        stream.to_dicts()
+
+
+def test_trailer_row_count_mismatch():
+    stream = ResultStream(iter([HEADER, ['US', 10], {'frame': 'trailer', 'row_count': 2}]))
+    with pytest.raises(ProtocolError, match="Trailer reports 2 rows, received 1"):
+        stream.to_dicts()
+
+
+def test_newer_protocol_versions_are_rejected():
+    stream = ResultStream(iter([dict(HEADER, protocol=99)]))
+    with pytest.raises(ProtocolError, match="Unsupported protocol version"):
+        stream.header
+
+
+def test_buffered_stream_replays_header_rows_and_trailer():
+    stream = ResultStream(iter([dict(HEADER, elapsed_ms=5), ['US', 10],
+                                {'frame': 'trailer', 'row_count': 1, 'query_id': 'q'}]))
+    replay = stream.buffered()
+    assert replay.header['elapsed_ms'] == 5
+    assert replay.to_dicts() == [{'region': 'US', 'visitors': 10}]
+    assert replay.trailer['query_id'] == 'q'
+
+
+def test_local_snowflake_speaks_the_protocol(local_snowflake):
+    stream = local_snowflake.stream("SELECT 1 AS one, 'a' AS letter UNION ALL SELECT 2, 'b' ORDER BY one")
+    assert stream.column_names == ['one', 'letter']
+    assert stream.to_result().rows == [(1, 'a'), (2, 'b')]
+    assert stream.trailer['row_count'] == 2
+
+
+def test_local_snowflake_reports_sql_errors_as_error_frames(local_snowflake):
+    with pytest.raises(SnowflakeQueryError):
+        local_snowflake.stream("SELECT * FROM analytics.webflow.NO_SUCH_TABLE").to_dicts()
@@ -0,0 +1,74 @@
+"""
+Tests for byte-stable query text (date windows as literals, canonical SQL)
+and the query-history lookup of which results Snowflake reused.
+"""
+
+from conftest import ANALYSIS_DATE, RecordingBackend
+from visitor_revenue.mcp_backend import rows_to_stream
+from visitor_revenue.result_reuse import (canonical_sql, date_window, query_costs, result_reuse_query,
+                                          reused_results)
+
+
+def run_analyses(make_analyzer, local_snowflake, **options):
+    backend = RecordingBackend(local_snowflake)
+    analyzer = make_analyzer(local_backend=backend, **options)
+    analyzer.run_analyses()
+    return backend.queries
+
+
+def test_date_windows_end_days_back_from_the_analysis_date():
+    assert date_window('2026-03-01', 30) == ('2026-01-30', '2026-03-01')
+    assert date_window('2026-03-01', 90, 1) == ('2025-12-01', '2026-02-28')
+
+
+def test_canonical_sql_collapses_layout_but_not_literals():
+    one = "SELECT a,  b -- columns\n  FROM t\n WHERE c = 'x  y';"
+    other = "SELECT a, b\nFROM t WHERE c = 'x  y'"
+    assert canonical_sql(one) == canonical_sql(other) == "SELECT a, b FROM t WHERE c = 'x  y'"
+
+
+def test_analysis_queries_are_byte_stable_for_a_date(make_analyzer, local_snowflake):
+    first = run_analyses(make_analyzer, local_snowflake)
+    again = run_analyses(make_analyzer, local_snowflake)
+    assert first and first == again
+    for query in first:
+        assert query == canonical_sql(query)
+        assert 'CURRENT_DATE' not in query.upper() and 'CURRENT_TIMESTAMP' not in query.upper()
+    assert any(f"DATE '{ANALYSIS_DATE}'" in query for query in first)
+
+    earlier = run_analyses(make_analyzer, local_snowflake, analysis_date=date_window(ANALYSIS_DATE, 1)[0])
+    # A different as-of date is different text, so it can't reuse the other date's results
+    assert set(earlier).isdisjoint(query for query in first if ANALYSIS_DATE in query)
+
+
+def test_results_without_bytes_scanned_were_reused():
+    sql = result_reuse_query(['q2', 'q1', 'q2'])
+    assert "QUERY_ID IN ('q1', 'q2')" in sql
+    history = [
+        {'QUERY_ID': 'q1', 'BYTES_SCANNED': 0, 'PARTITIONS_SCANNED': 0, 'EXECUTION_TIME': 12},
+        {'query_id': 'q2', 'bytes_scanned': 2048, 'partitions_scanned': 3, 'execution_time': None},
+    ]
+    assert reused_results(history) == {'q1': True, 'q2': False}
+    assert query_costs(history)['q2'] == {'bytes_scanned': 2048, 'partitions_scanned': 3, 'execution_ms': 0}
+
+
+def test_the_analyzer_marks_reused_results(make_analyzer, monkeypatch, capsys):
+    analyzer = make_analyzer()
+    analyzer.local_backend = None
+    analyzer.executed_queries = [
+        {'description': 'Visitor Metrics', 'query_id': 'q1', 'server_ms': 5, 'result_reused': None},
+        {'description': 'Revenue', 'query_id': 'q2', 'server_ms': 900, 'result_reused': None},
+    ]
+    sent = []
+
+    def history(query):
+        sent.append(query)
+        return rows_to_stream([{'QUERY_ID': 'q1', 'BYTES_SCANNED': 0, 'PARTITIONS_SCANNED': 0, 'EXECUTION_TIME': 3},
+                               {'QUERY_ID': 'q2', 'BYTES_SCANNED': 10, 'PARTITIONS_SCANNED': 1, 'EXECUTION_TIME': 850}])
+    monkeypatch.setattr(analyzer, '_open_stream', history)
+
+    analyzer.check_result_reuse()
+    assert sent == [result_reuse_query(['q1', 'q2'])]
+    assert [entry['result_reused'] for entry in analyzer.executed_queries] == [True, False]
+    assert analyzer.executed_queries[1]['execution_ms'] == 850
+    assert "1 of 2 queries reused a persisted result" in capsys.readouterr().out
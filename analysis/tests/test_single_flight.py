@@ -0,0 +1,190 @@
+"""
+Tests for SingleFlight: identical queries in flight share one execution
+across threads and across processes, and a failed execution reaches every
+caller that joined it.
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+from conftest import ANALYSIS_DIR
+from visitor_revenue.errors import SnowflakeQueryError
+from visitor_revenue.query_cache import QueryCache
+from visitor_revenue.result_protocol import QueryResult
+from visitor_revenue.single_flight import SingleFlight
+
+QUERY = "SELECT region, COUNT(*) FROM visitors GROUP BY 1"
+WINDOW = "2026-09-15..2026-10-15"
+RESULT = QueryResult(['region', 'visitors'], [('US', 3), ('UK', 2)])
+
+# A leader in another process: runs QUERY once `go` exists (or fails, with argv[3] == 'fail')
+LEADER = textwrap.dedent("""\
+    import os, sys, time
+    sys.path.insert(0, {analysis_dir!r})
+    from visitor_revenue.result_protocol import QueryResult
+    from visitor_revenue.single_flight import SingleFlight
+
+    lock_dir, signals, mode = sys.argv[1:4]
+
+    def loader():
+        open(os.path.join(signals, 'started'), 'w').close()
+        while not os.path.exists(os.path.join(signals, 'go')):
+            time.sleep(0.01)
+        if mode == 'fail':
+            raise RuntimeError('leader failed')
+        return QueryResult(['region', 'visitors'], [['US', 3], ['UK', 2]])
+
+    SingleFlight(lock_dir).do({query!r}, {window!r}, loader)
+    """)
+
+
+class Loader:
+    """A loader that blocks until released, counting its calls"""
+
+    def __init__(self, result=RESULT, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(10)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run_in_threads(flight, loader, followers):
+    """Start a leader, then `followers` identical callers while it is running; return outcomes"""
+    outcomes = [None] * (followers + 1)
+
+    def call(index):
+        try:
+            outcomes[index] = flight.do(QUERY, WINDOW, loader)
+        except BaseException as e:
+            outcomes[index] = e
+
+    threads = [threading.Thread(target=call, args=(0,))]
+    threads[0].start()
+    assert loader.started.wait(10)
+    threads += [threading.Thread(target=call, args=(i,)) for i in range(1, followers + 1)]
+    for thread in threads[1:]:
+        thread.start()
+    # Followers block on the leader's call; give them time to get there
+    time.sleep(0.2)
+    loader.release.set()
+    for thread in threads:
+        thread.join(10)
+    return outcomes
+
+
+@pytest.fixture
+def leader_process(tmp_path):
+    signals = tmp_path / 'signals'
+    signals.mkdir()
+    lock_dir = tmp_path / 'inflight'
+    processes = []
+
+    def start(mode='ok'):
+        script = LEADER.format(analysis_dir=ANALYSIS_DIR, query=QUERY, window=WINDOW)
+        process = subprocess.Popen([sys.executable, '-c', script, str(lock_dir), str(signals), mode],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        processes.append(process)
+        deadline = time.monotonic() + 30
+        while not (signals / 'started').exists():
+            assert time.monotonic() < deadline and process.poll() is None, "leader did not start"
+            time.sleep(0.01)
+        return process
+
+    start.lock_dir = str(lock_dir)
+    start.go = lambda: (signals / 'go').touch()
+    yield start
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def waiting_markers(lock_dir):
+    return [name for name in os.listdir(lock_dir) if '.waiting.' in name]
+
+
+def test_identical_calls_in_threads_share_one_execution():
+    flight = SingleFlight(cross_process=False)
+    loader = Loader()
+    outcomes = run_in_threads(flight, loader, followers=4)
+    assert loader.calls == 1
+    assert all(outcome == RESULT for outcome in outcomes)
+    assert flight.stats == {'executed': 1, 'joined_thread': 4, 'joined_process': 0}
+    # Followers get their own row lists
+    assert len({id(outcome.rows) for outcome in outcomes}) == 5
+
+
+def test_an_error_reaches_every_caller_that_joined():
+    flight = SingleFlight(cross_process=False)
+    loader = Loader(error=SnowflakeQueryError("Warehouse suspended"))
+    outcomes = run_in_threads(flight, loader, followers=3)
+    assert loader.calls == 1
+    assert all(isinstance(outcome, SnowflakeQueryError) for outcome in outcomes)
+    # The failed call is forgotten: the next caller runs the query again
+    retry = Loader()
+    retry.release.set()
+    assert flight.do(QUERY, WINDOW, retry) == RESULT and retry.calls == 1
+
+
+def test_different_windows_are_not_shared():
+    flight = SingleFlight(cross_process=False)
+    assert QueryCache.key(QUERY, WINDOW) != QueryCache.key(QUERY, "2026-09-14..2026-10-14")
+    flight.do(QUERY, WINDOW, lambda: RESULT)
+    flight.do(QUERY, "2026-09-14..2026-10-14", lambda: RESULT)
+    assert flight.stats['executed'] == 2
+
+
+def test_a_waiting_process_receives_the_leaders_result(leader_process):
+    leader = leader_process()
+    flight = SingleFlight(leader_process.lock_dir)
+    loader = Loader()
+    outcome = {}
+    waiter = threading.Thread(target=lambda: outcome.setdefault('result', flight.do(QUERY, WINDOW, loader)))
+    waiter.start()
+    deadline = time.monotonic() + 10
+    while not waiting_markers(leader_process.lock_dir):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    leader_process.go()
+    waiter.join(30)
+    assert leader.wait(30) == 0
+    assert loader.calls == 0
+    assert outcome['result'] == RESULT
+    assert flight.stats == {'executed': 0, 'joined_thread': 0, 'joined_process': 1}
+    assert waiting_markers(leader_process.lock_dir) == []
+
+
+def test_a_waiting_process_runs_the_query_when_the_leader_fails(leader_process):
+    leader = leader_process('fail')
+    flight = SingleFlight(leader_process.lock_dir)
+    loader = Loader()
+    loader.release.set()
+    threading.Timer(0.3, leader_process.go).start()
+    assert flight.do(QUERY, WINDOW, loader) == RESULT
+    assert leader.wait(30) != 0
+    assert loader.calls == 1
+    assert flight.stats == {'executed': 1, 'joined_thread': 0, 'joined_process': 0}
+
+
+def test_a_stuck_leader_is_given_up_on(leader_process):
+    leader_process()
+    flight = SingleFlight(leader_process.lock_dir, wait_timeout=0.3)
+    loader = Loader()
+    loader.release.set()
+    assert flight.do(QUERY, WINDOW, loader) == RESULT
+    assert loader.calls == 1
+    assert waiting_markers(leader_process.lock_dir) == []
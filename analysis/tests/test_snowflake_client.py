@@ -0,0 +1,88 @@
+"""
+Tests for the npm-based transports against a stand-in `npm` on PATH that
+speaks cli-snowflake's `serve` and `query --format ndjson` protocols.
+"""
+
+import os
+import stat
+import sys
+import textwrap
+
+import pytest
+
+from visitor_revenue.errors import SnowflakeQueryError
+from visitor_revenue.snowflake_client import SnowflakeWorker, run_query_subprocess
+
+FAKE_NPM = textwrap.dedent("""\
+    #!{python}
+    # Answers `SELECT <n>` with rows 0..n-1; any other SQL fails
+    import json, sys
+
+    def result(request_id, sql):
+        words = sql.split()
+        if len(words) != 2 or not words[1].isdigit():
+            return [{{'frame': 'error', 'id': request_id, 'message': f"SQL compilation error: {{sql}}"}}]
+        n = int(words[1])
+        return ([{{'frame': 'header', 'id': request_id, 'protocol': 1, 'columns': [{{'name': 'N', 'type': 'fixed'}}]}}]
+                + [[i] for i in range(n)]
+                + [{{'frame': 'trailer', 'id': request_id, 'row_count': n, 'query_id': f"q{{request_id}}"}}])
+
+    args = sys.argv[sys.argv.index('--') + 1:]
+    if args[0] == 'serve':
+        print(json.dumps({{'event': 'ready', 'connect_ms': 7}}), flush=True)
+        for line in sys.stdin:
+            request = json.loads(line)
+            if request.get('cancel'):
+                continue
+            for frame in result(request['id'], request['sql']):
+                print(json.dumps(frame), flush=True)
+    else:
+        print("> snowflake query")
+        frames = result(None, args[1])
+        for frame in frames:
+            print(json.dumps(frame))
+        sys.exit(1 if frames[0]['frame'] == 'error' else 0)
+    """)
+
+
+@pytest.fixture
+def fake_npm(tmp_path, monkeypatch):
+    npm = tmp_path / 'npm'
+    npm.write_text(FAKE_NPM.format(python=sys.executable))
+    npm.chmod(npm.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return str(tmp_path)
+
+
+def test_worker_answers_queries_over_one_process(fake_npm):
+    with SnowflakeWorker(cwd=fake_npm) as worker:
+        process = worker._process
+        assert worker.connect_ms == 7
+        assert worker.query("SELECT 3") == [{'N': 0}, {'N': 1}, {'N': 2}]
+        stream = worker.submit("SELECT 2")
+        assert stream.to_dicts() == [{'N': 0}, {'N': 1}]
+        assert stream.trailer['query_id'] == 'q2'
+        assert worker._process is process
+    assert not worker.is_running()
+
+
+def test_worker_errors_fail_only_their_query(fake_npm):
+    with SnowflakeWorker(cwd=fake_npm) as worker:
+        with pytest.raises(SnowflakeQueryError, match="SQL compilation error"):
+            worker.query("SELECT nope")
+        assert worker.query("SELECT 1") == [{'N': 0}]
+
+
+def test_worker_that_fails_to_start(tmp_path, monkeypatch):
+    npm = tmp_path / 'npm'
+    npm.write_text(f"#!{sys.executable}\nimport sys\nsys.exit(1)\n")
+    npm.chmod(npm.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    with pytest.raises(SnowflakeQueryError, match="failed to start"):
+        SnowflakeWorker(cwd=str(tmp_path)).start(timeout=10)
+
+
+def test_one_process_per_query(fake_npm):
+    assert run_query_subprocess("SELECT 2", cwd=fake_npm) == [{'N': 0}, {'N': 1}]
+    with pytest.raises(SnowflakeQueryError, match="SQL compilation error"):
+        run_query_subprocess("SELECT nope", cwd=fake_npm)
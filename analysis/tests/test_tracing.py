@@ -0,0 +1,85 @@
+"""
+Tests for span tracing: nesting and step attribution, the Chrome trace and
+Prometheus exports, and `--trace` on a local run.
+"""
+
+import json
+import threading
+
+from visitor_revenue.tracing import NULL_TRACER, Tracer
+
+
+def test_spans_nest_and_inherit_their_step():
+    tracer = Tracer()
+    with tracer.span('analysis', step='analyze_visitor_trends'):
+        with tracer.span('build_dataframe') as span:
+            span.set(rows=30, bytes=1024)
+        tracer.add_span('warehouse_execute', tracer.origin, 0.5)
+    build, warehouse, analysis = tracer.spans
+    assert build.attrs == {'step': 'analyze_visitor_trends', 'rows': 30, 'bytes': 1024}
+    assert warehouse.attrs['step'] == 'analyze_visitor_trends'
+    assert analysis.duration >= build.duration and build.cpu is not None
+
+
+def test_threads_keep_separate_stacks():
+    tracer = Tracer()
+
+    def write():
+        with tracer.span('write_results'):
+            pass
+
+    with tracer.span('analysis', step='main'):
+        worker = threading.Thread(target=write)
+        worker.start()
+        worker.join()
+    written, analysis = tracer.spans
+    assert 'step' not in written.attrs
+    assert written.thread_id != analysis.thread_id
+
+
+def test_errors_are_recorded_on_the_span():
+    tracer = Tracer()
+    try:
+        with tracer.span('analysis', step='broken'):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert tracer.spans[0].attrs['error'] == 'ValueError'
+
+
+def test_exports_write_chrome_trace_and_prometheus_text(tmp_path, capsys):
+    trace_path, metrics_path = tmp_path / 'trace.json', tmp_path / 'metrics' / 'run.prom'
+    tracer = Tracer(str(trace_path), str(metrics_path), job='test_job')
+    for _ in range(2):
+        with tracer.span('fetch', step='a "quoted" step') as span:
+            span.set(rows=5)
+    tracer.export()
+
+    events = [e for e in json.loads(trace_path.read_text())['traceEvents'] if e['ph'] == 'X']
+    assert [e['name'] for e in events] == ['fetch', 'fetch']
+    assert events[0]['cat'] == 'a "quoted" step' and events[0]['args']['rows'] == 5
+    metrics = metrics_path.read_text()
+    assert 'test_job_stage_calls{stage="fetch",step="a \\"quoted\\" step"} 2' in metrics
+    assert 'test_job_stage_rows{stage="fetch",step="a \\"quoted\\" step"} 10' in metrics
+    assert f"Trace saved to {trace_path}" in capsys.readouterr().out
+    assert [p.name for p in tmp_path.rglob('*.tmp')] == []
+
+
+def test_the_null_tracer_records_nothing():
+    with NULL_TRACER.span('analysis', step='x') as span:
+        span.set(rows=1)
+    NULL_TRACER.add_span('warehouse_execute', 0.0, 1.0)
+    NULL_TRACER.export()
+    assert not NULL_TRACER.enabled
+
+
+def test_a_traced_local_run_attributes_stages_to_analyses(run_main, tmp_path):
+    trace_dir = tmp_path / 'trace'
+    assert run_main(['--local', '--local-rows', '2000', '--backend', 'records', '--trace',
+                     '--trace-dir', str(trace_dir)]) == 0
+    [trace_file] = trace_dir.glob('visitor_revenue_trace_*.json')
+    events = [e for e in json.load(open(trace_file))['traceEvents'] if e['ph'] == 'X']
+    names = {e['name'] for e in events}
+    assert {'run_full_analysis', 'build_dataframe', 'write_results'} <= names
+    assert {e['cat'] for e in events if e['name'] == 'build_dataframe'} >= {'analyze_visitor_trends'}
+    assert 'visitor_revenue_stage_seconds{stage="run_full_analysis"' in (trace_dir / 'visitor_revenue.prom').read_text()
@@ -0,0 +1,4 @@
+"""
+Shared runtime for the Webflow visitor-to-revenue analyzers
+(visitor_revenue_analysis.py and visitor_revenue_analysis_simple.py)
+"""
@@ -0,0 +1,138 @@
+"""
+Historical backfill: the analysis as of every date in a range.
+
+Running the analyzer once per as-of date repeats every query per date. The
+backfill instead fetches what it can for many dates at once:
+
+- geography, channel and geography x channel distinct counts come from one
+  query per batch of as-of dates (BATCHED_VISITOR_QUERY): visitor rows are
+  joined to every as-of date whose 30-day window contains them and grouped
+  per as-of date, so each batch is a single scan and round trip.
+- daily trends and weekly conversion are built from per-day aggregates
+  (see daily_store), fetched once for the whole span.
+- revenue by segment reads a current-state table with no history; it is
+  fetched once and reported for every date.
+
+Dates then only need local work (rates, rollups, reports), which runs on a
+bounded pool sharing the analyzer's connection and result cache. Dates
+whose batched data is missing fall back to their own queries.
+
+BackfillManifest records finished dates so an interrupted backfill resumes
+where it stopped.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Sequence
+
+from visitor_revenue.consolidated import split_visitor_groupings
+from visitor_revenue.result_reuse import date_window
+
+# As-of dates per batched query; each visitor row is scanned once per date whose window holds it
+BACKFILL_BATCH_DATES = 26
+# Result keys BATCHED_VISITOR_QUERY provides
+BATCHED_RESULT_KEYS = ('geography_visitors', 'channel_visitors', 'geo_channel_matrix')
+
+BATCHED_VISITOR_QUERY = """
+        WITH as_of_dates AS (
+            SELECT as_of_date
+            FROM (VALUES {as_of_values}) AS d(as_of_date)
+        ),
+        visitors AS (
+            SELECT
+                d.as_of_date,
+                COALESCE(v.CUSTOM_REGION, 'Unknown') AS region,
+                COALESCE(v.DIM_CHANNEL_CATEGORY, 'Unknown') AS channel_category,
+                COALESCE(v.DIM_CHANNEL, 'Unknown') AS channel,
+                v.ID_VISITOR,
+                v.IS_NEW_VISITOR,
+                v.IS_PRE_SIGNUP_VISITOR
+            FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS v
+            JOIN as_of_dates d
+                ON v.DATE_DAY BETWEEN DATEADD(day, -30, d.as_of_date) AND d.as_of_date
+            WHERE v.DATE_DAY BETWEEN DATE '{start_date}' AND DATE '{end_date}'
+        )
+        SELECT
+            as_of_date,
+            -- GROUPING_ID bits, most significant first: region, channel_category, channel
+            CASE GROUPING_ID(region, channel_category, channel)
+                WHEN 3 THEN 'geography'
+                WHEN 4 THEN 'channel'
+                WHEN 1 THEN 'geo_channel'
+            END AS grouping_set,
+            region,
+            channel_category,
+            channel,
+            COUNT(DISTINCT ID_VISITOR) AS unique_visitors,
+            COUNT(DISTINCT CASE WHEN IS_NEW_VISITOR THEN ID_VISITOR END) AS new_visitors,
+            COUNT(DISTINCT CASE WHEN IS_PRE_SIGNUP_VISITOR THEN ID_VISITOR END) AS pre_signup_visitors
+        FROM visitors
+        GROUP BY GROUPING SETS (
+            (as_of_date, region),
+            (as_of_date, channel_category, channel),
+            (as_of_date, region, channel_category)
+        )
+        -- split_visitor_groupings applies each analysis' own thresholds
+        HAVING COUNT(DISTINCT ID_VISITOR) >= 100
+        """
+
+
+def backfill_dates(start: date, end: date, step_days: int = 7) -> List[str]:
+    """ISO as-of dates from start to end (inclusive), step_days apart"""
+    if step_days < 1:
+        raise ValueError("step_days must be at least 1")
+    dates = []
+    day = start
+    while day <= end:
+        dates.append(day.isoformat())
+        day += timedelta(days=step_days)
+    return dates
+
+
+def batched_visitor_query(as_of_dates: Sequence[str]) -> str:
+    """BATCHED_VISITOR_QUERY for the given as-of dates"""
+    as_of_dates = sorted(as_of_dates)
+    start_date = date_window(as_of_dates[0], 30)[0]
+    values = ', '.join(f"(DATE '{as_of}')" for as_of in as_of_dates)
+    return BATCHED_VISITOR_QUERY.format(as_of_values=values, start_date=start_date, end_date=as_of_dates[-1])
+
+
+def split_batched_visitor_groupings(rows: List[Dict]) -> Dict[str, Dict[str, List[Dict]]]:
+    """as-of date -> the geography, channel and crossover result rows for that date"""
+    by_date: Dict[str, List[Dict]] = {}
+    for raw in rows:
+        row = {key.lower(): value for key, value in raw.items()}
+        by_date.setdefault(str(row.pop('as_of_date'))[:10], []).append(row)
+    return {
+        as_of: {key: value for key, value in split_visitor_groupings(date_rows).items() if key in BATCHED_RESULT_KEYS}
+        for as_of, date_rows in by_date.items()
+    }
+
+
+class BackfillManifest:
+    """As-of dates a backfill has completed, kept as JSON next to its reports"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self._completed: Dict[str, Dict] = json.load(f)
+        except (OSError, ValueError):
+            self._completed = {}
+
+    def __contains__(self, as_of: str) -> bool:
+        return as_of in self._completed
+
+    def complete(self, as_of: str, report: str):
+        with self._lock:
+            self._completed[as_of] = {'report': report, 'completed_at': time.time()}
+            payload = json.dumps(self._completed, indent=2, sort_keys=True)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,173 @@
+"""
+Bulk unload of large query results as Parquet files.
+
+Regular queries return their rows as JSON frames on cli-snowflake's stdout,
+which is fine for the analyses' LIMITed summaries but not for full-detail
+pulls of millions of rows. unload() moves such a result without JSON on
+either side:
+
+1. COPY INTO a per-query prefix of the user stage (UNLOAD_STAGE) writes the
+   result as Snappy-compressed Parquet, split into files of about
+   UNLOAD_FILE_BYTES; DETAILED_OUTPUT lists the files it wrote
+2. the files are fetched with one GET per file, up to `workers` at a time
+3. the staged copies are removed
+
+The files land in a staging directory that replaces the target directory
+only once every file has arrived, with a manifest (MANIFEST) recording the
+query key, rows and bytes. The old directory is renamed aside before the
+staging directory is renamed into place, so readers see the old unload or
+the new one, never a half-deleted mix. open_dataset() scans the directory lazily with
+pyarrow.dataset: nothing is read until the dataset is filtered, projected or
+converted.
+
+Each statement is a separate call to `execute`, which the analyzer runs
+under its QueryRunner: every statement gets its own deadline and retries.
+All three are safe to repeat (COPY INTO overwrites the files a failed
+attempt left). The statements go through the analyzer's transport like any
+other query, so LocalSnowflake answers them too: its stage is a local directory and GET is a
+file copy. MCP sessions can't write files to this host, so bulk unloads need
+the worker or spawn transport.
+"""
+
+import concurrent.futures
+import json
+import os
+import shutil
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+from visitor_revenue.errors import SnowflakeQueryError
+from visitor_revenue.query_cache import QueryCache, ttl_for_query
+from visitor_revenue.result_protocol import ResultStream
+
+UNLOAD_STAGE = '@~/visitor_revenue_unload'
+# Snowflake splits the unload into files of at most this size (Parquet, compressed)
+UNLOAD_FILE_BYTES = 64 * 1024 * 1024
+DEFAULT_DOWNLOAD_WORKERS = 8
+# Written last; its absence marks an incomplete directory. The leading
+# underscore keeps it out of the dataset.
+MANIFEST = '_unload.json'
+
+
+class Unload(NamedTuple):
+    path: str
+    files: int
+    rows: int
+    bytes: int
+    # True if an earlier unload of the same query was reused
+    reused: bool = False
+    # The COPY INTO statement's query id and execution time (None when reused)
+    query_id: Optional[str] = None
+    server_ms: Optional[int] = None
+
+
+def copy_into_sql(query: str, location: str, max_file_size: int = UNLOAD_FILE_BYTES) -> str:
+    return (f"COPY INTO {location} FROM ({query}) "
+            f"FILE_FORMAT = (TYPE = PARQUET COMPRESSION = SNAPPY) HEADER = TRUE "
+            f"MAX_FILE_SIZE = {int(max_file_size)} OVERWRITE = TRUE DETAILED_OUTPUT = TRUE")
+
+
+def get_sql(staged_file: str, directory: str) -> str:
+    return f"GET {staged_file} 'file://{os.path.abspath(directory)}/'"
+
+
+def remove_sql(location: str) -> str:
+    return f"REMOVE {location}"
+
+
+def _field(row: Dict, name: str):
+    """A column of a result row, whatever case the transport reports its name in"""
+    for key, value in row.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def read_manifest(directory: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def reusable(directory: str, query: str, window: str, allow_stale: bool = False) -> Optional[Unload]:
+    """A complete earlier unload of the same query into directory, unless it has expired"""
+    manifest = read_manifest(directory)
+    if manifest is None or manifest.get('key') != QueryCache.key(query, window):
+        return None
+    if not allow_stale and time.time() - manifest['created_at'] > ttl_for_query(query):
+        return None
+    return Unload(directory, manifest['files'], manifest['rows'], manifest['bytes'], reused=True)
+
+
+def unload(query: str, window: str, directory: str, execute: Callable[[str], ResultStream],
+           workers: int = DEFAULT_DOWNLOAD_WORKERS) -> Unload:
+    """Unload a query's result into directory as Parquet files; raises SnowflakeQueryError on failure.
+
+    execute(sql) runs one statement and returns its result stream.
+    """
+    key = QueryCache.key(query, window)
+    location = f"{UNLOAD_STAGE}/{key[:16]}/"
+    staging = f"{directory}.{os.getpid()}.partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    try:
+        # Leftovers of an interrupted unload would be downloaded with the new files
+        execute(remove_sql(location)).to_dicts()
+        copy = execute(copy_into_sql(query, location))
+        files = copy.to_dicts()
+        query_id = (copy.trailer or {}).get('query_id')
+        server_ms = copy.header.get('elapsed_ms')
+
+        names = [os.path.basename(str(_field(row, 'file_name'))) for row in files]
+        with concurrent.futures.ThreadPoolExecutor(max(1, min(workers, len(names) or 1))) as pool:
+            for name, downloaded in zip(names, pool.map(
+                    lambda name: execute(get_sql(location + name, staging)).to_dicts(), names)):
+                status = [_field(row, 'status') for row in downloaded]
+                if status != ['DOWNLOADED']:
+                    raise SnowflakeQueryError(f"GET of {name} failed: {downloaded}")
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    finally:
+        try:
+            execute(remove_sql(location)).to_dicts()
+        except SnowflakeQueryError as e:
+            print(f"Could not remove staged files under {location}: {e}")
+
+    result = Unload(directory, len(names), sum(int(_field(row, 'row_count') or 0) for row in files),
+                    sum(int(_field(row, 'file_size') or 0) for row in files),
+                    query_id=query_id, server_ms=server_ms)
+    with open(os.path.join(staging, MANIFEST), 'w') as f:
+        json.dump({'key': key, 'created_at': time.time(), 'files': result.files,
+                   'rows': result.rows, 'bytes': result.bytes}, f)
+    _swap(staging, directory)
+    return result
+
+
+def _swap(staging: str, directory: str):
+    """Replace directory with staging by renames only; the old directory is deleted afterwards"""
+    previous = f"{directory}.{os.getpid()}.old"
+    shutil.rmtree(previous, ignore_errors=True)
+    try:
+        os.rename(directory, previous)
+    except FileNotFoundError:
+        previous = None
+    try:
+        os.rename(staging, directory)
+    except OSError:
+        if previous is not None:
+            os.rename(previous, directory)
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if previous is not None:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def open_dataset(directory: str):
+    """The unloaded files as a lazily scanned pyarrow Dataset"""
+    import pyarrow.dataset as ds
+    # Parquet files only: files starting with '_' or '.' (the manifest) are skipped
+    return ds.dataset(directory, format='parquet')
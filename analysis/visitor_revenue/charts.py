@@ -0,0 +1,240 @@
+"""
+Charts for the visitor-to-revenue report.
+
+render_charts draws the geography, channel, geography x channel heatmap,
+revenue segment and visitor trend figures (CHARTS) as PNGs, headlessly
+with matplotlib's Agg canvas. Figures are independent and matplotlib
+renders on one core, so they are drawn in a pool of processes.
+
+Each PNG is named by a hash of its chart spec and the input columns it
+plots. A chart whose data hasn't changed already exists under that name
+and is reused instead of re-rendered, across runs and across dates with
+identical results.
+
+matplotlib is imported only where a chart is drawn. seaborn, if installed,
+supplies the notebook's 'husl' palette.
+"""
+
+import base64
+import concurrent.futures
+import hashlib
+import html
+import importlib.util
+import json
+import os
+import re
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Bump when drawing code changes, so cached PNGs are redrawn
+CHART_VERSION = 1
+DEFAULT_CHART_WORKERS = 4
+
+
+@dataclass(frozen=True)
+class ChartSpec:
+    name: str
+    # Result key the chart is drawn from
+    result: str
+    title: str
+    # 'barh': one bar per row; 'heatmap': label x column grid; 'line': values over label (dates)
+    kind: str
+    label: Tuple[str, ...]
+    values: Tuple[str, ...]
+    # Heatmap columns
+    column: Optional[str] = None
+    # Largest rows kept for bar charts
+    limit: int = 15
+
+
+CHARTS = [
+    ChartSpec('geography', 'geography_visitors', "Top Regions by Unique Visitors (Last 30 Days)", 'barh',
+              label=('region',), values=('unique_visitors',)),
+    ChartSpec('channel', 'channel_visitors', "Top Channels by Unique Visitors (Last 30 Days)", 'barh',
+              label=('channel_category', 'channel'), values=('unique_visitors',)),
+    ChartSpec('geo_channel', 'geo_channel_matrix', "Pre-Signup Rate (%) by Region and Channel Category", 'heatmap',
+              label=('region',), values=('pre_signup_rate',), column='channel_category'),
+    ChartSpec('revenue_segments', 'revenue_segments', "MRR by Segment and Plan Tier", 'barh',
+              label=('segment', 'plan_tier'), values=('total_mrr',)),
+    ChartSpec('visitor_trends', 'visitor_trends', "Daily Unique Visitors (Last 30 Days)", 'line',
+              label=('date',), values=('unique_visitors', 'visitors_7d_avg')),
+]
+
+
+class Chart(NamedTuple):
+    spec: ChartSpec
+    path: str
+    # True if an identical chart was already on disk
+    cached: bool
+
+
+def _columns(spec: ChartSpec) -> Tuple[str, ...]:
+    return spec.label + spec.values + ((spec.column,) if spec.column else ())
+
+
+def chart_inputs(spec: ChartSpec, rows: List[Dict]) -> Optional[List[List]]:
+    """The columns a chart plots, row by row; None if the result lacks any of them"""
+    columns = _columns(spec)
+    if not rows or any(column not in rows[0] for column in columns):
+        return None
+    return [[row.get(column) for column in columns] for row in rows]
+
+
+def chart_key(spec: ChartSpec, inputs: List[List]) -> str:
+    payload = json.dumps([CHART_VERSION, asdict(spec), inputs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def render_charts(results: Dict[str, List[Dict]], chart_dir: str,
+                  workers: int = DEFAULT_CHART_WORKERS, specs: Sequence[ChartSpec] = CHARTS) -> List[Chart]:
+    """Draw (or reuse) every chart whose result is present; {result key: row dicts} in.
+
+    Charts that fail to render are reported and left out, like failed queries.
+    """
+    if importlib.util.find_spec('matplotlib') is None:
+        print("matplotlib is not installed; skipping charts")
+        return []
+
+    charts, pending = [], []
+    for spec in specs:
+        inputs = chart_inputs(spec, results.get(spec.result) or [])
+        if inputs is None:
+            continue
+        path = os.path.join(chart_dir, f"{spec.name}_{chart_key(spec, inputs)}.png")
+        if os.path.exists(path):
+            charts.append(Chart(spec, path, True))
+        else:
+            pending.append((spec, inputs, path))
+    if not pending:
+        return charts
+
+    os.makedirs(chart_dir, exist_ok=True)
+    if workers <= 1 or len(pending) == 1:
+        outcomes = [_render_safely(*job) for job in pending]
+    else:
+        import multiprocessing
+        # spawn: the analyzer's worker threads make forking unsafe
+        context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(min(workers, len(pending)), mp_context=context) as pool:
+            outcomes = list(pool.map(_render_safely, *zip(*pending)))
+
+    for (spec, _, path), error in zip(pending, outcomes):
+        if error is None:
+            charts.append(Chart(spec, path, False))
+        else:
+            print(f"Error rendering {spec.name} chart: {error}")
+    # Report order, whatever was cached
+    order = {spec.name: i for i, spec in enumerate(specs)}
+    return sorted(charts, key=lambda chart: order[chart.spec.name])
+
+
+def _render_safely(spec: ChartSpec, inputs: List[List], path: str) -> Optional[str]:
+    try:
+        render_chart(spec, inputs, path)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def render_chart(spec: ChartSpec, inputs: List[List], path: str):
+    """Draw one chart to a PNG (written atomically)"""
+    # Figure + Agg canvas, no pyplot: no GUI backend and no global state
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 6), dpi=100, layout='constrained')
+    ax = figure.add_subplot()
+    draw = {'barh': _draw_barh, 'heatmap': _draw_heatmap, 'line': _draw_line}[spec.kind]
+    draw(ax, figure, spec, inputs)
+    ax.set_title(spec.title)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    figure.savefig(tmp_path, format='png')
+    os.replace(tmp_path, path)
+
+
+def _palette(n: int) -> List:
+    try:
+        import seaborn as sns
+        return list(sns.color_palette('husl', n))
+    except ImportError:
+        from matplotlib import colormaps
+        return [colormaps['tab10'](i % 10) for i in range(n)]
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _draw_barh(ax, figure, spec: ChartSpec, inputs: List[List]):
+    n_labels = len(spec.label)
+    bars = sorted(((' - '.join(str(v) for v in row[:n_labels]), _number(row[n_labels])) for row in inputs),
+                  key=lambda bar: -bar[1] if bar[1] == bar[1] else 0)[:spec.limit]
+    # Largest at the top
+    bars.reverse()
+    ax.barh([label for label, _ in bars], [value for _, value in bars], color=_palette(1)[0])
+    ax.set_xlabel(spec.values[0].replace('_', ' '))
+    ax.ticklabel_format(axis='x', style='plain')
+    ax.xaxis.set_major_formatter('{x:,.0f}')
+
+
+def _draw_heatmap(ax, figure, spec: ChartSpec, inputs: List[List]):
+    cells = {(row[0], row[2]): _number(row[1]) for row in inputs}
+    rows = sorted({label for label, _ in cells}, key=str)
+    columns = sorted({column for _, column in cells}, key=str)
+    grid = [[cells.get((label, column), float('nan')) for column in columns] for label in rows]
+
+    image = ax.imshow(grid, aspect='auto', cmap='viridis')
+    figure.colorbar(image, ax=ax, label=spec.values[0].replace('_', ' '))
+    ax.set_xticks(range(len(columns)), [str(c) for c in columns], rotation=30, ha='right')
+    ax.set_yticks(range(len(rows)), [str(r) for r in rows])
+    for i, values in enumerate(grid):
+        for j, value in enumerate(values):
+            if value == value:
+                ax.text(j, i, f"{value:.1f}", ha='center', va='center', color='white', fontsize=8)
+
+
+def _as_date(value):
+    if isinstance(value, (date, datetime)):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return str(value)
+
+
+def _draw_line(ax, figure, spec: ChartSpec, inputs: List[List]):
+    points = sorted(inputs, key=lambda row: str(row[0]))
+    x = [_as_date(row[0]) for row in points]
+    for i, (name, color) in enumerate(zip(spec.values, _palette(len(spec.values)))):
+        ax.plot(x, [_number(row[1 + i]) for row in points], label=name.replace('_', ' '), color=color)
+    ax.legend()
+    ax.yaxis.set_major_formatter('{x:,.0f}')
+    figure.autofmt_xdate()
+
+
+_IMAGE = re.compile(r'^!\[(.*)\]\((.*)\)$')
+
+
+def markdown_to_html(markdown: str, base_dir: str, title: str) -> str:
+    """The report as one self-contained HTML page, charts inlined as data URIs"""
+    body = []
+    for line in markdown.splitlines():
+        image = _IMAGE.match(line.strip())
+        if image:
+            with open(os.path.join(base_dir, image.group(2)), 'rb') as f:
+                data = base64.b64encode(f.read()).decode('ascii')
+            body.append(f'<img alt="{html.escape(image.group(1))}" src="data:image/png;base64,{data}">')
+        elif line.startswith('#'):
+            level = len(line) - len(line.lstrip('#'))
+            body.append(f"<h{level}>{html.escape(line[level:].strip())}</h{level}>")
+        elif line.strip():
+            body.append(f"<p>{html.escape(line)}</p>")
+    return ("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+            f"<title>{html.escape(title)}</title>\n"
+            "<style>body { font-family: sans-serif; max-width: 60em; margin: 2em auto; } "
+            "p { white-space: pre-wrap; margin: 0.2em 0; } img { max-width: 100%; }</style>\n"
+            "</head>\n<body>\n" + '\n'.join(body) + "\n</body>\n</html>\n")
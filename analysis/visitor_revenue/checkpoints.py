@@ -0,0 +1,75 @@
+"""
+Per-step checkpoints for resumable analyzer runs.
+
+Every analysis step of run_full_analysis records a checkpoint in the run
+directory (`<output_dir>/runs/<analysis_date>/`) as soon as it finishes:
+its result files, the hashes (QueryCache.key: normalized SQL plus date
+window) of the queries it ran, the analysis date, the settings that shape
+its SQL, and whether any of its queries failed. checkpoints.json is the
+manifest; result files sit next to it.
+
+With --resume, a step whose checkpoint succeeded for the same analysis
+date and settings is restored from its files instead of re-queried, so
+recovering from one flaky query reruns only that query's step before the
+report is regenerated.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+MANIFEST = 'checkpoints.json'
+
+
+class RunCheckpoints:
+    """Checkpoint manifest and result files of one analyzer run"""
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        self._path = os.path.join(run_dir, MANIFEST)
+        self._lock = threading.Lock()
+        try:
+            with open(self._path) as f:
+                self._steps: Dict[str, Dict] = json.load(f)
+        except (OSError, ValueError):
+            self._steps = {}
+
+    def result_path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.run_dir, f"{key}.{fmt}")
+
+    def completed(self, step: str, window: str, settings: Dict) -> Optional[Dict]:
+        """The step's checkpoint if it succeeded for this window and settings"""
+        entry = self._steps.get(step)
+        if entry is None or entry['status'] != 'ok':
+            return None
+        if entry['window'] != window or entry['settings'] != settings:
+            return None
+        return entry
+
+    def record(self, step: str, status: str, keys: Sequence[str], queries: List[Dict], window: str, settings: Dict):
+        """Save a finished step's checkpoint (its result files must already be written)"""
+        with self._lock:
+            self._steps[step] = {
+                'status': status,
+                'keys': list(keys),
+                'queries': queries,
+                'window': window,
+                'settings': settings,
+                'finished_at': time.time(),
+            }
+            self._save()
+
+    def reset(self):
+        """Forget every checkpoint (a fresh, non-resumed run)"""
+        with self._lock:
+            self._steps = {}
+            self._save()
+
+    def _save(self):
+        os.makedirs(self.run_dir, exist_ok=True)
+        tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._steps, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self._path)
@@ -0,0 +1,132 @@
+"""
+Columnar result files for the visitor-to-revenue analyzers.
+
+save_results writes each result set as Arrow IPC (uncompressed, so it can be
+memory-mapped and read zero-copy) or Parquet (compressed, smaller), with
+dtypes preserved. CSV and JSON remain available as export formats.
+load_results memory-maps a previous run's files back as pyarrow Tables.
+
+pyarrow is only imported when a columnar format is actually used.
+"""
+
+import glob
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Union
+
+from visitor_revenue.records import Records
+
+OUTPUT_FORMATS = ('arrow', 'parquet', 'csv', 'json')
+COLUMNAR_FORMATS = ('arrow', 'parquet')
+
+
+def result_path(output_dir: str, key: str, analysis_date: str, fmt: str) -> str:
+    # Format names double as file extensions
+    return os.path.join(output_dir, f"{key}_{analysis_date}.{fmt}")
+
+
+def _write_arrow_table(table, path: str, fmt: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == 'parquet':
+        pq.write_table(table, path)
+        return
+    # Uncompressed IPC file: readable through a memory map without copies
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def write_frame(df, path: str, fmt: str):
+    """Write a pandas DataFrame in the given output format"""
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+    elif fmt == 'json':
+        df.to_json(path, orient='records', indent=2, date_format='iso')
+    else:
+        import pyarrow as pa
+        _write_arrow_table(pa.Table.from_pandas(df, preserve_index=False), path, fmt)
+
+
+def write_polars(df, path: str, fmt: str):
+    """Write a Polars DataFrame in the given output format (Arrow/Parquet without pyarrow)"""
+    if fmt == 'arrow':
+        # Uncompressed, like _write_arrow_table, so it can be memory-mapped
+        df.write_ipc(path, compression='uncompressed')
+    elif fmt == 'parquet':
+        df.write_parquet(path)
+    elif fmt == 'csv':
+        df.write_csv(path)
+    else:
+        write_records(df.to_dicts(), path, fmt)
+
+
+def write_records(rows: Union[List[Dict], Records], path: str, fmt: str):
+    """Write row dicts or Records in the given output format (no pandas needed)"""
+    if isinstance(rows, Records):
+        if fmt in COLUMNAR_FORMATS:
+            import pyarrow as pa
+            _write_arrow_table(pa.Table.from_pydict(rows.to_pydict()), path, fmt)
+            return
+        rows = rows.to_dicts()
+    if fmt == 'json':
+        with open(path, 'w') as f:
+            json.dump(rows, f, indent=2, default=str)
+    elif fmt == 'csv':
+        import csv
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else [])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        import pyarrow as pa
+        _write_arrow_table(pa.Table.from_pylist(rows), path, fmt)
+
+
+def read_table(path: str):
+    """Read one Arrow IPC or Parquet result file through a memory map"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.endswith('.parquet'):
+        return pq.read_table(path, memory_map=True)
+    # Buffers of the returned table point straight into the mapped file
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def available_dates(output_dir: str, fmt: str = 'arrow') -> List[str]:
+    """Analysis dates that have result files in the given format, oldest first"""
+    pattern = re.compile(r'_(\d{4}-\d{2}-\d{2})\.' + re.escape(fmt) + '$')
+    dates = set()
+    for path in glob.glob(os.path.join(output_dir, f"*.{fmt}")):
+        match = pattern.search(path)
+        if match:
+            dates.add(match.group(1))
+    return sorted(dates)
+
+
+def load_results(output_dir: str, analysis_date: Optional[str] = None, fmt: str = 'arrow',
+                 keys: Optional[Iterable[str]] = None, before: Optional[str] = None) -> Dict[str, object]:
+    """Memory-map a run's result files as {key: pyarrow.Table}.
+
+    With no analysis_date, loads the most recent run (strictly before
+    `before`, if given - e.g. before=today loads yesterday's outputs).
+    """
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"load_results reads columnar formats only, not {fmt}")
+
+    if analysis_date is None:
+        dates = [d for d in available_dates(output_dir, fmt) if before is None or d < before]
+        if not dates:
+            return {}
+        analysis_date = dates[-1]
+
+    suffix = f"_{analysis_date}.{fmt}"
+    tables = {}
+    for path in sorted(glob.glob(os.path.join(output_dir, f"*{suffix}"))):
+        key = os.path.basename(path)[:-len(suffix)]
+        if keys is None or key in keys:
+            tables[key] = read_table(path)
+    return tables
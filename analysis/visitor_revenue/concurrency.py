@@ -0,0 +1,76 @@
+"""
+Concurrent execution of analysis steps with grouped console output.
+
+Each step runs on a thread pool with its own stdout buffer; buffers are
+flushed strictly in step order, so the console reads exactly like a
+sequential run even though the queries overlap.
+"""
+
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Sequence
+
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """sys.stdout proxy that routes writes to a per-thread buffer when one is set"""
+
+    def __init__(self, target):
+        self._target = target
+        self._local = threading.local()
+
+    def capture(self, buffer: io.StringIO):
+        self._local.buffer = buffer
+
+    def release(self):
+        self._local.buffer = None
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, 'buffer', None)
+        return (buffer or self._target).write(text)
+
+    def flush(self):
+        self._target.flush()
+
+
+def run_grouped(steps: Sequence[Callable[[], Any]], max_workers: int) -> List[Any]:
+    """Run steps concurrently and replay their output in order.
+
+    Returns each step's return value in step order. If a step raises, its
+    output is still replayed and the first exception is re-raised after all
+    steps have finished.
+    """
+    if max_workers <= 1 or len(steps) <= 1:
+        return [step() for step in steps]
+
+    original = sys.stdout
+    proxy = _ThreadLocalStdout(original)
+    buffers = [io.StringIO() for _ in steps]
+
+    def _run(index: int):
+        proxy.capture(buffers[index])
+        try:
+            return steps[index]()
+        finally:
+            proxy.release()
+
+    sys.stdout = proxy
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_run, i) for i in range(len(steps))]
+            results, error = [], None
+            for index, future in enumerate(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(None)
+                    error = error or e
+                original.write(buffers[index].getvalue())
+                original.flush()
+    finally:
+        sys.stdout = original
+
+    if error is not None:
+        raise error
+    return results
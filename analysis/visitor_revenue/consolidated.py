@@ -0,0 +1,172 @@
+"""
+Single-scan fetch of every DAILY_MARKETING_VISITOR_DETAILS grouping.
+
+The geography, channel, geography x channel and daily-trend analyses all
+read the same 30-day window and differ only in their GROUP BY keys. One
+GROUPING SETS query returns all four groupings; split_visitor_groupings
+then reproduces each analysis' filters, rates, ordering and LIMIT locally.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, List, Optional
+
+from visitor_revenue.result_reuse import date_window
+
+# Result keys produced by split_visitor_groupings
+CONSOLIDATED_RESULT_KEYS = ('geography_visitors', 'channel_visitors', 'geo_channel_matrix', 'visitor_trends')
+
+CONSOLIDATED_VISITOR_QUERY = """
+        WITH date_range AS (
+            SELECT
+                DATE '{start_date}' AS start_date,
+                DATE '{end_date}' AS end_date
+        ),
+        visitors AS (
+            SELECT
+                COALESCE(v.CUSTOM_REGION, 'Unknown') AS region,
+                COALESCE(v.DIM_CHANNEL_CATEGORY, 'Unknown') AS channel_category,
+                COALESCE(v.DIM_CHANNEL, 'Unknown') AS channel,
+                v.DATE_DAY AS date,
+                v.ID_VISITOR,
+                v.IS_NEW_VISITOR,
+                v.IS_PRE_SIGNUP_VISITOR
+            FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS v
+            CROSS JOIN date_range dr
+            WHERE v.DATE_DAY BETWEEN dr.start_date AND dr.end_date
+        )
+        SELECT
+            -- GROUPING_ID bits, most significant first: region, channel_category, channel, date
+            CASE GROUPING_ID(region, channel_category, channel, date)
+                WHEN 7 THEN 'geography'
+                WHEN 9 THEN 'channel'
+                WHEN 3 THEN 'geo_channel'
+                WHEN 14 THEN 'daily'
+            END AS grouping_set,
+            region,
+            channel_category,
+            channel,
+            date,
+            COUNT(DISTINCT ID_VISITOR) AS unique_visitors,
+            COUNT(DISTINCT CASE WHEN IS_NEW_VISITOR THEN ID_VISITOR END) AS new_visitors,
+            COUNT(DISTINCT CASE WHEN IS_PRE_SIGNUP_VISITOR THEN ID_VISITOR END) AS pre_signup_visitors
+        FROM visitors
+        GROUP BY GROUPING SETS (
+            (region),
+            (channel_category, channel),
+            (region, channel_category),
+            (date)
+        )
+        -- Every grouping except daily trends drops groups under 100 visitors
+        HAVING COUNT(DISTINCT ID_VISITOR) >= 100
+            OR GROUPING_ID(region, channel_category, channel, date) = 14
+        """
+
+
+def consolidated_visitor_query(analysis_date: str, days: int = 30) -> str:
+    """CONSOLIDATED_VISITOR_QUERY for the `days` days up to analysis_date"""
+    start_date, end_date = date_window(analysis_date, days)
+    return CONSOLIDATED_VISITOR_QUERY.format(start_date=start_date, end_date=end_date)
+
+
+def round_half_up(value: float, places: int = 2) -> float:
+    """Round half away from zero, like Snowflake's ROUND on decimals"""
+    quantum = Decimal(1).scaleb(-places)
+    return float(Decimal(str(value)).quantize(quantum, rounding=ROUND_HALF_UP))
+
+
+def percent_rate(numerator, denominator) -> Optional[float]:
+    if not denominator:
+        return None
+    return round_half_up(100.0 * float(numerator) / float(denominator))
+
+
+def _by_visitors(rows: List[Dict], limit: Optional[int] = None) -> List[Dict]:
+    ordered = sorted(rows, key=lambda r: r['unique_visitors'], reverse=True)
+    return ordered[:limit] if limit is not None else ordered
+
+
+def visitor_trend_rows(daily: List[Dict]) -> List[Dict]:
+    """visitor_trends rows from per-day counts, newest first.
+
+    7-day averages trail over the rows present, in date order, like the
+    window function in analyze_visitor_trends.
+    """
+    daily = sorted(daily, key=lambda r: r['date'])
+    trends = []
+    for i, r in enumerate(daily):
+        window = daily[max(0, i - 6):i + 1]
+        trends.append({
+            'date': r['date'],
+            'unique_visitors': r['unique_visitors'],
+            'new_visitors': r['new_visitors'],
+            'pre_signup_visitors': r['pre_signup_visitors'],
+            'pre_signup_rate': percent_rate(r['pre_signup_visitors'], r['unique_visitors']),
+            'new_visitor_rate': percent_rate(r['new_visitors'], r['unique_visitors']),
+            'visitors_7d_avg': sum(w['unique_visitors'] for w in window) / len(window),
+            'pre_signups_7d_avg': sum(w['pre_signup_visitors'] for w in window) / len(window),
+        })
+    trends.reverse()
+    return trends
+
+
+def split_visitor_groupings(rows: List[Dict]) -> Dict[str, List[Dict]]:
+    """Split CONSOLIDATED_VISITOR_QUERY rows into the per-analysis result sets"""
+    groups: Dict[str, List[Dict]] = {'geography': [], 'channel': [], 'geo_channel': [], 'daily': []}
+    for raw in rows:
+        # Snowflake returns unquoted identifiers upper-cased
+        row = {key.lower(): value for key, value in raw.items()}
+        for count in ('unique_visitors', 'new_visitors', 'pre_signup_visitors'):
+            row[count] = int(row[count] or 0)
+        if row['grouping_set'] in groups:
+            groups[row['grouping_set']].append(row)
+
+    geography = _by_visitors([
+        {
+            'region': r['region'],
+            'unique_visitors': r['unique_visitors'],
+            'new_visitors': r['new_visitors'],
+            'pre_signup_visitors': r['pre_signup_visitors'],
+            'pre_signup_rate': percent_rate(r['pre_signup_visitors'], r['unique_visitors']),
+            'new_visitor_rate': percent_rate(r['new_visitors'], r['unique_visitors']),
+        }
+        for r in groups['geography'] if r['unique_visitors'] > 100
+    ], limit=25)
+
+    channel = _by_visitors([
+        {
+            'channel_category': r['channel_category'],
+            'channel': r['channel'],
+            'unique_visitors': r['unique_visitors'],
+            'new_visitors': r['new_visitors'],
+            'pre_signup_visitors': r['pre_signup_visitors'],
+            'pre_signup_rate': percent_rate(r['pre_signup_visitors'], r['unique_visitors']),
+            'new_visitor_rate': percent_rate(r['new_visitors'], r['unique_visitors']),
+        }
+        for r in groups['channel'] if r['unique_visitors'] > 100
+    ], limit=30)
+
+    # Crossover keeps pairs with >= 100 visitors, then only regions whose
+    # surviving pairs sum to >= 1000 visitors
+    pairs = [r for r in groups['geo_channel'] if r['unique_visitors'] >= 100]
+    region_totals: Dict[str, int] = {}
+    for r in pairs:
+        region_totals[r['region']] = region_totals.get(r['region'], 0) + r['unique_visitors']
+    geo_channel = _by_visitors([
+        {
+            'region': r['region'],
+            'channel_category': r['channel_category'],
+            'unique_visitors': r['unique_visitors'],
+            'pre_signup_visitors': r['pre_signup_visitors'],
+            'pre_signup_rate': percent_rate(r['pre_signup_visitors'], r['unique_visitors']),
+        }
+        for r in pairs if region_totals[r['region']] >= 1000
+    ], limit=50)
+
+    trends = visitor_trend_rows(groups['daily'])
+
+    return {
+        'geography_visitors': geography,
+        'channel_visitors': channel,
+        'geo_channel_matrix': geo_channel,
+        'visitor_trends': trends,
+    }
@@ -0,0 +1,225 @@
+"""
+Cost-aware planning of an analyzer run against a warehouse budget.
+
+Before any analysis query runs, the analyzer captures each step's SQL and
+has Snowflake EXPLAIN it. EXPLAIN only compiles the query and uses no
+warehouse time. The plan's GlobalStats row gives the micro-partitions and
+bytes the query would scan after pruning. Estimated credits are the query's
+median latency (from LatencyHistory) at the warehouse's credit rate.
+
+schedule() orders the steps cheapest first and admits them while the
+running total stays within the CostBudget, in bytes and/or credits. A step
+that doesn't fit is downgraded to a shorter date window: the window is
+halved, down to MIN_WINDOW_DAYS, and re-EXPLAINed each time. A step that
+still doesn't fit is refused and reported as a data gap. Sampling is not
+offered as a downgrade: COUNT(DISTINCT) over a sample can't be scaled back
+to the full population.
+
+After the run, actual partitions, bytes and execution time are read from
+query history (see result_reuse), and cost_table() lays the estimated and
+actual cost side by side.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from visitor_revenue.errors import SnowflakeQueryError
+
+EXPLAIN_PREFIX = 'EXPLAIN USING TABULAR '
+# Windows are never shortened below this many days
+MIN_WINDOW_DAYS = 7
+# A Medium warehouse; set the rate of the warehouse the queries run on
+DEFAULT_CREDITS_PER_HOUR = 4.0
+DEFAULT_BUDGET_CONCURRENCY = 2
+
+
+class QueryCaptured(Exception):
+    """Raised by fetch_rows while planning: the step's query was recorded, not run"""
+
+
+class BudgetExceededError(SnowflakeQueryError):
+    """Raised for a query the planner refused because it doesn't fit the run's budget"""
+
+    kind = 'over budget'
+    attempts = 0
+
+
+class QueryEstimate(NamedTuple):
+    partitions_total: int
+    partitions_assigned: int
+    bytes_assigned: int
+
+
+def explain_sql(query: str) -> str:
+    return EXPLAIN_PREFIX + query
+
+
+def parse_explain(rows: List[Dict]) -> QueryEstimate:
+    """Scan estimate from EXPLAIN USING TABULAR rows (GlobalStats, else the sum of table scans)"""
+    rows = [{key.lower(): value for key, value in row.items()} for row in rows]
+    stats = [row for row in rows if row.get('operation') == 'GlobalStats']
+    if not stats:
+        stats = [row for row in rows if row.get('partitionsassigned') is not None]
+    if not stats:
+        raise ValueError("EXPLAIN returned no partition statistics")
+    return QueryEstimate(*(sum(int(row.get(column) or 0) for row in stats)
+                           for column in ('partitionstotal', 'partitionsassigned', 'bytesassigned')))
+
+
+def format_bytes(value: Optional[float]) -> str:
+    if value is None:
+        return "n/a"
+    for unit in ('B', 'KB', 'MB'):
+        if value < 1024:
+            return f"{value:,.0f} B" if unit == 'B' else f"{value:,.1f} {unit}"
+        value /= 1024
+    return f"{value:,.1f} GB"
+
+
+@dataclass
+class CostBudget:
+    """Per-run limits; None leaves that dimension unlimited"""
+
+    max_bytes: Optional[int] = None
+    max_credits: Optional[float] = None
+    # Queries in flight at once under a plan (the analyzer's own limit still applies)
+    max_concurrency: int = DEFAULT_BUDGET_CONCURRENCY
+    credits_per_hour: float = DEFAULT_CREDITS_PER_HOUR
+
+    def credits(self, seconds: Optional[float]) -> Optional[float]:
+        return None if seconds is None else seconds * self.credits_per_hour / 3600
+
+    def describe(self) -> str:
+        limits = [f"{format_bytes(self.max_bytes)} scanned" if self.max_bytes is not None else None,
+                  f"{self.max_credits:g} credits" if self.max_credits is not None else None]
+        limits = [limit for limit in limits if limit]
+        return ', '.join(limits) if limits else "no limit (estimates only)"
+
+
+@dataclass
+class StepPlan:
+    """One analysis step's query, its estimated cost and the planner's decision"""
+
+    method: str
+    description: str = ""
+    # None: the step runs no query (e.g. served from the daily store)
+    query: Optional[str] = None
+    # None: EXPLAIN failed, so the cost is unknown
+    estimate: Optional[QueryEstimate] = None
+    # Expected execution time from latency history
+    seconds: Optional[float] = None
+    # The step's date window in days (None: no window to shorten) and the window it runs with
+    days: Optional[int] = None
+    window_days: Optional[int] = None
+    # Served from the local query cache: costs nothing
+    cached: bool = False
+    # 'run', 'downgrade' or 'refuse'
+    decision: str = 'run'
+    reason: str = ""
+
+    @property
+    def bytes(self) -> int:
+        if self.cached or self.estimate is None:
+            return 0
+        return self.estimate.bytes_assigned
+
+    def credits(self, budget: CostBudget) -> Optional[float]:
+        return 0.0 if self.cached or self.query is None else budget.credits(self.seconds)
+
+    def label(self) -> str:
+        if self.decision == 'refuse':
+            return "refused"
+        if self.decision == 'downgrade':
+            return f"{self.window_days} of {self.days} days"
+        if self.query is None:
+            return "no query"
+        return "cached" if self.cached else "run"
+
+
+def _fits(plan: StepPlan, budget: CostBudget, spent_bytes: int, spent_credits: float) -> bool:
+    if budget.max_bytes is not None and spent_bytes + plan.bytes > budget.max_bytes:
+        return False
+    credits = plan.credits(budget)
+    return budget.max_credits is None or credits is None or spent_credits + credits <= budget.max_credits
+
+
+def schedule(plans: List[StepPlan], budget: CostBudget,
+             downgrade: Callable[[StepPlan, int], StepPlan]) -> List[StepPlan]:
+    """Plans in execution order, cheapest first, each marked run, downgrade or refuse.
+
+    Steps are admitted in order while the budget allows, so as many steps
+    as possible fit. downgrade(plan, days) re-plans a step with its window
+    shortened to `days`. Steps whose cost is unknown are admitted at zero.
+    """
+    ordered = sorted(plans, key=lambda plan: (plan.bytes, plan.credits(budget) or 0.0))
+    scheduled, spent_bytes, spent_credits = [], 0, 0.0
+    for plan in ordered:
+        candidate, days = plan, plan.days
+        while not _fits(candidate, budget, spent_bytes, spent_credits):
+            days = days // 2 if days is not None and days // 2 >= MIN_WINDOW_DAYS else None
+            if days is None:
+                candidate = None
+                break
+            candidate = downgrade(plan, days)
+
+        if candidate is None:
+            plan.decision = 'refuse'
+            credits = plan.credits(budget)
+            cost = f"{format_bytes(plan.bytes)} scanned" + (f", {credits:.4f} credits" if credits is not None else "")
+            plan.reason = (f"estimated {cost} doesn't fit the run's budget ({budget.describe()}; "
+                           f"{format_bytes(spent_bytes)}, {spent_credits:.4f} credits already planned)")
+            scheduled.append(plan)
+            continue
+        if candidate is not plan:
+            candidate.decision = 'downgrade'
+            candidate.reason = f"window shortened from {plan.days} to {candidate.window_days} days to fit the budget"
+        spent_bytes += candidate.bytes
+        spent_credits += candidate.credits(budget) or 0.0
+        scheduled.append(candidate)
+    return scheduled
+
+
+def _actual(plan: StepPlan, executed: List[Dict], budget: CostBudget) -> Dict:
+    """Summed query history of a plan's executions (retries and hedges included)"""
+    entries = [entry for entry in executed if entry['description'] == plan.description]
+    if not entries:
+        return {}
+
+    def total(field):
+        values = [entry.get(field) for entry in entries]
+        return None if any(value is None for value in values) else sum(values)
+
+    execution_ms = total('execution_ms')
+    if execution_ms is None:
+        execution_ms = total('server_ms')
+    return {
+        'partitions': total('partitions_scanned'),
+        'bytes': total('bytes_scanned'),
+        'credits': budget.credits(execution_ms / 1000 if execution_ms is not None else None),
+    }
+
+
+def cost_table(plans: List[StepPlan], executed: Optional[List[Dict]], budget: CostBudget) -> List[str]:
+    """Markdown table of estimated (and, given executed queries, actual) partitions, bytes and credits"""
+    def number(value, fmt):
+        return "n/a" if value is None else format(value, fmt)
+
+    lines = ["| Query | Plan | Est. partitions | Est. scanned | Est. credits |",
+             "|---|---|---:|---:|---:|"]
+    if executed is not None:
+        lines = [lines[0] + " Partitions | Scanned | Credits |", lines[1] + "---:|---:|---:|"]
+    for plan in plans:
+        if plan.query is None:
+            continue
+        estimate = plan.estimate
+        partitions = (f"{estimate.partitions_assigned:,} of {estimate.partitions_total:,}"
+                      if estimate is not None and not plan.cached else "n/a")
+        line = (f"| {plan.description} | {plan.label()} | {partitions} | "
+                f"{format_bytes(plan.bytes) if estimate is not None else 'n/a'} | "
+                f"{number(plan.credits(budget), '.4f')} |")
+        if executed is not None:
+            actual = _actual(plan, executed, budget)
+            line += (f" {number(actual.get('partitions'), ',')} | {format_bytes(actual.get('bytes'))} | "
+                     f"{number(actual.get('credits'), '.4f')} |")
+        lines.append(line)
+    return lines
@@ -0,0 +1,328 @@
+"""
+In-memory region x channel x day cube of visitor counts.
+
+One query pulls DAILY_MARKETING_VISITOR_DETAILS for the 30-day window,
+aggregated to region, channel category, channel and day, and VisitorCube
+holds it as integer-coded dimension arrays. New questions ("pre-signup
+rate by region for paid search only", "last 7 vs prior 7 days by channel")
+are then answered by VisitorCube.slice in memory, without another
+warehouse round trip.
+
+Distinct visitor counts don't add up: a visitor seen on three days, or
+through two channels, is one visitor in the rollup but three or two in the
+cells. The cube handles this in one of two ways:
+
+- sketches (the default): every cell carries HyperLogLog sketches of its
+  unique, new and pre-signup visitors (see hll). slice() merges the cells'
+  sketches for each output row, so every window and grouping gets a
+  distinct-count estimate within hll.error_bound() (about 3%).
+- exact (visitor_cube_query(..., exact=True)): cells carry COUNT(DISTINCT)
+  values, and the same scan returns exact counts for the groupings the
+  analyses report (region; channel category and channel; region and channel
+  category; day). slice() answers from an exact grouping whenever one
+  matches the question. Otherwise it sums the smallest grouping that covers
+  it and marks the result approximate: each count is then an upper bound,
+  counting a visitor once per day/channel/region they appeared in.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from visitor_revenue import hll
+from visitor_revenue.consolidated import percent_rate
+from visitor_revenue.result_reuse import date_window
+
+DIMENSIONS = ('region', 'channel_category', 'channel', 'date')
+MEASURES = ('unique_visitors', 'new_visitors', 'pre_signup_visitors')
+
+# Groupings the analyses report, by consolidated grouping_set name; exact
+# cubes fetch these alongside the cells
+REPORT_GROUPINGS = {
+    'geography': ('region',),
+    'channel': ('channel_category', 'channel'),
+    'geo_channel': ('region', 'channel_category'),
+    'daily': ('date',),
+}
+
+VISITOR_SKETCH_QUERY = """
+        WITH date_range AS (
+            SELECT
+                DATE '{start_date}' AS start_date,
+                DATE '{end_date}' AS end_date
+        )
+        SELECT
+            COALESCE(v.CUSTOM_REGION, 'Unknown') AS region,
+            COALESCE(v.DIM_CHANNEL_CATEGORY, 'Unknown') AS channel_category,
+            COALESCE(v.DIM_CHANNEL, 'Unknown') AS channel,
+            v.DATE_DAY AS date,
+            HLL_EXPORT(HLL_ACCUMULATE(v.ID_VISITOR)) AS unique_visitors_hll,
+            HLL_EXPORT(HLL_ACCUMULATE(CASE WHEN v.IS_NEW_VISITOR THEN v.ID_VISITOR END)) AS new_visitors_hll,
+            HLL_EXPORT(HLL_ACCUMULATE(CASE WHEN v.IS_PRE_SIGNUP_VISITOR THEN v.ID_VISITOR END)) AS pre_signup_visitors_hll
+        FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS v
+        CROSS JOIN date_range dr
+        WHERE v.DATE_DAY BETWEEN dr.start_date AND dr.end_date
+        GROUP BY 1, 2, 3, 4
+        """
+
+VISITOR_CUBE_QUERY = """
+        WITH date_range AS (
+            SELECT
+                DATE '{start_date}' AS start_date,
+                DATE '{end_date}' AS end_date
+        ),
+        visitors AS (
+            SELECT
+                COALESCE(v.CUSTOM_REGION, 'Unknown') AS region,
+                COALESCE(v.DIM_CHANNEL_CATEGORY, 'Unknown') AS channel_category,
+                COALESCE(v.DIM_CHANNEL, 'Unknown') AS channel,
+                v.DATE_DAY AS date,
+                v.ID_VISITOR,
+                v.IS_NEW_VISITOR,
+                v.IS_PRE_SIGNUP_VISITOR
+            FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS v
+            CROSS JOIN date_range dr
+            WHERE v.DATE_DAY BETWEEN dr.start_date AND dr.end_date
+        )
+        SELECT
+            -- GROUPING_ID bits, most significant first: region, channel_category, channel, date
+            GROUPING_ID(region, channel_category, channel, date) AS grouping_id,
+            region,
+            channel_category,
+            channel,
+            date,
+            COUNT(DISTINCT ID_VISITOR) AS unique_visitors,
+            COUNT(DISTINCT CASE WHEN IS_NEW_VISITOR THEN ID_VISITOR END) AS new_visitors,
+            COUNT(DISTINCT CASE WHEN IS_PRE_SIGNUP_VISITOR THEN ID_VISITOR END) AS pre_signup_visitors
+        FROM visitors
+        GROUP BY GROUPING SETS (
+            (region, channel_category, channel, date),
+            (region),
+            (channel_category, channel),
+            (region, channel_category),
+            (date)
+        )
+        """
+
+Filter = Union[str, Sequence[str]]
+
+
+def visitor_cube_query(analysis_date: str, exact: bool = False, days: int = 30) -> str:
+    """Cube query for the `days` days up to analysis_date: sketches, or exact counts"""
+    start_date, end_date = date_window(analysis_date, days)
+    template = VISITOR_CUBE_QUERY if exact else VISITOR_SKETCH_QUERY
+    return template.format(start_date=start_date, end_date=end_date)
+
+
+def _grouped_dims(grouping_id: int) -> Tuple[str, ...]:
+    """Dimensions a GROUPING_ID row is grouped by (a set bit means aggregated away)"""
+    width = len(DIMENSIONS)
+    return tuple(dim for i, dim in enumerate(DIMENSIONS) if not grouping_id >> (width - 1 - i) & 1)
+
+
+def _day(value) -> str:
+    """Normalize a DATE value to YYYY-MM-DD"""
+    return str(value)[:10]
+
+
+class _Grouping:
+    """One grouping set: a code array per grouped dimension, and per measure either counts or sketches"""
+
+    def __init__(self, dims: Tuple[str, ...], codes: Dict[str, np.ndarray], counts: Optional[np.ndarray] = None,
+                 sketches: Optional[Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]] = None):
+        self.dims = dims
+        self.codes = codes
+        # rows x MEASURES exact counts
+        self.counts = counts
+        # measure -> (row offsets, register indices, register values), rows' sparse registers back to back
+        self.sketches = sketches
+
+    def __len__(self) -> int:
+        return len(next(iter(self.codes.values())))
+
+
+def _pack_sketches(exports: List) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    parsed = [hll.parse_export(export) for export in exports]
+    offsets = np.zeros(len(parsed) + 1, dtype=np.int64)
+    np.cumsum([len(indices) for indices, _ in parsed], out=offsets[1:])
+    indices = np.concatenate([indices for indices, _ in parsed] or [np.empty(0, dtype=np.uint16)])
+    values = np.concatenate([values for _, values in parsed] or [np.empty(0, dtype=np.uint8)])
+    return offsets, indices, values
+
+
+def _merged_estimates(sketch: Tuple[np.ndarray, np.ndarray, np.ndarray], rows: np.ndarray,
+                      groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """Estimate per group from merging the sketches of rows (groups[i]: output group of rows[i])"""
+    offsets, indices, values = sketch
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    # Positions of every selected row's registers in indices/values
+    entries = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    registers = np.zeros((n_groups, 1 << hll.PRECISION), dtype=np.uint8)
+    np.maximum.at(registers, (np.repeat(groups, lengths), indices[entries]), values[entries])
+    return hll.estimates(registers)
+
+
+@dataclass
+class CubeSlice:
+    """Rows of a VisitorCube.slice, and whether their visitor counts are exact"""
+    rows: List[Dict]
+    approximate: bool = False
+    # Why the counts are approximate, for labelling reports
+    note: str = ""
+    # Relative error bound (95% confidence) of sketch estimates; None for summed or exact counts
+    error: Optional[float] = None
+
+
+class VisitorCube:
+    """Region x channel category x channel x day visitor counts, sliceable in memory"""
+
+    def __init__(self, rows: Iterable[Dict]):
+        by_grouping: Dict[Tuple[str, ...], List[Dict]] = {}
+        for raw in rows:
+            # Snowflake returns unquoted identifiers upper-cased
+            row = {key.lower(): value for key, value in raw.items()}
+            # Sketch rows are all cells; exact rows say which grouping they belong to
+            dims = _grouped_dims(int(row['grouping_id'])) if 'grouping_id' in row else DIMENSIONS
+            by_grouping.setdefault(dims, []).append(row)
+        self.sketched = any(f"{MEASURES[0]}_hll" in group[0] for group in by_grouping.values())
+
+        # Categorical levels, sorted so a date window is a contiguous code range
+        self.levels: Dict[str, np.ndarray] = {}
+        for dim in DIMENSIONS:
+            values = {row[dim] for dims, group in by_grouping.items() if dim in dims for row in group}
+            self.levels[dim] = np.array(sorted(values), dtype=object)
+        self._days = np.array([_day(value) for value in self.levels['date']], dtype=object)
+
+        self._groupings: Dict[FrozenSet[str], _Grouping] = {}
+        for dims, group in by_grouping.items():
+            codes = {
+                dim: np.searchsorted(self.levels[dim], np.array([row[dim] for row in group], dtype=object)).astype(np.int32)
+                for dim in dims
+            }
+            if self.sketched:
+                sketches = {m: _pack_sketches([row[f"{m}_hll"] for row in group]) for m in MEASURES}
+                self._groupings[frozenset(dims)] = _Grouping(dims, codes, sketches=sketches)
+            else:
+                counts = np.array([[int(row[m] or 0) for m in MEASURES] for row in group], dtype=np.int64)
+                self._groupings[frozenset(dims)] = _Grouping(dims, codes, counts=counts.reshape(-1, len(MEASURES)))
+
+    @property
+    def cells(self) -> int:
+        """Number of region x channel x day cells held"""
+        finest = self._groupings.get(frozenset(DIMENSIONS))
+        return 0 if finest is None else len(finest)
+
+    @property
+    def date_range(self) -> Optional[Tuple[str, str]]:
+        if not len(self._days):
+            return None
+        return self._days[0], self._days[-1]
+
+    def slice(self, by: Sequence[str] = (), where: Optional[Dict[str, Filter]] = None,
+              start: Optional[str] = None, end: Optional[str] = None) -> CubeSlice:
+        """Visitor counts grouped by `by`, for rows matching `where` between start and end (ISO dates, inclusive).
+
+        where maps a dimension to one value or a list of values. Rows are
+        ordered by unique_visitors, largest first, and carry pre_signup_rate
+        and new_visitor_rate.
+        """
+        by = tuple(by)
+        unknown = [dim for dim in by + tuple(where or ()) if dim not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown cube dimension(s): {', '.join(unknown)}")
+
+        allowed = self._allowed_codes(where or {}, start, end)
+        needed = frozenset(by) | frozenset(allowed)
+        grouping, exact = self._grouping_for(by, needed, allowed)
+        if grouping is None:
+            return CubeSlice([])
+
+        mask = np.ones(len(grouping), dtype=bool)
+        for dim, codes in allowed.items():
+            mask &= np.isin(grouping.codes[dim], codes)
+        selected = np.flatnonzero(mask)
+
+        if by:
+            sizes = tuple(len(self.levels[dim]) for dim in by)
+            flat = np.ravel_multi_index(tuple(grouping.codes[dim][selected] for dim in by), sizes)
+            keys, inverse = np.unique(flat, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            key_codes = np.unravel_index(keys, sizes)
+        else:
+            keys, inverse = np.zeros(1), np.zeros(len(selected), dtype=np.int64)
+            key_codes = ()
+
+        if grouping.sketches is not None:
+            sums = np.column_stack([
+                np.rint(_merged_estimates(grouping.sketches[m], selected, inverse, len(keys))) for m in MEASURES
+            ]).astype(np.int64)
+        else:
+            sums = np.zeros((len(keys), len(MEASURES)), dtype=np.int64)
+            np.add.at(sums, inverse, grouping.counts[selected])
+
+        order = np.argsort(-sums[:, 0], kind='stable')
+        rows = []
+        for i in order:
+            row = {dim: self.levels[dim][key_codes[j][i]] for j, dim in enumerate(by)}
+            row.update({m: int(sums[i, k]) for k, m in enumerate(MEASURES)})
+            row['pre_signup_rate'] = percent_rate(row['pre_signup_visitors'], row['unique_visitors'])
+            row['new_visitor_rate'] = percent_rate(row['new_visitors'], row['unique_visitors'])
+            rows.append(row)
+
+        if grouping.sketches is not None:
+            error = hll.error_bound()
+            note = f"HyperLogLog estimates: within ±{error:.1%} of the distinct count with 95% confidence"
+            return CubeSlice(rows, approximate=True, note=note, error=error)
+        note = ""
+        if not exact:
+            summed = [dim for dim in grouping.dims if dim not in by]
+            note = (f"Visitor counts summed across {', '.join(summed)}: a visitor seen in more than one "
+                    f"{'/'.join(summed)} is counted once for each (upper bound)")
+        return CubeSlice(rows, approximate=not exact, note=note)
+
+    def grouping_rows(self) -> List[Dict]:
+        """The reported groupings as consolidated-query rows, for split_visitor_groupings"""
+        rows = []
+        for name, dims in REPORT_GROUPINGS.items():
+            for row in self.slice(by=dims).rows:
+                row['grouping_set'] = name
+                rows.append(row)
+        return rows
+
+    def _allowed_codes(self, where: Dict[str, Filter], start: Optional[str], end: Optional[str]) -> Dict[str, np.ndarray]:
+        """Dimension -> codes a row must have; dimensions left unrestricted are omitted"""
+        allowed = {}
+        for dim, values in where.items():
+            values = [values] if isinstance(values, str) else list(values)
+            if dim == 'date':
+                values = [_day(value) for value in values]
+                allowed[dim] = np.flatnonzero(np.isin(self._days, values))
+            else:
+                allowed[dim] = np.flatnonzero(np.isin(self.levels[dim], values))
+        if start is not None or end is not None:
+            lo = np.searchsorted(self._days, start, side='left') if start is not None else 0
+            hi = np.searchsorted(self._days, end, side='right') if end is not None else len(self._days)
+            window = np.arange(lo, hi)
+            if lo > 0 or hi < len(self._days):
+                allowed['date'] = np.intersect1d(allowed['date'], window) if 'date' in allowed else window
+        return allowed
+
+    def _grouping_for(self, by: Tuple[str, ...], needed: FrozenSet[str],
+                      allowed: Dict[str, np.ndarray]) -> Tuple[Optional[_Grouping], bool]:
+        """The grouping to answer from, and whether its counts answer exactly.
+
+        Exact needs a grouping on exactly the grouped and filtered
+        dimensions, with filtered dimensions outside `by` pinned to one
+        value: then every output row is a single grouping row. Otherwise the
+        smallest grouping covering the dimensions is summed. A sketched cube
+        only has cells, whose sketches slice() merges.
+        """
+        grouping = self._groupings.get(needed)
+        if grouping is not None and all(len(allowed[dim]) <= 1 for dim in needed - set(by)):
+            return grouping, True
+        covering = [g for dims, g in self._groupings.items() if needed <= dims]
+        if not covering:
+            return None, False
+        return min(covering, key=len), False
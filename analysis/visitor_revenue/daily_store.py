@@ -0,0 +1,199 @@
+"""
+Incremental local store of per-day aggregates.
+
+The trend and conversion analyses only ever change at the newest day, so
+instead of re-aggregating 30-90 days in the warehouse on every run, the
+per-day aggregates are kept in a local SQLite file. Each run fetches only
+the days the store doesn't have yet, plus a short trailing window that is
+always re-fetched to pick up late-arriving data. Rates, weekly rollups and
+7-day averages are then computed locally.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from visitor_revenue.consolidated import percent_rate, round_half_up, visitor_trend_rows
+from visitor_revenue.snowflake_client import PROJECT_ROOT
+
+DEFAULT_STORE_PATH = os.path.join(PROJECT_ROOT, 'analysis', '.daily_aggregates.sqlite')
+DEFAULT_REFETCH_DAYS = 3
+
+# Aggregate table -> metric columns (every table is keyed on date)
+TABLES = {
+    'visitor_daily': ('unique_visitors', 'new_visitors', 'pre_signup_visitors'),
+    'conversion_daily': ('signups', 'new_subscriptions', 'new_mrr'),
+}
+
+VISITOR_DAILY_QUERY = """
+        SELECT
+            v.DATE_DAY AS date,
+            COUNT(DISTINCT v.ID_VISITOR) AS unique_visitors,
+            COUNT(DISTINCT CASE WHEN v.IS_NEW_VISITOR THEN v.ID_VISITOR END) AS new_visitors,
+            COUNT(DISTINCT CASE WHEN v.IS_PRE_SIGNUP_VISITOR THEN v.ID_VISITOR END) AS pre_signup_visitors
+        FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS v
+        WHERE v.DATE_DAY BETWEEN DATE '{start}' AND DATE '{end}'
+        GROUP BY 1
+        """
+
+CONVERSION_DAILY_QUERY = """
+        WITH daily_signups AS (
+            SELECT
+                DATE_TRUNC('day', TIMESTAMP) AS signup_date,
+                COUNT(DISTINCT USER_ID) AS signups
+            FROM analytics.webflow.FCT_USER_CREATED
+            WHERE DATE_TRUNC('day', TIMESTAMP) BETWEEN DATE '{start}' AND DATE '{end}'
+            GROUP BY 1
+        ),
+        new_subscriptions AS (
+            SELECT
+                DATE_TRUNC('day', CREATED_AT) AS subscription_date,
+                COUNT(DISTINCT USER_ID) AS new_subscriptions,
+                SUM(MRR) AS new_mrr
+            FROM analytics.webflow.REPORT__GOOGLE_NEW_FIRST_SUBSCRIPTION_EVENT
+            WHERE DATE_TRUNC('day', CREATED_AT) BETWEEN DATE '{start}' AND DATE '{end}'
+            GROUP BY 1
+        )
+        SELECT
+            COALESCE(s.signup_date, n.subscription_date) AS date,
+            COALESCE(s.signups, 0) AS signups,
+            COALESCE(n.new_subscriptions, 0) AS new_subscriptions,
+            COALESCE(n.new_mrr, 0) AS new_mrr
+        FROM daily_signups s
+        FULL OUTER JOIN new_subscriptions n ON s.signup_date = n.subscription_date
+        """
+
+QUERIES = {
+    'visitor_daily': VISITOR_DAILY_QUERY,
+    'conversion_daily': CONVERSION_DAILY_QUERY,
+}
+
+
+def _day(value) -> str:
+    """Normalize a Snowflake DATE/TIMESTAMP value to YYYY-MM-DD"""
+    return str(value)[:10]
+
+
+def _date_range(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _contiguous_runs(days: List[date]) -> List[Tuple[date, date]]:
+    """(first, last) of each run of consecutive days in a sorted list"""
+    runs: List[Tuple[date, date]] = []
+    for day in days:
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+class DailyAggregateStore:
+    """SQLite-backed per-day aggregates with incremental refresh"""
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, refetch_days: int = DEFAULT_REFETCH_DAYS):
+        self.path = path
+        self.refetch_days = refetch_days
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            for table, metrics in TABLES.items():
+                columns = ', '.join(f"{metric} REAL NOT NULL" for metric in metrics)
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    f"(date TEXT PRIMARY KEY, {columns}, fetched_at REAL NOT NULL)"
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def dates_to_fetch(self, table: str, start: date, end: date) -> List[date]:
+        """Days in [start, end] that are missing or inside the re-fetch window"""
+        with self._connect() as conn:
+            stored = {row['date'] for row in conn.execute(
+                f"SELECT date FROM {table} WHERE date BETWEEN ? AND ?", (start.isoformat(), end.isoformat())
+            )}
+        refetch_from = end - timedelta(days=self.refetch_days - 1)
+        return [d for d in _date_range(start, end) if d.isoformat() not in stored or d >= refetch_from]
+
+    def refresh(self, table: str, start: date, end: date,
+                fetch: Callable[[str], List[Dict]]) -> List[Tuple[date, date]]:
+        """Bring [start, end] up to date, running fetch(sql) once per run of consecutive stale days.
+
+        A missing old day and the re-fetch window are two small queries, not
+        one spanning everything in between. Returns the (start, end) spans
+        that were fetched; empty if the store already covered the window.
+        """
+        spans = _contiguous_runs(self.dates_to_fetch(table, start, end))
+        for fetch_start, fetch_end in spans:
+            sql = QUERIES[table].format(start=fetch_start.isoformat(), end=fetch_end.isoformat())
+            self.upsert(table, fetch(sql), fetch_start, fetch_end)
+        return spans
+
+    def upsert(self, table: str, rows: List[Dict], start: date, end: date):
+        """Store fetched rows; days in [start, end] without a row are stored as zeros"""
+        metrics = TABLES[table]
+        by_day = {}
+        for raw in rows:
+            row = {key.lower(): value for key, value in raw.items()}
+            by_day[_day(row['date'])] = [float(row.get(metric) or 0) for metric in metrics]
+
+        now = time.time()
+        records = [
+            (d.isoformat(), *by_day.get(d.isoformat(), [0.0] * len(metrics)), now)
+            for d in _date_range(start, end)
+        ]
+        placeholders = ', '.join('?' * (len(metrics) + 2))
+        with self._connect() as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})", records)
+
+    def load(self, table: str, start: date, end: date) -> List[Dict]:
+        """Stored rows for [start, end] in date order"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM {table} WHERE date BETWEEN ? AND ? ORDER BY date",
+                (start.isoformat(), end.isoformat()),
+            ).fetchall()
+        return [{key: row[key] for key in row.keys() if key != 'fetched_at'} for row in rows]
+
+
+def visitor_trends(store: DailyAggregateStore, start: date, end: date) -> List[Dict]:
+    """visitor_trends result rows computed from stored daily aggregates"""
+    daily = [
+        dict(row, **{metric: int(row[metric]) for metric in TABLES['visitor_daily']})
+        for row in store.load('visitor_daily', start, end)
+        if row['unique_visitors'] > 0
+    ]
+    return visitor_trend_rows(daily)
+
+
+def weekly_conversion(store: DailyAggregateStore, start: date, end: date, limit: int = 13) -> List[Dict]:
+    """signup_conversion result rows (weekly rollup) from stored daily aggregates"""
+    weeks: Dict[str, List[float]] = {}
+    for row in store.load('conversion_daily', start, end):
+        if not (row['signups'] or row['new_subscriptions'] or row['new_mrr']):
+            continue
+        day = date.fromisoformat(row['date'])
+        # Monday-start weeks, matching the SQL path's DATE_TRUNC('week', date)::DATE
+        week = (day - timedelta(days=day.weekday())).isoformat()
+        totals = weeks.setdefault(week, [0.0, 0.0, 0.0])
+        totals[0] += row['signups']
+        totals[1] += row['new_subscriptions']
+        totals[2] += row['new_mrr']
+
+    result = []
+    for week in sorted(weeks, reverse=True)[:limit]:
+        signups, subscriptions, mrr = weeks[week]
+        result.append({
+            'week': week,
+            'total_signups': int(signups),
+            'total_new_subscriptions': int(subscriptions),
+            'total_new_mrr': round_half_up(mrr, 0),
+            'conversion_rate': percent_rate(subscriptions, signups),
+            'avg_mrr_per_conversion': round_half_up(mrr / subscriptions) if subscriptions else None,
+        })
+    return result
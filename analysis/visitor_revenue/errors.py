@@ -0,0 +1,7 @@
+"""
+Exceptions shared across the visitor_revenue package
+"""
+
+
+class SnowflakeQueryError(Exception):
+    """Raised when Snowflake (or the CLI in front of it) rejects a query"""
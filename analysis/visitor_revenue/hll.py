@@ -0,0 +1,109 @@
+"""
+HyperLogLog sketches in Snowflake's HLL_EXPORT format.
+
+COUNT(DISTINCT ID_VISITOR) can't be re-aggregated: the distinct visitors of
+a week are not the sum of its days. A HyperLogLog sketch can: Snowflake's
+HLL_EXPORT(HLL_ACCUMULATE(ID_VISITOR)) returns, per group, 2^precision
+registers, each holding the longest run of leading zeros (plus one) seen
+among the hashes routed to it. The sketch of a union is the register-wise
+maximum of its parts (what HLL_COMBINE does), so per-day, per-dimension
+sketches fetched once answer distinct counts for any window or grouping by
+merging locally.
+
+Exports look like
+    {"version": 4, "precision": 12, "sparse": {"indices": [...], "maxLzCounts": [...]}}
+or, for well-filled sketches, {"version": 4, "precision": 12, "dense": [...]}.
+parse_export reads either (as a dict or JSON text) into sparse
+(indices, values) arrays. estimate() uses Ertl's improved raw estimator,
+which needs no empirical bias tables and is accurate from empty sketches to
+billions of values. Its relative standard error is 1.04 / sqrt(2^precision):
+about 1.6% at Snowflake's precision 12.
+
+The local DuckDB backend produces the same export from its own 64-bit hash
+(see local_backend.translate_sql).
+"""
+
+import json
+import math
+from typing import Dict, Tuple, Union
+
+import numpy as np
+
+# Snowflake's HLL functions use 2^12 registers and 64-bit hashes
+PRECISION = 12
+HASH_BITS = 64
+# Standard errors covered by error_bound (about 95% confidence)
+CONFIDENCE_Z = 1.96
+
+Export = Union[str, Dict, None]
+
+
+def parse_export(export: Export) -> Tuple[np.ndarray, np.ndarray]:
+    """(register indices, register values) of an HLL_EXPORT object; empty for NULL"""
+    if export is None:
+        return np.empty(0, dtype=np.uint16), np.empty(0, dtype=np.uint8)
+    if isinstance(export, (str, bytes)):
+        export = json.loads(export)
+    precision = int(export.get('precision', PRECISION))
+    if precision != PRECISION:
+        raise ValueError(f"Unsupported HLL precision {precision} (expected {PRECISION})")
+    if 'dense' in export:
+        values = np.asarray(export['dense'], dtype=np.uint8)
+        indices = np.flatnonzero(values).astype(np.uint16)
+        return indices, values[indices]
+    sparse = export.get('sparse') or {}
+    return (np.asarray(sparse.get('indices', ()), dtype=np.uint16),
+            np.asarray(sparse.get('maxLzCounts', ()), dtype=np.uint8))
+
+
+def _sigma(x: float) -> float:
+    if x == 1.0:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0.0 or x == 1.0:
+        return 0.0
+    y, z = 1.0, 1.0 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1.0 - x) ** 2 * y
+        if z == previous:
+            return z / 3.0
+
+
+def estimate(registers: np.ndarray, precision: int = PRECISION) -> float:
+    """Distinct-count estimate from one sketch's full register array"""
+    m = 1 << precision
+    q = HASH_BITS - precision
+    histogram = np.bincount(registers, minlength=q + 2)
+    z = m * _tau(1.0 - histogram[q + 1] / m)
+    for k in range(q, 0, -1):
+        z = 0.5 * (z + histogram[k])
+    z += m * _sigma(histogram[0] / m)
+    return m * m / (2 * math.log(2) * z)
+
+
+def estimates(registers: np.ndarray, precision: int = PRECISION) -> np.ndarray:
+    """estimate() for each row of a (sketches x registers) array"""
+    return np.array([estimate(row, precision) for row in registers], dtype=np.float64)
+
+
+def relative_error(precision: int = PRECISION) -> float:
+    """Relative standard error of a merged sketch's estimate"""
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def error_bound(precision: int = PRECISION) -> float:
+    """Relative error not exceeded with about 95% confidence"""
+    return CONFIDENCE_Z * relative_error(precision)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Cold-start import benchmark for the visitor-to-revenue analyzer
+
+Imports each module in fresh interpreters under `python -X importtime` and
+reports the module's cumulative import time (median of --repeat runs) and
+its heaviest direct imports. Agents start a new process per invocation, so
+this is paid on every run before the first query is sent.
+
+Exits 1 if a module's median exceeds --budget-ms, or if importing it loads
+any heavy third-party module (pandas, NumPy, Polars, pyarrow, matplotlib,
+seaborn, DuckDB): those belong behind lazy imports at their first use.
+
+Usage (from analysis/):
+    python -m visitor_revenue.import_benchmark
+    python -m visitor_revenue.import_benchmark --budget-ms 100 --repeat 9
+    python -m visitor_revenue.import_benchmark --json imports.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Optional
+
+DEFAULT_MODULES = ['visitor_revenue_analysis', 'visitor_revenue_analysis_simple']
+DEFAULT_BUDGET_MS = 150.0
+# Modules whose import alone costs tens to hundreds of milliseconds
+HEAVY_MODULES = ('pandas', 'numpy', 'polars', 'pyarrow', 'matplotlib', 'seaborn', 'duckdb')
+ANALYSIS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$')
+
+
+class ImportEntry(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    # 0 for imports made directly by the interpreter or -c, 1 for their imports, ...
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportEntry]:
+    """-X importtime lines in output order (each module after its own imports)"""
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append(ImportEntry(module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def module_imports(entries: List[ImportEntry], module: str) -> List[ImportEntry]:
+    """The entries of module's own import tree, module itself last"""
+    for end, entry in enumerate(entries):
+        if entry.depth == 0 and entry.module == module:
+            start = end
+            while start > 0 and entries[start - 1].depth > 0:
+                start -= 1
+            return entries[start:end + 1]
+    raise ValueError(f"{module} does not appear in the -X importtime output")
+
+
+def measure(module: str, python: str = sys.executable) -> List[ImportEntry]:
+    """Import module in a fresh interpreter and return its import tree"""
+    result = subprocess.run([python, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=ANALYSIS_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    return module_imports(parse_importtime(result.stderr), module)
+
+
+def heavy_modules(tree: List[ImportEntry]) -> List[str]:
+    return sorted({entry.module.split('.')[0] for entry in tree} & set(HEAVY_MODULES))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--module', nargs='+', default=DEFAULT_MODULES,
+                        help="Modules to import, from analysis/ (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help="Allowed median import time per module (default: %(default)s)")
+    parser.add_argument('--top', type=int, default=8, help="Heaviest direct imports listed per module")
+    parser.add_argument('--json', help="Write median import times (ms) to this file")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, float] = {}
+    problems = []
+    for module in args.module:
+        # One unmeasured run writes any missing bytecode caches
+        measure(module)
+        trees = [measure(module) for _ in range(args.repeat)]
+        median_ms = statistics.median(tree[-1].cumulative_us for tree in trees) / 1000
+        results[module] = median_ms
+
+        print(f"\n{module}: {median_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        direct = [entry for entry in trees[0] if entry.depth == 1]
+        for entry in sorted(direct, key=lambda e: -e.cumulative_us)[:args.top]:
+            print(f"  {entry.cumulative_us / 1000:>8.1f} ms  {entry.module}")
+
+        if median_ms > args.budget_ms:
+            problems.append(f"{module}: {median_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        heavy = heavy_modules(trees[0])
+        if heavy:
+            problems.append(f"{module}: imports {', '.join(heavy)} at load; import them where first used")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nImport times written to {args.json}")
+
+    if problems:
+        print(f"\n{len(problems)} cold-start problem(s):")
+        for problem in problems:
+            print(f"  {problem}")
+        return 1
+    print("\nAll modules within the cold-start budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
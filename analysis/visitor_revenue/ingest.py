@@ -0,0 +1,124 @@
+"""
+Schema-driven ingest of query results into compact DataFrames.
+
+pd.DataFrame(rows) on a list of row dicts infers every column from Python
+objects: counts become int64 (float64 once a value is missing), and every
+region, channel or segment name is stored as a separate Python string in
+each row. A FrameSchema says how one query's columns should be stored
+instead, and the result backends build each column directly from the row
+values:
+
+- dimension columns (`categories`, DIMENSIONS by default) become
+  categoricals: one small integer code per row plus the distinct names
+- count columns (`counts`) are downcast to the smallest signed integer type
+  holding their range (float64 if any value is missing, as in pandas)
+- other numeric columns stay int64/float64
+- other text columns (dates included) use Arrow-backed strings when pyarrow
+  is installed
+
+Counts are kept signed so subtracting two of them can't wrap around; pandas
+and NumPy sums of small integer types accumulate in int64. Polars frames get
+the same categoricals and integer widths. Records already hold typed
+columns and ignore schemas.
+
+Queries without a schema (e.g. the consolidated and backfill queries, whose
+rows carry NULL dimensions that are tested with `is None` downstream) are
+built exactly as before.
+"""
+
+import importlib.util
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence, Tuple
+
+DIMENSIONS = ('region', 'channel_category', 'channel', 'segment', 'plan_tier')
+VISITOR_COUNTS = ('unique_visitors', 'new_visitors', 'pre_signup_visitors')
+
+_INT_TYPES = (('int8', 2 ** 7), ('int16', 2 ** 15), ('int32', 2 ** 31))
+
+
+@dataclass(frozen=True)
+class FrameSchema:
+    """How the columns of one query's result are stored"""
+
+    # Stored as categoricals
+    categories: Tuple[str, ...] = DIMENSIONS
+    # Whole-number columns (visitor, customer, signup counts), downcast to the smallest integer type
+    counts: Tuple[str, ...] = ()
+
+
+VISITOR_SCHEMA = FrameSchema(counts=VISITOR_COUNTS)
+REVENUE_SCHEMA = FrameSchema(counts=('customer_count',))
+CONVERSION_SCHEMA = FrameSchema(counts=('total_signups', 'total_new_subscriptions'))
+
+
+def smallest_int(low: int, high: int) -> str:
+    """Name of the narrowest signed integer type holding low..high"""
+    for name, limit in _INT_TYPES:
+        if -limit <= low and high < limit:
+            return name
+    return 'int64'
+
+
+def columns_from_rows(rows: Sequence[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """{column: values}, in the first row's column order"""
+    return {name: [row.get(name) for row in rows] for name in rows[0]}
+
+
+def columns_from_tuples(rows: Sequence[Sequence[Any]], columns: Sequence[str]) -> Dict[str, List[Any]]:
+    return {name: list(values) for name, values in zip(columns, zip(*rows))}
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _count_column(values: List[Any]):
+    """A count column as the narrowest integer array, or float64 if values are missing"""
+    import numpy as np
+
+    floats = np.asarray([np.nan if value is None else value for value in values], dtype=np.float64)
+    if len(floats) == 0 or np.isnan(floats).any() or not np.array_equal(floats, np.floor(floats)):
+        return floats
+    return floats.astype(smallest_int(int(floats.min()), int(floats.max())))
+
+
+def _string_dtype():
+    import pandas as pd
+    return pd.StringDtype('pyarrow') if importlib.util.find_spec('pyarrow') is not None else object
+
+
+def pandas_frame(columns: Dict[str, List[Any]], schema: FrameSchema):
+    """A pandas DataFrame built column by column according to schema"""
+    import numpy as np
+    import pandas as pd
+
+    data = {}
+    for name, values in columns.items():
+        present = [value for value in values if value is not None]
+        if name in schema.categories:
+            data[name] = pd.Categorical(values)
+        elif name in schema.counts:
+            data[name] = _count_column(values)
+        elif present and all(_is_number(value) for value in present):
+            whole = len(present) == len(values) and all(isinstance(value, int) for value in present)
+            data[name] = np.asarray(values if whole else [np.nan if v is None else v for v in values],
+                                    dtype=np.int64 if whole else np.float64)
+        elif present and all(isinstance(value, str) for value in present):
+            data[name] = pd.array(values, dtype=_string_dtype())
+        else:
+            data[name] = values
+    return pd.DataFrame(data)
+
+
+def polars_frame(columns: Dict[str, List[Any]], schema: FrameSchema):
+    """A Polars DataFrame with schema's categoricals and narrowed counts"""
+    import polars as pl
+
+    df = pl.DataFrame(columns, strict=False)
+    casts = [pl.col(name).cast(pl.Categorical) for name in schema.categories
+             if name in df.columns and df.schema[name] == pl.String]
+    for name in schema.counts:
+        if name in df.columns and df.schema[name].is_integer() and df[name].null_count() == 0 and len(df):
+            width = smallest_int(df[name].min(), df[name].max())
+            casts.append(pl.col(name).cast(getattr(pl, width.capitalize())))
+    return df.with_columns(casts) if casts else df
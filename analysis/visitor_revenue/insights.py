@@ -0,0 +1,303 @@
+"""
+Declarative insight rules, evaluated column-at-a-time.
+
+The analyzer describes its executive-summary insights as a list of
+InsightRule(result, kind, metric, comparison, threshold, template, ...).
+evaluate_insights pulls the columns a result set's rules need once,
+coerces them to float arrays, and evaluates every rule for that result with
+array operations - no iterrows, no per-row float() calls. Result sets may be
+pandas or Polars DataFrames, Records (typed columns, read without
+conversion) or lists of row dicts. Columns of DataFrames are NumPy arrays;
+Records select, rank and group with their own filter/top/group_sum, and row
+dicts run the same operations on plain Python lists, so evaluating either
+never imports NumPy.
+"""
+
+import operator
+import statistics
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from visitor_revenue.records import Records
+
+COMPARISONS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+}
+
+# kind -> what the rule computes (template fields in brackets)
+RULE_KINDS = {
+    'first': "the first row [row columns]",
+    'count': "rows matching the comparison [count]",
+    'top': "one line per matching row, optionally sorted by metric, at most n [row columns]",
+    'sum': "sum of metric [value]",
+    'mean': "mean of metric over the first `head` rows [value]",
+    'change': "mean of the first n rows minus mean of the next n [value, direction]",
+    'best_ratio': "group with the highest sum(metric) / sum(denominator) [group_by column, value]",
+    'top_share': "share (%) of metric held by the n largest groups [value]",
+}
+
+
+@dataclass(frozen=True)
+class InsightRule:
+    """One insight: which result set, what to compute, and how to phrase it"""
+    result: str
+    kind: str
+    template: str
+    metric: Optional[str] = None
+    comparison: Optional[str] = None
+    # Number, or 'median' / 'mean' of the metric column
+    threshold: Union[float, str, None] = None
+    n: Optional[int] = None
+    head: Optional[int] = None
+    sort: bool = True
+    group_by: Optional[str] = None
+    denominator: Optional[str] = None
+    # Skip the rule unless the result has at least this many rows
+    min_rows: int = 1
+    # For 'count': skip the rule when nothing matches
+    skip_if_zero: bool = False
+    labels: Tuple[str, str] = ('improving', 'declining')
+
+    def __post_init__(self):
+        if self.kind not in RULE_KINDS:
+            raise ValueError(f"Unknown insight rule kind: {self.kind}")
+        if self.comparison is not None and self.comparison not in COMPARISONS:
+            raise ValueError(f"Unknown comparison: {self.comparison}")
+
+
+class _Frame:
+    """Column access over a DataFrame, Records or a list of row dicts"""
+
+    def __init__(self, data):
+        self._data = data
+        self._is_records = isinstance(data, Records)
+        self.records: Optional[Records] = data if self._is_records else None
+        # pandas and Polars both hand out columns as Series with to_numpy()
+        self._is_dataframe = not self._is_records and hasattr(data, 'columns') and hasattr(data, 'shape')
+        self._is_polars = type(data).__module__.split('.')[0] == 'polars'
+        self._numeric: Dict[str, Any] = {}
+        self.length = len(data)
+
+    def numeric(self, name: str):
+        """Column as floats (converted once, then reused by every rule)"""
+        if name not in self._numeric:
+            if self._is_records:
+                # Already float storage: no conversion
+                self._numeric[name] = self._data.floats(name)
+            elif self._is_dataframe:
+                self._numeric[name] = _to_float_array(self._data[name].to_numpy())
+            else:
+                self._numeric[name] = _to_float_list([row.get(name) for row in self._data])
+        return self._numeric[name]
+
+    def labels(self, name: str) -> List[Any]:
+        if self._is_records:
+            return self._data.values(name)
+        if self._is_dataframe:
+            return self._data[name].to_list()
+        return [row.get(name) for row in self._data]
+
+    def group_sums(self, by: str, names: Sequence[str]) -> Tuple[List[Any], List[Sequence[float]]]:
+        """Distinct values of `by` (sorted) and per-value sums of each named column"""
+        if self._is_records:
+            grouped = self._data.group_sum(by, names)
+            return grouped.values(by), [grouped.floats(name) for name in names]
+        return _group_sums(self.labels(by), *(self.numeric(name) for name in names))
+
+    def row(self, index: int) -> Dict[str, Any]:
+        if self._is_polars:
+            return self._data.row(index, named=True)
+        if self._is_dataframe:
+            return self._data.iloc[index].to_dict()
+        return dict(self._data[index])
+
+
+def _numpy(vector):
+    """numpy if vector is a numpy array; plain sequences never import it"""
+    return sys.modules['numpy'] if type(vector).__module__ == 'numpy' else None
+
+
+def _to_float_array(values):
+    # Missing values become NaN: they fail every comparison and are skipped
+    # by sum/mean/median, as in pandas
+    np = sys.modules['numpy']
+    return np.asarray([np.nan if v is None else v for v in values], dtype=float)
+
+
+def _to_float_list(values) -> List[float]:
+    return [float('nan') if v is None else float(v) for v in values]
+
+
+def _present(vector) -> List[float]:
+    return [v for v in vector if v == v]
+
+
+def _mask(vector, comparison: str, threshold: float):
+    compare = COMPARISONS[comparison]
+    if _numpy(vector) is not None:
+        return compare(vector, threshold)
+    return [compare(v, threshold) for v in vector]
+
+
+def _indices(mask) -> List[int]:
+    np = _numpy(mask)
+    if np is not None:
+        return np.flatnonzero(mask).tolist()
+    return [i for i, m in enumerate(mask) if m]
+
+
+def _take(vector, indices: Sequence[int]):
+    if _numpy(vector) is not None:
+        return vector[list(indices)]
+    return [vector[i] for i in indices]
+
+
+def _descending(vector) -> List[int]:
+    """Positions of vector from largest to smallest value, ties in original order"""
+    np = _numpy(vector)
+    if np is not None:
+        return np.argsort(-vector, kind='stable').tolist()
+    return sorted(range(len(vector)), key=lambda i: -vector[i])
+
+
+def _sum(vector) -> float:
+    np = _numpy(vector)
+    return float(np.nansum(vector)) if np is not None else float(sum(_present(vector)))
+
+
+def _mean(vector) -> float:
+    np = _numpy(vector)
+    if np is not None:
+        present = vector[~np.isnan(vector)]
+        return float(present.mean()) if len(present) else float('nan')
+    present = _present(vector)
+    return sum(present) / len(present) if present else float('nan')
+
+
+def _median(vector) -> float:
+    np = _numpy(vector)
+    if np is not None:
+        present = vector[~np.isnan(vector)]
+        return float(np.median(present)) if len(present) else float('nan')
+    present = _present(vector)
+    return statistics.median(present) if present else float('nan')
+
+
+def _group_sums(keys: List[Any], *vectors) -> Tuple[List[Any], List[List[float]]]:
+    """Distinct keys (sorted, like a pandas groupby) and per-key sums of each vector"""
+    np = _numpy(vectors[0])
+    if np is not None:
+        uniques, inverse = np.unique(np.asarray(keys, dtype=object), return_inverse=True)
+        sums = [np.bincount(inverse, weights=np.nan_to_num(v), minlength=len(uniques)).tolist() for v in vectors]
+        return uniques.tolist(), sums
+
+    groups: Dict[Any, List[float]] = {}
+    for i, key in enumerate(keys):
+        totals = groups.setdefault(key, [0.0] * len(vectors))
+        for j, vector in enumerate(vectors):
+            if vector[i] == vector[i]:
+                totals[j] += vector[i]
+    ordered = sorted(groups)
+    return ordered, [[groups[key][j] for key in ordered] for j in range(len(vectors))]
+
+
+def _threshold(rule: InsightRule, vector) -> float:
+    if rule.threshold == 'median':
+        return _median(vector)
+    if rule.threshold == 'mean':
+        return _mean(vector)
+    return float(rule.threshold)
+
+
+def _evaluate(rule: InsightRule, frame: _Frame) -> List[str]:
+    if frame.length < rule.min_rows:
+        return []
+
+    if rule.kind == 'first':
+        return [rule.template.format(**frame.row(0))]
+
+    vector = frame.numeric(rule.metric)
+
+    if rule.kind in ('count', 'top') and frame.records is not None:
+        return _evaluate_records_selection(rule, frame.records, vector)
+
+    if rule.kind in ('count', 'top'):
+        indices = list(range(frame.length))
+        if rule.comparison is not None:
+            indices = _indices(_mask(vector, rule.comparison, _threshold(rule, vector)))
+        if rule.kind == 'count':
+            if rule.skip_if_zero and not indices:
+                return []
+            return [rule.template.format(count=len(indices))]
+        if rule.sort:
+            indices = [indices[i] for i in _descending(_take(vector, indices))]
+        return [rule.template.format(**frame.row(i)) for i in indices[:rule.n]]
+
+    if rule.kind == 'sum':
+        return [rule.template.format(value=_sum(vector))]
+
+    if rule.kind == 'mean':
+        head = rule.head or frame.length
+        return [rule.template.format(value=_mean(vector[:head]))]
+
+    if rule.kind == 'change':
+        n = rule.n or 1
+        if frame.length < 2 * n:
+            return []
+        value = _mean(vector[:n]) - _mean(vector[n:2 * n])
+        direction = rule.labels[0] if value > 0 else rule.labels[1]
+        return [rule.template.format(value=value, direction=direction)]
+
+    if rule.kind == 'best_ratio':
+        keys, (numerators, denominators) = frame.group_sums(rule.group_by, [rule.metric, rule.denominator])
+        ratios = [num / den if den else 0.0 for num, den in zip(numerators, denominators)]
+        best = max(range(len(keys)), key=lambda i: ratios[i])
+        return [rule.template.format(**{rule.group_by: keys[best], 'value': ratios[best]})]
+
+    if rule.kind == 'top_share':
+        _, (totals,) = frame.group_sums(rule.group_by, [rule.metric])
+        grand_total = sum(totals)
+        if not grand_total:
+            return []
+        top = sorted(totals, reverse=True)[:rule.n or 1]
+        return [rule.template.format(value=sum(top) / grand_total * 100)]
+
+    return []
+
+
+def _evaluate_records_selection(rule: InsightRule, records: Records, vector) -> List[str]:
+    """'count' and 'top' rules on Records"""
+    selected = records
+    if rule.comparison is not None:
+        compare, threshold = COMPARISONS[rule.comparison], _threshold(rule, vector)
+        selected = records.filter(rule.metric, lambda value: compare(value, threshold))
+    if rule.kind == 'count':
+        if rule.skip_if_zero and not selected:
+            return []
+        return [rule.template.format(count=len(selected))]
+    n = len(selected) if rule.n is None else rule.n
+    selected = selected.top(n, rule.metric) if rule.sort else selected.head(n)
+    return [rule.template.format(**dict(row)) for row in selected]
+
+
+def evaluate_insights(rules: Sequence[InsightRule], results: Dict[str, Any]) -> List[str]:
+    """Evaluate rules against result sets, in rule order.
+
+    Rules whose result set is missing or empty produce nothing, so a failed
+    analysis simply drops its insights.
+    """
+    frames: Dict[str, Optional[_Frame]] = {}
+    insights = []
+    for rule in rules:
+        if rule.result not in frames:
+            data = results.get(rule.result)
+            frames[rule.result] = _Frame(data) if data is not None and len(data) else None
+        frame = frames[rule.result]
+        if frame is not None:
+            insights.extend(_evaluate(rule, frame))
+    return insights
@@ -0,0 +1,436 @@
+"""
+Local Snowflake stand-in for running the analyzers without a warehouse.
+
+LocalSnowflake is a DuckDB database with an `analytics.webflow` schema
+holding synthetic versions of the four tables the analyzers read:
+
+- DAILY_MARKETING_VISITOR_DETAILS   (`rows` rows; the scale knob)
+- TOOL_PLAN_OBJECT_DAILY_CURRENT    (rows / 10)
+- FCT_USER_CREATED                  (rows / 20)
+- REPORT__GOOGLE_NEW_FIRST_SUBSCRIPTION_EVENT (rows / 100)
+
+Data is generated inside DuckDB from hashes of the row number, so a given
+(rows, seed) always produces the same tables and seeding 100M rows doesn't
+pass through Python. Dates run up to SYNTHETIC_END_DATE, not today, and
+analyzers given a LocalSnowflake analyze as of that date. stream() answers the analyzers' Snowflake SQL with a
+ResultStream built from the same frames cli-snowflake emits, so everything
+downstream of _open_stream (cache, chunked iteration, result parsing) runs
+unchanged.
+
+Column names come back as written in the query (lower-case aliases), not
+upper-cased the way Snowflake reports unquoted identifiers.
+
+EXPLAIN USING TABULAR is answered with synthetic micro-partition counts (see
+explain), so cost planning can be exercised locally; the numbers are not
+DuckDB's.
+
+Bulk unloads (see visitor_revenue.bulk_unload) work too: the user stage is
+a temporary directory, COPY INTO <stage> writes Parquet files there with
+DuckDB's own COPY, GET copies a staged file out and REMOVE deletes them.
+
+duckdb is only imported when a LocalSnowflake is created.
+"""
+
+import datetime
+import decimal
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from visitor_revenue.cost_planner import EXPLAIN_PREFIX
+from visitor_revenue.result_protocol import PROTOCOL_VERSION, Frame, ResultStream
+
+DEFAULT_ROWS = 10000
+# The synthetic data ends on this fixed date, so it doesn't move with the
+# clock: --local runs and the tests analyze as of it
+SYNTHETIC_END_DATE = '2026-10-15'
+# Dates are spread over this many days up to SYNTHETIC_END_DATE (the longest
+# analysis window is 90 days)
+SYNTHETIC_DAYS = 95
+
+REGIONS = ['United States', 'United Kingdom', 'Germany', 'France', 'India', 'Brazil', 'Canada',
+           'Australia', 'Japan', 'Netherlands', 'Spain', 'Mexico', 'Unknown']
+CHANNELS = [
+    ('Paid Search', 'google_ads'), ('Paid Search', 'bing_ads'), ('Organic Search', 'google'),
+    ('Organic Search', 'bing'), ('Direct', 'direct'), ('Referral', 'partner'), ('Referral', 'community'),
+    ('Social', 'linkedin'), ('Social', 'youtube'), ('Email', 'newsletter'), ('Display', 'programmatic'),
+]
+BUSINESS_CATEGORIES = ['Agency', 'Freelancer', 'In-house', 'Enterprise', 'Startup', 'Education', None]
+PLAN_TIERS = ['Starter', 'Basic', 'CMS', 'Business', 'Enterprise']
+
+_SCHEMA = """
+CREATE SCHEMA IF NOT EXISTS analytics.webflow;
+"""
+
+# {n}: rows in the table, {seed}: seed, {end_date}: SYNTHETIC_END_DATE, {days}: SYNTHETIC_DAYS,
+# {visitors}: distinct visitor ids, {users}: FCT_USER_CREATED rows. u(k) is a uniform [0, 1) draw per row and salt.
+_SEED_TABLES = {
+    'DAILY_MARKETING_VISITOR_DETAILS': """
+        CREATE OR REPLACE TABLE analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS AS
+        WITH draws AS (
+            SELECT
+                i,
+                -- Skewed picks: a few regions and channels carry most traffic
+                1 + floor(pow(u(i, 1), 2) * {n_regions})::INT AS region_idx,
+                1 + floor(pow(u(i, 2), 1.5) * {n_channels})::INT AS channel_idx,
+                u(i, 3) AS new_draw,
+                u(i, 4) AS signup_draw
+            FROM range({n}) t(i)
+        )
+        SELECT
+            (DATE '{end_date}' - (hash(i, {seed}, 5) % {days})::INT) AS DATE_DAY,
+            'v' || (hash(i, {seed}, 6) % {visitors})::VARCHAR AS ID_VISITOR,
+            NULLIF({regions}[region_idx], 'Unknown') AS CUSTOM_REGION,
+            {channel_categories}[channel_idx] AS DIM_CHANNEL_CATEGORY,
+            {channels}[channel_idx] AS DIM_CHANNEL,
+            new_draw < 0.35 AS IS_NEW_VISITOR,
+            -- Pre-signup share varies by channel and region
+            signup_draw < 0.02 + 0.006 * channel_idx + 0.003 * (region_idx % 5) AS IS_PRE_SIGNUP_VISITOR
+        FROM draws
+        """,
+    'TOOL_PLAN_OBJECT_DAILY_CURRENT': """
+        CREATE OR REPLACE TABLE analytics.webflow.TOOL_PLAN_OBJECT_DAILY_CURRENT AS
+        SELECT
+            'c' || (hash(i, {seed}, 7) % greatest({n} // 2, 1))::VARCHAR AS WF_CUSTOMER_ID,
+            {business_categories}[1 + floor(u(i, 8) * {n_business_categories})::INT] AS BUSINESS_CATEGORY,
+            {plan_tiers}[1 + floor(pow(u(i, 9), 2) * {n_plan_tiers})::INT] AS PLAN_OBJECT_TIER,
+            CASE WHEN u(i, 10) < 0.1 THEN 0 ELSE round(10 + pow(u(i, 11), 3) * 2000, 2) END AS MRR,
+            u(i, 12) < 0.15 AS IS_NEW_BUSINESS_MRR,
+            CASE WHEN u(i, 13) < 0.1 THEN round(u(i, 14) * 200, 2) ELSE 0 END AS EXPANSION_MRR,
+            CASE WHEN u(i, 15) < 0.05 THEN round(u(i, 16) * 100, 2) ELSE 0 END AS CONTRACTION_MRR,
+            CASE WHEN u(i, 17) < 0.03 THEN round(u(i, 18) * 150, 2) ELSE 0 END AS CHURNED_MRR
+        FROM range({n}) t(i)
+        """,
+    'FCT_USER_CREATED': """
+        CREATE OR REPLACE TABLE analytics.webflow.FCT_USER_CREATED AS
+        SELECT
+            'u' || i::VARCHAR AS USER_ID,
+            DATE '{end_date}'::TIMESTAMP - to_seconds((hash(i, {seed}, 19) % ({days} * 86400))::BIGINT) AS TIMESTAMP
+        FROM range({n}) t(i)
+        """,
+    'REPORT__GOOGLE_NEW_FIRST_SUBSCRIPTION_EVENT': """
+        CREATE OR REPLACE TABLE analytics.webflow.REPORT__GOOGLE_NEW_FIRST_SUBSCRIPTION_EVENT AS
+        SELECT
+            'u' || (hash(i, {seed}, 20) % {users})::VARCHAR AS USER_ID,
+            DATE '{end_date}'::TIMESTAMP - to_seconds((hash(i, {seed}, 21) % ({days} * 86400))::BIGINT) AS CREATED_AT,
+            round(14 + pow(u(i, 22), 2) * 400, 2) AS MRR
+        FROM range({n}) t(i)
+        """,
+}
+
+# Table -> rows relative to DAILY_MARKETING_VISITOR_DETAILS, and a floor
+_TABLE_SCALE = {
+    'DAILY_MARKETING_VISITOR_DETAILS': (1, 1),
+    'TOOL_PLAN_OBJECT_DAILY_CURRENT': (10, 1000),
+    'FCT_USER_CREATED': (20, 1000),
+    'REPORT__GOOGLE_NEW_FIRST_SUBSCRIPTION_EVENT': (100, 100),
+}
+
+# Synthetic micro-partitions for EXPLAIN: rows per partition, stored bytes per value
+LOCAL_PARTITION_ROWS = 50000
+LOCAL_VALUE_BYTES = 8
+# Tables loaded in date order, so date predicates prune their partitions
+_DATE_CLUSTERED = ('DAILY_MARKETING_VISITOR_DETAILS', 'FCT_USER_CREATED', 'REPORT__GOOGLE_NEW_FIRST_SUBSCRIPTION_EVENT')
+_TABLE_NAME = re.compile(r'\banalytics\.webflow\.(\w+)', re.IGNORECASE)
+_DATE_LITERAL = re.compile(r"'(\d{4}-\d{2}-\d{2})'")
+_EXPLAIN_COLUMNS = ('step', 'id', 'parent', 'operation', 'objects', 'alias', 'expressions',
+                    'partitionsTotal', 'partitionsAssigned', 'bytesAssigned')
+
+# Stage statements issued by bulk_unload, against the user stage (@~)
+_COPY_INTO = re.compile(r"^COPY INTO @~/(\S+) FROM \((.*)\) FILE_FORMAT = .*?MAX_FILE_SIZE = (\d+)",
+                        re.IGNORECASE | re.DOTALL)
+_GET = re.compile(r"^GET @~/(\S+) 'file://(.*)'$", re.IGNORECASE)
+_REMOVE = re.compile(r"^REMOVE @~/(\S+)$", re.IGNORECASE)
+
+_DATEADD = re.compile(r'\bDATEADD\(\s*(day|week|month|year)s?\s*,', re.IGNORECASE)
+_HLL_EXPORT = re.compile(r'\bHLL_EXPORT\(\s*HLL_ACCUMULATE\(([^()]*)\)\s*\)', re.IGNORECASE)
+
+# Translated DATEADD (date arguments only, which is all the analyzers use)
+_MACROS = """
+CREATE OR REPLACE MACRO sf_dateadd(unit, n, d) AS CAST(d + CASE lower(unit)
+    WHEN 'day' THEN to_days(CAST(n AS INTEGER))
+    WHEN 'week' THEN to_days(CAST(7 * n AS INTEGER))
+    WHEN 'month' THEN to_months(CAST(n AS INTEGER))
+    ELSE to_years(CAST(n AS INTEGER)) END AS DATE);
+CREATE OR REPLACE MACRO u(i, salt) AS (hash(i, {seed}, salt) % 1000000) / 1000000.0;
+"""
+
+# HLL_EXPORT(HLL_ACCUMULATE(x)) over a list of the group's values, in
+# Snowflake's sparse export format (precision 12, see visitor_revenue.hll):
+# the top 12 bits of DuckDB's 64-bit hash pick the register, the position of
+# the first set bit in the other 52 is the register value
+_HLL_MACRO = """
+CREATE OR REPLACE MACRO sf_hll_export(vals) AS (
+    SELECT '{"version":4,"precision":12,"sparse":{"indices":['
+        || COALESCE(string_agg(idx::VARCHAR, ',' ORDER BY idx), '')
+        || '],"maxLzCounts":[' || COALESCE(string_agg(rho::VARCHAR, ',' ORDER BY idx), '') || ']}}'
+    FROM (
+        SELECT idx, max(rho) AS rho
+        FROM (
+            SELECT
+                (h >> 52)::INTEGER AS idx,
+                CASE WHEN h & 4503599627370495 = 0 THEN 53
+                     ELSE 52 - floor(log2((h & 4503599627370495)::DOUBLE))::INTEGER END AS rho
+            FROM (SELECT hash(v) AS h FROM unnest(vals) AS t(v) WHERE v IS NOT NULL)
+        )
+        GROUP BY idx
+    )
+);
+"""
+
+
+def translate_sql(query: str) -> str:
+    """Rewrite the Snowflake-only syntax the analyzers use into DuckDB SQL"""
+    query = _DATEADD.sub(lambda m: f"sf_dateadd('{m.group(1).lower()}',", query)
+    return _HLL_EXPORT.sub(lambda m: f"sf_hll_export(list({m.group(1)}))", query)
+
+
+def table_rows(rows: int) -> dict:
+    """Row count of every synthetic table at the given scale"""
+    return {table: max(rows // divisor, floor) for table, (divisor, floor) in _TABLE_SCALE.items()}
+
+
+def _sql_list(values) -> str:
+    return '[' + ', '.join('NULL' if v is None else "'" + v.replace("'", "''") + "'" for v in values) + ']'
+
+
+def _wire_value(value):
+    """Values as they arrive from cli-snowflake's JSON frames"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return value
+
+
+def _row_frames(columns, rows: List[Dict], elapsed_ms: int) -> Iterator[Frame]:
+    """Frames of a synthetic result (row dicts with the given columns)"""
+    yield {'frame': 'header', 'protocol': PROTOCOL_VERSION, 'elapsed_ms': elapsed_ms,
+           'columns': [{'name': column, 'type': 'VARCHAR', 'nullable': True} for column in columns]}
+    for row in rows:
+        yield [row[column] for column in columns]
+    yield {'frame': 'trailer', 'row_count': len(rows), 'query_id': None}
+
+
+class LocalSnowflake:
+    """DuckDB-backed stand-in for the analyzers' Snowflake tables"""
+
+    def __init__(self, rows: int = DEFAULT_ROWS, seed: int = 0, database: Optional[str] = None,
+                 threads: Optional[int] = None):
+        import duckdb
+
+        self.rows = rows
+        self.seed = seed
+        self.database = database
+        self.seed_seconds: Optional[float] = None
+        self._conn = duckdb.connect()
+        if threads:
+            self._conn.execute(f"SET threads = {int(threads)}")
+        if database:
+            os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        target = database or ':memory:'
+        self._conn.execute(f"ATTACH '{target}' AS analytics")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute(_MACROS.format(seed=int(seed)))
+        self._conn.execute(_HLL_MACRO)
+        self._lock = threading.Lock()
+        self._error = duckdb.Error
+        # The user stage bulk unloads write to
+        self.stage_dir = tempfile.mkdtemp(prefix='local_stage_')
+
+        if not self._is_seeded():
+            self.seed_tables()
+
+    def _is_seeded(self) -> bool:
+        """A persistent database is reused when it holds the same data at this scale"""
+        try:
+            row = self._conn.execute(
+                "SELECT rows, seed, end_date FROM analytics.webflow._synthetic_meta"
+            ).fetchone()
+        except self._error:
+            # New database, or one seeded before the end date was fixed
+            return False
+        return row == (self.rows, self.seed, datetime.date.fromisoformat(SYNTHETIC_END_DATE))
+
+    def seed_tables(self):
+        """(Re)generate all synthetic tables at the configured scale"""
+        started = time.perf_counter()
+        counts = table_rows(self.rows)
+        params = {
+            'seed': int(self.seed),
+            'end_date': SYNTHETIC_END_DATE,
+            'days': SYNTHETIC_DAYS,
+            # Visitors return on ~3 days each; user ids are shared with subscriptions
+            'visitors': max(self.rows // 3, 1),
+            'users': counts['FCT_USER_CREATED'],
+            'regions': _sql_list(REGIONS),
+            'n_regions': len(REGIONS),
+            'channel_categories': _sql_list(category for category, _ in CHANNELS),
+            'channels': _sql_list(channel for _, channel in CHANNELS),
+            'n_channels': len(CHANNELS),
+            'business_categories': _sql_list(BUSINESS_CATEGORIES),
+            'n_business_categories': len(BUSINESS_CATEGORIES),
+            'plan_tiers': _sql_list(PLAN_TIERS),
+            'n_plan_tiers': len(PLAN_TIERS),
+        }
+        for table, sql in _SEED_TABLES.items():
+            self._conn.execute(sql.format(n=counts[table], **params))
+        self._conn.execute("CREATE OR REPLACE TABLE analytics.webflow._synthetic_meta "
+                           "(rows BIGINT, seed BIGINT, end_date DATE)")
+        self._conn.execute("INSERT INTO analytics.webflow._synthetic_meta VALUES (?, ?, ?)",
+                           [self.rows, self.seed, datetime.date.fromisoformat(SYNTHETIC_END_DATE)])
+        self.seed_seconds = time.perf_counter() - started
+
+    def explain(self, query: str) -> List[Dict]:
+        """Snowflake-style EXPLAIN USING TABULAR rows with synthetic partition counts.
+
+        Each table is cut into LOCAL_PARTITION_ROWS-row partitions of
+        LOCAL_VALUE_BYTES per value. Date-clustered tables are pruned to the
+        share of their SYNTHETIC_DAYS that the query's date literals span, the
+        way Snowflake prunes on partition min/max.
+        """
+        counts = table_rows(self.rows)
+        with self._lock:
+            widths = dict(self._conn.execute(
+                "SELECT upper(table_name), count(*) FROM duckdb_columns() "
+                "WHERE database_name = 'analytics' AND schema_name = 'webflow' GROUP BY 1"
+            ).fetchall())
+        dates = sorted({datetime.date.fromisoformat(d) for d in _DATE_LITERAL.findall(query)})
+        share = 1.0
+        if len(dates) >= 2:
+            share = min(1.0, ((dates[-1] - dates[0]).days + 1) / SYNTHETIC_DAYS)
+
+        scans = []
+        for table in dict.fromkeys(name.upper() for name in _TABLE_NAME.findall(query)):
+            if table not in counts:
+                continue
+            total = math.ceil(counts[table] / LOCAL_PARTITION_ROWS)
+            assigned = max(1, math.ceil(total * share)) if table in _DATE_CLUSTERED else total
+            rows_assigned = min(counts[table], assigned * LOCAL_PARTITION_ROWS)
+            scans.append({'step': 1, 'id': len(scans) + 1, 'parent': 0, 'operation': 'TableScan',
+                          'objects': f"ANALYTICS.WEBFLOW.{table}", 'alias': None, 'expressions': None,
+                          'partitionsTotal': total, 'partitionsAssigned': assigned,
+                          'bytesAssigned': rows_assigned * widths.get(table, 1) * LOCAL_VALUE_BYTES})
+        stats = {'step': None, 'id': None, 'parent': None, 'operation': 'GlobalStats', 'objects': None,
+                 'alias': None, 'expressions': None}
+        for column in ('partitionsTotal', 'partitionsAssigned', 'bytesAssigned'):
+            stats[column] = sum(scan[column] for scan in scans)
+        return [stats] + scans
+
+    def query(self, query: str) -> List[Dict]:
+        """Run a query and return all of its rows"""
+        return self.stream(query).to_dicts()
+
+    def stream(self, query: str) -> ResultStream:
+        """Run Snowflake SQL locally; rows are fetched lazily as the stream is read"""
+        cursors = []
+
+        def cancel():
+            for cursor in cursors:
+                cursor.interrupt()
+
+        return ResultStream(self._frames(query, cursors), cancel=cancel)
+
+    def _frames(self, query: str, cursors: List) -> Iterator[Frame]:
+        if query.upper().startswith(EXPLAIN_PREFIX):
+            yield from self._explain_frames(query[len(EXPLAIN_PREFIX):])
+            return
+        for pattern, statement in ((_COPY_INTO, self._copy_into), (_GET, self._get), (_REMOVE, self._remove)):
+            match = pattern.match(query)
+            if match:
+                yield from self._statement_frames(statement, match)
+                return
+        # One cursor per query so concurrent analysis steps don't share state
+        with self._lock:
+            cursor = self._conn.cursor()
+        cursors.append(cursor)
+        try:
+            started = time.perf_counter()
+            try:
+                cursor.execute(translate_sql(query))
+            except self._error as e:
+                yield {'frame': 'error', 'message': str(e)}
+                return
+
+            description = cursor.description or []
+            yield {
+                'frame': 'header',
+                'protocol': PROTOCOL_VERSION,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000),
+                'columns': [{'name': column[0], 'type': str(column[1]), 'nullable': True}
+                            for column in description],
+            }
+
+            row_count = 0
+            while True:
+                batch = cursor.fetchmany(10000)
+                if not batch:
+                    break
+                for row in batch:
+                    yield [_wire_value(value) for value in row]
+                row_count += len(batch)
+            yield {'frame': 'trailer', 'row_count': row_count, 'query_id': None}
+        finally:
+            cursor.close()
+
+    def _explain_frames(self, query: str) -> Iterator[Frame]:
+        yield from _row_frames(_EXPLAIN_COLUMNS, self.explain(query), 0)
+
+    def _statement_frames(self, statement, match) -> Iterator[Frame]:
+        started = time.perf_counter()
+        try:
+            columns, rows = statement(*match.groups())
+        except (self._error, OSError) as e:
+            yield {'frame': 'error', 'message': str(e)}
+            return
+        yield from _row_frames(columns, rows, round((time.perf_counter() - started) * 1000))
+
+    def _stage_path(self, path: str) -> str:
+        return os.path.join(self.stage_dir, path.strip('/'))
+
+    def _copy_into(self, location: str, query: str, max_file_size: str):
+        """COPY INTO @~/location FROM (query): Parquet files and their sizes and row counts"""
+        target = self._stage_path(location)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with self._lock:
+            cursor = self._conn.cursor()
+        try:
+            cursor.execute(f"COPY ({translate_sql(query)}) TO '{target}' "
+                           f"(FORMAT PARQUET, COMPRESSION SNAPPY, FILE_SIZE_BYTES {int(max_file_size)})")
+            files = cursor.execute(f"SELECT file_name, num_rows FROM parquet_file_metadata('{target}/*.parquet') "
+                                   f"ORDER BY file_name").fetchall()
+        finally:
+            cursor.close()
+        return ('FILE_NAME', 'FILE_SIZE', 'ROW_COUNT'), [
+            {'FILE_NAME': os.path.basename(path), 'FILE_SIZE': os.path.getsize(path), 'ROW_COUNT': rows}
+            for path, rows in files]
+
+    def _get(self, staged_file: str, directory: str):
+        """GET @~/staged_file 'file://directory/'"""
+        path = self._stage_path(staged_file)
+        shutil.copyfile(path, os.path.join(directory, os.path.basename(path)))
+        return ('file', 'size', 'status', 'message'), [
+            {'file': os.path.basename(path), 'size': os.path.getsize(path), 'status': 'DOWNLOADED', 'message': ''}]
+
+    def _remove(self, location: str):
+        """REMOVE @~/location: every staged file under it"""
+        path = self._stage_path(location)
+        removed = sorted(os.listdir(path)) if os.path.isdir(path) else []
+        shutil.rmtree(path, ignore_errors=True)
+        return ('name', 'result'), [{'name': f"{location.rstrip('/')}/{name}", 'result': 'removed'}
+                                      for name in removed]
+
+    def close(self):
+        self._conn.close()
+        shutil.rmtree(self.stage_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
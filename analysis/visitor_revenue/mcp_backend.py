@@ -0,0 +1,412 @@
+"""
+Snowflake queries through a pool of MCP sessions.
+
+The Snowflake MCP server (`mcp-server-snowflake`, see
+packages/core/tests/snowflake/test-snowflake-mcp-simple.py) exposes a
+`query_run_query` tool. MCPQueryPool keeps a few initialized ClientSessions
+to it open for the whole run, on a background event loop, so synchronous
+callers (including the analyzers' worker threads) can submit queries
+without starting and authenticating a server per query:
+
+- each call goes to the live session with the fewest calls in flight, and
+  a session carries any number of concurrent calls (JSON-RPC multiplexing)
+- a session whose transport fails (or that stops answering pings) is torn
+  down and restarted with backoff; the failed call, and any other call in
+  flight on it, is retried once on another session (queries are reads)
+- tool errors (bad SQL, permissions) are raised as SnowflakeQueryError and
+  leave the session alone
+
+Each session runs in its own long-lived task, because the stdio transport's
+task group must be entered and exited by the same task.
+
+The mcp package and asyncio are only imported when a pool is used.
+"""
+
+import concurrent.futures
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+from visitor_revenue.errors import SnowflakeQueryError
+from visitor_revenue.result_protocol import PROTOCOL_VERSION, Frame, ProtocolError, ResultStream
+from visitor_revenue.snowflake_client import PROJECT_ROOT
+
+if TYPE_CHECKING:
+    import asyncio
+
+DEFAULT_TOOL = 'query_run_query'
+DEFAULT_POOL_SIZE = 2
+DEFAULT_CONFIG_PATH = os.path.join(PROJECT_ROOT, 'snowflake-mcp', 'test-config.yaml')
+# Seconds between restarts of a failing session, doubling up to the maximum
+RESTART_BACKOFF = 1.0
+MAX_RESTART_BACKOFF = 30.0
+# Idle sessions are pinged this often so a dead server is noticed before a query hits it
+HEALTH_CHECK_INTERVAL = 30.0
+
+_SNOWFLAKE_ENV = ('SNOWFLAKE_ACCOUNT', 'SNOWFLAKE_USER', 'SNOWFLAKE_DATABASE', 'SNOWFLAKE_WAREHOUSE',
+                  'SNOWFLAKE_AUTHENTICATOR')
+
+
+def snowflake_server_params(config_path: Optional[str] = None):
+    """StdioServerParameters for `uv run mcp-server-snowflake <config>`"""
+    from mcp import StdioServerParameters
+
+    config_path = config_path or os.environ.get('SNOWFLAKE_MCP_CONFIG', DEFAULT_CONFIG_PATH)
+    env = dict(os.environ)
+    env.update({name: os.environ[name] for name in _SNOWFLAKE_ENV if name in os.environ})
+    return StdioServerParameters(command='uv', args=['run', 'mcp-server-snowflake', config_path], env=env)
+
+
+def _payload_rows(payload: Any) -> List[Dict]:
+    if isinstance(payload, str):
+        # Tools that serialize their own rows return them as a JSON string
+        try:
+            payload = json.loads(payload)
+        except json.JSONDecodeError as e:
+            raise ProtocolError(f"{DEFAULT_TOOL} returned non-JSON content: {e}")
+    if isinstance(payload, list):
+        if all(isinstance(row, dict) for row in payload):
+            return payload
+    elif isinstance(payload, dict):
+        for key in ('result', 'results', 'rows', 'data'):
+            if key in payload:
+                return _payload_rows(payload[key])
+    raise ProtocolError(f"Unrecognized {DEFAULT_TOOL} result: {str(payload)[:80]}")
+
+
+def parse_tool_result(result) -> List[Dict]:
+    """Row dicts from a CallToolResult; raises SnowflakeQueryError for tool errors"""
+    texts = [item.text for item in result.content if getattr(item, 'type', None) == 'text']
+    if getattr(result, 'isError', False):
+        raise SnowflakeQueryError(' '.join(texts) or "MCP tool call failed")
+
+    structured = getattr(result, 'structuredContent', None)
+    if structured is not None:
+        return _payload_rows(structured)
+    if not texts:
+        return []
+    if len(texts) == 1:
+        return _payload_rows(texts[0])
+    # Older FastMCP returns a list result as one text item per element
+    return _payload_rows([json.loads(text) for text in texts])
+
+
+def _row_frames(rows: List[Dict]) -> Iterator[Frame]:
+    names = list(rows[0].keys()) if rows else []
+    yield {'frame': 'header', 'protocol': PROTOCOL_VERSION,
+           'columns': [{'name': name, 'type': None} for name in names]}
+    for row in rows:
+        yield [row.get(name) for name in names]
+    yield {'frame': 'trailer', 'row_count': len(rows), 'query_id': None}
+
+
+def rows_to_stream(rows: List[Dict]) -> ResultStream:
+    """Wrap already-fetched row dicts as a ResultStream"""
+    return ResultStream(_row_frames(rows))
+
+
+class _PooledSession:
+    """One MCP server process and its ClientSession, restarted when it dies"""
+
+    def __init__(self, pool: 'MCPQueryPool', index: int):
+        self.pool = pool
+        self.index = index
+        self.session = None
+        self.in_flight = 0
+        self.calls = 0
+        self.restarts = 0
+        # Seconds spent launching and initializing each incarnation
+        self.init_seconds: List[float] = []
+        self.last_error: Optional[BaseException] = None
+        # Set when the current incarnation is to be torn down or has ended
+        self._dead: Optional['asyncio.Event'] = None
+
+    def mark_dead(self, error: BaseException):
+        self.last_error = error
+        self.session = None
+        if self._dead is not None:
+            self._dead.set()
+
+    async def _health_check(self, session):
+        """Return (ending the session) once the server stops answering pings"""
+        import asyncio
+
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            try:
+                await asyncio.wait_for(session.send_ping(), HEALTH_CHECK_INTERVAL)
+            except Exception as e:
+                self.last_error = e
+                return
+
+    async def run(self):
+        import asyncio
+        from mcp import ClientSession
+        from mcp.client.stdio import stdio_client
+
+        pool = self.pool
+        backoff = RESTART_BACKOFF
+        while not pool._closing.is_set():
+            self._dead = asyncio.Event()
+            try:
+                started = time.perf_counter()
+                async with stdio_client(pool.server) as (read, write):
+                    async with ClientSession(read, write) as session:
+                        await session.initialize()
+                        self.init_seconds.append(time.perf_counter() - started)
+                        self.session = session
+                        backoff = RESTART_BACKOFF
+                        await pool._notify_ready()
+                        await _first_of(pool._closing.wait(), self._dead.wait(), self._health_check(session))
+            except Exception as e:
+                self.last_error = e
+            finally:
+                self.session = None
+                # Fail calls still waiting on this incarnation (see call_tool)
+                self._dead.set()
+
+            if pool._closing.is_set():
+                break
+            self.restarts += 1
+            try:
+                await asyncio.wait_for(pool._closing.wait(), backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, MAX_RESTART_BACKOFF)
+
+
+    async def call_tool(self, session, tool: str, arguments: Dict[str, Any]):
+        """session.call_tool, raising ConnectionError if the session ends first.
+
+        A ClientSession that is torn down leaves its pending requests waiting
+        forever; watching the incarnation's _dead event turns that into a
+        transport failure the caller retries on another session.
+        """
+        import asyncio
+
+        dead = self._dead
+        call = asyncio.ensure_future(session.call_tool(tool, arguments=arguments))
+        watch = asyncio.ensure_future(dead.wait())
+        try:
+            done, _ = await asyncio.wait([call, watch], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watch.cancel()
+            if not call.done():
+                call.cancel()
+        if call not in done:
+            raise ConnectionError(f"MCP session {self.index} ended mid-call: {self.last_error!r}")
+        return call.result()
+
+
+async def _first_of(*awaitables):
+    import asyncio
+
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class MCPQueryPool:
+    """Pool of MCP sessions serving `query_run_query` to synchronous callers"""
+
+    def __init__(self, server=None, size: int = DEFAULT_POOL_SIZE, tool: str = DEFAULT_TOOL,
+                 query_argument: str = 'query', call_timeout: Optional[float] = None,
+                 start_timeout: Optional[float] = 300.0):
+        # None: the Snowflake MCP server (built when the pool starts)
+        self.server = server
+        self.size = max(1, size)
+        self.tool = tool
+        self.query_argument = query_argument
+        self.call_timeout = call_timeout
+        # SSO login in the first session can take a while
+        self.start_timeout = start_timeout
+        self.sessions: List[_PooledSession] = []
+        self._loop: Optional['asyncio.AbstractEventLoop'] = None
+        self._thread: Optional[threading.Thread] = None
+        self._tasks: List['asyncio.Task'] = []
+        self._closing: Optional['asyncio.Event'] = None
+        self._ready: Optional['asyncio.Condition'] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the event loop and sessions; block until one session is ready"""
+        import asyncio
+
+        with self._lock:
+            if self._loop is not None:
+                return
+            if self.server is None:
+                self.server = snowflake_server_params()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name='mcp-query-pool', daemon=True)
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._start_sessions(), self._loop).result()
+
+        try:
+            self._submit(self._wait_ready(self.start_timeout))
+        except Exception:
+            self.close()
+            raise
+
+    def is_running(self) -> bool:
+        return self._loop is not None
+
+    def query(self, query: str) -> List[Dict]:
+        """Run a query on the least busy live session and return its rows"""
+        if not self.is_running():
+            self.start()
+        return self._submit(self._call(query))
+
+    def stream(self, query: str) -> ResultStream:
+        """The query's rows as a ResultStream; the call is made when the stream is first read.
+
+        Cancelling the stream cancels the tool call (the session stays up).
+        """
+        import asyncio
+
+        lock = threading.Lock()
+        call: Dict[str, Any] = {'future': None, 'cancelled': False}
+
+        def frames() -> Iterator[Frame]:
+            if not self.is_running():
+                self.start()
+            with lock:
+                if call['cancelled']:
+                    raise SnowflakeQueryError(f"{self.tool} call cancelled")
+                call['future'] = asyncio.run_coroutine_threadsafe(self._call(query), self._loop)
+            try:
+                rows = call['future'].result()
+            except concurrent.futures.CancelledError:
+                raise SnowflakeQueryError(f"{self.tool} call cancelled")
+            yield from _row_frames(rows)
+
+        def cancel():
+            with lock:
+                call['cancelled'] = True
+                future = call['future']
+            if future is not None:
+                future.cancel()
+
+        return ResultStream(frames(), cancel=cancel)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-session call counts, restarts and initialization times"""
+        return {
+            'sessions': [
+                {'index': s.index, 'live': s.session is not None, 'calls': s.calls, 'in_flight': s.in_flight,
+                 'restarts': s.restarts, 'init_seconds': list(s.init_seconds),
+                 'last_error': repr(s.last_error) if s.last_error else None}
+                for s in self.sessions
+            ],
+        }
+
+    def close(self):
+        """Shut down every session and the event loop"""
+        import asyncio
+
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=30)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+        loop.close()
+
+    def _submit(self, coroutine):
+        import asyncio
+
+        loop = self._loop
+        if loop is None:
+            coroutine.close()
+            raise SnowflakeQueryError("MCP query pool is closed")
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    async def _start_sessions(self):
+        import asyncio
+
+        self._closing = asyncio.Event()
+        self._ready = asyncio.Condition()
+        self.sessions = [_PooledSession(self, index) for index in range(self.size)]
+        self._tasks = [asyncio.ensure_future(session.run()) for session in self.sessions]
+
+    async def _notify_ready(self):
+        async with self._ready:
+            self._ready.notify_all()
+
+    def _live(self) -> List[_PooledSession]:
+        return [session for session in self.sessions if session.session is not None]
+
+    async def _wait_ready(self, timeout: Optional[float]):
+        import asyncio
+
+        async with self._ready:
+            try:
+                await asyncio.wait_for(self._ready.wait_for(lambda: bool(self._live())), timeout)
+            except asyncio.TimeoutError:
+                errors = [repr(s.last_error) for s in self.sessions if s.last_error]
+                raise SnowflakeQueryError(
+                    f"No MCP session became ready within {timeout}s"
+                    + (f" (last error: {errors[-1]})" if errors else "")
+                )
+
+    async def _acquire(self) -> _PooledSession:
+        # The session that woke us may die again before we pick it: wait again
+        # (_wait_ready raises once no session comes back within start_timeout)
+        while True:
+            live = self._live()
+            if live:
+                return min(live, key=lambda s: s.in_flight)
+            await self._wait_ready(self.start_timeout)
+
+    async def _call(self, query: str) -> List[Dict]:
+        import asyncio
+        from mcp.shared.exceptions import McpError
+        from mcp.types import CONNECTION_CLOSED
+
+        for attempt in range(2):
+            pooled = await self._acquire()
+            session = pooled.session
+            pooled.in_flight += 1
+            pooled.calls += 1
+            try:
+                result = await asyncio.wait_for(
+                    pooled.call_tool(session, self.tool, {self.query_argument: query}),
+                    self.call_timeout,
+                )
+            except asyncio.TimeoutError:
+                raise SnowflakeQueryError(f"{self.tool} did not answer within {self.call_timeout}s")
+            except Exception as e:
+                if isinstance(e, McpError) and e.error.code != CONNECTION_CLOSED:
+                    # The server answered with a JSON-RPC error: the session is fine
+                    raise SnowflakeQueryError(str(e))
+                # Transport failure: restart the session and retry elsewhere once
+                pooled.mark_dead(e)
+                if attempt:
+                    raise SnowflakeQueryError(f"MCP session failed: {e!r}")
+                continue
+            finally:
+                pooled.in_flight -= 1
+            return parse_tool_result(result)
+
+    async def _shutdown(self):
+        import asyncio
+
+        self._closing.set()
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=20)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
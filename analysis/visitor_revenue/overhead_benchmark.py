@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Per-query overhead benchmark: spawn-per-query vs persistent Snowflake worker
+
+Runs the six queries issued by run_full_analysis through both transports and
+prints wall time per query. For the worker, the warehouse execution time
+reported by cli-snowflake is subtracted to isolate transport overhead.
+
+Usage (from analysis/):
+    python -m visitor_revenue.overhead_benchmark [--repeat 3]
+"""
+
+import argparse
+import statistics
+import time
+from typing import List, Tuple
+
+from visitor_revenue.snowflake_client import SnowflakeWorker, run_query_subprocess
+
+
+def collect_full_analysis_queries() -> List[Tuple[str, str]]:
+    """Capture (description, sql) for every query run_full_analysis issues"""
+    from visitor_revenue_analysis import WebflowVisitorRevenueAnalyzer
+
+    captured = []
+
+    class _RecordingAnalyzer(WebflowVisitorRevenueAnalyzer):
+        def execute_snowflake_query(self, query: str, description: str = "", schema=None):
+            captured.append((description, query))
+            return self.result_backend.frame([])
+
+    analyzer = _RecordingAnalyzer(result_backend='records')
+    for _, method in analyzer.ANALYSIS_STEPS:
+        getattr(analyzer, method)()
+    return captured
+
+
+def time_spawn(query: str) -> float:
+    started = time.perf_counter()
+    run_query_subprocess(query)
+    return time.perf_counter() - started
+
+
+def time_worker(worker: SnowflakeWorker, query: str) -> Tuple[float, float]:
+    """Return (wall seconds, warehouse seconds) for one worker round trip"""
+    started = time.perf_counter()
+    stream = worker.submit(query)
+    stream.to_dicts()
+    wall = time.perf_counter() - started
+    return wall, stream.header.get('elapsed_ms', 0) / 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per query per transport (median is reported)")
+    args = parser.parse_args()
+
+    queries = collect_full_analysis_queries()
+
+    print("Starting persistent worker...")
+    started = time.perf_counter()
+    worker = SnowflakeWorker()
+    worker.start()
+    startup = time.perf_counter() - started
+    print(f"Worker startup (Node + tsx + login): {startup:.2f}s (connect {worker.connect_ms} ms)")
+
+    rows = []
+    try:
+        for description, query in queries:
+            spawn = statistics.median(time_spawn(query) for _ in range(args.repeat))
+            samples = [time_worker(worker, query) for _ in range(args.repeat)]
+            worker_wall = statistics.median(s[0] for s in samples)
+            warehouse = statistics.median(s[1] for s in samples)
+            rows.append((description, spawn, worker_wall, warehouse))
+    finally:
+        worker.close()
+
+    print(f"\n{'Query':<52} {'spawn':>8} {'worker':>8} {'exec':>8} {'spawn ovh':>10} {'worker ovh':>10}")
+    print("-" * 100)
+    for description, spawn, worker_wall, warehouse in rows:
+        print(f"{description[:52]:<52} {spawn:>7.2f}s {worker_wall:>7.2f}s {warehouse:>7.2f}s "
+              f"{spawn - warehouse:>9.2f}s {worker_wall - warehouse:>9.2f}s")
+
+    total_spawn = sum(r[1] for r in rows)
+    total_worker = sum(r[2] for r in rows) + startup
+    print("-" * 100)
+    print(f"Six-query total: spawn {total_spawn:.2f}s vs worker {total_worker:.2f}s (including worker startup)")
+
+
+if __name__ == "__main__":
+    main()
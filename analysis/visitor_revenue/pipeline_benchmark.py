@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmark against the local Snowflake stand-in
+
+Seeds a LocalSnowflake at each requested scale and runs run_full_analysis
+on it, timing every stage: table seeding, each analysis step, insight
+generation and result writing. No warehouse or SSO is involved, so results
+are comparable between runs on the same machine.
+
+Usage (from analysis/):
+    python -m visitor_revenue.pipeline_benchmark --scales 10k 1M 100M
+    python -m visitor_revenue.pipeline_benchmark --json bench.json
+    python -m visitor_revenue.pipeline_benchmark --baseline bench.json --tolerance 0.25
+
+Large scales are best run with --db-dir, which keeps the seeded DuckDB
+files (and lets DuckDB spill to disk) so later runs skip seeding.
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from visitor_revenue.local_backend import LocalSnowflake
+from visitor_revenue.result_backends import RESULT_BACKENDS
+
+DEFAULT_SCALES = ['10k', '1M', '100M']
+_SUFFIXES = {'k': 1_000, 'm': 1_000_000, 'b': 1_000_000_000}
+
+
+def parse_scale(value: str) -> int:
+    """'10k' -> 10000, '1M' -> 1000000, '2500' -> 2500"""
+    value = value.strip().lower().replace('_', '')
+    if value and value[-1] in _SUFFIXES:
+        return int(float(value[:-1]) * _SUFFIXES[value[-1]])
+    return int(value)
+
+
+def _timed(stages: Dict[str, float], name: str, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - started
+    return wrapper
+
+
+def time_pipeline(backend: LocalSnowflake, analyzer_class, **options) -> Dict[str, float]:
+    """Run run_full_analysis once and return seconds per stage (plus 'total')"""
+    output_dir = tempfile.mkdtemp(prefix='visitor_revenue_bench_')
+    analyzer = analyzer_class(local_backend=backend, **options)
+    analyzer.output_dir = output_dir
+
+    # run_analyses and save_results look methods up on the instance, so
+    # wrapping them here times each stage without touching the analyzer
+    stages: Dict[str, float] = {}
+    methods = [method for _, method in analyzer.ANALYSIS_STEPS]
+    if options.get('consolidated'):
+        methods.insert(0, 'analyze_visitor_details_consolidated')
+    methods += ['generate_insights_and_recommendations', 'save_results']
+    for method in methods:
+        setattr(analyzer, method, _timed(stages, method, getattr(analyzer, method)))
+
+    started = time.perf_counter()
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            analyzer.run_full_analysis()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    stages['total'] = time.perf_counter() - started
+    # save_results includes insight generation; report the write on its own
+    stages['save_results'] -= stages.get('generate_insights_and_recommendations', 0.0)
+    return stages
+
+
+def _print_table(results: Dict[str, Dict[str, float]]):
+    scales = list(results)
+    stages = []
+    for timings in results.values():
+        stages += [stage for stage in timings if stage not in stages]
+
+    print(f"\n{'Stage':<44}" + ''.join(f"{scale:>12}" for scale in scales))
+    print("-" * (44 + 12 * len(scales)))
+    for stage in stages:
+        cells = ''.join(
+            f"{results[scale][stage]:>11.3f}s" if stage in results[scale] else f"{'-':>12}" for scale in scales
+        )
+        print(f"{stage:<44}{cells}")
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                        tolerance: float, min_seconds: float = 0.05) -> List[str]:
+    """Stages slower than the baseline by more than tolerance (a fraction)"""
+    regressions = []
+    for scale, timings in results.items():
+        for stage, seconds in timings.items():
+            before = baseline.get(scale, {}).get(stage)
+            # Very short stages are dominated by noise
+            if before is None or max(before, seconds) < min_seconds:
+                continue
+            if seconds > before * (1 + tolerance):
+                regressions.append(f"{scale} {stage}: {before:.3f}s -> {seconds:.3f}s "
+                                   f"(+{(seconds / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--scales', nargs='+', default=DEFAULT_SCALES,
+                        help="DAILY_MARKETING_VISITOR_DETAILS row counts, e.g. 10k 1M 100M (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=3, help="Pipeline runs per scale (median is reported)")
+    parser.add_argument('--backend', choices=list(RESULT_BACKENDS), default='pandas',
+                        help="Result backend the analyzer holds results in (default: %(default)s)")
+    parser.add_argument('--consolidated', action='store_true', help="Benchmark the GROUPING SETS mode")
+    parser.add_argument('--concurrency', type=int, default=1, help="Analysis queries in flight at once")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic data seed")
+    parser.add_argument('--db-dir', help="Keep seeded DuckDB files here and reuse them on later runs")
+    parser.add_argument('--json', help="Write stage timings to this file (usable as a later --baseline)")
+    parser.add_argument('--baseline', help="Timings JSON from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown vs --baseline before a stage counts as a regression (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    from visitor_revenue_analysis import WebflowVisitorRevenueAnalyzer
+
+    results: Dict[str, Dict[str, float]] = {}
+    for scale in args.scales:
+        rows = parse_scale(scale)
+        database = os.path.join(args.db_dir, f"synthetic_{rows}_{args.seed}.duckdb") if args.db_dir else None
+        print(f"Scale {scale} ({rows:,} visitor-detail rows): seeding...", flush=True)
+        backend = LocalSnowflake(rows=rows, seed=args.seed, database=database)
+        try:
+            runs = [
+                time_pipeline(backend, WebflowVisitorRevenueAnalyzer,
+                              consolidated=args.consolidated, max_concurrency=args.concurrency,
+                              result_backend=args.backend)
+                for _ in range(args.repeat)
+            ]
+        finally:
+            backend.close()
+
+        timings = {'seed_tables': backend.seed_seconds or 0.0}
+        for stage in runs[0]:
+            timings[stage] = statistics.median(run[stage] for run in runs)
+        results[scale] = timings
+        seeded = f"reused {database}" if backend.seed_seconds is None else f"seeded in {backend.seed_seconds:.2f}s"
+        print(f"  {seeded}, pipeline {timings['total']:.2f}s", flush=True)
+
+    _print_table(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nTimings written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Seeding time is setup, not pipeline performance
+        regressions = compare_to_baseline(
+            {scale: {k: v for k, v in t.items() if k != 'seed_tables'} for scale, t in results.items()},
+            baseline, args.tolerance,
+        )
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo stage regressed beyond {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
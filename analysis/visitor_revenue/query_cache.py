@@ -0,0 +1,240 @@
+"""
+On-disk cache of Snowflake query results.
+
+Entries are keyed on normalized SQL text plus the resolved date window the
+query ran for, expire after a per-table TTL, and are evicted least recently
+used first once the cache exceeds its byte budget. Each entry stores the
+column names once and every row as a JSON array (entries written as row
+dicts by earlier versions are still read).
+
+Several processes can share a cache directory. Every change to index.json
+(and every lookup) happens under an exclusive flock on index.lock, starting
+from the index as currently on disk, so one process's entries are never
+dropped by another saving a stale copy. Where fcntl is unavailable only
+threads of one process are serialized.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from visitor_revenue.result_protocol import QueryResult
+from visitor_revenue.snowflake_client import PROJECT_ROOT, SnowflakeQueryError
+
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_ROOT, 'analysis', '.query_cache')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Source tables refresh at most daily; a query lives as long as its
+# shortest-lived table.
+TABLE_TTLS = {
+    'DAILY_MARKETING_VISITOR_DETAILS': 24 * 3600,
+    'TOOL_PLAN_OBJECT_DAILY_CURRENT': 12 * 3600,
+    'FCT_USER_CREATED': 6 * 3600,
+    'REPORT__GOOGLE_NEW_FIRST_SUBSCRIPTION_EVENT': 6 * 3600,
+}
+DEFAULT_TTL = 3600
+
+CACHE_MODES = ('normal', 'refresh', 'offline')
+
+_ENTRY_FILE = re.compile(r'^[0-9a-f]{64}\.json$')
+
+
+class CacheMissError(SnowflakeQueryError):
+    """Raised in offline mode when a query has no cached result"""
+
+
+def normalize_sql(query: str) -> str:
+    """Strip comments and collapse whitespace outside string literals"""
+    parts = re.split(r"('(?:[^']|'')*')", query)
+    for i in range(0, len(parts), 2):
+        text = re.sub(r'--[^\n]*', ' ', parts[i])
+        parts[i] = re.sub(r'\s+', ' ', text)
+    return ''.join(parts).strip().rstrip(';').strip()
+
+
+def ttl_for_query(query: str) -> int:
+    """TTL in seconds for a query, based on the tables it reads"""
+    upper = query.upper()
+    ttls = [ttl for table, ttl in TABLE_TTLS.items() if table in upper]
+    return min(ttls) if ttls else DEFAULT_TTL
+
+
+def _decode(payload) -> QueryResult:
+    if isinstance(payload, list):
+        # Row dicts, as written before entries stored columns once
+        return QueryResult.from_dicts(payload)
+    return QueryResult(payload['columns'], [tuple(row) for row in payload['rows']])
+
+
+class QueryCache:
+    """Size-bounded LRU cache of query results on local disk"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 mode: str = 'normal'):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self._index_path = os.path.join(cache_dir, 'index.json')
+        self._lock_path = os.path.join(cache_dir, 'index.lock')
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    @staticmethod
+    def key(query: str, window: str = "") -> str:
+        digest = hashlib.sha256()
+        digest.update(normalize_sql(query).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(window.encode('utf-8'))
+        return digest.hexdigest()
+
+    def fetch(self, query: str, window: str, loader: Callable[[], QueryResult],
+              ttl: Optional[int] = None) -> QueryResult:
+        """Return the cached result for (query, window), calling loader on a miss"""
+        key = self.key(query, window)
+
+        if self.mode != 'refresh':
+            result = self.get(key, allow_stale=self.mode == 'offline')
+            if result is not None:
+                return result
+
+        if self.mode == 'offline':
+            raise CacheMissError("Query result not cached (offline mode)")
+
+        result = loader()
+        self.put(key, result, ttl if ttl is not None else ttl_for_query(query))
+        return result
+
+    def contains(self, query: str, window: str) -> bool:
+        """Whether fetch() would be served from the cache (without reading the entry)"""
+        if self.mode == 'refresh':
+            return False
+        with self._locked_index() as index:
+            entry = index.get(self.key(query, window))
+        if entry is None:
+            return False
+        return self.mode == 'offline' or time.time() - entry['created_at'] <= entry['ttl']
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[QueryResult]:
+        with self._locked_index() as index:
+            entry = index.get(key)
+            if entry is None:
+                return None
+            age = time.time() - entry['created_at']
+            if age > entry['ttl'] and not allow_stale:
+                return None
+            try:
+                with open(self._entry_path(key)) as f:
+                    result = _decode(json.load(f))
+            except (OSError, json.JSONDecodeError, KeyError, TypeError):
+                self._remove(key)
+                self._save_index()
+                return None
+            entry['last_access'] = time.time()
+            self._save_index()
+
+        stale = " (stale)" if age > entry['ttl'] else ""
+        print(f"Served from query cache{stale}, age {age / 60:.0f} min")
+        return result
+
+    def put(self, key: str, result: QueryResult, ttl: int):
+        payload = json.dumps({'columns': result.columns, 'rows': result.rows}, default=str)
+        with self._locked_index() as index:
+            self._atomic_write(self._entry_path(key), payload)
+            now = time.time()
+            index[key] = {
+                'bytes': len(payload.encode('utf-8')),
+                'created_at': now,
+                'last_access': now,
+                'ttl': ttl,
+            }
+            self._evict()
+            self._save_index()
+
+    def clear(self):
+        with self._locked_index() as index:
+            for key in list(index):
+                self._remove(key)
+            self._remove_orphans()
+            self._save_index()
+
+    def total_bytes(self) -> int:
+        return sum(entry['bytes'] for entry in self._index.values())
+
+    def _evict(self):
+        now = time.time()
+        for key, entry in list(self._index.items()):
+            if now - entry['created_at'] > entry['ttl']:
+                self._remove(key)
+
+        by_recency = sorted(self._index, key=lambda k: self._index[k]['last_access'])
+        total = self.total_bytes()
+        for key in by_recency:
+            if total <= self.max_bytes:
+                break
+            total -= self._index[key]['bytes']
+            self._remove(key)
+        self._remove_orphans()
+
+    def _remove_orphans(self):
+        """Delete entry files the index doesn't list (left by a process that died mid-put)"""
+        for name in os.listdir(self.cache_dir):
+            if _ENTRY_FILE.match(name) and name[:-len('.json')] not in self._index:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def _remove(self, key: str):
+        self._index.pop(key, None)
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    @contextlib.contextmanager
+    def _locked_index(self) -> Iterator[Dict[str, Dict]]:
+        """Hold the index lock, with self._index freshly loaded from disk"""
+        with self._lock, open(self._lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._index = self._load_index()
+                yield self._index
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self) -> Dict[str, Dict]:
+        try:
+            with open(self._index_path) as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        # Drop entries whose data file has gone missing
+        return {k: v for k, v in index.items() if os.path.exists(self._entry_path(k))}
+
+    def _save_index(self):
+        self._atomic_write(self._index_path, json.dumps(self._index))
+
+    @staticmethod
+    def _atomic_write(path: str, payload: str):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
@@ -0,0 +1,250 @@
+"""
+Compact typed columns for result sets (the 'records' result backend).
+
+A list of row dicts repeats every key in every row and keeps numbers as
+whatever the transport returned (often strings), so each consumer converts
+them again. Records stores a result set column by column and converts once,
+at ingest:
+
+- integer columns (no missing values) are array('q') - 8 bytes per value
+- other numeric columns are array('d'), with NaN for missing values
+  (an integer column with missing values becomes float64, as in pandas)
+- everything else (names, dates) stays a list of Python objects
+
+Numeric strings such as '1234' or '12.5' count as numbers; other strings
+are kept as they are. Iterating yields Row views (no per-row dicts), which
+read like dicts: row['region'], row.get(...), dict(row). Missing values
+read as None.
+
+sort_by, filter, top and group_sum return new Records; to_dicts and
+to_pydict convert back for writers that want plain Python values.
+No third-party packages are needed.
+"""
+
+import heapq
+import math
+import re
+import sys
+from array import array
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+Column = Union[array, List[Any]]
+
+_NUMBER = re.compile(r'-?\d+(\.\d*)?([eE][-+]?\d+)?$')
+
+
+def _parse(value: Any) -> Any:
+    if isinstance(value, str) and _NUMBER.match(value):
+        return int(value) if value.lstrip('-').isdigit() else float(value)
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _column(values: List[Any]) -> Column:
+    """Typed storage for one column of already-parsed values"""
+    numeric = [v for v in values if v is not None]
+    if numeric and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in numeric):
+        if len(numeric) == len(values) and all(isinstance(v, int) for v in numeric):
+            try:
+                return array('q', values)
+            except OverflowError:
+                return values
+        return array('d', [math.nan if v is None else v for v in values])
+    return values
+
+
+def _take(column: Column, indices: Iterable[int]) -> Column:
+    if isinstance(column, array):
+        return array(column.typecode, [column[i] for i in indices])
+    return [column[i] for i in indices]
+
+
+class Row:
+    """Read-only view of one row of a Records"""
+
+    __slots__ = ('_records', '_index')
+
+    def __init__(self, records: 'Records', index: int):
+        self._records = records
+        self._index = index
+
+    def __getitem__(self, name: str) -> Any:
+        return self._records._value(name, self._index)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self[name] if name in self._records._columns else default
+
+    def keys(self) -> List[str]:
+        return self._records.columns
+
+    def values(self) -> List[Any]:
+        return [self[name] for name in self._records.columns]
+
+    def items(self) -> List[tuple]:
+        return [(name, self[name]) for name in self._records.columns]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records.columns)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._records._columns
+
+    def __len__(self) -> int:
+        return len(self._records._columns)
+
+    def __repr__(self) -> str:
+        return f"Row({dict(self.items())!r})"
+
+
+class Records:
+    """A result set stored as typed columns"""
+
+    __slots__ = ('_columns', '_length')
+
+    def __init__(self, columns: Optional[Dict[str, Column]] = None, length: int = 0):
+        self._columns: Dict[str, Column] = columns or {}
+        self._length = length
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Dict[str, Any]]) -> 'Records':
+        """Records from row dicts (or Row views), converting values once"""
+        if isinstance(rows, Records):
+            return rows
+        if not rows:
+            return cls()
+        names = list(rows[0].keys())
+        columns = {name: _column([_parse(row.get(name)) for row in rows]) for name in names}
+        return cls(columns, len(rows))
+
+    @classmethod
+    def from_tuples(cls, rows: Sequence[Sequence[Any]], columns: Sequence[str]) -> 'Records':
+        """Records from row tuples in column order (as result streams deliver them)"""
+        if not rows:
+            return cls({name: [] for name in columns}, 0)
+        return cls({name: _column([_parse(value) for value in values])
+                    for name, values in zip(columns, zip(*rows))}, len(rows))
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Row]:
+        return (Row(self, i) for i in range(self._length))
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Row, 'Records']:
+        if isinstance(index, slice):
+            return self.take(range(self._length)[index])
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("Records index out of range")
+        return Row(self, index)
+
+    def __repr__(self) -> str:
+        return f"Records({self._length} rows: {', '.join(self._columns)})"
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns"""
+        total = 0
+        for column in self._columns.values():
+            if isinstance(column, array):
+                total += column.itemsize * len(column)
+            else:
+                total += sys.getsizeof(column) + sum(sys.getsizeof(value) for value in column)
+        return total
+
+    def _value(self, name: str, index: int) -> Any:
+        value = self._columns[name][index]
+        return None if value != value else value
+
+    def column(self, name: str) -> Column:
+        """The column's storage: array('q'), array('d') (NaN = missing) or a list"""
+        return self._columns[name]
+
+    def values(self, name: str) -> List[Any]:
+        """The column as Python values, None for missing"""
+        column = self._columns[name]
+        if isinstance(column, array) and column.typecode == 'd':
+            return [None if v != v else v for v in column]
+        return list(column)
+
+    def floats(self, name: str) -> array:
+        """The column as array('d'); missing and non-numeric values are NaN"""
+        column = self._columns[name]
+        if isinstance(column, array):
+            return column if column.typecode == 'd' else array('d', column)
+        floats = array('d')
+        for value in column:
+            try:
+                floats.append(math.nan if value is None else float(value))
+            except (TypeError, ValueError):
+                floats.append(math.nan)
+        return floats
+
+    def take(self, indices: Iterable[int]) -> 'Records':
+        """The rows at the given positions, in that order"""
+        indices = list(indices)
+        return Records({name: _take(column, indices) for name, column in self._columns.items()}, len(indices))
+
+    def head(self, n: int) -> 'Records':
+        return self if n >= self._length else self.take(range(n))
+
+    def sort_by(self, name: str, descending: bool = False) -> 'Records':
+        """Rows ordered by one column; missing values last either way"""
+        column = self._columns[name]
+        present = [i for i in range(self._length) if not _is_missing(column[i])]
+        missing = [i for i in range(self._length) if _is_missing(column[i])]
+        present.sort(key=column.__getitem__, reverse=descending)
+        return self.take(present + missing)
+
+    def filter(self, name: str, predicate: Callable[[Any], bool]) -> 'Records':
+        """Rows whose value in one column satisfies predicate (missing values never do)"""
+        column = self._columns[name]
+        return self.take(i for i in range(self._length)
+                         if not _is_missing(column[i]) and predicate(column[i]))
+
+    def top(self, n: int, name: str) -> 'Records':
+        """The n rows with the largest values in one column, largest first"""
+        column = self._columns[name]
+        present = (i for i in range(self._length) if not _is_missing(column[i]))
+        return self.take(heapq.nlargest(n, present, key=column.__getitem__))
+
+    def group_sum(self, by: str, sums: Sequence[str]) -> 'Records':
+        """One row per distinct value of `by` (sorted) with the sums of the given columns.
+
+        Missing values count as zero, as in a pandas groupby sum.
+        """
+        keys = self._columns[by]
+        groups: Dict[Any, int] = {}
+        for key in keys:
+            groups.setdefault(key, len(groups))
+        ordered = sorted(groups)
+        columns: Dict[str, Column] = {by: _column(ordered)}
+        for name in sums:
+            column = self._columns[name]
+            typecode = column.typecode if isinstance(column, array) else 'd'
+            totals = array(typecode, [0]) * len(groups)
+            values = column if isinstance(column, array) else self.floats(name)
+            for key, value in zip(keys, values):
+                if value == value:
+                    totals[groups[key]] += value
+            columns[name] = array(typecode, [totals[groups[key]] for key in ordered])
+        return Records(columns, len(ordered))
+
+    def to_pydict(self) -> Dict[str, List[Any]]:
+        """{column: Python values}, None for missing"""
+        return {name: self.values(name) for name in self._columns}
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        columns = self.to_pydict()
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
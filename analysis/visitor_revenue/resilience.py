@@ -0,0 +1,343 @@
+"""
+Deadlines, retries and hedging for individual Snowflake queries.
+
+QueryRunner.run(attempt, key) calls attempt(token) until it returns rows:
+
+- every attempt has a deadline (QueryPolicy.timeout). When it passes, the
+  attempt's CancelToken fires and the transport abandons the query: the
+  spawned process is killed, the worker cancels the statement, the MCP call
+  or DuckDB query is interrupted. The attempt then fails with
+  QueryTimeoutError instead of blocking the run.
+- failures are classified (classify_error). Timeouts and transient errors
+  (dropped connections, throttling, expired sessions, truncated results) are
+  retried with jittered exponential backoff. Permanent errors (SQL
+  compilation, permissions, bad credentials) fail at once.
+- with hedging enabled, an attempt still running past a quantile of the
+  query's latency (QueryPolicy.hedge_quantile, e.g. 0.95 for p95, from
+  LatencyHistory, kept across runs) gets a duplicate. The first to succeed
+  wins and the other is cancelled. Tail latency from occasional stalls then
+  costs about that quantile plus one normal execution, not the whole stall.
+
+When every attempt fails the runner raises QueryFailedError, which carries
+the classification and attempt count so callers can report the failure
+rather than silently dropping a result.
+"""
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from visitor_revenue.errors import SnowflakeQueryError
+from visitor_revenue.result_protocol import ProtocolError
+from visitor_revenue.snowflake_client import PROJECT_ROOT
+
+T = TypeVar('T')
+
+DEFAULT_HISTORY_PATH = os.path.join(PROJECT_ROOT, 'analysis', '.query_latency.json')
+DEFAULT_TIMEOUT = 600.0
+DEFAULT_CONNECT_TIMEOUT = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+# Latencies kept per query; enough for a stable p95 without going stale
+HISTORY_SAMPLES = 50
+
+# Checked before TRANSIENT_ERRORS: a compilation error mentioning "timeout" is still permanent
+PERMANENT_ERRORS = (
+    'sql compilation error', 'syntax error', 'does not exist or not authorized', 'insufficient privileges',
+    'invalid identifier', 'incorrect username or password', 'failed to start',
+)
+TRANSIENT_ERRORS = (
+    'timeout', 'timed out', 'econnreset', 'econnrefused', 'etimedout', 'eai_again', 'socket hang up',
+    'network', 'service unavailable', 'too many requests', '429', '502', '503', '504',
+    'authentication token has expired', 'session no longer exists', 'worker exited', 'worker stopped',
+    'truncated', 'mcp session failed', 'connection closed',
+)
+
+
+class QueryTimeoutError(SnowflakeQueryError):
+    """Raised when a query attempt passes its deadline"""
+
+
+class QueryFailedError(SnowflakeQueryError):
+    """Raised once a query has failed for good"""
+
+    def __init__(self, message: str, kind: str, attempts: int):
+        super().__init__(message)
+        self.kind = kind
+        self.attempts = attempts
+
+
+class _HedgeLost(SnowflakeQueryError):
+    """Cancellation reason for the slower of two hedged attempts"""
+
+
+def classify_error(error: BaseException) -> str:
+    """'timeout', 'transient' (worth retrying) or 'permanent'"""
+    if isinstance(error, QueryTimeoutError):
+        return 'timeout'
+    if not isinstance(error, SnowflakeQueryError):
+        # Bugs, missing executables and the like don't fix themselves
+        return 'permanent'
+    message = str(error).lower()
+    if any(pattern in message for pattern in PERMANENT_ERRORS):
+        return 'permanent'
+    if isinstance(error, ProtocolError) or any(pattern in message for pattern in TRANSIENT_ERRORS):
+        return 'transient'
+    return 'permanent'
+
+
+class CancelToken:
+    """Cancellation signal for one attempt; transports register how to abandon their query"""
+
+    def __init__(self):
+        self.reason: Optional[Exception] = None
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Call callback when the token fires (at once if it already has)"""
+        with self._lock:
+            if self.reason is None:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self, reason: Exception):
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def raise_if_cancelled(self):
+        if self.reason is not None:
+            raise self.reason
+
+
+class LatencyHistory:
+    """Recent successful latencies per query, optionally persisted as JSON"""
+
+    def __init__(self, path: Optional[str] = None, max_samples: int = HISTORY_SAMPLES):
+        # None: in memory only
+        self.path = path
+        self.max_samples = max_samples
+        self._samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        if path:
+            try:
+                with open(path) as f:
+                    self._samples = {key: list(values) for key, values in json.load(f).items()}
+            except (OSError, ValueError):
+                pass
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            samples = self._samples.setdefault(key, [])
+            samples.append(round(seconds, 3))
+            del samples[:-self.max_samples]
+
+    def quantile(self, key: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """Nearest-rank quantile of the key's latencies, or None with too little history"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        return samples[max(0, math.ceil(q * len(samples)) - 1)]
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            payload = json.dumps(self._samples)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class QueryPolicy:
+    """Deadline, retry and hedging settings applied to every query"""
+
+    # Seconds per attempt (None: wait forever)
+    timeout: Optional[float] = DEFAULT_TIMEOUT
+    # Seconds to wait for the persistent worker's login before giving up
+    connect_timeout: Optional[float] = DEFAULT_CONNECT_TIMEOUT
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    # First retry waits about this long; each further retry doubles it, up to max_backoff
+    backoff: float = 1.0
+    max_backoff: float = 30.0
+    # Latency quantile after which a duplicate attempt is sent (None: no hedging)
+    hedge_quantile: Optional[float] = None
+    # Successful runs of a query needed before it is hedged
+    hedge_min_samples: int = 5
+
+
+class _Race:
+    """Tokens of the attempts racing for one result"""
+
+    def __init__(self, primary: CancelToken):
+        self.tokens = [primary]
+        self.done = False
+        self.lock = threading.Lock()
+
+    def cancel_all(self, reason: Exception):
+        with self.lock:
+            tokens = list(self.tokens)
+        for token in tokens:
+            token.cancel(reason)
+
+    def finish(self, winner: Optional[CancelToken] = None):
+        """Stop new hedges; cancel every attempt except the winner"""
+        with self.lock:
+            self.done = True
+            losers = [token for token in self.tokens if token is not winner]
+        if winner is not None:
+            for token in losers:
+                token.cancel(_HedgeLost("A hedged duplicate finished first"))
+
+
+class _Hedge:
+    """Duplicate attempt started on a timer once the primary runs past the hedge quantile"""
+
+    def __init__(self, attempt: Callable[[CancelToken], T], race: _Race):
+        self.attempt = attempt
+        self.race = race
+        self.thread: Optional[threading.Thread] = None
+        self.token: Optional[CancelToken] = None
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.seconds = 0.0
+
+    def start(self):
+        with self.race.lock:
+            if self.race.done:
+                return
+            self.token = CancelToken()
+            self.race.tokens.append(self.token)
+            self.thread = threading.Thread(target=self._run, name='query-hedge', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            self.result = self.attempt(self.token)
+            self.seconds = time.perf_counter() - started
+            self.race.finish(self.token)
+        except BaseException as e:
+            self.error = self.token.reason or e
+
+    @property
+    def started(self) -> bool:
+        return self.thread is not None
+
+    def outcome(self) -> Optional[Tuple[T, float]]:
+        """Wait for a started hedge; (result, seconds) if it succeeded"""
+        with self.race.lock:
+            thread = self.thread
+        if thread is None:
+            return None
+        thread.join()
+        if self.error is not None:
+            return None
+        return self.result, self.seconds
+
+
+class QueryRunner:
+    """Runs query attempts under a QueryPolicy"""
+
+    def __init__(self, policy: Optional[QueryPolicy] = None, history: Optional[LatencyHistory] = None,
+                 rng: Optional[random.Random] = None):
+        self.policy = policy or QueryPolicy()
+        self.history = history if history is not None else LatencyHistory()
+        self._rng = rng or random.Random()
+
+    def run(self, attempt: Callable[[CancelToken], T], key: str = "") -> T:
+        """Call attempt(token) until it succeeds, retrying transient failures"""
+        policy = self.policy
+        label = key or "Query"
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                result, seconds = self._run_once(attempt, label)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == 'permanent' or attempts >= policy.max_attempts:
+                    raise QueryFailedError(str(e), kind, attempts) from e
+                delay = self.backoff_delay(attempts)
+                print(f"{label}: {kind} error ({e}); retrying in {delay:.1f}s "
+                      f"(attempt {attempts + 1} of {policy.max_attempts})")
+                time.sleep(delay)
+                continue
+            self.history.record(label, seconds)
+            return result
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Seconds to wait after the given failed attempt: half fixed, half random"""
+        ceiling = min(self.policy.max_backoff, self.policy.backoff * 2 ** (attempt - 1))
+        return ceiling / 2 + self._rng.uniform(0, ceiling / 2)
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        policy = self.policy
+        if policy.hedge_quantile is None:
+            return None
+        delay = self.history.quantile(key, policy.hedge_quantile, policy.hedge_min_samples)
+        if delay is None or (policy.timeout is not None and delay >= policy.timeout):
+            return None
+        return delay
+
+    def save(self):
+        self.history.save()
+
+    def _run_once(self, attempt: Callable[[CancelToken], T], label: str) -> Tuple[T, float]:
+        policy = self.policy
+        primary = CancelToken()
+        race = _Race(primary)
+        timers = []
+        if policy.timeout is not None:
+            reason = QueryTimeoutError(f"{label} did not finish within {policy.timeout:g}s")
+            timers.append(threading.Timer(policy.timeout, race.cancel_all, args=(reason,)))
+        hedge = None
+        hedge_after = self.hedge_delay(label)
+        if hedge_after is not None:
+            hedge = _Hedge(attempt, race)
+            timers.append(threading.Timer(hedge_after, hedge.start))
+        for timer in timers:
+            timer.daemon = True
+            timer.start()
+
+        started = time.perf_counter()
+        try:
+            try:
+                result = attempt(primary)
+            except Exception as e:
+                error = primary.reason or e
+                race.finish()
+                outcome = hedge.outcome() if hedge is not None else None
+                if outcome is None:
+                    raise error
+                print(f"{label}: hedged duplicate (sent after {hedge_after:.1f}s, "
+                      f"p{policy.hedge_quantile * 100:g}) finished first")
+                return outcome
+            race.finish(primary)
+            if hedge is not None and hedge.started:
+                print(f"{label}: original finished before its hedged duplicate (sent after {hedge_after:.1f}s)")
+            return result, time.perf_counter() - started
+        finally:
+            for timer in timers:
+                timer.cancel()
@@ -0,0 +1,160 @@
+"""
+Result backends: how the analyzer holds, prints and writes result sets.
+
+The analyzer turns each query's row dicts into a table of the selected
+backend and never touches the table type directly:
+
+- 'records': visitor_revenue.records.Records - typed columns in pure
+  Python; no third-party imports at all (JSON checkpoints)
+- 'pandas': pandas DataFrames (Arrow checkpoints; Arrow/Parquet need pyarrow)
+- 'polars': Polars DataFrames (Arrow checkpoints written by Polars itself)
+
+frame and from_tuples take an optional FrameSchema (see
+visitor_revenue.ingest): with one, pandas and Polars build categorical
+dimensions and narrowed counts column by column; without one, frames are
+built as before.
+
+pandas and Polars are imported on first use, so choosing a backend costs
+nothing until a result arrives, and the records backend never loads them.
+"""
+
+import json
+from typing import Dict, List, Optional, Sequence
+
+from visitor_revenue.columnar_io import read_table, write_frame, write_polars, write_records
+from visitor_revenue.ingest import FrameSchema, columns_from_rows, columns_from_tuples, pandas_frame, polars_frame
+from visitor_revenue.records import Records
+
+
+class RecordsBackend:
+    """Pure-Python typed columns"""
+
+    name = 'records'
+    checkpoint_format = 'json'
+
+    # Records type their columns themselves; schemas are accepted and ignored
+    def frame(self, rows: List[Dict], schema: Optional[FrameSchema] = None) -> Records:
+        return Records.from_rows(rows)
+
+    def from_tuples(self, rows: Sequence[Sequence], columns: List[str],
+                    schema: Optional[FrameSchema] = None) -> Records:
+        return Records.from_tuples(rows, columns)
+
+    def empty(self, data: Records) -> bool:
+        return not data
+
+    def to_rows(self, data: Records) -> List[Dict]:
+        return data.to_dicts()
+
+    def nbytes(self, data: Records) -> int:
+        return data.nbytes
+
+    def format_table(self, data: Records, limit: int) -> str:
+        # Limit to 6 columns for readability; cells are cut and padded to 15 characters
+        headers = data.columns[:6]
+        header_line = " | ".join(f"{h:<15.15}" for h in headers)
+        head = data.head(limit)
+        cells = [[f"{value!s:<15.15}" for value in head.values(h)] for h in headers]
+        lines = ["-" * 80, header_line, "-" * len(header_line)]
+        lines += [" | ".join(row_cells) for row_cells in zip(*cells)]
+        return '\n'.join(lines)
+
+    def write(self, data: Records, path: str, fmt: str):
+        write_records(data, path, fmt)
+
+    def read(self, path: str) -> Records:
+        with open(path) as f:
+            return Records.from_rows(json.load(f))
+
+
+class PandasBackend:
+    """pandas DataFrames"""
+
+    name = 'pandas'
+    checkpoint_format = 'arrow'
+
+    def frame(self, rows: List[Dict], schema: Optional[FrameSchema] = None):
+        if schema is not None and rows:
+            return pandas_frame(columns_from_rows(rows), schema)
+        import pandas as pd
+        return pd.DataFrame(rows)
+
+    def from_tuples(self, rows: Sequence[Sequence], columns: List[str], schema: Optional[FrameSchema] = None):
+        if schema is not None and rows:
+            return pandas_frame(columns_from_tuples(rows, columns), schema)
+        import pandas as pd
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+    def empty(self, data) -> bool:
+        return data.empty
+
+    def to_rows(self, data) -> List[Dict]:
+        return data.to_dict('records')
+
+    def nbytes(self, data) -> int:
+        return int(data.memory_usage(deep=True).sum())
+
+    def format_table(self, data, limit: int) -> str:
+        return data.head(limit).to_string(index=False)
+
+    def write(self, data, path: str, fmt: str):
+        write_frame(data, path, fmt)
+
+    def read(self, path: str):
+        return read_table(path).to_pandas()
+
+
+class PolarsBackend:
+    """Polars DataFrames"""
+
+    name = 'polars'
+    checkpoint_format = 'arrow'
+
+    def frame(self, rows: List[Dict], schema: Optional[FrameSchema] = None):
+        if schema is not None and rows:
+            return polars_frame(columns_from_rows(rows), schema)
+        import polars as pl
+        # Every row decides column types: early rows may hold nulls
+        return pl.DataFrame(rows, infer_schema_length=None)
+
+    def from_tuples(self, rows: Sequence[Sequence], columns: List[str], schema: Optional[FrameSchema] = None):
+        if schema is not None and rows:
+            return polars_frame(columns_from_tuples(rows, columns), schema)
+        import polars as pl
+        return pl.DataFrame(rows, schema=columns, orient='row', infer_schema_length=None)
+
+    def empty(self, data) -> bool:
+        return data.is_empty()
+
+    def to_rows(self, data) -> List[Dict]:
+        return data.to_dicts()
+
+    def nbytes(self, data) -> int:
+        return int(data.estimated_size())
+
+    def format_table(self, data, limit: int) -> str:
+        import polars as pl
+        # Plain right-aligned columns, like pandas' to_string
+        with pl.Config(tbl_formatting='NOTHING', tbl_cell_alignment='RIGHT', tbl_hide_dataframe_shape=True,
+                       tbl_hide_column_data_types=True, tbl_hide_dtype_separator=True,
+                       tbl_rows=limit, tbl_cols=-1, tbl_width_chars=1000):
+            return str(data.head(limit))
+
+    def write(self, data, path: str, fmt: str):
+        write_polars(data, path, fmt)
+
+    def read(self, path: str):
+        import polars as pl
+        # Memory-mapped by Polars itself (the file is uncompressed)
+        return pl.read_ipc(path)
+
+
+RESULT_BACKENDS = {backend.name: backend for backend in (RecordsBackend, PandasBackend, PolarsBackend)}
+
+
+def get_result_backend(name: str):
+    """A backend instance by name ('records', 'pandas' or 'polars')"""
+    if name not in RESULT_BACKENDS:
+        raise ValueError(f"Unknown result backend: {name} (choose from {', '.join(RESULT_BACKENDS)})")
+    return RESULT_BACKENDS[name]()
+
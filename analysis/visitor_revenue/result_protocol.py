@@ -0,0 +1,167 @@
+"""
+Framed NDJSON result protocol spoken by `cli-snowflake.ts query --format ndjson`
+and `cli-snowflake.ts serve`.
+
+    {"frame": "header", "protocol": 1, "columns": [{"name": ..., "type": ...}, ...]}
+    [value, value, ...]                      # one positional row per line
+    {"frame": "trailer", "row_count": N, "query_id": "..."}
+
+or a single {"frame": "error", "message": ...} in place of (or after) the
+rows. Readers add "bytes_received" (size of the result on the wire) to the
+trailer. Nothing before the header is interpreted, so stray log output can no
+longer be mistaken for a result, and rows are consumed one line at a time.
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from visitor_revenue.errors import SnowflakeQueryError
+
+PROTOCOL_VERSION = 1
+
+Frame = Union[Dict[str, Any], List[Any]]
+
+
+class ProtocolError(SnowflakeQueryError):
+    """Raised when the framed output is malformed or truncated"""
+
+
+class QueryResult(NamedTuple):
+    """A complete result: column names and one tuple per row, in column order"""
+    columns: List[str]
+    rows: List[Tuple]
+
+    @classmethod
+    def from_dicts(cls, rows: List[Dict[str, Any]]) -> 'QueryResult':
+        columns = list(rows[0]) if rows else []
+        return cls(columns, [tuple(row.get(name) for name in columns) for row in rows])
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+
+def decode_frames(lines: Iterable[str]) -> Iterator[Frame]:
+    """Turn raw stdout lines into frames, skipping anything before the header"""
+    in_result = False
+    received = 0
+    for line in lines:
+        received += len(line)
+        line = line.strip()
+        if not line:
+            continue
+
+        if not in_result:
+            if not line.startswith('{'):
+                continue
+            try:
+                frame = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(frame, dict) and frame.get('frame') in ('header', 'error'):
+                in_result = frame['frame'] == 'header'
+                received = len(line) + 1
+                yield frame
+            continue
+
+        try:
+            frame = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ProtocolError(f"Malformed row frame: {e}")
+        if isinstance(frame, dict) and frame.get('frame') == 'trailer':
+            frame['bytes_received'] = received
+        yield frame
+        if isinstance(frame, dict) and frame.get('frame') in ('trailer', 'error'):
+            in_result = False
+
+
+class ResultStream:
+    """A query result received incrementally as header, rows and trailer"""
+
+    def __init__(self, frames: Iterator[Frame], cancel: Optional[Callable[[], None]] = None):
+        self._frames = frames
+        # Transport hook that abandons the query (kills the process, cancels the statement)
+        self._cancel = cancel
+        self._header: Optional[Dict[str, Any]] = None
+        self.trailer: Optional[Dict[str, Any]] = None
+        self.rows_read = 0
+
+    @property
+    def header(self) -> Dict[str, Any]:
+        if self._header is None:
+            frame = next(self._frames, None)
+            if frame is None:
+                raise ProtocolError("Result ended before the header frame")
+            self._raise_for_error(frame)
+            if not isinstance(frame, dict) or frame.get('frame') != 'header':
+                raise ProtocolError("Expected a header frame")
+            if frame.get('protocol', PROTOCOL_VERSION) > PROTOCOL_VERSION:
+                raise ProtocolError(f"Unsupported protocol version {frame['protocol']}")
+            self._header = frame
+        return self._header
+
+    @property
+    def columns(self) -> List[Dict[str, Any]]:
+        return self.header['columns']
+
+    @property
+    def column_names(self) -> List[str]:
+        return [column['name'] for column in self.columns]
+
+    def __iter__(self) -> Iterator[Tuple]:
+        """Yield rows as tuples in column order"""
+        self.header
+        for frame in self._frames:
+            if isinstance(frame, list):
+                self.rows_read += 1
+                yield tuple(frame)
+                continue
+
+            self._raise_for_error(frame)
+            if frame.get('frame') == 'trailer':
+                self.trailer = frame
+                expected = frame.get('row_count')
+                if expected is not None and expected != self.rows_read:
+                    raise ProtocolError(f"Trailer reports {expected} rows, received {self.rows_read}")
+                return
+            raise ProtocolError(f"Unexpected frame: {frame.get('frame')}")
+
+        raise ProtocolError(f"Result truncated after {self.rows_read} rows (no trailer)")
+
+    def cancel(self):
+        """Abandon the result; the reader then fails instead of waiting for more frames"""
+        if self._cancel is not None:
+            self._cancel()
+
+    def iter_chunks(self, chunksize: int) -> Iterator[List[Tuple]]:
+        """Yield lists of at most chunksize rows"""
+        chunk = []
+        for row in self:
+            chunk.append(row)
+            if len(chunk) >= chunksize:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def buffered(self) -> 'ResultStream':
+        """Read the whole result now; a new stream replays it"""
+        header = self.header
+        rows = [list(row) for row in self]
+        return ResultStream(iter([header, *rows, self.trailer]))
+
+    def to_result(self) -> QueryResult:
+        """The remaining rows as tuples, without building a dict per row"""
+        return QueryResult(self.column_names, list(self))
+
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        names = self.column_names
+        for row in self:
+            yield dict(zip(names, row))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return list(self.iter_dicts())
+
+    @staticmethod
+    def _raise_for_error(frame: Frame):
+        if isinstance(frame, dict) and frame.get('frame') == 'error':
+            raise SnowflakeQueryError(frame.get('message', 'Unknown Snowflake error'))
@@ -0,0 +1,68 @@
+"""
+Byte-stable query text for Snowflake's persisted result cache.
+
+Snowflake answers a query from its 24-hour result cache, without starting a
+warehouse, only when the text matches an earlier query exactly and uses no
+context functions such as CURRENT_DATE(). The analyzers therefore resolve
+their date windows from analysis_date in Python and render them as DATE
+literals (date_window), and send canonical_sql() text so the two analyzers'
+differently indented copies of a query are the same statement.
+
+Whether Snowflake reused a result is not reported with the result itself;
+result_reuse_query() looks the run's query ids up in INFORMATION_SCHEMA
+query history afterwards. A reused result scans no bytes, which no analysis
+query does when it actually executes. The same lookup returns each query's
+partitions and bytes scanned and its execution time (query_costs), the
+actual cost the cost planner reports next to its estimates.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from visitor_revenue.query_cache import normalize_sql
+
+# Query history is only searched this far back; one run issues a handful of queries
+HISTORY_RESULT_LIMIT = 1000
+
+
+def date_window(analysis_date: str, days_back: int, end_days_back: int = 0) -> Tuple[str, str]:
+    """ISO (start, end) dates: analysis_date minus days_back through analysis_date minus end_days_back"""
+    day = date.fromisoformat(analysis_date)
+    return (day - timedelta(days=days_back)).isoformat(), (day - timedelta(days=end_days_back)).isoformat()
+
+
+def canonical_sql(query: str) -> str:
+    """The query text sent to Snowflake: comments stripped, whitespace collapsed"""
+    return normalize_sql(query)
+
+
+def result_reuse_query(query_ids: Iterable[str]) -> str:
+    """SQL returning QUERY_ID, BYTES_SCANNED, PARTITIONS_SCANNED and EXECUTION_TIME for the given query ids"""
+    ids = ', '.join(f"'{query_id}'" for query_id in sorted(set(query_ids)))
+    return canonical_sql(f"""
+        SELECT QUERY_ID, BYTES_SCANNED, PARTITIONS_SCANNED, EXECUTION_TIME
+        FROM TABLE(ANALYTICS.INFORMATION_SCHEMA.QUERY_HISTORY(RESULT_LIMIT => {HISTORY_RESULT_LIMIT}))
+        WHERE QUERY_ID IN ({ids})
+        """)
+
+
+def reused_results(history_rows: List[Dict]) -> Dict[str, bool]:
+    """query id -> whether Snowflake served it from the persisted result cache"""
+    reused = {}
+    for row in history_rows:
+        row = {key.upper(): value for key, value in row.items()}
+        reused[row['QUERY_ID']] = int(row.get('BYTES_SCANNED') or 0) == 0
+    return reused
+
+
+def query_costs(history_rows: List[Dict]) -> Dict[str, Dict]:
+    """query id -> bytes_scanned, partitions_scanned and execution_ms from query history"""
+    costs = {}
+    for row in history_rows:
+        row = {key.upper(): value for key, value in row.items()}
+        costs[row['QUERY_ID']] = {
+            'bytes_scanned': int(row.get('BYTES_SCANNED') or 0),
+            'partitions_scanned': int(row.get('PARTITIONS_SCANNED') or 0),
+            'execution_ms': int(row.get('EXECUTION_TIME') or 0),
+        }
+    return costs
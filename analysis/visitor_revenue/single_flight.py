@@ -0,0 +1,198 @@
+"""
+Coalescing of identical in-flight Snowflake queries.
+
+When several analyses, or several analyzer runs on the same host (the daily
+briefing and a manual run, say), issue the same query at the same time, only
+one execution reaches the warehouse and the others share its result:
+
+- within a process, callers whose key (normalized SQL plus date window, as
+  in the query cache) is already in flight wait for that call and receive
+  copies of its rows, or its exception
+- across processes, the leader holds an exclusive flock on
+  `<lock_dir>/<key>.lock` while it runs. A process that finds the lock taken
+  registers as a waiter and blocks on the lock; the leader publishes its
+  rows to `<key>.result.json` only if someone is waiting. A waiter that gets
+  the lock without finding a fresh result (the leader failed or died; the
+  kernel drops a dead process's locks) runs the query itself, as does one
+  that registered just too late for the leader to notice it.
+
+Lock files are left in place: unlinking a lock file other processes may be
+blocked on would let two leaders run at once. Result files older than
+RESULT_TTL are removed by later leaders.
+
+Cross-process coalescing needs fcntl; elsewhere only the in-process layer
+applies.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from visitor_revenue.query_cache import QueryCache
+from visitor_revenue.result_protocol import QueryResult
+from visitor_revenue.snowflake_client import PROJECT_ROOT
+
+DEFAULT_LOCK_DIR = os.path.join(PROJECT_ROOT, 'analysis', '.inflight')
+# Published results only need to outlive the waiters that were already blocked
+RESULT_TTL = 300
+# Give up waiting on another process after this long and run the query here
+DEFAULT_WAIT_TIMEOUT = 30 * 60
+_POLL_INTERVAL = 0.05
+_MAX_POLL_INTERVAL = 1.0
+
+
+class _Call:
+    """One in-process execution that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[QueryResult] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Share one execution of a query among concurrent identical callers"""
+
+    def __init__(self, lock_dir: str = DEFAULT_LOCK_DIR, cross_process: bool = True,
+                 wait_timeout: float = DEFAULT_WAIT_TIMEOUT):
+        self.lock_dir = lock_dir
+        # False: coalesce within this process only (e.g. synthetic local data)
+        self.cross_process = cross_process and fcntl is not None
+        self.wait_timeout = wait_timeout
+        self.stats = {'executed': 0, 'joined_thread': 0, 'joined_process': 0}
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        if self.cross_process:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, query: str, window: str, loader: Callable[[], QueryResult]) -> QueryResult:
+        """Return loader()'s result, sharing it with identical concurrent calls"""
+        key = QueryCache.key(query, window)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            self._count('joined_thread')
+            print("Joined an identical query already running in this process")
+            if call.error is not None:
+                raise call.error
+            # Rows are tuples; copying the lists keeps one caller's edits out of another's
+            return QueryResult(list(call.result.columns), list(call.result.rows))
+
+        try:
+            if self.cross_process:
+                call.result = self._do_locked(key, loader)
+            else:
+                call.result = self._execute(loader)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _execute(self, loader: Callable[[], QueryResult]) -> QueryResult:
+        self._count('executed')
+        return loader()
+
+    def _do_locked(self, key: str, loader: Callable[[], QueryResult]) -> QueryResult:
+        lock_path = os.path.join(self.lock_dir, f"{key}.lock")
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                result = self._wait_for_leader(key, lock_file)
+                if result is not None:
+                    self._count('joined_process')
+                    print("Joined an identical query already running in another analyzer process")
+                    return result
+            try:
+                self._remove_stale_results()
+                result = self._execute(loader)
+                if self._waiters(key):
+                    self._publish(key, result)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _wait_for_leader(self, key: str, lock_file) -> Optional[QueryResult]:
+        """Block until the leader releases the lock (which we then hold); return its result, if published"""
+        waiting_since = time.time()
+        marker = os.path.join(self.lock_dir, f"{key}.waiting.{os.getpid()}.{threading.get_ident()}")
+        open(marker, 'w').close()
+        try:
+            interval = _POLL_INTERVAL
+            deadline = time.monotonic() + self.wait_timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        # Leader is stuck; run the query ourselves without the lock
+                        print(f"Gave up waiting {self.wait_timeout:.0f}s for an identical query in another process")
+                        return None
+                    time.sleep(interval)
+                    interval = min(interval * 2, _MAX_POLL_INTERVAL)
+        finally:
+            try:
+                os.remove(marker)
+            except OSError:
+                pass
+        return self._read_result(key, waiting_since)
+
+    def _waiters(self, key: str) -> bool:
+        return bool(glob.glob(os.path.join(glob.escape(self.lock_dir), f"{key}.waiting.*")))
+
+    def _result_path(self, key: str) -> str:
+        return os.path.join(self.lock_dir, f"{key}.result.json")
+
+    def _publish(self, key: str, result: QueryResult):
+        path = self._result_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'finished_at': time.time(), 'columns': result.columns, 'rows': result.rows}, f, default=str)
+        os.replace(tmp_path, path)
+
+    def _read_result(self, key: str, since: float) -> Optional[QueryResult]:
+        try:
+            with open(self._result_path(key)) as f:
+                result = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        # An older result belongs to an earlier execution, not the one we waited on
+        if result.get('finished_at', 0) < since or 'columns' not in result:
+            return None
+        return QueryResult(result['columns'], [tuple(row) for row in result['rows']])
+
+    def _remove_stale_results(self):
+        now = time.time()
+        lock_dir = glob.escape(self.lock_dir)
+        # Waiter markers left by killed processes would otherwise force every later leader to publish
+        stale = [(path, now - RESULT_TTL) for path in glob.glob(os.path.join(lock_dir, '*.result.json'))]
+        stale += [(path, now - self.wait_timeout - RESULT_TTL)
+                  for path in glob.glob(os.path.join(lock_dir, '*.waiting.*'))]
+        for path, cutoff in stale:
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
@@ -0,0 +1,265 @@
+"""
+Snowflake query transport for the visitor-to-revenue analyzers.
+
+Two ways of reaching Snowflake through packages/core/src/cli-snowflake.ts:
+
+- stream_query_subprocess: one `npm run snowflake -- query` process per query
+  (Node startup, tsx transpile and SSO login every time)
+- SnowflakeWorker: one long-lived `npm run snowflake -- serve` process that
+  keeps its connection warm and answers newline-delimited JSON requests
+
+Both read results in the framed NDJSON format described in result_protocol.
+"""
+
+import functools
+import json
+import queue
+import subprocess
+import tempfile
+import threading
+from typing import Dict, Iterator, List, Optional, Set
+
+from visitor_revenue.errors import SnowflakeQueryError
+from visitor_revenue.result_protocol import Frame, ProtocolError, ResultStream, decode_frames
+
+PROJECT_ROOT = '/Users/rachelwolan/agent-chief-of-staff'
+
+# Frames buffered per in-flight worker request before the reader thread
+# blocks (and, through the pipe, the worker pauses its Snowflake stream)
+MAX_BUFFERED_FRAMES = 10000
+
+_END = object()
+
+
+def stream_query_subprocess(query: str, cwd: str = PROJECT_ROOT) -> ResultStream:
+    """Run a single query through a fresh `npm run snowflake` process"""
+    cmd = ['npm', 'run', '--silent', 'snowflake', '--', 'query', query, '--format', 'ndjson']
+    stderr = tempfile.TemporaryFile(mode='w+')
+    process = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=stderr, text=True)
+
+    def frames() -> Iterator[Frame]:
+        try:
+            yield from decode_frames(process.stdout)
+            if process.wait() != 0:
+                stderr.seek(0)
+                raise SnowflakeQueryError(stderr.read())
+        finally:
+            process.stdout.close()
+            process.wait()
+            stderr.close()
+
+    return ResultStream(frames(), cancel=process.kill)
+
+
+def run_query_subprocess(query: str, cwd: str = PROJECT_ROOT) -> List[Dict]:
+    """Run a single query through a fresh `npm run snowflake` process"""
+    return stream_query_subprocess(query, cwd).to_dicts()
+
+
+class SnowflakeWorker:
+    """Client for a persistent `cli-snowflake.ts serve` process"""
+
+    def __init__(self, cwd: str = PROJECT_ROOT):
+        self.cwd = cwd
+        self.connect_ms: Optional[int] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        # Set by the worker's ready event; _ready alone is also set when the worker exits first
+        self._connected = False
+        self._pending: Dict[int, queue.Queue] = {}
+        # The result currently streaming from the worker, and requests whose
+        # remaining frames should be dropped
+        self._current: Optional[queue.Queue] = None
+        self._current_id = None
+        self._cancelled: Set[int] = set()
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def start(self, timeout: Optional[float] = None):
+        """Launch the worker and block until its Snowflake connection is up"""
+        if self.is_running():
+            return
+
+        # --silent keeps npm's script banner off stdout; stderr is inherited so
+        # SSO prompts and connection errors stay visible to the user.
+        cmd = ['npm', 'run', '--silent', 'snowflake', '--', 'serve']
+        self._ready.clear()
+        self._connected = False
+        self._process = subprocess.Popen(
+            cmd,
+            cwd=self.cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        self._reader = threading.Thread(target=self._read_responses, args=(self._process,), daemon=True)
+        self._reader.start()
+
+        if not self._ready.wait(timeout) or not self._connected or not self.is_running():
+            self.close()
+            raise SnowflakeQueryError("Snowflake worker failed to start")
+
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def query(self, query: str, timeout: Optional[float] = None) -> List[Dict]:
+        """Send a query to the worker and wait for all of its rows"""
+        return self.submit(query, timeout).to_dicts()
+
+    def submit(self, query: str, timeout: Optional[float] = None) -> ResultStream:
+        """Send a query and return its result as a stream.
+
+        timeout bounds the wait for each frame, not the whole result.
+        """
+        if not self.is_running():
+            self.start()
+
+        channel: queue.Queue = queue.Queue(maxsize=MAX_BUFFERED_FRAMES)
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self._pending[request_id] = channel
+            self._process.stdin.write(json.dumps({'id': request_id, 'sql': query}) + '\n')
+            self._process.stdin.flush()
+        return ResultStream(self._drain(channel, timeout), cancel=functools.partial(self.cancel, request_id))
+
+    def cancel(self, request_id: int, error: Optional[Exception] = None):
+        """Fail a request's stream now and ask the worker to cancel its statement"""
+        with self._lock:
+            channel = self._pending.pop(request_id, None)
+            if channel is None and self._current_id == request_id:
+                channel = self._current
+            if channel is None:
+                return
+            self._cancelled.add(request_id)
+            if self.is_running():
+                try:
+                    self._process.stdin.write(json.dumps({'id': request_id, 'cancel': True}) + '\n')
+                    self._process.stdin.flush()
+                except OSError:
+                    pass
+
+        # Unblock the reader thread if it is waiting on a full channel, then fail the reader
+        while True:
+            try:
+                channel.get_nowait()
+            except queue.Empty:
+                break
+        channel.put(error or SnowflakeQueryError(f"Request {request_id} cancelled"))
+        channel.put(_END)
+
+    def close(self):
+        """Stop the worker process and fail any outstanding queries"""
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=5)
+        except Exception:
+            process.kill()
+        self._fail_pending("Snowflake worker stopped")
+
+    @staticmethod
+    def _drain(channel: queue.Queue, timeout: Optional[float]) -> Iterator[Frame]:
+        while True:
+            try:
+                item = channel.get(timeout=timeout)
+            except queue.Empty:
+                raise SnowflakeQueryError(f"No response from Snowflake worker within {timeout}s")
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def _read_responses(self, process: subprocess.Popen):
+        current: Optional[queue.Queue] = None
+        current_id = None
+        received = 0
+        cancelled = self._cancelled
+
+        for line in process.stdout:
+            received += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                frame = json.loads(line)
+            except json.JSONDecodeError:
+                if current is not None:
+                    current.put(ProtocolError(f"Malformed frame from worker: {line[:80]}"))
+                    current.put(_END)
+                    current = current_id = None
+                continue
+
+            if isinstance(frame, list):
+                if current is not None and current_id not in cancelled:
+                    current.put(frame)
+                continue
+            if not isinstance(frame, dict):
+                continue
+
+            if frame.get('event') == 'ready':
+                self.connect_ms = frame.get('connect_ms')
+                self._connected = True
+                self._ready.set()
+                continue
+
+            kind = frame.get('frame')
+            if kind == 'header':
+                if current is not None:
+                    # Previous result stopped mid-stream without a trailer
+                    current.put(ProtocolError("Result truncated by the worker"))
+                    current.put(_END)
+                with self._lock:
+                    current = self._pending.pop(frame.get('id'), None)
+                    current_id = frame.get('id')
+                    self._current, self._current_id = current, current_id
+                received = len(line) + 1
+                if current is not None:
+                    current.put(frame)
+            elif kind == 'trailer':
+                if current is not None and current_id not in cancelled:
+                    frame['bytes_received'] = received
+                    current.put(frame)
+                    current.put(_END)
+                with self._lock:
+                    cancelled.discard(current_id)
+                    current = current_id = self._current = self._current_id = None
+            elif kind == 'error':
+                with self._lock:
+                    if current is not None and frame.get('id') == current_id:
+                        channel, current, current_id = current, None, None
+                        self._current = self._current_id = None
+                    else:
+                        channel = self._pending.pop(frame.get('id'), None)
+                    if frame.get('id') in cancelled:
+                        cancelled.discard(frame.get('id'))
+                        channel = None
+                if channel is not None:
+                    channel.put(frame)
+                    channel.put(_END)
+
+        # stdout closed: the worker exited (or never connected)
+        self._ready.set()
+        if current is not None:
+            current.put(SnowflakeQueryError("Snowflake worker exited mid-result"))
+            current.put(_END)
+        self._fail_pending("Snowflake worker exited unexpectedly")
+
+    def _fail_pending(self, reason: str):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for channel in pending.values():
+            channel.put(SnowflakeQueryError(reason))
+            channel.put(_END)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
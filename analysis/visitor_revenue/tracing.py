@@ -0,0 +1,258 @@
+"""
+Span instrumentation for analyzer runs.
+
+A Tracer records named spans - wall time, thread CPU time, process peak RSS,
+and optional row and byte counts - around each stage of a run: worker or
+process startup, Snowflake login, warehouse execution, result transfer and
+parsing, DataFrame construction, insight generation and file writes.
+Spans nest per thread and inherit their parent's `step` (the analysis
+method), so every stage can be attributed to the analysis that caused it.
+
+Traces export as Chrome trace JSON (open in chrome://tracing or
+https://ui.perfetto.dev) and as a Prometheus textfile for node_exporter's
+textfile collector.
+
+Instrumentation is off unless a Tracer is passed in; the analyzers default
+to NULL_TRACER, whose span() hands back one shared no-op context manager
+without reading any clocks.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+# Attributes reported as dedicated columns/metrics rather than free-form args
+COUNTERS = ('rows', 'bytes')
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """High-water resident set size of this process"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Span:
+    """One timed stage; set() attaches rows, bytes or other attributes"""
+
+    __slots__ = ('name', 'attrs', 'start', 'duration', 'cpu', 'peak_rss', 'thread_id', '_cpu_start')
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+        self.cpu: Optional[float] = None
+        self.peak_rss: Optional[int] = None
+        self.thread_id = threading.get_ident()
+        self._cpu_start = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _SpanContext:
+    def __init__(self, tracer: 'Tracer', span: Span):
+        self._tracer = tracer
+        self._span = span
+
+    def __enter__(self) -> Span:
+        stack = self._tracer._stack()
+        if stack and 'step' not in self._span.attrs and 'step' in stack[-1].attrs:
+            self._span.attrs['step'] = stack[-1].attrs['step']
+        stack.append(self._span)
+        self._span._cpu_start = time.thread_time()
+        self._span.start = time.perf_counter()
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self._span
+        span.duration = time.perf_counter() - span.start
+        span.cpu = time.thread_time() - span._cpu_start
+        span.peak_rss = peak_rss_bytes()
+        if exc_type is not None:
+            span.attrs['error'] = exc_type.__name__
+        self._tracer._stack().pop()
+        self._tracer._finish(span)
+        return False
+
+
+class _NullSpan:
+    """Stands in for both the context manager and the span when tracing is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullTracer:
+    """Tracer that records nothing"""
+
+    enabled = False
+
+    def span(self, name: str, **attrs) -> _NullSpan:
+        return _NULL_SPAN
+
+    def add_span(self, name: str, start: float, duration: float, **attrs):
+        pass
+
+    def export(self):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+class Tracer:
+    """Collects spans for one run and exports them when the run ends"""
+
+    enabled = True
+
+    def __init__(self, trace_path: Optional[str] = None, metrics_path: Optional[str] = None,
+                 job: str = 'visitor_revenue'):
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.job = job
+        self.spans: List[Span] = []
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def span(self, name: str, **attrs) -> _SpanContext:
+        """Time a block: `with tracer.span('stage', step=...) as span: span.set(rows=n)`"""
+        return _SpanContext(self, Span(name, attrs))
+
+    def add_span(self, name: str, start: float, duration: float, **attrs):
+        """Record a stage timed elsewhere (e.g. warehouse time reported by cli-snowflake).
+
+        start is a time.perf_counter() value; the span inherits the current step.
+        """
+        span = Span(name, attrs)
+        stack = self._stack()
+        if stack and 'step' not in attrs and 'step' in stack[-1].attrs:
+            span.attrs['step'] = stack[-1].attrs['step']
+        span.start = start
+        span.duration = max(duration, 0.0)
+        self._finish(span)
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Spans as Chrome trace 'complete' events (microsecond timestamps)"""
+        pid = os.getpid()
+        thread_ids: Dict[int, int] = {}
+        events = []
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        for span in spans:
+            tid = thread_ids.setdefault(span.thread_id, len(thread_ids) + 1)
+            args = {key: value for key, value in span.attrs.items() if value is not None}
+            if span.cpu is not None:
+                args['cpu_ms'] = round(span.cpu * 1000, 3)
+            if span.peak_rss is not None:
+                args['peak_rss_mb'] = round(span.peak_rss / (1024 * 1024), 1)
+            events.append({
+                'name': span.name,
+                'cat': span.attrs.get('step', 'run'),
+                'ph': 'X',
+                'ts': round((span.start - self.origin) * 1e6, 1),
+                'dur': round(span.duration * 1e6, 1),
+                'pid': pid,
+                'tid': tid,
+                'args': args,
+            })
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+             'args': {'name': 'main' if tid == 1 else f'thread-{tid}'}}
+            for tid in thread_ids.values()
+        ]
+        return {'traceEvents': metadata + events, 'displayTimeUnit': 'ms',
+                'otherData': {'job': self.job, 'started_at': self.started_at}}
+
+    def prometheus_text(self) -> str:
+        """Per (stage, step) totals in Prometheus text exposition format"""
+        totals: Dict[tuple, Dict[str, float]] = {}
+        peak = 0
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            key = (span.name, str(span.attrs.get('step', '')))
+            entry = totals.setdefault(key, {'seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0, 'rows': 0, 'bytes': 0})
+            entry['seconds'] += span.duration
+            entry['cpu_seconds'] += span.cpu or 0.0
+            entry['calls'] += 1
+            for counter in COUNTERS:
+                entry[counter] += span.attrs.get(counter) or 0
+            peak = max(peak, span.peak_rss or 0)
+
+        metrics = [
+            ('seconds', 'Wall time spent in each stage during the last run'),
+            ('cpu_seconds', 'Thread CPU time spent in each stage during the last run'),
+            ('calls', 'Number of times each stage ran during the last run'),
+            ('rows', 'Rows handled by each stage during the last run'),
+            ('bytes', 'Bytes handled by each stage during the last run'),
+        ]
+        lines = []
+        for field, help_text in metrics:
+            name = f"{self.job}_stage_{field}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for (stage, step), entry in sorted(totals.items()):
+                lines.append(f'{name}{{stage="{_label(stage)}",step="{_label(step)}"}} {entry[field]:g}')
+        lines += [
+            f"# HELP {self.job}_peak_rss_bytes Peak resident set size of the last run",
+            f"# TYPE {self.job}_peak_rss_bytes gauge",
+            f"{self.job}_peak_rss_bytes {peak}",
+            f"# HELP {self.job}_last_run_timestamp_seconds Start time of the last run",
+            f"# TYPE {self.job}_last_run_timestamp_seconds gauge",
+            f"{self.job}_last_run_timestamp_seconds {self.started_at:.3f}",
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        """Write the trace and metrics files that were configured"""
+        if self.trace_path:
+            _write_atomic(self.trace_path, json.dumps(self.chrome_trace()))
+            print(f"Trace saved to {self.trace_path}")
+        if self.metrics_path:
+            _write_atomic(self.metrics_path, self.prometheus_text())
+            print(f"Metrics saved to {self.metrics_path}")
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_atomic(path: str, content: str):
+    # The textfile collector may read at any moment; never expose a partial file
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
@@ -2,64 +2,480 @@
 """
 Webflow Visitor-to-Revenue Analysis by Segment and Geography
 Analyzes conversion funnel from visitors to paid subscriptions with revenue metrics
+
+Result sets are held by a runtime-selected backend (--backend records,
+pandas or polars; see visitor_revenue.result_backends). pandas, NumPy,
+Polars and pyarrow are imported on first use, so startup stays cheap.
 """
 
 import os
+import sys
 import json
-import subprocess
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import seaborn as sns
-from typing import Dict, List, Tuple
+import argparse
+import contextlib
+import copy
+import dataclasses
+import functools
+import io
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
+from visitor_revenue.bulk_unload import DEFAULT_DOWNLOAD_WORKERS, Unload, open_dataset, reusable, unload
+from visitor_revenue.charts import DEFAULT_CHART_WORKERS, Chart, markdown_to_html, render_charts
+from visitor_revenue.checkpoints import RunCheckpoints
+from visitor_revenue.columnar_io import OUTPUT_FORMATS, result_path
+from visitor_revenue.concurrency import run_grouped
+from visitor_revenue.cost_planner import (DEFAULT_BUDGET_CONCURRENCY, DEFAULT_CREDITS_PER_HOUR, BudgetExceededError,
+                                          CostBudget, QueryCaptured, StepPlan, cost_table, explain_sql,
+                                          format_bytes, parse_explain, schedule)
+from visitor_revenue.consolidated import CONSOLIDATED_RESULT_KEYS, consolidated_visitor_query, split_visitor_groupings
+from visitor_revenue.daily_store import DEFAULT_REFETCH_DAYS, DEFAULT_STORE_PATH, DailyAggregateStore, visitor_trends, weekly_conversion
+from visitor_revenue.ingest import CONVERSION_SCHEMA, REVENUE_SCHEMA, VISITOR_SCHEMA, FrameSchema
+from visitor_revenue.insights import InsightRule, evaluate_insights
+from visitor_revenue.local_backend import DEFAULT_ROWS, SYNTHETIC_END_DATE, LocalSnowflake
+from visitor_revenue.mcp_backend import DEFAULT_POOL_SIZE
+from visitor_revenue.query_cache import DEFAULT_MAX_BYTES, CacheMissError, QueryCache
+from visitor_revenue.result_backends import RESULT_BACKENDS, get_result_backend
+from visitor_revenue.result_protocol import QueryResult, ResultStream
+from visitor_revenue.resilience import DEFAULT_HISTORY_PATH, CancelToken, LatencyHistory, QueryPolicy, QueryRunner
+from visitor_revenue.result_reuse import canonical_sql, date_window, query_costs, result_reuse_query, reused_results
+from visitor_revenue.single_flight import SingleFlight
+from visitor_revenue.snowflake_client import PROJECT_ROOT, SnowflakeQueryError, SnowflakeWorker, stream_query_subprocess
+from visitor_revenue.tracing import NULL_TRACER, Tracer
+
+if TYPE_CHECKING:
+    from visitor_revenue.backfill import BackfillManifest
+    from visitor_revenue.cube import VisitorCube
+    from visitor_revenue.mcp_backend import MCPQueryPool
+
 class WebflowVisitorRevenueAnalyzer:
-    def __init__(self):
-        self.analysis_date = datetime.now().strftime('%Y-%m-%d')
+    # Result key -> analysis method, in report order
+    ANALYSIS_STEPS = [
+        ('geography_visitors', 'analyze_visitor_metrics_by_geography'),
+        ('channel_visitors', 'analyze_visitor_metrics_by_channel'),
+        ('revenue_segments', 'analyze_revenue_by_segment'),
+        ('signup_conversion', 'analyze_signup_to_revenue_conversion'),
+        ('geo_channel_matrix', 'analyze_geo_channel_crossover'),
+        ('visitor_trends', 'analyze_visitor_trends'),
+    ]
+
+    # Executive-summary insights, in report order (see visitor_revenue.insights)
+    INSIGHT_RULES = [
+        InsightRule('geography_visitors', 'first',
+                    "• Top visitor region: {region} with {unique_visitors:,.0f} visitors"),
+        InsightRule('geography_visitors', 'count',
+                    "• {count} regions show above-median pre-signup conversion rates",
+                    metric='pre_signup_rate', comparison='>', threshold='median'),
+        InsightRule('geography_visitors', 'top', "  - {region}: {pre_signup_rate}% conversion rate",
+                    metric='pre_signup_rate', comparison='>', threshold='median', n=3),
+        InsightRule('channel_visitors', 'first',
+                    "• Top traffic channel: {channel} with {unique_visitors:,.0f} visitors"),
+        InsightRule('channel_visitors', 'count', "• {count} channels show above-median conversion rates",
+                    metric='pre_signup_rate', comparison='>', threshold='median'),
+        InsightRule('channel_visitors', 'best_ratio',
+                    "• Most efficient channel category: {channel_category} ({value:.1%} conversion)",
+                    metric='pre_signup_visitors', denominator='unique_visitors', group_by='channel_category'),
+        InsightRule('revenue_segments', 'sum', "• Total MRR across analyzed segments: ${value:,.0f}",
+                    metric='total_mrr'),
+        InsightRule('revenue_segments', 'first',
+                    "• Top revenue segment: {segment} - {plan_tier} (${total_mrr:,.0f} MRR)"),
+        InsightRule('revenue_segments', 'top_share', "• Revenue concentration: Top 2 segments = {value:.1f}% of MRR",
+                    metric='total_mrr', group_by='segment', n=2),
+        InsightRule('signup_conversion', 'mean', "• Recent 4-week avg signup→paid conversion: {value:.2f}%",
+                    metric='conversion_rate', head=4),
+        InsightRule('signup_conversion', 'mean', "• Average MRR per new subscription: ${value:.2f}",
+                    metric='avg_mrr_per_conversion', head=4),
+        InsightRule('signup_conversion', 'change', "• Conversion trend: {direction} ({value:+.2f}% points)",
+                    metric='conversion_rate', n=2),
+    ]
+
+    def __init__(self, query_mode: str = 'worker', max_concurrency: int = 1,
+                 cache: Optional[QueryCache] = None, consolidated: bool = False,
+                 daily_store: Optional[DailyAggregateStore] = None,
+                 output_formats: Sequence[str] = ('arrow',),
+                 local_backend: Optional[LocalSnowflake] = None,
+                 tracer: Optional[Tracer] = None, mcp_sessions: int = DEFAULT_POOL_SIZE,
+                 single_flight: Optional[SingleFlight] = None, query_runner: Optional[QueryRunner] = None,
+                 cube: bool = False, exact_counts: bool = False, analysis_date: Optional[str] = None,
+                 resume: bool = False, result_backend: str = 'pandas', charts: bool = False,
+                 chart_workers: int = DEFAULT_CHART_WORKERS, cost_budget: Optional[CostBudget] = None,
+                 bulk: bool = False, download_workers: int = DEFAULT_DOWNLOAD_WORKERS):
+        # As-of date (YYYY-MM-DD) every date window ends at; today by default,
+        # or the last day of the synthetic data when running locally
+        if analysis_date is None:
+            analysis_date = SYNTHETIC_END_DATE if local_backend is not None else datetime.now().strftime('%Y-%m-%d')
+        self.analysis_date = analysis_date
         self.results = {}
+        # 'worker' keeps one warm cli-snowflake process for the whole run;
+        # 'spawn' launches `npm run snowflake` per query (previous behaviour);
+        # 'mcp' sends queries to a pool of Snowflake MCP server sessions
+        self.query_mode = query_mode
+        self.mcp_sessions = mcp_sessions
+        # Number of analysis queries allowed in flight at once (1 = sequential)
+        self.max_concurrency = max_concurrency
+        # Optional on-disk result cache; None always queries Snowflake
+        self.cache = cache
+        # Share one execution among identical queries in flight in this
+        # process or other runs on this host; None runs every query
+        self.single_flight = single_flight
+        # Per-query deadlines, retries and hedging (see visitor_revenue.resilience)
+        self.query_runner = query_runner or QueryRunner()
+        # Fetch all visitor-detail groupings with one GROUPING SETS scan
+        self.consolidated = consolidated
+        # Pull a region x channel x day cube and derive the visitor-detail
+        # results from it; the cube stays in visitor_cube for ad-hoc slicing
+        self.cube = cube
+        self.visitor_cube: Optional['VisitorCube'] = None
+        # Cube distinct counts: HyperLogLog sketches (merge to any window or
+        # grouping, ~3% error) unless exact COUNT(DISTINCT) is required
+        self.exact_counts = exact_counts
+        # Local per-day aggregates; when set, trend and conversion analyses
+        # only fetch days the store is missing
+        self.daily_store = daily_store
+        self.output_dir = "/Users/rachelwolan/agent-chief-of-staff/analysis/visitor_revenue_output"
+        # Result file formats written by save_results (arrow by default; see columnar_io)
+        self.output_formats = list(output_formats)
+        # Table type results are held in: 'records' (pure Python), 'pandas' or 'polars'
+        self.result_backend = get_result_backend(result_backend)
+        # Render report charts in save_results (cached by input hash; see
+        # visitor_revenue.charts), up to chart_workers processes at once
+        self.charts = charts
+        self.chart_workers = chart_workers
+        # Also pull every region x channel x day row, unloaded to Parquet and
+        # downloaded by up to download_workers threads (see
+        # visitor_revenue.bulk_unload); visitor_detail is the lazily scanned dataset
+        self.bulk = bulk
+        self.download_workers = download_workers
+        self.unloads: Dict[str, Unload] = {}
+        self.visitor_detail = None
+        # Synthetic DuckDB stand-in; when set, no query reaches Snowflake
+        self.local_backend = local_backend
+        # Per-stage span instrumentation; NULL_TRACER records nothing
+        self.tracer = tracer or NULL_TRACER
+        self.query_timings = []
+        # In-memory size of each query's result table, by description
+        self.result_memory: Dict[str, int] = {}
+        # Statements that actually reached the backend (not served by the
+        # query cache or joined in flight); see check_result_reuse
+        self.executed_queries = []
+        # Queries that failed for good: query, kind, attempts, error
+        self.failures = []
+        # EXPLAIN every step's query first and run them cheapest first within
+        # this budget, shortening or refusing what doesn't fit (see
+        # visitor_revenue.cost_planner); None runs every query unplanned
+        self.cost_budget = cost_budget
+        self.query_plans: List[StepPlan] = []
+        # Restore steps checkpointed by an earlier run for this date instead
+        # of re-running them (see visitor_revenue.checkpoints)
+        self.resume = resume
+        # Per-thread bookkeeping for the step being checkpointed: queries run, whether one failed
+        self._step = threading.local()
+        self._worker = None
+        self._mcp_pool = None
+        self._worker_lock = threading.Lock()
 
-    def execute_snowflake_query(self, query: str, description: str = "") -> pd.DataFrame:
-        """Execute a Snowflake query and return results as DataFrame"""
+    def execute_snowflake_query(self, query: str, description: str = "", schema: Optional[FrameSchema] = None):
+        """Execute a Snowflake query and return results as a table of the result backend.
+
+        schema (see visitor_revenue.ingest) sets how the result's columns are stored.
+        """
         print(f"\n{'='*60}")
         print(f"Executing: {description}")
         print(f"{'='*60}")
 
         try:
-            # Use npm run snowflake command
-            cmd = ['npm', 'run', 'snowflake', '--', 'query', query]
-            result = subprocess.run(cmd, capture_output=True, text=True, cwd='/Users/rachelwolan/agent-chief-of-staff')
-
-            if result.returncode != 0:
-                print(f"Error executing query: {result.stderr}")
-                return pd.DataFrame()
-
-            # Parse JSON output
-            output_lines = result.stdout.strip().split('\n')
-            for line in reversed(output_lines):
-                if line.startswith('[') or line.startswith('{'):
-                    try:
-                        data = json.loads(line)
-                        if isinstance(data, list):
-                            return pd.DataFrame(data)
-                    except json.JSONDecodeError:
-                        continue
+            result = self.fetch_result(query, description)
+            with self.tracer.span('build_dataframe', backend=self.result_backend.name) as span:
+                df = self.result_backend.from_tuples(result.rows, result.columns, schema)
+                nbytes = self.result_backend.nbytes(df)
+                span.set(rows=len(df), bytes=nbytes)
+            self.result_memory[description] = nbytes
+            print(f"Result: {len(df):,} rows, {format_bytes(nbytes)} in memory")
+            return df
 
-            return pd.DataFrame()
+        except QueryCaptured:
+            raise
+
+        except SnowflakeQueryError as e:
+            print(f"Error executing query: {e}")
+            self._record_failure(description, e)
+            return self.result_backend.frame([])
 
         except Exception as e:
             print(f"Error: {str(e)}")
-            return pd.DataFrame()
+            self._record_failure(description, e)
+            return self.result_backend.frame([])
+
+    def fetch_rows(self, query: str, description: str = "") -> List[Dict]:
+        """Run a query (through the cache, if enabled) and return row dicts; raises on failure"""
+        return self.fetch_result(query, description).to_dicts()
+
+    def fetch_result(self, query: str, description: str = "") -> QueryResult:
+        """Run a query (through the cache, if enabled) and return its columns and row tuples; raises on failure"""
+        self._admit(query, description)
+        started = time.perf_counter()
+        step_queries = getattr(self._step, 'queries', None)
+        if step_queries is not None:
+            step_queries.append({'description': description, 'hash': QueryCache.key(query, self.analysis_date)})
+        try:
+            with self.tracer.span('query', query=description):
+                load = functools.partial(self._load_rows, query, description)
+                if self.cache is not None:
+                    return self.cache.fetch(query, self.analysis_date, load)
+                return load()
+        finally:
+            self.query_timings.append((description, time.perf_counter() - started))
+
+    def _admit(self, query: str, description: str):
+        """Raise instead of running the query while planning, or if the planner refused it"""
+        captured = getattr(self._step, 'captured', None)
+        if captured is not None:
+            # Planning: record the step's query instead of running it
+            captured.append((query, description))
+            raise QueryCaptured(description)
+        plan = getattr(self._step, 'plan', None)
+        if plan is not None and plan.decision == 'refuse':
+            raise BudgetExceededError(plan.reason)
+
+    def unload_query(self, query: str, description: str, name: str) -> Optional[Unload]:
+        """Unload a large result to Parquet files under output_dir/<name>_<date>; None on failure.
+
+        Rows never pass through JSON frames. A complete unload of the same
+        query is reused while the query cache would still serve it.
+        """
+        print(f"\n{'='*60}")
+        print(f"Unloading: {description}")
+        print(f"{'='*60}")
+
+        try:
+            self._admit(query, description)
+            if self.query_mode == 'mcp' and self.local_backend is None:
+                raise SnowflakeQueryError("Bulk unloads need the worker or spawn transport "
+                                          "(MCP sessions can't download stage files)")
+            path = os.path.join(self.output_dir, f"{name}_{self.analysis_date}")
+            offline = self.cache is not None and self.cache.mode == 'offline'
+            result = None
+            if self.cache is not None and self.cache.mode != 'refresh':
+                result = reusable(path, query, self.analysis_date, allow_stale=offline)
+            if result is None and offline:
+                raise CacheMissError("Unloaded result not on disk (offline mode)")
+
+            started = time.perf_counter()
+            step_queries = getattr(self._step, 'queries', None)
+            if step_queries is not None:
+                step_queries.append({'description': description, 'hash': QueryCache.key(query, self.analysis_date)})
+            try:
+                with self.tracer.span('unload', query=description) as span:
+                    if result is None:
+                        result = unload(query, self.analysis_date, path,
+                                        functools.partial(self._run_statement, description), self.download_workers)
+                    span.set(rows=result.rows, files=result.files, bytes=result.bytes, reused=result.reused)
+            finally:
+                self.query_timings.append((description, time.perf_counter() - started))
+            if not result.reused:
+                self.executed_queries.append({
+                    'description': description,
+                    'query_id': result.query_id,
+                    'server_ms': result.server_ms,
+                    'result_reused': None,
+                })
+            self.unloads[description] = result
+            print(f"{'Reused' if result.reused else 'Unloaded'} {result.rows:,} rows in {result.files} Parquet "
+                  f"file(s), {format_bytes(result.bytes)}: {result.path}")
+            return result
+
+        except QueryCaptured:
+            raise
+
+        except SnowflakeQueryError as e:
+            print(f"Error executing query: {e}")
+            self._record_failure(description, e)
+            return None
+
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            self._record_failure(description, e)
+            return None
+
+    def _load_rows(self, query: str, description: str = "") -> QueryResult:
+        if self.single_flight is not None:
+            return self.single_flight.do(query, self.analysis_date, lambda: self._run_query(query, description))
+        return self._run_query(query, description)
+
+    def iter_snowflake_query(self, query: str, description: str = "", chunksize: int = 50000,
+                             schema: Optional[FrameSchema] = None):
+        """Stream a query result as result-backend tables of at most chunksize rows.
+
+        Rows are parsed as they arrive and the result cache is bypassed, so
+        memory stays bounded by one chunk regardless of result size.
+        """
+        print(f"\n{'='*60}")
+        print(f"Streaming: {description}")
+        print(f"{'='*60}")
+
+        stream = self._open_stream(query)
+        columns = stream.column_names
+        for chunk in stream.iter_chunks(chunksize):
+            yield self.result_backend.from_tuples(chunk, columns, schema)
+
+    def _open_stream(self, query: str) -> ResultStream:
+        query = canonical_sql(query)
+        if self.local_backend is not None:
+            return self.local_backend.stream(query)
+        if self.query_mode == 'spawn':
+            return stream_query_subprocess(query)
+        if self.query_mode == 'mcp':
+            return self._get_mcp_pool().stream(query)
+        return self._get_worker().submit(query)
+
+    def _record_failure(self, description: str, error: Exception):
+        self._step.failed = True
+        self.failures.append({
+            'query': description,
+            'kind': getattr(error, 'kind', 'error'),
+            'attempts': getattr(error, 'attempts', 1),
+            'error': str(error),
+        })
+
+    def _run_query(self, query: str, description: str = "") -> QueryResult:
+        """Run a query under the runner's deadline, retry and hedging policy"""
+        return self.query_runner.run(functools.partial(self._attempt_query, query, description), description)
+
+    def _attempt_query(self, query: str, description: str, token: CancelToken) -> QueryResult:
+        token.raise_if_cancelled()
+        # Spawn mode: process startup; worker mode: sending the request
+        with self.tracer.span('open_stream', transport=self._transport()):
+            stream = self._open_stream(query)
+        token.on_cancel(stream.cancel)
+        # Spawn mode: Node/tsx startup, login and execution; worker mode: execution
+        with self.tracer.span('await_header'):
+            header = stream.header
+        if self.tracer.enabled:
+            self._trace_server_timings(header)
+        with self.tracer.span('transfer_and_parse') as span:
+            result = stream.to_result()
+            span.set(rows=len(result.rows), bytes=(stream.trailer or {}).get('bytes_received'))
+        self.executed_queries.append({
+            'description': description,
+            'query_id': (stream.trailer or {}).get('query_id'),
+            'server_ms': header.get('elapsed_ms'),
+            'result_reused': None,
+        })
+        return result
+
+    def _run_statement(self, description: str, sql: str) -> ResultStream:
+        """Run one statement of a multi-statement operation under the runner's deadline and retry policy.
+
+        The result is read in full inside the attempt, so the deadline
+        covers it. Statements aren't hedged: two concurrent COPY INTOs of the
+        same location would write over each other.
+        """
+        runner = QueryRunner(dataclasses.replace(self.query_runner.policy, hedge_quantile=None),
+                             self.query_runner.history)
+        return runner.run(functools.partial(self._attempt_statement, sql), f"{description}: {sql.split(None, 1)[0]}")
+
+    def _attempt_statement(self, sql: str, token: CancelToken) -> ResultStream:
+        token.raise_if_cancelled()
+        stream = self._open_stream(sql)
+        token.on_cancel(stream.cancel)
+        return stream.buffered()
+
+    def _transport(self) -> str:
+        if self.local_backend is not None:
+            return 'local'
+        return self.query_mode
+
+    def _trace_server_timings(self, header: Dict):
+        """Record login and warehouse time reported by cli-snowflake as spans ending now"""
+        arrived = time.perf_counter()
+        elapsed = header.get('elapsed_ms')
+        if elapsed is None:
+            return
+        self.tracer.add_span('warehouse_execute', arrived - elapsed / 1000, elapsed / 1000)
+        connect = header.get('connect_ms')
+        if connect is not None:
+            self.tracer.add_span('snowflake_connect', arrived - (elapsed + connect) / 1000, connect / 1000)
+
+    def _get_worker(self) -> SnowflakeWorker:
+        with self._worker_lock:
+            if self._worker is None:
+                with self.tracer.span('worker_start'):
+                    self._worker = SnowflakeWorker()
+                    self._worker.start(timeout=self.query_runner.policy.connect_timeout)
+                if self.tracer.enabled and self._worker.connect_ms is not None:
+                    # Login happened just before the worker reported ready
+                    connect = self._worker.connect_ms / 1000
+                    self.tracer.add_span('snowflake_connect', time.perf_counter() - connect, connect)
+            return self._worker
+
+    def _get_mcp_pool(self) -> 'MCPQueryPool':
+        from visitor_revenue.mcp_backend import MCPQueryPool
+
+        with self._worker_lock:
+            if self._mcp_pool is None:
+                with self.tracer.span('mcp_pool_start', sessions=self.mcp_sessions):
+                    pool = MCPQueryPool(size=self.mcp_sessions)
+                    pool.start()
+                self._mcp_pool = pool
+            return self._mcp_pool
+
+    def check_result_reuse(self):
+        """Look up which executed queries Snowflake answered from its persisted result cache"""
+        query_ids = [entry['query_id'] for entry in self.executed_queries if entry['query_id']]
+        if not query_ids or self.local_backend is not None:
+            return
+        try:
+            with self.tracer.span('check_result_reuse'):
+                history = self._open_stream(result_reuse_query(query_ids)).to_dicts()
+        except SnowflakeQueryError as e:
+            print(f"Could not read query history: {e}")
+            return
+
+        reused, costs = reused_results(history), query_costs(history)
+        for entry in self.executed_queries:
+            entry['result_reused'] = reused.get(entry['query_id'])
+            entry.update(costs.get(entry['query_id'], {}))
+        hits = [entry for entry in self.executed_queries if entry['result_reused']]
+        print(f"\nSnowflake result cache: {len(hits)} of {len(query_ids)} queries reused a persisted result")
+        for entry in hits:
+            print(f"  • {entry['description']}")
+
+    def close(self):
+        """Shut down the persistent Snowflake worker or MCP sessions, if started"""
+        if self._worker is not None:
+            self._worker.close()
+            self._worker = None
+        if self._mcp_pool is not None:
+            self._mcp_pool.close()
+            self._mcp_pool = None
+
+    def print_table(self, data, title: str, limit: int = 10):
+        """Print the first rows of a result set"""
+        print(f"\n{title}:")
+        print(self.result_backend.format_table(data, limit))
+
+    def _window_days(self, days: int) -> int:
+        """Days of history a step queries: `days`, unless the cost planner shortened its window"""
+        self._step.days = days
+        plan = getattr(self._step, 'plan', None)
+        if plan is not None and plan.window_days is not None:
+            return min(days, plan.window_days)
+        return days
 
     def analyze_visitor_metrics_by_geography(self):
         """Analyze visitor metrics by geographic region"""
-        query = """
+        start_date, end_date = date_window(self.analysis_date, self._window_days(30))
+        query = f"""
         WITH date_range AS (
             SELECT
-                DATEADD(day, -30, CURRENT_DATE()) AS start_date,
-                CURRENT_DATE() AS end_date
+                DATE '{start_date}' AS start_date,
+                DATE '{end_date}' AS end_date
         ),
         visitor_metrics AS (
             SELECT
@@ -85,20 +501,20 @@ class WebflowVisitorRevenueAnalyzer:
         LIMIT 25
         """
 
-        df = self.execute_snowflake_query(query, "Visitor Metrics by Geography (Last 30 Days)")
-        if not df.empty:
+        df = self.execute_snowflake_query(query, "Visitor Metrics by Geography (Last 30 Days)", VISITOR_SCHEMA)
+        if not self.result_backend.empty(df):
             self.results['geography_visitors'] = df
-            print(f"\nTop Geographic Regions by Visitor Volume:")
-            print(df.head(10).to_string(index=False))
+            self.print_table(df, "Top Geographic Regions by Visitor Volume", 10)
         return df
 
     def analyze_visitor_metrics_by_channel(self):
         """Analyze visitor metrics by marketing channel"""
-        query = """
+        start_date, end_date = date_window(self.analysis_date, self._window_days(30))
+        query = f"""
         WITH date_range AS (
             SELECT
-                DATEADD(day, -30, CURRENT_DATE()) AS start_date,
-                CURRENT_DATE() AS end_date
+                DATE '{start_date}' AS start_date,
+                DATE '{end_date}' AS end_date
         ),
         channel_metrics AS (
             SELECT
@@ -126,11 +542,11 @@ class WebflowVisitorRevenueAnalyzer:
         LIMIT 30
         """
 
-        df = self.execute_snowflake_query(query, "Visitor Metrics by Marketing Channel (Last 30 Days)")
-        if not df.empty:
+        df = self.execute_snowflake_query(query, "Visitor Metrics by Marketing Channel (Last 30 Days)",
+                                          VISITOR_SCHEMA)
+        if not self.result_backend.empty(df):
             self.results['channel_visitors'] = df
-            print(f"\nTop Marketing Channels by Visitor Volume:")
-            print(df.head(10).to_string(index=False))
+            self.print_table(df, "Top Marketing Channels by Visitor Volume", 10)
         return df
 
     def analyze_revenue_by_segment(self):
@@ -167,20 +583,23 @@ class WebflowVisitorRevenueAnalyzer:
         LIMIT 20
         """
 
-        df = self.execute_snowflake_query(query, "Current Revenue by Customer Segment")
-        if not df.empty:
+        df = self.execute_snowflake_query(query, "Current Revenue by Customer Segment", REVENUE_SCHEMA)
+        if not self.result_backend.empty(df):
             self.results['revenue_segments'] = df
-            print(f"\nRevenue by Customer Segment:")
-            print(df.head(10).to_string(index=False))
+            self.print_table(df, "Revenue by Customer Segment", 10)
         return df
 
     def analyze_signup_to_revenue_conversion(self):
         """Analyze conversion from signups to revenue"""
-        query = """
+        if self.daily_store is not None:
+            return self._analyze_signup_to_revenue_conversion_incremental()
+
+        start_date, end_date = date_window(self.analysis_date, self._window_days(90), 1)
+        query = f"""
         WITH date_range AS (
             SELECT
-                DATEADD(day, -90, CURRENT_DATE()) AS start_date,
-                DATEADD(day, -1, CURRENT_DATE()) AS end_date
+                DATE '{start_date}' AS start_date,
+                DATE '{end_date}' AS end_date
         ),
         daily_signups AS (
             SELECT
@@ -211,7 +630,7 @@ class WebflowVisitorRevenueAnalyzer:
             FULL OUTER JOIN new_subscriptions n ON s.signup_date = n.subscription_date
         )
         SELECT
-            DATE_TRUNC('week', date) AS week,
+            DATE_TRUNC('week', date)::DATE AS week,
             SUM(signups) AS total_signups,
             SUM(new_subscriptions) AS total_new_subscriptions,
             ROUND(SUM(new_mrr), 0) AS total_new_mrr,
@@ -223,20 +642,21 @@ class WebflowVisitorRevenueAnalyzer:
         LIMIT 13
         """
 
-        df = self.execute_snowflake_query(query, "Signup to Subscription Conversion (Last 90 Days)")
-        if not df.empty:
+        df = self.execute_snowflake_query(query, "Signup to Subscription Conversion (Last 90 Days)",
+                                          CONVERSION_SCHEMA)
+        if not self.result_backend.empty(df):
             self.results['signup_conversion'] = df
-            print(f"\nWeekly Signup to Revenue Conversion:")
-            print(df.head(10).to_string(index=False))
+            self.print_table(df, "Weekly Signup to Revenue Conversion", 10)
         return df
 
     def analyze_geo_channel_crossover(self):
         """Analyze the intersection of geography and channel performance"""
-        query = """
+        start_date, end_date = date_window(self.analysis_date, self._window_days(30))
+        query = f"""
         WITH date_range AS (
             SELECT
-                DATEADD(day, -30, CURRENT_DATE()) AS start_date,
-                CURRENT_DATE() AS end_date
+                DATE '{start_date}' AS start_date,
+                DATE '{end_date}' AS end_date
         ),
         geo_channel_metrics AS (
             SELECT
@@ -267,20 +687,23 @@ class WebflowVisitorRevenueAnalyzer:
         LIMIT 50
         """
 
-        df = self.execute_snowflake_query(query, "Geography x Channel Performance Matrix")
-        if not df.empty:
+        df = self.execute_snowflake_query(query, "Geography x Channel Performance Matrix", VISITOR_SCHEMA)
+        if not self.result_backend.empty(df):
             self.results['geo_channel_matrix'] = df
-            print(f"\nTop Geography-Channel Combinations:")
-            print(df.head(15).to_string(index=False))
+            self.print_table(df, "Top Geography-Channel Combinations", 15)
         return df
 
     def analyze_visitor_trends(self):
         """Analyze visitor and conversion trends over time"""
-        query = """
+        if self.daily_store is not None:
+            return self._analyze_visitor_trends_incremental()
+
+        start_date, end_date = date_window(self.analysis_date, self._window_days(30))
+        query = f"""
         WITH date_range AS (
             SELECT
-                DATEADD(day, -30, CURRENT_DATE()) AS start_date,
-                CURRENT_DATE() AS end_date
+                DATE '{start_date}' AS start_date,
+                DATE '{end_date}' AS end_date
         ),
         daily_visitor_metrics AS (
             SELECT
@@ -306,11 +729,129 @@ class WebflowVisitorRevenueAnalyzer:
         ORDER BY date DESC
         """
 
-        df = self.execute_snowflake_query(query, "Daily Visitor Trends (Last 30 Days)")
-        if not df.empty:
+        df = self.execute_snowflake_query(query, "Daily Visitor Trends (Last 30 Days)", VISITOR_SCHEMA)
+        if not self.result_backend.empty(df):
+            self.results['visitor_trends'] = df
+            self.print_table(df, "Recent Visitor Trend Summary", 7)
+        return df
+
+    def unload_visitor_detail(self):
+        """Unload every region x channel x day row of the window (no LIMIT) as a Parquet dataset"""
+        start_date, end_date = date_window(self.analysis_date, self._window_days(30))
+        query = f"""
+        WITH date_range AS (
+            SELECT
+                DATE '{start_date}' AS start_date,
+                DATE '{end_date}' AS end_date
+        )
+        SELECT
+            v.DATE_DAY AS date,
+            COALESCE(v.CUSTOM_REGION, 'Unknown') AS region,
+            COALESCE(v.DIM_CHANNEL_CATEGORY, 'Unknown') AS channel_category,
+            COALESCE(v.DIM_CHANNEL, 'Unknown') AS channel,
+            COUNT(DISTINCT v.ID_VISITOR) AS unique_visitors,
+            COUNT(DISTINCT CASE WHEN v.IS_NEW_VISITOR THEN v.ID_VISITOR END) AS new_visitors,
+            COUNT(DISTINCT CASE WHEN v.IS_PRE_SIGNUP_VISITOR THEN v.ID_VISITOR END) AS pre_signup_visitors
+        FROM analytics.webflow.DAILY_MARKETING_VISITOR_DETAILS v
+        CROSS JOIN date_range dr
+        WHERE v.DATE_DAY BETWEEN dr.start_date AND dr.end_date
+        GROUP BY 1, 2, 3, 4
+        """
+
+        result = self.unload_query(query, "Visitor Detail: Region x Channel x Day (Last 30 Days)", 'visitor_detail')
+        if result is None:
+            return None
+        try:
+            # Only the first rows are read here; the rest stay on disk until scanned
+            self.visitor_detail = open_dataset(result.path)
+            self.print_table(self.result_backend.frame(self.visitor_detail.head(10).to_pylist()),
+                             "Visitor Detail (first rows)", 10)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            self._record_failure("Visitor Detail: Region x Channel x Day (Last 30 Days)", e)
+        return self.visitor_detail
+
+    def analyze_visitor_details_consolidated(self):
+        """Fetch geography, channel, crossover and trend groupings in one scan"""
+        df = self.execute_snowflake_query(consolidated_visitor_query(self.analysis_date, self._window_days(30)), "Visitor Details, All Groupings (Last 30 Days)")
+        if self.result_backend.empty(df):
+            return df
+
+        self._store_groupings(split_visitor_groupings(self.result_backend.to_rows(df)))
+        return df
+
+    def analyze_visitor_cube(self):
+        """Fetch the region x channel x day cube and derive geography, channel, crossover and trends from it"""
+        # NumPy-backed: imported only when the cube is used
+        from visitor_revenue.cube import VisitorCube, visitor_cube_query
+        from visitor_revenue.hll import error_bound
+
+        df = self.execute_snowflake_query(visitor_cube_query(self.analysis_date, exact=self.exact_counts,
+                                                             days=self._window_days(30)),
+                                          "Visitor Cube: Region x Channel x Day (Last 30 Days)")
+        if self.result_backend.empty(df):
+            return df
+
+        with self.tracer.span('build_cube', rows=len(df)):
+            self.visitor_cube = VisitorCube(self.result_backend.to_rows(df))
+        print(f"\nVisitor cube: {self.visitor_cube.cells:,} region x channel x day cells held for in-memory slicing")
+        if self.visitor_cube.sketched:
+            print(f"Visitor counts are HyperLogLog estimates (±{error_bound():.1%}, 95% confidence); "
+                  f"use --exact for audited numbers")
+        self._store_groupings(split_visitor_groupings(self.visitor_cube.grouping_rows()))
+        return df
+
+    def _store_groupings(self, groupings: Dict[str, List[Dict]]):
+        for key, title, limit in [
+            ('geography_visitors', "Top Geographic Regions by Visitor Volume", 10),
+            ('channel_visitors', "Top Marketing Channels by Visitor Volume", 10),
+            ('geo_channel_matrix', "Top Geography-Channel Combinations", 15),
+            ('visitor_trends', "Recent Visitor Trend Summary", 7),
+        ]:
+            if groupings.get(key):
+                self.results[key] = self.result_backend.frame(groupings[key], VISITOR_SCHEMA)
+                self.print_table(self.results[key], title, limit)
+
+    def _refresh_daily_store(self, table: str, start: date, end: date, description: str):
+        """Fetch whatever the daily store is missing for [start, end]"""
+        spans = self.daily_store.refresh(
+            table, start, end,
+            lambda sql: self.fetch_rows(sql, f"{description}: daily aggregates"),
+        )
+        if not spans:
+            print(f"\n{description}: all {(end - start).days + 1} days served from the daily store")
+        else:
+            fetched = ', '.join(f"{first} to {last}" for first, last in spans)
+            print(f"\n{description}: fetched {fetched}, remaining days served from the daily store")
+
+    def _analyze_signup_to_revenue_conversion_incremental(self):
+        start, end = map(date.fromisoformat, date_window(self.analysis_date, self._window_days(90), 1))
+        try:
+            self._refresh_daily_store('conversion_daily', start, end, "Signup to Subscription Conversion")
+        except SnowflakeQueryError as e:
+            print(f"Error executing query: {e}")
+            self._record_failure("Signup to Subscription Conversion", e)
+            return self.result_backend.frame([])
+
+        df = self.result_backend.frame(weekly_conversion(self.daily_store, start, end), CONVERSION_SCHEMA)
+        if not self.result_backend.empty(df):
+            self.results['signup_conversion'] = df
+            self.print_table(df, "Weekly Signup to Revenue Conversion", 10)
+        return df
+
+    def _analyze_visitor_trends_incremental(self):
+        start, end = map(date.fromisoformat, date_window(self.analysis_date, self._window_days(30)))
+        try:
+            self._refresh_daily_store('visitor_daily', start, end, "Daily Visitor Trends")
+        except SnowflakeQueryError as e:
+            print(f"Error executing query: {e}")
+            self._record_failure("Daily Visitor Trends", e)
+            return self.result_backend.frame([])
+
+        df = self.result_backend.frame(visitor_trends(self.daily_store, start, end), VISITOR_SCHEMA)
+        if not self.result_backend.empty(df):
             self.results['visitor_trends'] = df
-            print(f"\nRecent Visitor Trend Summary:")
-            print(df.head(7).to_string(index=False))
+            self.print_table(df, "Recent Visitor Trend Summary", 7)
         return df
 
     def generate_insights_and_recommendations(self):
@@ -321,72 +862,10 @@ class WebflowVisitorRevenueAnalyzer:
         print(f"Analysis Date: {self.analysis_date}")
         print(f"Analysis Period: Last 30-90 days")
 
-        insights = []
+        with self.tracer.span('generate_insights'):
+            insights = evaluate_insights(self.INSIGHT_RULES, self.results)
         recommendations = []
 
-        # Geography insights
-        if 'geography_visitors' in self.results and not self.results['geography_visitors'].empty:
-            geo_df = self.results['geography_visitors']
-            top_geo = geo_df.iloc[0]
-            high_conv_geos = geo_df[geo_df['pre_signup_rate'] > geo_df['pre_signup_rate'].median()]
-
-            insights.append(f"• Top visitor region: {top_geo['region']} with {int(top_geo['unique_visitors']):,} visitors")
-            insights.append(f"• {len(high_conv_geos)} regions show above-median pre-signup conversion rates")
-
-            if len(high_conv_geos) > 0:
-                best_converting = high_conv_geos.nlargest(3, 'pre_signup_rate')
-                for _, row in best_converting.iterrows():
-                    insights.append(f"  - {row['region']}: {row['pre_signup_rate']}% conversion rate")
-
-        # Channel insights
-        if 'channel_visitors' in self.results and not self.results['channel_visitors'].empty:
-            chan_df = self.results['channel_visitors']
-            top_channel = chan_df.iloc[0]
-            high_conv_channels = chan_df[chan_df['pre_signup_rate'] > chan_df['pre_signup_rate'].median()]
-
-            insights.append(f"• Top traffic channel: {top_channel['channel']} with {int(top_channel['unique_visitors']):,} visitors")
-            insights.append(f"• {len(high_conv_channels)} channels show above-median conversion rates")
-
-            # Calculate efficiency metrics
-            chan_summary = chan_df.groupby('channel_category').agg({
-                'unique_visitors': 'sum',
-                'pre_signup_visitors': 'sum'
-            }).reset_index()
-            chan_summary['efficiency'] = chan_summary['pre_signup_visitors'] / chan_summary['unique_visitors']
-            best_category = chan_summary.nlargest(1, 'efficiency').iloc[0]
-            insights.append(f"• Most efficient channel category: {best_category['channel_category']} ({best_category['efficiency']:.1%} conversion)")
-
-        # Revenue insights
-        if 'revenue_segments' in self.results and not self.results['revenue_segments'].empty:
-            rev_df = self.results['revenue_segments']
-            total_mrr = rev_df['total_mrr'].sum()
-            top_segment = rev_df.iloc[0]
-
-            insights.append(f"• Total MRR across analyzed segments: ${total_mrr:,.0f}")
-            insights.append(f"• Top revenue segment: {top_segment['segment']} - {top_segment['plan_tier']} (${top_segment['total_mrr']:,.0f} MRR)")
-
-            # Calculate segment concentration
-            segment_summary = rev_df.groupby('segment')['total_mrr'].sum().sort_values(ascending=False)
-            if len(segment_summary) > 0:
-                top_2_concentration = segment_summary.head(2).sum() / segment_summary.sum() * 100
-                insights.append(f"• Revenue concentration: Top 2 segments = {top_2_concentration:.1f}% of MRR")
-
-        # Conversion funnel insights
-        if 'signup_conversion' in self.results and not self.results['signup_conversion'].empty:
-            conv_df = self.results['signup_conversion']
-            recent_weeks = conv_df.head(4)
-            avg_conversion = recent_weeks['conversion_rate'].mean()
-            avg_mrr_per_conv = recent_weeks['avg_mrr_per_conversion'].mean()
-
-            insights.append(f"• Recent 4-week avg signup→paid conversion: {avg_conversion:.2f}%")
-            insights.append(f"• Average MRR per new subscription: ${avg_mrr_per_conv:.2f}")
-
-            # Trend analysis
-            if len(conv_df) >= 4:
-                recent_trend = conv_df.head(2)['conversion_rate'].mean() - conv_df.iloc[2:4]['conversion_rate'].mean()
-                trend_direction = "improving" if recent_trend > 0 else "declining"
-                insights.append(f"• Conversion trend: {trend_direction} ({recent_trend:+.2f}% points)")
-
         # Generate recommendations
         if insights:
             recommendations.append("1. GEOGRAPHIC EXPANSION:")
@@ -423,15 +902,21 @@ class WebflowVisitorRevenueAnalyzer:
 
     def save_results(self):
         """Save analysis results to files"""
-        output_dir = "/Users/rachelwolan/agent-chief-of-staff/analysis/visitor_revenue_output"
+        output_dir = self.output_dir
         os.makedirs(output_dir, exist_ok=True)
 
-        # Save DataFrames to CSV
+        # Save result sets in each requested format (Arrow IPC by default)
         for key, df in self.results.items():
-            if isinstance(df, pd.DataFrame) and not df.empty:
-                filename = f"{output_dir}/{key}_{self.analysis_date}.csv"
-                df.to_csv(filename, index=False)
-                print(f"Saved {key} to {filename}")
+            if not self.result_backend.empty(df):
+                for fmt in self.output_formats:
+                    filename = result_path(output_dir, key, self.analysis_date, fmt)
+                    with self.tracer.span('write_results', result=key, format=fmt) as span:
+                        self.result_backend.write(df, filename, fmt)
+                        if self.tracer.enabled:
+                            span.set(bytes=os.path.getsize(filename))
+                    print(f"Saved {key} to {filename}")
+
+        charts = self.render_charts() if self.charts else []
 
         # Generate summary report
         insights, recommendations = self.generate_insights_and_recommendations()
@@ -451,9 +936,9 @@ This analysis examines visitor-to-revenue conversion patterns across geographic
 
 {chr(10).join(recommendations)}
 
-## Data Tables
+{self._charts_section(charts)}{self._unloads_section()}{self._estimates_section()}{self._query_costs_section()}{self._data_gaps_section()}## Data Tables
 
-See accompanying CSV files for detailed data.
+See accompanying {' / '.join(fmt.upper() for fmt in self.output_formats)} files for detailed data.
 """
 
         report_file = f"{output_dir}/visitor_revenue_report_{self.analysis_date}.md"
@@ -461,27 +946,548 @@ See accompanying CSV files for detailed data.
             f.write(report_content)
         print(f"\nReport saved to {report_file}")
 
+        if charts:
+            # Self-contained copy with the charts inlined, for sharing as one file
+            html_file = f"{output_dir}/visitor_revenue_report_{self.analysis_date}.html"
+            with open(html_file, 'w') as f:
+                f.write(markdown_to_html(report_content, output_dir, f"Webflow Visitor-to-Revenue Analysis {self.analysis_date}"))
+            print(f"HTML report saved to {html_file}")
+
+    def render_charts(self) -> List[Chart]:
+        """Render (or reuse) the report charts for the current results"""
+        rows = {key: self.result_backend.to_rows(df) for key, df in self.results.items()
+                if not self.result_backend.empty(df)}
+        with self.tracer.span('render_charts') as span:
+            charts = render_charts(rows, os.path.join(self.output_dir, 'charts'), self.chart_workers)
+            span.set(rendered=sum(not chart.cached for chart in charts), cached=sum(chart.cached for chart in charts))
+        if charts:
+            print(f"Charts: {sum(not chart.cached for chart in charts)} rendered, "
+                  f"{sum(chart.cached for chart in charts)} unchanged")
+        return charts
+
+    def _charts_section(self, charts: List[Chart]) -> str:
+        """Report section embedding the rendered charts (paths relative to the report)"""
+        if not charts:
+            return ""
+        images = [f"![{chart.spec.title}]({os.path.relpath(chart.path, self.output_dir)})" for chart in charts]
+        return "## Charts\n\n" + '\n\n'.join(images) + "\n\n"
+
+    def _unloads_section(self) -> str:
+        """Report section pointing at the full-detail Parquet datasets of this run"""
+        if not self.unloads:
+            return ""
+        lines = [f"- {description}: {result.rows:,} rows in {result.files} file(s), {format_bytes(result.bytes)}: "
+                 f"`{os.path.relpath(result.path, self.output_dir)}/`" for description, result in self.unloads.items()]
+        return ("## Full Detail\n\nUnloaded as Parquet; scan with `pyarrow.dataset.dataset(path)` or "
+                "`polars.scan_parquet(path + '/*.parquet')`.\n\n" + '\n'.join(lines) + "\n\n")
+
+    def _estimates_section(self) -> str:
+        """Report note when visitor counts come from merged sketches rather than exact counts"""
+        if not self.cube or self.exact_counts or not any(key in self.results for key in CONSOLIDATED_RESULT_KEYS):
+            return ""
+        from visitor_revenue.hll import error_bound
+
+        return (f"## Estimated Counts\n\nUnique, new and pre-signup visitor counts are HyperLogLog estimates, "
+                f"within ±{error_bound():.1%} of the exact distinct count with 95% confidence. "
+                f"Rerun with `--cube --exact` for audited numbers.\n\n")
+
+    def _query_costs_section(self) -> str:
+        """Report section with each planned query's estimated and actual cost"""
+        if not self.query_plans:
+            return ""
+        lines = cost_table(self.query_plans, self.executed_queries, self.cost_budget)
+        notes = [f"- {plan.description}: {plan.reason}" for plan in self.query_plans if plan.decision == 'downgrade']
+        return (f"## Query Costs\n\nBudget: {self.cost_budget.describe()}. Estimates are from EXPLAIN and latency "
+                f"history at {self.cost_budget.credits_per_hour:g} credits/hour; actuals from query history.\n\n"
+                + '\n'.join(lines) + "\n\n" + ('\n'.join(notes) + "\n\n" if notes else ""))
+
+    def _data_gaps_section(self) -> str:
+        """Report section listing queries that failed, so missing sections are never silent"""
+        if not self.failures:
+            return ""
+        lines = [
+            f"- {failure['query']}: {failure['kind']} error after {failure['attempts']} attempt(s): {failure['error']}"
+            for failure in self.failures
+        ]
+        return ("## Data Gaps\n\nThese queries failed; their sections are missing from this report.\n\n"
+                + '\n'.join(lines) + "\n\n")
+
+    def run_analyses(self):
+        """Run every analysis step, up to max_concurrency at a time"""
+        methods = [method for key, method in self.ANALYSIS_STEPS
+                   if not ((self.consolidated or self.cube) and key in CONSOLIDATED_RESULT_KEYS)]
+        if self.cube:
+            methods.insert(0, 'analyze_visitor_cube')
+        elif self.consolidated:
+            methods.insert(0, 'analyze_visitor_details_consolidated')
+        if self.bulk:
+            methods.append('unload_visitor_detail')
+        checkpoints = RunCheckpoints(os.path.join(self.output_dir, 'runs', self.analysis_date))
+        if self.resume:
+            methods = [method for method in methods if not self._restore_step(checkpoints, method)]
+        else:
+            checkpoints.reset()
+        concurrency = self.max_concurrency
+        if self.cost_budget is not None:
+            self.plan_queries(methods)
+            methods = [plan.method for plan in self.query_plans]
+            concurrency = min(concurrency, self.cost_budget.max_concurrency)
+        run_grouped([functools.partial(self._run_checkpointed_step, checkpoints, method) for method in methods],
+                    concurrency)
+
+        # Completion order varies under concurrency; keep report order stable
+        self.results = {key: self.results[key] for key, _ in self.ANALYSIS_STEPS if key in self.results}
+
+    def plan_queries(self, methods: Sequence[str]):
+        """EXPLAIN each step's query and schedule the steps against cost_budget (into query_plans)"""
+        print(f"\nPlanning {len(methods)} analysis step(s); budget: {self.cost_budget.describe()}")
+        with self.tracer.span('plan_queries', steps=len(methods)):
+            plans = [self._plan_step(method) for method in methods]
+            self.query_plans = schedule(plans, self.cost_budget, self._downgrade)
+        print('\n'.join(cost_table(self.query_plans, None, self.cost_budget)))
+        for plan in self.query_plans:
+            if plan.reason:
+                print(f"  • {plan.description}: {plan.reason}")
+
+    def _plan_step(self, method: str, window_days: Optional[int] = None) -> StepPlan:
+        """Capture a step's query without running it, then estimate its cost"""
+        plan = StepPlan(method, window_days=window_days)
+        self._step.captured, self._step.plan, self._step.days = [], plan, None
+        try:
+            # The step's own output (banners, tables) belongs to the real run
+            with contextlib.redirect_stdout(io.StringIO()):
+                getattr(self, method)()
+        except QueryCaptured:
+            pass
+        finally:
+            captured, self._step.captured, self._step.plan = self._step.captured, None, None
+        plan.days = self._step.days
+        if not captured:
+            return plan
+
+        plan.query, plan.description = captured[0]
+        if self.cache is not None and self.cache.contains(plan.query, self.analysis_date):
+            plan.cached = True
+            return plan
+        try:
+            with self.tracer.span('explain', query=plan.description):
+                plan.estimate = parse_explain(self._open_stream(explain_sql(plan.query)).to_dicts())
+        except (SnowflakeQueryError, ValueError) as e:
+            print(f"Could not estimate {plan.description}: {e}")
+        plan.seconds = self.query_runner.history.quantile(plan.description, 0.5)
+        return plan
+
+    def _downgrade(self, plan: StepPlan, days: int) -> StepPlan:
+        """The step re-planned with its date window shortened to `days`"""
+        shorter = self._plan_step(plan.method, window_days=days)
+        if shorter.seconds is not None and plan.bytes:
+            # History is of full-window runs; time scales with bytes scanned
+            shorter.seconds *= shorter.bytes / plan.bytes
+        return shorter
+
+    def _run_step(self, method: str):
+        with self.tracer.span('analysis', step=method):
+            return getattr(self, method)()
+
+    def _step_keys(self, method: str) -> Tuple[str, ...]:
+        """Result keys an analysis step produces"""
+        if method in ('analyze_visitor_details_consolidated', 'analyze_visitor_cube'):
+            return CONSOLIDATED_RESULT_KEYS
+        return tuple(key for key, step in self.ANALYSIS_STEPS if step == method)
+
+    def _checkpoint_settings(self) -> Dict:
+        """Settings that change what a step queries; checkpoints from other settings aren't reused"""
+        return {
+            'consolidated': self.consolidated,
+            'cube': self.cube,
+            'exact_counts': self.exact_counts,
+            'incremental': self.daily_store is not None,
+            # Checkpoint files are in the backend's own format
+            'result_backend': self.result_backend.name,
+        }
+
+    def _run_checkpointed_step(self, checkpoints: RunCheckpoints, method: str):
+        """Run a step, then checkpoint its results (or its failure)"""
+        self._step.queries, self._step.failed = [], False
+        plan = next((plan for plan in self.query_plans if plan.method == method), None)
+        self._step.plan = plan
+        failed = True
+        try:
+            result = self._run_step(method)
+            failed = self._step.failed
+            return result
+        finally:
+            queries, self._step.queries, self._step.plan = self._step.queries, None, None
+            keys = [] if failed else [key for key in self._step_keys(method) if key in self.results]
+            with self.tracer.span('checkpoint', step=method):
+                os.makedirs(checkpoints.run_dir, exist_ok=True)
+                fmt = self.result_backend.checkpoint_format
+                for key in keys:
+                    self.result_backend.write(self.results[key], checkpoints.result_path(key, fmt), fmt)
+                # A shortened window isn't this step's result; --resume reruns it
+                status = 'failed' if failed else 'downgraded' if plan is not None and plan.decision == 'downgrade' else 'ok'
+                checkpoints.record(method, status, keys, queries,
+                                   self.analysis_date, self._checkpoint_settings())
+
+    def _restore_step(self, checkpoints: RunCheckpoints, method: str) -> bool:
+        """Load a step's results from a successful checkpoint; False if it has to run"""
+        if method == 'unload_visitor_detail':
+            # The unloaded files are the checkpoint; unload_query reuses them
+            return False
+        entry = checkpoints.completed(method, self.analysis_date, self._checkpoint_settings())
+        if entry is None:
+            return False
+        try:
+            fmt = self.result_backend.checkpoint_format
+            restored = {key: self.result_backend.read(checkpoints.result_path(key, fmt)) for key in entry['keys']}
+        except (OSError, ValueError):
+            return False
+        self.results.update(restored)
+        print(f"Restored {method} from checkpoint ({', '.join(entry['keys']) or 'no results'})")
+        return True
+
     def run_full_analysis(self):
         """Execute complete visitor-to-revenue analysis"""
         print("\n" + "="*80)
         print("WEBFLOW VISITOR-TO-REVENUE CONVERSION ANALYSIS")
         print("="*80)
 
-        # Run all analyses
-        self.analyze_visitor_metrics_by_geography()
-        self.analyze_visitor_metrics_by_channel()
-        self.analyze_revenue_by_segment()
-        self.analyze_signup_to_revenue_conversion()
-        self.analyze_geo_channel_crossover()
-        self.analyze_visitor_trends()
+        try:
+            with self.tracer.span('run_full_analysis'):
+                # Run all analyses (concurrently when max_concurrency > 1)
+                self.run_analyses()
+                self.check_result_reuse()
+
+                # Generate insights and save results
+                self.save_results()
+        finally:
+            self.close()
+            self.query_runner.save()
+            self.tracer.export()
 
-        # Generate insights and save results
-        self.save_results()
+        self._print_failures()
 
         print("\n" + "="*80)
         print("ANALYSIS COMPLETE")
         print("="*80)
 
+    def _print_failures(self):
+        if self.failures:
+            print(f"\n⚠️  {len(self.failures)} quer{'y' if len(self.failures) == 1 else 'ies'} failed; "
+                  f"their sections are missing from the report:")
+            for failure in self.failures:
+                print(f"  • {failure['query']}: {failure['kind']} after {failure['attempts']} attempt(s) - {failure['error']}")
+
+    def run_backfill(self, dates: Sequence[str], workers: int = 4, batch: bool = True,
+                     batch_size: Optional[int] = None):
+        """Produce result sets and a report as of each date, under output_dir/backfill.
+
+        Dates recorded in the backfill manifest are skipped, so rerunning an
+        interrupted backfill resumes it. With batch, shared data is fetched
+        for many dates per query (see visitor_revenue.backfill); otherwise
+        each date runs its own queries. Up to `workers` dates are processed
+        at once, sharing this analyzer's connection and caches.
+        """
+        from visitor_revenue.backfill import BACKFILL_BATCH_DATES, BackfillManifest
+
+        backfill_dir = os.path.join(self.output_dir, 'backfill')
+        manifest = BackfillManifest(os.path.join(backfill_dir, 'backfill_manifest.json'))
+        pending = [as_of for as_of in sorted(set(dates)) if as_of not in manifest]
+
+        print("\n" + "="*80)
+        print("WEBFLOW VISITOR-TO-REVENUE BACKFILL")
+        print("="*80)
+        print(f"{len(dates)} as-of dates; {len(dates) - len(pending)} already completed, {len(pending)} to run")
+
+        try:
+            with self.tracer.span('run_backfill', dates=len(pending)):
+                if pending:
+                    self._backfill(pending, backfill_dir, manifest, workers, batch, batch_size or BACKFILL_BATCH_DATES)
+        finally:
+            self.close()
+            self.query_runner.save()
+            self.tracer.export()
+
+        self._print_failures()
+        completed = sum(as_of in manifest for as_of in pending)
+        print("\n" + "="*80)
+        print(f"BACKFILL COMPLETE: {completed} of {len(pending)} dates written to {backfill_dir}")
+        print("="*80)
+
+    def _backfill(self, pending: List[str], backfill_dir: str, manifest: 'BackfillManifest',
+                  workers: int, batch: bool, batch_size: int):
+        # Start the connection now so every date shares it
+        if self.local_backend is None and self.query_mode == 'worker':
+            self._get_worker()
+        elif self.local_backend is None and self.query_mode == 'mcp':
+            self._get_mcp_pool()
+
+        shared, groupings, daily_store = {}, {}, None
+        # Backfill-only aggregates (never re-fetched), removed when the backfill ends
+        store_dir = tempfile.mkdtemp(prefix='backfill_daily_') if batch else None
+        try:
+            if batch:
+                revenue = self.analyze_revenue_by_segment()
+                if not self.result_backend.empty(revenue):
+                    # Current-state table: the same snapshot for every as-of date
+                    shared['revenue_segments'] = revenue
+
+                daily_store = DailyAggregateStore(os.path.join(store_dir, 'daily_aggregates.sqlite'), refetch_days=0)
+                first, last = date.fromisoformat(pending[0]), date.fromisoformat(pending[-1])
+                for table, start, end, description in [
+                    ('conversion_daily', first - timedelta(days=90), last - timedelta(days=1), "Backfill: Signup to Subscription Conversion"),
+                    ('visitor_daily', first - timedelta(days=30), last, "Backfill: Daily Visitor Trends"),
+                ]:
+                    try:
+                        with self.tracer.span('analysis', step=table):
+                            daily_store.refresh(table, start, end,
+                                                lambda sql: self.fetch_rows(sql, f"{description}: daily aggregates"))
+                        print(f"\n{description}: fetched daily aggregates for {start} to {end}")
+                    except SnowflakeQueryError as e:
+                        # Dates fetch the days they need themselves
+                        print(f"Error executing query: {e}")
+                        self._record_failure(description, e)
+
+                chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+                for chunk_groupings in run_grouped(
+                        [functools.partial(self._fetch_batched_groupings, chunk) for chunk in chunks], workers):
+                    groupings.update(chunk_groupings)
+
+            run_grouped([
+                functools.partial(self._backfill_date, as_of, backfill_dir, manifest,
+                                  dict(shared, **groupings.get(as_of, {})), daily_store)
+                for as_of in pending
+            ], workers)
+        finally:
+            if store_dir is not None:
+                shutil.rmtree(store_dir, ignore_errors=True)
+
+    def _fetch_batched_groupings(self, as_of_dates: List[str]) -> Dict[str, Dict[str, List[Dict]]]:
+        from visitor_revenue.backfill import batched_visitor_query, split_batched_visitor_groupings
+
+        description = f"Backfill: Visitor Groupings as of {as_of_dates[0]} to {as_of_dates[-1]}"
+        with self.tracer.span('analysis', step='batched_visitor_groupings', dates=len(as_of_dates)):
+            df = self.execute_snowflake_query(batched_visitor_query(as_of_dates), description)
+        if self.result_backend.empty(df):
+            return {}
+        print(f"\n{description}: {len(df):,} rows")
+        return split_batched_visitor_groupings(self.result_backend.to_rows(df))
+
+    def _backfill_date(self, as_of: str, backfill_dir: str, manifest: 'BackfillManifest',
+                       prefetched: Dict, daily_store: Optional[DailyAggregateStore]):
+        """Run the analysis as of one date, starting from prefetched results"""
+        from visitor_revenue.backfill import BATCHED_RESULT_KEYS
+
+        run = self._as_of(as_of, backfill_dir, daily_store)
+        print(f"\n{'-'*80}\nAS OF {as_of}\n{'-'*80}")
+        for key, value in prefetched.items():
+            if key not in BATCHED_RESULT_KEYS:
+                run.results[key] = value
+        run._store_groupings({key: value for key, value in prefetched.items() if key in BATCHED_RESULT_KEYS})
+        for key, method in self.ANALYSIS_STEPS:
+            if key not in run.results:
+                run._run_step(method)
+        run.results = {key: run.results[key] for key, _ in self.ANALYSIS_STEPS if key in run.results}
+        run.save_results()
+
+        self.query_timings.extend(run.query_timings)
+        self.executed_queries.extend(run.executed_queries)
+        self.failures.extend(dict(failure, query=f"{failure['query']} (as of {as_of})") for failure in run.failures)
+        if not run.failures:
+            manifest.complete(as_of, f"{backfill_dir}/visitor_revenue_report_{as_of}.md")
+
+    def _as_of(self, as_of: str, output_dir: str, daily_store: Optional[DailyAggregateStore]) -> 'WebflowVisitorRevenueAnalyzer':
+        """An analyzer for one as-of date sharing this one's connection, caches and query policy"""
+        run = copy.copy(self)
+        run.analysis_date = as_of
+        run.output_dir = output_dir
+        run.daily_store = daily_store
+        run.results = {}
+        run.query_timings = []
+        run.executed_queries = []
+        run.failures = []
+        run.visitor_cube = None
+        # Dates already run in parallel; steps within a date run in order
+        run.max_concurrency = 1
+        # Charts render inline in the date's thread rather than a pool per date
+        run.chart_workers = 1
+        run.consolidated = run.cube = False
+        # Full-detail pulls are for today's report, not each backfilled date
+        run.bulk = False
+        run.unloads = {}
+        run.visitor_detail = None
+        return run
+
+
+def main(argv: Optional[List[str]] = None, default_backend: str = 'pandas',
+         default_formats: Sequence[str] = ('arrow',)) -> int:
+    """Command line entry point; returns the exit status (1 if any query failed)"""
+    from visitor_revenue.backfill import BACKFILL_BATCH_DATES, backfill_dates
+
+    parser = argparse.ArgumentParser(description="Webflow visitor-to-revenue analysis")
+    parser.add_argument('command', nargs='?', choices=['analyze', 'backfill'], default='analyze',
+                        help="analyze: today's report (default); backfill: a report as of every --step days from --from to --to")
+    backfill = parser.add_argument_group('backfill')
+    backfill.add_argument('--from', dest='from_date', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                          help="First as-of date")
+    backfill.add_argument('--to', dest='to_date', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                          help="Last as-of date (default: today; with --local, the last synthetic date)")
+    backfill.add_argument('--step', type=int, default=7, help="Days between as-of dates (default: %(default)s)")
+    backfill.add_argument('--workers', type=int, default=4,
+                          help="As-of dates processed at once, sharing one connection (default: %(default)s)")
+    backfill.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_DATES,
+                          help="As-of dates per batched visitor query (default: %(default)s)")
+    backfill.add_argument('--no-batch', action='store_true',
+                          help="Run every query separately for each as-of date instead of batching dates")
+    transport = parser.add_mutually_exclusive_group()
+    transport.add_argument('--spawn', action='store_true',
+                           help="Spawn `npm run snowflake` per query instead of using a persistent worker")
+    transport.add_argument('--mcp', action='store_true',
+                           help="Query through pooled Snowflake MCP server sessions (query_run_query)")
+    parser.add_argument('--mcp-sessions', type=int, default=DEFAULT_POOL_SIZE,
+                        help="MCP server sessions to keep open with --mcp (default: %(default)s)")
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help="Maximum number of analysis queries to run at once (default: 1, sequential)")
+    visitor_details = parser.add_mutually_exclusive_group()
+    visitor_details.add_argument('--consolidated', action='store_true',
+                                 help="Fetch all visitor-detail groupings with a single GROUPING SETS query")
+    visitor_details.add_argument('--cube', action='store_true',
+                                 help="Fetch a region x channel x day cube and derive the visitor-detail results from it")
+    parser.add_argument('--exact', action='store_true',
+                        help="With --cube, fetch exact COUNT(DISTINCT) visitor counts instead of HyperLogLog sketches")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Keep per-day aggregates locally and fetch only missing days for trends/conversion")
+    parser.add_argument('--refetch-days', type=int, default=DEFAULT_REFETCH_DAYS,
+                        help="Trailing days always re-fetched in --incremental mode (late-arriving data)")
+    parser.add_argument('--backend', choices=list(RESULT_BACKENDS), default=default_backend,
+                        help="Table type results are held in: records (pure Python, fastest startup), "
+                             "pandas or polars (default: %(default)s)")
+    parser.add_argument('--format', nargs='+', choices=OUTPUT_FORMATS, default=list(default_formats),
+                        help="Result file format(s) written by save_results (default: %(default)s)")
+    parser.add_argument('--charts', action='store_true',
+                        help="Render geography, channel, heatmap, revenue and trend charts into the report "
+                             "(needs matplotlib; also writes an HTML report)")
+    parser.add_argument('--chart-workers', type=int, default=DEFAULT_CHART_WORKERS,
+                        help="Processes rendering charts at once (default: %(default)s)")
+    budget = parser.add_argument_group('cost budget')
+    budget.add_argument('--plan', action='store_true',
+                        help="EXPLAIN every query first, run the cheapest first and report estimated vs actual cost")
+    budget.add_argument('--budget-gb', type=float,
+                        help="Bytes the run may scan, in GB (implies --plan); queries over it are shortened or refused")
+    budget.add_argument('--budget-credits', type=float,
+                        help="Warehouse credits the run may use (implies --plan)")
+    budget.add_argument('--budget-concurrency', type=int, default=DEFAULT_BUDGET_CONCURRENCY,
+                        help="Planned queries in flight at once (default: %(default)s)")
+    budget.add_argument('--credits-per-hour', type=float, default=DEFAULT_CREDITS_PER_HOUR,
+                        help="Credit rate of the warehouse, for credit estimates (default: %(default)s, Medium)")
+    parser.add_argument('--bulk', action='store_true',
+                        help="Also unload every region x channel x day row (no LIMIT) to a Parquet dataset "
+                             "via a stage, skipping JSON transfer (needs pyarrow)")
+    parser.add_argument('--download-workers', type=int, default=DEFAULT_DOWNLOAD_WORKERS,
+                        help="Unloaded files downloaded at once with --bulk (default: %(default)s)")
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the on-disk query result cache")
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument('--refresh', action='store_true',
+                            help="Re-run every query and overwrite cached results")
+    cache_mode.add_argument('--offline', action='store_true',
+                            help="Serve results from the cache only; never contact Snowflake")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Evict least recently used results beyond this size")
+    parser.add_argument('--resume', action='store_true',
+                        help="Restore today's checkpointed steps; rerun only missing or failed ones, then rewrite the report")
+    parser.add_argument('--no-single-flight', action='store_true',
+                        help="Don't share executions of identical queries already in flight on this host")
+    parser.add_argument('--timeout', type=float, default=QueryPolicy.timeout,
+                        help="Seconds before a query attempt is abandoned (0: no deadline; default: %(default)s)")
+    parser.add_argument('--retries', type=int, default=QueryPolicy.max_attempts - 1,
+                        help="Retries for timeouts and transient errors, with jittered backoff (default: %(default)s)")
+    parser.add_argument('--hedge', type=float, nargs='?', const=0.95, default=None, metavar='QUANTILE',
+                        help="Send a duplicate of any query still running past this latency quantile "
+                             "of its recent runs (default when given: 0.95)")
+    parser.add_argument('--local', action='store_true',
+                        help="Query a synthetic local DuckDB stand-in instead of Snowflake (implies --no-cache)")
+    parser.add_argument('--local-rows', type=int, default=DEFAULT_ROWS,
+                        help="Synthetic DAILY_MARKETING_VISITOR_DETAILS rows for --local (default: %(default)s)")
+    parser.add_argument('--local-db', help="DuckDB file to keep the --local tables in and reuse across runs")
+    parser.add_argument('--trace', action='store_true',
+                        help="Record per-stage spans; write a Chrome trace and a Prometheus textfile")
+    parser.add_argument('--trace-dir', default=os.path.join(PROJECT_ROOT, 'analysis', 'visitor_revenue_output'),
+                        help="Directory for --trace output (default: the results directory)")
+    args = parser.parse_args(argv)
+    if args.command == 'backfill' and args.from_date is None:
+        parser.error("backfill requires --from")
+    if args.to_date is None:
+        args.to_date = date.fromisoformat(SYNTHETIC_END_DATE) if args.local else date.today()
+
+    cache = None
+    if not args.no_cache and not args.local:
+        cache = QueryCache(
+            max_bytes=args.cache_max_mb * 1024 * 1024,
+            mode='refresh' if args.refresh else 'offline' if args.offline else 'normal',
+        )
+
+    query_runner = QueryRunner(
+        QueryPolicy(timeout=args.timeout or None, max_attempts=args.retries + 1, hedge_quantile=args.hedge),
+        # Synthetic latencies must not set the hedging thresholds for real queries
+        LatencyHistory(None if args.local else DEFAULT_HISTORY_PATH),
+    )
+
+    single_flight = None
+    if not args.no_single_flight:
+        # Synthetic results must never be handed to another process
+        single_flight = SingleFlight(cross_process=not args.local)
+
+    daily_store = None
+    if args.incremental:
+        # Synthetic aggregates must never land in the real store
+        store_path = os.path.join(tempfile.mkdtemp(), 'daily_aggregates.sqlite') if args.local else DEFAULT_STORE_PATH
+        daily_store = DailyAggregateStore(store_path, refetch_days=args.refetch_days)
+
+    cost_budget = None
+    if args.plan or args.budget_gb is not None or args.budget_credits is not None:
+        cost_budget = CostBudget(
+            max_bytes=int(args.budget_gb * 1024 ** 3) if args.budget_gb is not None else None,
+            max_credits=args.budget_credits,
+            max_concurrency=args.budget_concurrency,
+            credits_per_hour=args.credits_per_hour,
+        )
+
+    tracer = None
+    if args.trace:
+        tracer = Tracer(
+            trace_path=os.path.join(args.trace_dir, f"visitor_revenue_trace_{datetime.now().strftime('%Y-%m-%d')}.json"),
+            metrics_path=os.path.join(args.trace_dir, 'visitor_revenue.prom'),
+        )
+
+    analyzer = WebflowVisitorRevenueAnalyzer(
+        query_mode='spawn' if args.spawn else 'mcp' if args.mcp else 'worker',
+        max_concurrency=args.concurrency,
+        cache=cache,
+        consolidated=args.consolidated,
+        daily_store=daily_store,
+        output_formats=args.format,
+        local_backend=LocalSnowflake(rows=args.local_rows, database=args.local_db) if args.local else None,
+        tracer=tracer,
+        mcp_sessions=args.mcp_sessions,
+        single_flight=single_flight,
+        query_runner=query_runner,
+        cube=args.cube,
+        exact_counts=args.exact,
+        resume=args.resume,
+        result_backend=args.backend,
+        charts=args.charts,
+        chart_workers=args.chart_workers,
+        cost_budget=cost_budget,
+        bulk=args.bulk,
+        download_workers=args.download_workers,
+    )
+    if args.command == 'backfill':
+        analyzer.run_backfill(backfill_dates(args.from_date, args.to_date, args.step), workers=args.workers,
+                              batch=not args.no_batch, batch_size=args.batch_size)
+    else:
+        analyzer.run_full_analysis()
+    return 1 if analyzer.failures else 0
+
+
 if __name__ == "__main__":
-    analyzer = WebflowVisitorRevenueAnalyzer()
-    analyzer.run_full_analysis()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
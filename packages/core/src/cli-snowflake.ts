@@ -6,6 +6,7 @@
  */
 
 import snowflake from 'snowflake-sdk';
+import * as readline from 'readline';
 
 // Snowflake connection configuration
 const config = {
@@ -63,6 +64,112 @@ async function executeQuery(query: string): Promise<any[]> {
   });
 }
 
+/**
+ * Execute a query in streaming mode; resolves once the statement has run,
+ * before any rows are fetched. onStatement receives the statement as soon as
+ * it is submitted, so it can be cancelled while still executing.
+ */
+async function executeStreaming(query: string, onStatement?: (stmt: any) => void): Promise<any> {
+  const connection = await getConnection();
+
+  return new Promise((resolve, reject) => {
+    const statement = connection.execute({
+      sqlText: query,
+      streamResult: true,
+      complete: (err: any, stmt: any) => {
+        if (err) {
+          reject(err);
+        } else {
+          resolve(stmt);
+        }
+      },
+    });
+    onStatement?.(statement);
+  });
+}
+
+// GET and PUT move files between a stage and this host. The driver runs them
+// through its file transfer agent and returns their status rows all at once,
+// not as a stream.
+const FILE_TRANSFER = /^\s*(GET|PUT)\s/i;
+
+/**
+ * Execute a query, streaming its result unless it is a file transfer.
+ * Resolves with the statement and, for file transfers, the buffered rows.
+ */
+async function executeForFrames(query: string, onStatement?: (stmt: any) => void): Promise<{ stmt: any; rows?: any[] }> {
+  if (!FILE_TRANSFER.test(query)) {
+    return { stmt: await executeStreaming(query, onStatement) };
+  }
+  const connection = await getConnection();
+
+  return new Promise((resolve, reject) => {
+    const statement = connection.execute({
+      sqlText: query,
+      complete: (err: any, stmt: any, rows: any[]) => {
+        if (err) {
+          reject(err);
+        } else {
+          resolve({ stmt, rows: rows || [] });
+        }
+      },
+    });
+    onStatement?.(statement);
+  });
+}
+
+/**
+ * Write a statement's result as framed NDJSON:
+ *
+ *   {"frame":"header","protocol":1,"columns":[{"name":..,"type":..,"scale":..}]}
+ *   [value, value, ...]        one positional JSON array per row
+ *   {"frame":"trailer","row_count":N,"query_id":"..."}
+ *
+ * Rows are streamed from Snowflake and written as they arrive, pausing on
+ * stdout backpressure, so the full result is never held in memory. A file
+ * transfer's buffered rows are written as they are.
+ */
+function writeFrames(stmt: any, extra: Record<string, unknown> = {}, buffered?: any[]): Promise<void> {
+  let columns = (stmt.getColumns?.() || []).map((column: any) => ({
+    name: column.getName(),
+    type: column.getType(),
+    scale: column.getScale(),
+    nullable: column.isNullable(),
+  }));
+  if (buffered && columns.length === 0 && buffered.length > 0) {
+    columns = Object.keys(buffered[0]).map((name) => ({ name, type: 'text', scale: null, nullable: true }));
+  }
+  const names: string[] = columns.map((column: any) => column.name);
+
+  process.stdout.write(JSON.stringify({ frame: 'header', protocol: 1, ...extra, columns }) + '\n');
+
+  if (buffered) {
+    buffered.forEach((row) => process.stdout.write(JSON.stringify(names.map((name) => row[name])) + '\n'));
+    const trailer = { frame: 'trailer', ...extra, row_count: buffered.length, query_id: stmt.getQueryId?.() };
+    process.stdout.write(JSON.stringify(trailer) + '\n');
+    return Promise.resolve();
+  }
+
+  return new Promise((resolve, reject) => {
+    let rowCount = 0;
+    const rows = stmt.streamRows();
+
+    rows.on('data', (row: any) => {
+      rowCount++;
+      if (!process.stdout.write(JSON.stringify(names.map((name) => row[name])) + '\n')) {
+        rows.pause();
+        process.stdout.once('drain', () => rows.resume());
+      }
+    });
+    rows.on('error', reject);
+    rows.on('end', () => {
+      const trailer = { frame: 'trailer', ...extra, row_count: rowCount, query_id: stmt.getQueryId() };
+      process.stdout.write(JSON.stringify(trailer) + '\n');
+      resolve();
+    });
+  });
+}
+
 // Clean up connection on exit
 process.on('exit', () => {
   if (cachedConnection && cachedConnection.destroy) {
@@ -138,15 +245,128 @@ async function getWeeklyTrend() {
   });
 }
 
-async function customQuery(query: string) {
+async function customQuery(query: string, format: string = 'json') {
+  if (format === 'ndjson') {
+    // Machine-readable framed output; nothing else may be written to stdout
+    try {
+      // Timings let callers separate login from warehouse execution
+      const connectStarted = Date.now();
+      await getConnection();
+      const started = Date.now();
+      const { stmt, rows } = await executeForFrames(query);
+      await writeFrames(stmt, { connect_ms: started - connectStarted, elapsed_ms: Date.now() - started }, rows);
+    } catch (error: any) {
+      process.stdout.write(JSON.stringify({ frame: 'error', message: error.message }) + '\n');
+      throw error;
+    }
+    return;
+  }
+
   console.log('\n🔍 Executing custom query...\n');
   const rows = await executeQuery(query);
   console.log(JSON.stringify(rows, null, 2));
 }
 
+/**
+ * Long-lived query worker for the Python analyzers.
+ *
+ * Reads one JSON request per line on stdin ({"id": 1, "sql": "..."}) and
+ * answers each with framed NDJSON (see writeFrames) whose header, trailer
+ * and error frames carry the request id. {"id": 1, "cancel": true} cancels
+ * that request's statement; the caller has stopped waiting for it, so no
+ * result is written. The Snowflake connection is opened once at startup and
+ * reused, so callers pay Node startup, tsx transpile and SSO login once per
+ * run instead of once per query. All diagnostics go to stderr to keep stdout
+ * machine-readable.
+ */
+async function serve() {
+  const send = (message: object) => {
+    process.stdout.write(JSON.stringify(message) + '\n');
+  };
+
+  // Statements execute concurrently, but each response's frames are written
+  // contiguously: only one result streams to stdout at a time.
+  let outputQueue: Promise<void> = Promise.resolve();
+  const withOutput = (write: () => Promise<void> | void): Promise<void> => {
+    const next = outputQueue.then(write);
+    outputQueue = next.catch(() => {});
+    return next;
+  };
+
+  const connectStart = Date.now();
+  await getConnection();
+  send({ event: 'ready', connect_ms: Date.now() - connectStart });
+
+  // Statements still executing or streaming, by request id
+  const running = new Map<number | string, any>();
+  const cancelled = new Set<number | string>();
+
+  // Exit once stdin is closed and every accepted request has been answered
+  let inFlight = 0;
+  let closing = false;
+  const exitWhenIdle = () => {
+    if (closing && inFlight === 0) {
+      withOutput(() => process.exit(0));
+    }
+  };
+
+  const rl = readline.createInterface({ input: process.stdin, terminal: false });
+
+  rl.on('line', (line) => {
+    if (!line.trim()) return;
+
+    let request: { id: number | string; sql?: string; cancel?: boolean };
+    try {
+      request = JSON.parse(line);
+    } catch (error: any) {
+      send({ frame: 'error', id: null, message: `Invalid request: ${error.message}` });
+      return;
+    }
+
+    if (request.cancel) {
+      const statement = running.get(request.id);
+      if (statement) {
+        cancelled.add(request.id);
+        statement.cancel((err: any) => {
+          if (err) console.error(`Cancel of request ${request.id} failed:`, err.message);
+        });
+      }
+      return;
+    }
+
+    const started = Date.now();
+    const sendError = (error: any) =>
+      withOutput(() => send({ frame: 'error', id: request.id, message: error.message }));
+
+    inFlight++;
+    executeForFrames(request.sql!, (stmt) => running.set(request.id, stmt))
+      .then(({ stmt, rows }) =>
+        withOutput(() =>
+          cancelled.has(request.id)
+            ? undefined
+            : writeFrames(stmt, { id: request.id, elapsed_ms: Date.now() - started }, rows)
+        )
+      )
+      .catch(sendError)
+      .finally(() => {
+        running.delete(request.id);
+        cancelled.delete(request.id);
+        inFlight--;
+        exitWhenIdle();
+      });
+  });
+
+  rl.on('close', () => {
+    closing = true;
+    exitWhenIdle();
+  });
+}
+
 async function main() {
   const command = process.argv[2];
   const arg = process.argv[3];
+  const formatIndex = process.argv.indexOf('--format');
+  const format = formatIndex > 0 ? process.argv[formatIndex + 1] : 'json';
 
   try {
     switch (command) {
@@ -161,7 +381,10 @@ async function main() {
           console.error('Error: Please provide a SQL query');
           process.exit(1);
         }
-        await customQuery(arg);
+        await customQuery(arg, format);
+        break;
+      case 'serve':
+        await serve();
         break;
       default:
         console.log('Snowflake CLI - Quick access to metrics');
@@ -169,6 +392,8 @@ async function main() {
         console.log('  npm run snowflake signups [date]  - Get signup metrics (default: yesterday)');
         console.log('  npm run snowflake trend           - Show 7-day signup trend');
         console.log('  npm run snowflake query "SQL"     - Execute custom SQL query');
+        console.log('      --format ndjson               - Stream rows as framed NDJSON');
+        console.log('  npm run snowflake serve           - Run as a stdin/stdout query worker');
         console.log('\nExamples:');
         console.log('  npm run snowflake signups');
         console.log('  npm run snowflake signups 2025-10-14');
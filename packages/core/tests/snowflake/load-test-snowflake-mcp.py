@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Load test for the Snowflake MCP server's query_run_query tool.
+
+Opens one or more MCP server processes (sessions), then drives
+query_run_query at each requested concurrency level and reports latency
+percentiles, throughput, session-init cost and error rates. The sweep shows
+how many concurrent tool calls one server process sustains before
+throughput stops growing and latency starts queueing.
+
+Against the offline stub (no credentials or network needed):
+
+    python load-test-snowflake-mcp.py --stub --stub-latency-ms 200 \
+        --concurrency 1 2 4 8 16 32 --duration 10
+
+    # a server whose tool blocks the event loop, as a synchronous connector does
+    python load-test-snowflake-mcp.py --stub --stub-blocking --concurrency 1 4 16
+
+Against the real server (same configuration as test-snowflake-mcp-simple.py):
+
+    python load-test-snowflake-mcp.py --config snowflake-mcp/test-config.yaml \
+        --query "SELECT 1" --concurrency 1 2 4 8
+
+Without --rate each level is closed-loop: `concurrency` callers issue calls
+back to back. With --rate, calls arrive on a fixed schedule (open loop) with
+at most `concurrency` in flight, and latency is measured from each call's
+scheduled start, so time spent queueing behind a saturated server counts.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from contextlib import AsyncExitStack
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+
+TOOL = "query_run_query"
+STUB_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub-snowflake-mcp-server.py")
+DEFAULT_QUERY = "SELECT CURRENT_VERSION() as VERSION, CURRENT_USER() as USER, CURRENT_WAREHOUSE() as WAREHOUSE"
+# A level "still scales" while each step up in concurrency adds this much throughput
+SCALING_THRESHOLD = 0.10
+
+
+def server_params(args) -> StdioServerParameters:
+    if args.stub:
+        stub_args = [
+            STUB_SERVER,
+            "--latency-ms", str(args.stub_latency_ms),
+            "--jitter-ms", str(args.stub_jitter_ms),
+            "--rows", str(args.stub_rows),
+            "--row-bytes", str(args.stub_row_bytes),
+            "--error-rate", str(args.stub_error_rate),
+            "--init-delay-ms", str(args.stub_init_delay_ms),
+        ]
+        if args.stub_blocking:
+            stub_args.append("--blocking")
+        return StdioServerParameters(command=sys.executable, args=stub_args, env=dict(os.environ))
+
+    config_path = args.config or os.path.join(os.getcwd(), "snowflake-mcp", "test-config.yaml")
+    return StdioServerParameters(
+        command="uv",
+        args=["run", "mcp-server-snowflake", config_path],
+        env=dict(os.environ),
+    )
+
+
+def percentile(sorted_values: list, pct: float):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def classify(error: BaseException) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, McpError):
+        return "protocol"
+    return "transport"
+
+
+async def open_sessions(stack: AsyncExitStack, params: StdioServerParameters, count: int) -> tuple:
+    """Start count server processes one after another; return sessions and init seconds"""
+    sessions, init_seconds = [], []
+    for index in range(count):
+        started = time.perf_counter()
+        read, write = await stack.enter_async_context(stdio_client(params))
+        session = await stack.enter_async_context(ClientSession(read, write))
+        await session.initialize()
+        init_seconds.append(time.perf_counter() - started)
+
+        tools = await session.list_tools()
+        if not any(tool.name == TOOL for tool in tools.tools):
+            raise RuntimeError(f"Server does not expose {TOOL} (is query_manager enabled?)")
+        sessions.append(session)
+        print(f"✓ Session {index + 1}/{count} ready in {init_seconds[-1] * 1000:.0f} ms")
+    return sessions, init_seconds
+
+
+async def call(session: ClientSession, query: str, timeout: float, scheduled: float, samples: list):
+    """One tool call; appends (scheduled start, latency, outcome, response bytes)"""
+    try:
+        result = await asyncio.wait_for(session.call_tool(TOOL, arguments={"query": query}), timeout)
+    except Exception as e:
+        samples.append((scheduled, time.perf_counter() - scheduled, classify(e), 0))
+        return
+    size = sum(len(item.text) for item in result.content if getattr(item, "type", None) == "text")
+    outcome = "tool_error" if result.isError else "ok"
+    samples.append((scheduled, time.perf_counter() - scheduled, outcome, size))
+
+
+async def run_closed_loop(sessions: list, args, concurrency: int, samples: list, stop_at: float):
+    async def caller(index: int):
+        session = sessions[index % len(sessions)]
+        while time.perf_counter() < stop_at:
+            await call(session, args.query, args.timeout, time.perf_counter(), samples)
+
+    await asyncio.gather(*(caller(index) for index in range(concurrency)))
+
+
+async def run_open_loop(sessions: list, args, concurrency: int, samples: list, started: float, stop_at: float):
+    limit = asyncio.Semaphore(concurrency)
+    interval = 1.0 / args.rate
+
+    async def scheduled_call(session, scheduled: float):
+        async with limit:
+            await call(session, args.query, args.timeout, scheduled, samples)
+
+    tasks = []
+    sent = 0
+    while True:
+        scheduled = started + sent * interval
+        if scheduled >= stop_at:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(scheduled_call(sessions[sent % len(sessions)], scheduled)))
+        sent += 1
+    await asyncio.gather(*tasks)
+
+
+def summarize(concurrency: int, samples: list, measure_from: float) -> dict:
+    measured = [sample for sample in samples if sample[0] >= measure_from]
+    finished_at = max((start + latency for start, latency, _, _ in measured), default=measure_from)
+    window = max(finished_at - measure_from, 1e-9)
+
+    ok = sorted(latency for _, latency, outcome, _ in measured if outcome == "ok")
+    errors = {}
+    for _, _, outcome, _ in measured:
+        if outcome != "ok":
+            errors[outcome] = errors.get(outcome, 0) + 1
+    total = len(measured)
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "concurrency": concurrency,
+        "calls": total,
+        "ok": len(ok),
+        "errors": errors,
+        "error_rate": round((total - len(ok)) / total, 4) if total else 0.0,
+        "throughput_per_s": round(len(ok) / window, 2),
+        "mb_per_s": round(sum(size for _, _, _, size in measured) / window / 1e6, 3),
+        "p50_ms": ms(percentile(ok, 50)),
+        "p95_ms": ms(percentile(ok, 95)),
+        "p99_ms": ms(percentile(ok, 99)),
+        "max_ms": ms(ok[-1] if ok else None),
+    }
+
+
+def find_knee(levels: list, max_p95_ms=None) -> dict:
+    """Highest concurrency that still added throughput (and met the p95 budget).
+
+    Tool errors (bad SQL, injected stub failures) don't disqualify a level;
+    timeouts and transport or protocol failures do.
+    """
+    scaling = levels[0]["concurrency"] if levels else None
+    for previous, current in zip(levels, levels[1:]):
+        if current["throughput_per_s"] < previous["throughput_per_s"] * (1 + SCALING_THRESHOLD):
+            break
+        scaling = current["concurrency"]
+
+    within_budget = None
+    if max_p95_ms is not None:
+        for level in levels:
+            failures = sum(count for kind, count in level["errors"].items() if kind != "tool_error")
+            if level["p95_ms"] is not None and level["p95_ms"] <= max_p95_ms and not failures:
+                within_budget = level["concurrency"]
+    return {"scaling_concurrency": scaling, "p95_budget_concurrency": within_budget}
+
+
+def print_report(init_seconds: list, levels: list, knee: dict, sessions: int, max_p95_ms=None):
+    print(f"\n📊 Session init: {len(init_seconds)} sample(s), "
+          f"min {min(init_seconds) * 1000:.0f} ms, "
+          f"mean {sum(init_seconds) / len(init_seconds) * 1000:.0f} ms, "
+          f"max {max(init_seconds) * 1000:.0f} ms")
+
+    header = f"{'conc':>5} {'calls':>7} {'calls/s':>9} {'MB/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}"
+    print(f"\n{header}\n{'-' * len(header)}")
+    for level in levels:
+        def cell(value):
+            return f"{value:.1f}" if value is not None else "-"
+        print(f"{level['concurrency']:>5} {level['calls']:>7} {level['throughput_per_s']:>9.1f} "
+              f"{level['mb_per_s']:>7.2f} {cell(level['p50_ms']):>8} {cell(level['p95_ms']):>8} "
+              f"{cell(level['p99_ms']):>8} {cell(level['max_ms']):>8} {level['error_rate'] * 100:>6.1f}%")
+        if level["errors"]:
+            details = ", ".join(f"{kind}={count}" for kind, count in sorted(level["errors"].items()))
+            print(f"{'':>5} errors: {details}")
+
+    if len(levels) > 1:
+        per_process = f" across {sessions} server processes" if sessions > 1 else " on one server process"
+        if knee["scaling_concurrency"] == levels[-1]["concurrency"]:
+            print(f"\n📈 Throughput was still scaling at concurrency {knee['scaling_concurrency']}{per_process}, "
+                  f"the top of the sweep; try higher levels to find where it stops")
+        else:
+            print(f"\n📈 Throughput stops scaling past concurrency {knee['scaling_concurrency']}{per_process}")
+    if max_p95_ms is not None:
+        if knee["p95_budget_concurrency"] is None:
+            print(f"⚠️  No level met p95 <= {max_p95_ms:g} ms without timeouts or transport errors")
+        else:
+            print(f"⏱  Highest concurrency with p95 <= {max_p95_ms:g} ms and no failures: "
+                  f"{knee['p95_budget_concurrency']}")
+
+
+async def load_test(args) -> dict:
+    params = server_params(args)
+    target = "stub server" if args.stub else "Snowflake MCP server"
+    print(f"🔧 Starting {args.sessions} {target} session(s)...\n")
+
+    levels = []
+    async with AsyncExitStack() as stack:
+        sessions, init_seconds = await open_sessions(stack, params, args.sessions)
+
+        for concurrency in args.concurrency:
+            mode = f"{args.rate:g} calls/s, max {concurrency} in flight" if args.rate else f"{concurrency} callers"
+            print(f"\n🔍 Level: {mode}, {args.warmup:g}s warmup + {args.duration:g}s")
+            samples = []
+            started = time.perf_counter()
+            measure_from = started + args.warmup
+            stop_at = measure_from + args.duration
+            if args.rate:
+                await run_open_loop(sessions, args, concurrency, samples, started, stop_at)
+            else:
+                await run_closed_loop(sessions, args, concurrency, samples, stop_at)
+            levels.append(summarize(concurrency, samples, measure_from))
+
+    knee = find_knee(levels, args.max_p95_ms)
+    print_report(init_seconds, levels, knee, args.sessions, args.max_p95_ms)
+    return {
+        "target": "stub" if args.stub else "snowflake",
+        "sessions": args.sessions,
+        "rate": args.rate,
+        "duration_s": args.duration,
+        "session_init_ms": [round(seconds * 1000, 1) for seconds in init_seconds],
+        "levels": levels,
+        **knee,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Latency and throughput load test for {TOOL}")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                        help="Concurrency levels to sweep (calls in flight)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Open-loop arrival rate in calls/s (default: closed loop)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds before each level")
+    parser.add_argument("--sessions", type=int, default=1, help="Server processes to spread calls over")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-call timeout in seconds")
+    parser.add_argument("--query", default=DEFAULT_QUERY, help="SQL passed to query_run_query")
+    parser.add_argument("--max-p95-ms", type=float, default=None,
+                        help="Also report the highest level whose p95 stays within this budget")
+    parser.add_argument("--json", dest="json_path", help="Write the results as JSON to this path")
+    parser.add_argument("--config", help="Service config for mcp-server-snowflake")
+
+    stub = parser.add_argument_group("stub server")
+    stub.add_argument("--stub", action="store_true", help="Test stub-snowflake-mcp-server.py instead")
+    stub.add_argument("--stub-latency-ms", type=float, default=100.0)
+    stub.add_argument("--stub-jitter-ms", type=float, default=0.0)
+    stub.add_argument("--stub-rows", type=int, default=10)
+    stub.add_argument("--stub-row-bytes", type=int, default=100)
+    stub.add_argument("--stub-error-rate", type=float, default=0.0)
+    stub.add_argument("--stub-init-delay-ms", type=float, default=0.0)
+    stub.add_argument("--stub-blocking", action="store_true", help="Stub tool blocks its event loop")
+    args = parser.parse_args()
+
+    if args.rate is not None and args.rate <= 0:
+        parser.error("--rate must be positive")
+    if args.sessions < 1 or min(args.concurrency) < 1:
+        parser.error("--sessions and --concurrency must be at least 1")
+
+    try:
+        results = asyncio.run(load_test(args))
+    except Exception as e:
+        print(f"❌ Load test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to {args.json_path}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for mcp-server-snowflake.
+
+Serves a `query_run_query` tool over stdio with injectable latency, payload
+size and failure rate, so load-test-snowflake-mcp.py can run without
+Snowflake credentials or network access:
+
+    python stub-snowflake-mcp-server.py --latency-ms 200 --jitter-ms 50 \
+        --rows 1000 --row-bytes 200 --error-rate 0.01 --init-delay-ms 1500
+
+--init-delay-ms is spent before the server starts answering (connector
+import and SSO login in the real server). --blocking sleeps in a synchronous
+tool, which holds the event loop like a blocking Snowflake connector call,
+so calls on one server process run one at a time.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from mcp.server.fastmcp import FastMCP
+
+
+def build_rows(count: int, row_bytes: int) -> list:
+    """count result rows of roughly row_bytes serialized bytes each"""
+    template = {"ID": 0, "DATE_DAY": "2025-10-14", "VALUE": 0.0, "PAYLOAD": ""}
+    overhead = len(json.dumps(template))
+    padding = "x" * max(0, row_bytes - overhead)
+    return [
+        {"ID": i, "DATE_DAY": "2025-10-14", "VALUE": round(i * 1.5, 2), "PAYLOAD": padding}
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Snowflake MCP server for load testing")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Mean execution time per query")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter around the latency")
+    parser.add_argument("--rows", type=int, default=10, help="Rows returned per query")
+    parser.add_argument("--row-bytes", type=int, default=100, help="Approximate serialized size of each row")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls that fail (0-1)")
+    parser.add_argument("--init-delay-ms", type=float, default=0.0, help="Startup delay before serving")
+    parser.add_argument("--blocking", action="store_true", help="Block the event loop while 'executing'")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for jitter and injected failures")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Serialized once: the load test measures the transport, not json.dumps
+    payload = json.dumps(build_rows(args.rows, args.row_bytes), default=str)
+    # Per-request INFO logging on stderr would drown out the load test's report
+    mcp = FastMCP("snowflake-stub", log_level="WARNING")
+
+    def delay() -> float:
+        jitter = rng.uniform(-args.jitter_ms, args.jitter_ms) if args.jitter_ms else 0.0
+        return max(0.0, args.latency_ms + jitter) / 1000
+
+    def check_failure(query: str):
+        if rng.random() < args.error_rate:
+            raise RuntimeError(f"Injected failure for query: {query[:60]}")
+
+    if args.blocking:
+        @mcp.tool()
+        def query_run_query(query: str) -> str:
+            """Run a SQL query (stub: sleeps, then returns synthetic rows)"""
+            time.sleep(delay())
+            check_failure(query)
+            return payload
+    else:
+        @mcp.tool()
+        async def query_run_query(query: str) -> str:
+            """Run a SQL query (stub: sleeps, then returns synthetic rows)"""
+            await asyncio.sleep(delay())
+            check_failure(query)
+            return payload
+
+    if args.init_delay_ms:
+        time.sleep(args.init_delay_ms / 1000)
+    mcp.run()
+
+
+if __name__ == "__main__":
+    main()